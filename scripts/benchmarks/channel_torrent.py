@@ -0,0 +1,66 @@
+"""
+This script measures the time to create a channel torrent after a commit adds a new blob to a channel, with the full
+hashing of the channel directory by libtorrent and with the incremental hashing that reuses the hashes of the previous
+channel torrent.
+
+For available parameters see "parse_args" function below.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from tribler.core.components.libtorrent.utils.libtorrent_helper import libtorrent as lt
+from tribler.core.components.metadata_store.db.channel_torrent import create_channel_torrent
+from tribler.core.utilities.path_util import Path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the incremental hashing of the channel torrents')
+
+    parser.add_argument('-b', '--blobs', type=int, help='number of blobs in the channel', default=200)
+    parser.add_argument('-s', '--blob-size', type=int, help='size of a blob, in bytes', default=1024 * 1024)
+
+    return parser.parse_args()
+
+
+def create_full(directory):
+    fs = lt.file_storage()
+    lt.add_files(fs, str(directory))
+    t = lt.create_torrent(fs)
+    lt.set_piece_hashes(t, str(directory.parent))
+    return t.generate()
+
+
+def add_blob(directory, index, size):
+    (directory / f'{index:012d}.mdblob.lz4').write_bytes(os.urandom(size))
+
+
+def run(arguments):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        directory = Path(tmp_dir) / 'channel'
+        directory.mkdir()
+        for index in range(arguments.blobs - 1):
+            add_blob(directory, index, arguments.blob_size)
+        torrent_path = Path(tmp_dir) / 'channel.torrent'
+        torrent_path.write_bytes(lt.bencode(create_full(directory)))
+        add_blob(directory, arguments.blobs - 1, arguments.blob_size)
+
+        started = time.perf_counter()
+        full = create_full(directory)
+        full_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        incremental = create_channel_torrent(directory, previous_torrent_path=torrent_path)
+        incremental_time = time.perf_counter() - started
+
+        full.pop(b'creation date')
+        incremental.pop(b'creation date')
+        print(f'Channel of {arguments.blobs} blobs, {arguments.blobs * arguments.blob_size / 2 ** 20:.1f} MB')
+        print(f'Full hashing: {full_time:.3f} s')
+        print(f'Incremental hashing: {incremental_time:.3f} s')
+        print(f'Identical torrents: {lt.bencode(full) == lt.bencode(incremental)}')
+
+
+if __name__ == "__main__":
+    run(parse_args())
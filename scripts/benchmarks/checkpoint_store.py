@@ -0,0 +1,86 @@
+"""
+This script measures the time to load the download checkpoints on startup, from a `.conf` file per download
+and from the checkpoint store, for several numbers of downloads. The downloads are not started, so the time
+is the time to read and decode the checkpoints.
+
+For available parameters see "parse_args" function below.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from tribler.core.components.libtorrent.download_manager.checkpoint_store import CHECKPOINTS_DB_FILENAME, \
+    CheckpointStore
+from tribler.core.components.libtorrent.download_manager.download_config import DownloadConfig
+from tribler.core.components.libtorrent.download_manager.download_manager import CHECKPOINTS_BATCH_SIZE
+from tribler.core.utilities.path_util import Path
+
+# The delay between the downloads started from the `.conf` files by the previous versions
+LEGACY_START_DELAY = .01
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the loading of the download checkpoints')
+
+    parser.add_argument('-c', '--counts', type=int, nargs='+', help='numbers of downloads',
+                        default=[1000, 4000, 8000])
+
+    return parser.parse_args()
+
+
+def create_config(infohash):
+    config = DownloadConfig()
+    config.set_metainfo({b'info': {b'name': b'torrent', b'piece length': 2 ** 18, b'length': 2 ** 30,
+                                   b'pieces': os.urandom(20 * 4096)}})
+    config.set_engineresumedata({b'info-hash': infohash, b'pieces': b'\x01' * 4096})
+    return config
+
+
+def write_checkpoint_files(directory, count):
+    for _ in range(count):
+        infohash = os.urandom(20)
+        create_config(infohash).write(str(directory / f'{infohash.hex()}.conf'))
+
+
+def load_files(directory):
+    for filename in directory.glob('*.conf'):
+        DownloadConfig.load(filename).get_metainfo()
+
+
+def load_store(store):
+    infohashes = store.get_infohashes()
+    for i in range(0, len(infohashes), CHECKPOINTS_BATCH_SIZE):
+        for _, config_json in store.get_configs(infohashes[i:i + CHECKPOINTS_BATCH_SIZE]):
+            DownloadConfig.from_json(config_json).get_metainfo()
+
+
+def run(arguments):
+    for count in arguments.counts:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            write_checkpoint_files(directory, count)
+
+            started = time.perf_counter()
+            load_files(directory)
+            files_time = time.perf_counter() - started
+
+            store = CheckpointStore(directory / CHECKPOINTS_DB_FILENAME)
+            started = time.perf_counter()
+            store.migrate(directory)
+            migrate_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            load_store(store)
+            store_time = time.perf_counter() - started
+            store.close()
+
+            print(f'{count} downloads:')
+            print(f'  .conf files: {files_time:.2f} s '
+                  f'(+{count * LEGACY_START_DELAY:.0f} s of the delays between the started downloads)')
+            print(f'  Migration to the store (once): {migrate_time:.2f} s')
+            print(f'  Checkpoint store: {store_time:.2f} s')
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,110 @@
+"""
+This script measures the bandwidth and the ingest CPU time saved by sending the known entries filter along with
+the remote select requests.
+
+A responding peer has all the entries. For each response, the querying peer already has a given share of the entries
+(`--overlap`). Without the filter, the response contains all the entries, and the querying peer processes the known
+entries once more. With the filter, the responding peer skips the entries that match the filter. The response size
+is the total size of the compressed chunks, the ingest time is the time of `process_compressed_mdblob` of the
+querying peer. The creation of the filter and the filtering of the entries are measured separately.
+
+For available parameters see "parse_args" function below.
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from ipv8.keyvault.crypto import default_eccrypto
+from pony.orm import db_session
+
+from payload_ingest import create_payloads
+from response_building import build_chunks
+from tribler.core.components.metadata_store.db.store import MetadataStore
+from tribler.core.components.metadata_store.remote_query_community.known_filter import KnownFilter, get_entry_key
+from tribler.core.components.metadata_store.remote_query_community.settings import RemoteQueryCommunitySettings
+from tribler.core.utilities.path_util import Path
+
+
+def parse_args():
+    settings = RemoteQueryCommunitySettings()
+    parser = argparse.ArgumentParser(description='Benchmark the known entries filter of the remote queries')
+
+    parser.add_argument('-r', '--responses', type=int, help='number of responses', default=50)
+    parser.add_argument('-e', '--entries', type=int, help='number of entries per response',
+                        default=settings.max_response_size)
+    parser.add_argument('-o', '--overlap', type=float, nargs='+', help='shares of the entries the querying peer has',
+                        default=[0.0, 0.5, 0.9])
+    parser.add_argument('-s', '--filter-size', type=int, help='max filter size, in bytes',
+                        default=settings.known_filter_size)
+
+    return parser.parse_args()
+
+
+def get_key(entry):
+    return get_entry_key(entry.public_key, entry.id_, entry.timestamp)
+
+
+def create_store(tmp_dir, name):
+    return MetadataStore(Path(tmp_dir) / f'{name}.db', Path(tmp_dir), default_eccrypto.generate_key('curve25519'),
+                         disable_sync=True)
+
+
+def measure(responder, payloads, arguments, overlap, use_filter):
+    settings = RemoteQueryCommunitySettings()
+    rnd = random.Random(0)
+    totals = {'bytes': 0, 'ingest': 0.0, 'filter': 0.0}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        requester = create_store(tmp_dir, 'requester')
+        for start in range(0, len(payloads), arguments.entries):
+            response_payloads = payloads[start:start + arguments.entries]
+            known = rnd.sample(response_payloads, int(len(response_payloads) * overlap))
+            with db_session:
+                requester.process_payload_batch(known)
+
+            with db_session:
+                entries = list(responder.TorrentMetadata.select(
+                    lambda g: g.id_ > start and g.id_ <= start + arguments.entries
+                ).order_by(lambda g: g.id_))
+                if use_filter:
+                    started = time.perf_counter()
+                    known_entries = requester.TorrentMetadata.select(
+                        lambda g: g.id_ > start and g.id_ <= start + arguments.entries
+                    )
+                    known_filter = KnownFilter.create((get_key(e) for e in known_entries), arguments.filter_size)
+                    if known_filter is not None:
+                        known_filter = KnownFilter.from_bytes(known_filter.to_bytes())
+                        entries = [e for e in entries if get_key(e) not in known_filter]
+                    totals['filter'] += time.perf_counter() - started
+                chunks = build_chunks(entries, settings.maximum_payload_size)
+
+            totals['bytes'] += sum(len(chunk) for chunk in chunks)
+            started = time.perf_counter()
+            for chunk in chunks:
+                requester.process_compressed_mdblob(chunk)
+            totals['ingest'] += time.perf_counter() - started
+        requester.shutdown()
+    return totals
+
+
+def run(arguments):
+    count = arguments.responses * arguments.entries
+    print(f'Creating {count} signed payloads...')
+    payloads = create_payloads(count)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        responder = create_store(tmp_dir, 'responder')
+        with db_session:
+            responder.process_payload_batch(payloads)
+
+        print(f'{"overlap":<10}{"filter":<8}{"response KB":>12}{"ingest s":>10}{"filter s":>10}')
+        for overlap in arguments.overlap:
+            for use_filter in (False, True):
+                totals = measure(responder, payloads, arguments, overlap, use_filter)
+                print(f'{overlap:<10.2f}{"yes" if use_filter else "no":<8}{totals["bytes"] / 1024:>12.1f}'
+                      f'{totals["ingest"]:>10.3f}{totals["filter"]:>10.3f}')
+        responder.shutdown()
+
+
+if __name__ == "__main__":
+    run(parse_args())
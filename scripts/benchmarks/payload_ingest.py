@@ -0,0 +1,100 @@
+"""
+This script measures the throughput of ingesting gossiped metadata payloads, in entries per second.
+
+It compares processing the payloads one by one by `process_payload` (the previous behaviour of
+`process_squashed_mdblob`) with processing them in bulk by `process_payload_batch`. Each approach ingests the same
+signed torrent payloads into an empty database first (all entries are new), and then once more (all entries are
+already known). Deserialization and signature checks are done once beforehand and are not measured.
+
+For available parameters see "parse_args" function below.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from ipv8.keyvault.crypto import default_eccrypto
+from pony.orm import db_session
+
+from synthetic_db import random_title
+from tribler.core.components.metadata_store.db.serialization import (
+    REGULAR_TORRENT,
+    TorrentMetadataPayload,
+    read_payload_with_offset,
+)
+from tribler.core.components.metadata_store.db.store import MAX_BATCH_SIZE, MetadataStore
+from tribler.core.utilities.path_util import Path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the ingest of metadata payloads')
+
+    parser.add_argument('-c', '--count', type=int, help='number of payloads', default=20_000)
+    parser.add_argument('-b', '--batch', type=int, help='number of payloads per transaction', default=MAX_BATCH_SIZE)
+
+    return parser.parse_args()
+
+
+def create_payloads(count):
+    key = default_eccrypto.generate_key('curve25519')
+    public_key = key.pub().key_to_bin()[10:]
+    rnd = random.Random(0)
+    now = datetime.utcnow()
+    blob = b''.join(
+        TorrentMetadataPayload(
+            REGULAR_TORRENT, 0, public_key, i + 1, 0, i + 1,
+            rnd.getrandbits(160).to_bytes(20, 'big'), rnd.randint(1, 10 ** 10),
+            now - timedelta(seconds=rnd.randint(0, 3600 * 24 * 365)), random_title(rnd), 'video',
+            'http://tracker.example.org/announce',
+            key=key
+        ).serialized()
+        for i in range(count)
+    )
+
+    payloads = []
+    offset = 0
+    while offset < len(blob):
+        payload, offset = read_payload_with_offset(blob, offset)
+        payloads.append(payload)
+    return payloads
+
+
+def process_one_by_one(mds, batch):
+    result = []
+    for payload in batch:
+        result.extend(mds.process_payload(payload))
+    return result
+
+
+def process_in_bulk(mds, batch):
+    return mds.process_payload_batch(batch)
+
+
+def ingest(mds, payloads, batch_size, process):
+    started = time.perf_counter()
+    states = {}
+    for start in range(0, len(payloads), batch_size):
+        with db_session(immediate=True):
+            for r in process(mds, payloads[start:start + batch_size]):
+                states[r.obj_state.name] = states.get(r.obj_state.name, 0) + 1
+    return len(payloads) / (time.perf_counter() - started), states
+
+
+def run(arguments):
+    print(f'Creating {arguments.count} signed payloads...')
+    payloads = create_payloads(arguments.count)
+
+    print(f'{"mode":<16}{"pass":<8}{"entries/s":>12}  results')
+    for name, process in (('one by one', process_one_by_one), ('bulk', process_in_bulk)):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = Path(tmp_dir) / 'ingest.db'
+            mds = MetadataStore(db_path, Path(tmp_dir), default_eccrypto.generate_key('curve25519'))
+            for pass_name in ('new', 'known'):
+                speed, states = ingest(mds, payloads, arguments.batch, process)
+                print(f'{name:<16}{pass_name:<8}{speed:>12.0f}  {states}')
+            mds.shutdown()
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,81 @@
+"""
+This script measures the time to build the responses to remote queries, that is, to pack the metadata entries into
+compressed chunks by `entries_to_chunk`, as `RemoteQueryCommunity.send_db_results` does.
+
+It compares the entries with the stored signed payload bytes (the entries signed or received since the database
+version 17) with the entries that are serialized on every send (the entries of the upgraded databases). The entries
+are loaded from the database beforehand, and the loading is not measured.
+
+For available parameters see "parse_args" function below.
+"""
+import argparse
+import tempfile
+import time
+
+from ipv8.keyvault.crypto import default_eccrypto
+from pony.orm import db_session
+
+from payload_ingest import create_payloads
+from tribler.core.components.metadata_store.db.orm_bindings.channel_metadata import entries_to_chunk
+from tribler.core.components.metadata_store.db.store import MetadataStore
+from tribler.core.components.metadata_store.remote_query_community.settings import RemoteQueryCommunitySettings
+from tribler.core.utilities.path_util import Path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the building of the remote query responses')
+
+    parser.add_argument('-c', '--count', type=int, help='number of entries', default=10_000)
+    parser.add_argument('-r', '--repeat', type=int, help='number of measurements, the best one is shown', default=5)
+    parser.add_argument('-s', '--chunk-size', type=int, help='chunk size, in bytes',
+                        default=RemoteQueryCommunitySettings().maximum_payload_size)
+
+    return parser.parse_args()
+
+
+def build_chunks(entries, chunk_size):
+    chunks = []
+    index = 0
+    while index < len(entries):
+        chunk, index = entries_to_chunk(entries, chunk_size, start_index=index, include_health=True)
+        chunks.append(chunk)
+    return chunks
+
+
+def measure(mds, arguments):
+    with db_session:
+        entries = list(mds.TorrentMetadata.select().prefetch(mds.TorrentMetadata.health))
+        best = None
+        for _ in range(arguments.repeat):
+            started = time.perf_counter()
+            chunks = build_chunks(entries, arguments.chunk_size)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+    return best, chunks
+
+
+def run(arguments):
+    print(f'Creating {arguments.count} signed payloads...')
+    payloads = create_payloads(arguments.count)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mds = MetadataStore(Path(tmp_dir) / 'responses.db', Path(tmp_dir), default_eccrypto.generate_key('curve25519'),
+                            disable_sync=True)
+        with db_session:
+            mds.process_payload_batch(payloads)
+
+        print(f'{"payload bytes":<16}{"seconds":>10}{"entries/s":>12}{"chunks":>8}')
+        results = {}
+        for name in ('stored', 'serialized'):
+            if name == 'serialized':
+                with db_session:
+                    mds.db.execute('UPDATE ChannelNode SET serialized_payload = NULL')
+            elapsed, results[name] = measure(mds, arguments)
+            print(f'{name:<16}{elapsed:>10.3f}{arguments.count / elapsed:>12.0f}{len(results[name]):>8}')
+        mds.shutdown()
+
+    assert results['stored'] == results['serialized'], 'The responses differ'
+
+
+if __name__ == "__main__":
+    run(parse_args())
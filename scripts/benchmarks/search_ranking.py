@@ -0,0 +1,97 @@
+"""
+This script compares the batched search ranking stage of MetadataStore with the previous approach of ranking
+text search results inside SQLite, where the `search_rank` SQL function calls `torrent_rank` once per row.
+
+Both approaches are used to fetch the first page of results for the same queries on a synthetic database,
+as the REST API does it. The full orders of results produced by both approaches are checked to be identical.
+
+For available parameters see "parse_args" function below.
+"""
+import argparse
+import time
+from statistics import median
+
+from pony.orm import db_session, desc, raw_sql  # pylint: disable=unused-import
+
+from synthetic_db import create_synthetic_metadata_store
+from tribler.core.components.metadata_store.db.serialization import CHANNEL_TORRENT, COLLECTION_NODE
+from tribler.core.utilities.search_utils import torrent_rank
+
+_queries = ['big buck', 'ubuntu', 'movie 1080p', 'sintel', 'live concert', 'complete collection', 'bunny*', 'flac']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the search ranking stage')
+
+    parser.add_argument('-d', '--db', type=str, help='path to the synthetic database', default='./search_ranking.db')
+    parser.add_argument('-c', '--count', type=int, help='number of entries in the database', default=1_000_000)
+    parser.add_argument('-r', '--repeat', type=int, help='number of runs for each query', default=5)
+    parser.add_argument('-p', '--page', type=int, help='page size', default=50)
+
+    return parser.parse_args()
+
+
+def sql_ranked_query(mds, txt_filter):
+    now = int(time.time())  # pylint: disable=unused-variable
+    return mds.get_entries_query(txt_filter=txt_filter).sort_by(
+        f"""
+        (1 if g.metadata_type == {CHANNEL_TORRENT} else 2 if g.metadata_type == {COLLECTION_NODE} else 3),
+        raw_sql('''search_rank(
+            $txt_filter, g.title, torrentstate.seeders, torrentstate.leechers, $now - strftime('%s', g.torrent_date)
+        ) DESC'''),
+        desc(g.health.last_check)
+        """
+    )
+
+
+@db_session
+def sql_ranking_page(mds, txt_filter, page):
+    result = sql_ranked_query(mds, txt_filter)[:page]
+    for entry in result:
+        entry.to_simple_dict()  # the same as `get_entries` does
+    return [entry.rowid for entry in result]
+
+
+@db_session
+def batch_ranking_page(mds, txt_filter, page):
+    return [entry.rowid for entry in mds.get_entries(first=1, last=page, txt_filter=txt_filter)]
+
+
+@db_session
+def check_same_order(mds, txt_filter):
+    sql_order = [entry.rowid for entry in sql_ranked_query(mds, txt_filter)]
+    if sql_order != mds.rank_search_results(txt_filter):
+        raise AssertionError(f'Different order of results for the query {txt_filter!r}')
+    return len(sql_order)
+
+
+def measure(func, *args, repeat):
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        durations.append(time.perf_counter() - started)
+    return median(durations), result
+
+
+def run(arguments):
+    mds = create_synthetic_metadata_store(arguments.db, arguments.count)
+    with db_session:
+        mds.db.get_connection().create_function('search_rank', 5, torrent_rank)
+
+    print(f'{"query":<24}{"ranked":>8}{"sql, ms":>12}{"batch, ms":>12}{"speedup":>10}')
+    for txt_filter in _queries:
+        ranked = check_same_order(mds, txt_filter)
+        sql_time, sql_page = measure(sql_ranking_page, mds, txt_filter, arguments.page, repeat=arguments.repeat)
+        batch_time, batch_page = measure(batch_ranking_page, mds, txt_filter, arguments.page, repeat=arguments.repeat)
+        if sql_page != batch_page:
+            raise AssertionError(f'Different first page of results for the query {txt_filter!r}')
+        print(f'{txt_filter:<24}{ranked:>8}{sql_time * 1000:>12.1f}{batch_time * 1000:>12.1f}'
+              f'{sql_time / batch_time:>10.1f}')
+
+    mds.shutdown()
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,178 @@
+"""
+This script measures the time to update the piece prios of a streamed file on every read of a chunk, for a large
+torrent (50 GiB in 200k pieces by default).
+
+The static buffer pieces are finished, and the chunks read the file sequentially from different positions. On every
+read, the piece of the chunk is finished, the chunk moves its dynamic buffer by a piece and the prios are updated.
+The prio update of the previous versions, which checks every missing piece of the file against the buffers of all
+the chunks, is measured for the same state of the stream, and the prios it computes are compared to the prios
+of the incremental update.
+
+For available parameters see "parse_args" function below.
+"""
+import argparse
+import asyncio
+import time
+from unittest.mock import Mock
+
+from tribler.core.components.libtorrent.download_manager.stream import DEADLINE_PRIO_MAP, MIN_PIECE_PRIO, Stream, \
+    StreamChunk
+from tribler.core.components.libtorrent.utils.libtorrent_helper import libtorrent as lt
+from tribler.core.utilities.path_util import Path
+from tribler.core.utilities.simpledefs import DLSTATUS_DOWNLOADING
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the piece prio updates of a streamed file')
+
+    parser.add_argument('-s', '--size', type=int, help='file size, in GiB', default=50)
+    parser.add_argument('-p', '--piece-length', type=int, help='piece length, in bytes', default=2 ** 18)
+    parser.add_argument('-c', '--chunks', type=int, help='number of chunks reading the file', default=2)
+    parser.add_argument('-r', '--reads', type=int, help='number of reads per chunk', default=100)
+    parser.add_argument('-l', '--legacy-reads', type=int, help='number of reads with the previous prio update',
+                        default=1)
+
+    return parser.parse_args()
+
+
+class FakeDownload:
+    """
+    A download of a single file torrent with the piece prios kept in memory
+    """
+
+    def __init__(self, length, piece_length):
+        pieces = length // piece_length
+        self.info = lt.torrent_info({b'info': {b'name': b'video.mkv', b'piece length': piece_length,
+                                               b'length': length, b'pieces': b'\x00' * 20 * pieces}})
+        self.handle = Mock(torrent_file=lambda: self.info)
+        self.pieces_have = [False] * pieces
+        self.piece_prios = [4] * pieces
+
+        tdef = Mock()
+        tdef.get_metainfo = lambda: {b'info': {}}
+        tdef.get_piece_length = lambda: piece_length
+        tdef.get_files_with_length = lambda: [('video.mkv', length)]
+        tdef.get_infohash = lambda: b'\x01' * 20
+        self.get_def = lambda: tdef
+
+        state = Mock()
+        state.get_status = lambda: DLSTATUS_DOWNLOADING
+        state.get_pieces_complete = lambda: self.pieces_have
+        self.get_state = lambda: state
+
+    async def get_handle(self):
+        return self.handle
+
+    def get_content_dest(self):
+        return Path('video.mkv')
+
+    def get_piece_priorities(self):
+        return list(self.piece_prios)
+
+    def set_piece_priorities(self, piece_priorities):
+        if piece_priorities and isinstance(piece_priorities[0], tuple):
+            for piece, prio in piece_priorities:
+                self.piece_prios[piece] = prio
+        else:
+            self.piece_prios[:len(piece_priorities)] = piece_priorities
+
+    def get_file_priorities(self):
+        return [4]
+
+    def set_selected_files(self, *_, **__):
+        pass
+
+    def set_piece_deadline(self, *_):
+        pass
+
+    def reset_piece_deadline(self, *_):
+        pass
+
+    def resume(self):
+        pass
+
+    def set_piece_alerts(self, *_):
+        pass
+
+
+def legacy_updateprios(stream, piecepriorities):
+    """
+    The prio update of the previous versions, returns the pieces with the changed prios
+    """
+    changes = {}
+    staticbuff = False
+    for piece in stream.iterpieces(have=False):
+        if piece in stream.footerpieces or piece in stream.headerpieces or piece in stream.prebuffpieces:
+            prio = 7
+            staticbuff = True
+        elif staticbuff:
+            prio = 0
+        else:
+            deadline = None
+            for startbyte in stream.cursorpiecemap:
+                paused, cursorpieces = stream.cursorpiecemap[startbyte]
+                if not paused and piece in cursorpieces and \
+                        (deadline is None or cursorpieces.index(piece) < deadline):
+                    deadline = cursorpieces.index(piece)
+            if deadline is None:
+                prio = MIN_PIECE_PRIO
+            elif deadline < len(DEADLINE_PRIO_MAP):
+                prio = DEADLINE_PRIO_MAP[deadline]
+            else:
+                prio = 1
+        if piecepriorities[piece] != prio:
+            changes[piece] = prio
+    return changes
+
+
+async def read_chunks(stream, download, chunks, reads):
+    times = []
+    for _ in range(reads):
+        for chunk in chunks:
+            piece = stream.bytetopiece(chunk.seekpos)
+            download.pieces_have[piece] = True
+            stream.piecefinished(piece)
+            started = time.perf_counter()
+            await chunk.seek(chunk.seekpos + stream.piecelen)
+            times.append(time.perf_counter() - started)
+    return times
+
+
+async def run(arguments):
+    download = FakeDownload(arguments.size * 2 ** 30, arguments.piece_length)
+    stream = Stream(download)
+    await stream.enable(0)
+    for piece in stream.staticpieces:
+        download.pieces_have[piece] = True
+
+    started = time.perf_counter()
+    await stream.updateprios()
+    full_time = time.perf_counter() - started
+
+    chunks = []
+    for i in range(arguments.chunks):
+        chunk = StreamChunk(stream, i * stream.filesize // arguments.chunks + stream.piecelen)
+        chunk.file = True  # the file is not read, only the seek position is updated
+        await chunk.seek(chunk.startpos)
+        chunks.append(chunk)
+
+    times = await read_chunks(stream, download, chunks, arguments.reads)
+
+    print(f'{len(download.pieces_have)} pieces, {arguments.chunks} chunks with '
+          f'{len(stream.cursorpiecemap[chunks[0].startpos][1])} buffer pieces each:')
+    print(f'  Full prio update (once): {full_time * 1000:.1f} ms')
+    print(f'  Incremental prio update per read: avg {sum(times) / len(times) * 1000:.2f} ms, '
+          f'max {max(times) * 1000:.2f} ms')
+
+    if arguments.legacy_reads:
+        legacy_times = []
+        for _ in range(arguments.legacy_reads):
+            started = time.perf_counter()
+            changes = legacy_updateprios(stream, download.get_piece_priorities())
+            legacy_times.append(time.perf_counter() - started)
+        print(f'  Previous prio update per read: avg {sum(legacy_times) / len(legacy_times) * 1000:.2f} ms')
+        print(f'  Pieces with different prios: {len(changes)}')
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
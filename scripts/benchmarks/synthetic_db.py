@@ -0,0 +1,81 @@
+"""
+This module creates synthetic metadata databases for benchmarks.
+
+Rows are inserted with raw SQL, bypassing the ORM and signature generation, so that a database with
+millions of entries can be created in minutes. The entries are not signed and must not be shared.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from ipv8.keyvault.crypto import default_eccrypto
+from pony.orm import db_session
+
+from tribler.core.components.metadata_store.db.orm_bindings.channel_node import COMMITTED
+from tribler.core.components.metadata_store.db.serialization import REGULAR_TORRENT
+from tribler.core.components.metadata_store.db.store import MetadataStore
+from tribler.core.utilities.path_util import Path as TriblerPath
+
+WORDS = [
+    'big', 'buck', 'bunny', 'sintel', 'tears', 'steel', 'elephants', 'dream', 'ubuntu', 'debian', 'linux', 'iso',
+    'amd64', 'x86', 'server', 'desktop', 'live', 'movie', 'music', 'album', 'live', 'concert', 'season', 'episode',
+    'complete', 'collection', 'remastered', 'edition', 'open', 'source', 'documentary', 'nature', 'ocean', 'space',
+    'lecture', 'course', 'python', 'tutorial', 'book', 'audiobook', '1080p', '720p', '2160p', 'hdr', 'flac', 'mp3',
+]
+
+_insert_state_sql = """
+    INSERT INTO TorrentState (rowid, infohash, seeders, leechers, last_check, self_checked, has_data)
+    VALUES (?, ?, ?, ?, ?, 0, 0)
+"""
+
+_insert_node_sql = """
+    INSERT INTO ChannelNode (rowid, metadata_type, reserved_flags, origin_id, public_key, id_, timestamp, signature,
+                             added_on, status, title, tags, infohash, size, torrent_date, tracker_info, xxx, health,
+                             tag_processor_version)
+    VALUES (?, ?, 0, 0, ?, ?, ?, NULL, ?, ?, ?, '', ?, ?, ?, '', 0, ?, 0)
+"""
+
+
+def random_title(rnd: random.Random) -> str:
+    # Words at the beginning of the list are more popular, which gives a skewed distribution of FTS matches
+    return ' '.join(WORDS[min(int(rnd.expovariate(1 / 10)), len(WORDS) - 1)] for _ in range(rnd.randint(2, 8)))
+
+
+def create_synthetic_metadata_store(db_path: Path, count: int, batch_size: int = 10000, seed: int = 0):
+    """
+    Create (or open, if it already exists) a metadata store with `count` synthetic torrent entries.
+    """
+    db_path = TriblerPath(db_path)
+    existed = db_path.exists()
+    mds = MetadataStore(db_path, db_path.parent, default_eccrypto.generate_key('curve25519'), disable_sync=True)
+    if existed:
+        return mds
+
+    rnd = random.Random(seed)
+    now = int(time.time())
+    public_key = b'\x01' * 64
+    started = time.time()
+    for start in range(1, count + 1, batch_size):
+        states, nodes = [], []
+        for rowid in range(start, min(start + batch_size, count + 1)):
+            infohash = rnd.getrandbits(160).to_bytes(20, 'big')
+            has_health = rnd.random() < 0.6
+            states.append((
+                rowid,
+                infohash,
+                int(rnd.paretovariate(1.2)) - 1 if has_health else 0,
+                int(rnd.paretovariate(1.5)) - 1 if has_health else 0,
+                now - rnd.randint(0, 3600 * 24 * 30) if has_health else 0,
+            ))
+            torrent_date = datetime.utcfromtimestamp(now) - timedelta(seconds=rnd.randint(0, 3600 * 24 * 365 * 5))
+            nodes.append((
+                rowid, REGULAR_TORRENT, public_key, rowid, rowid, datetime.utcnow(), COMMITTED, random_title(rnd),
+                infohash, rnd.randint(1, 10 ** 10), torrent_date, rowid,
+            ))
+        with db_session:
+            connection = mds.db.get_connection()
+            connection.executemany(_insert_state_sql, states)
+            connection.executemany(_insert_node_sql, nodes)
+        print(f'Inserted {min(start + batch_size - 1, count)} rows in {time.time() - started:.1f} seconds')
+    return mds
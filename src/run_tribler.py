@@ -5,6 +5,7 @@ import argparse
 # noinspection PyUnresolvedReferences
 import encodings.idna  # pylint: disable=unused-import
 import logging.config
+import multiprocessing
 import os
 import sys
 
@@ -74,6 +75,9 @@ def init_boot_logger():
 
 
 if __name__ == "__main__":
+    # Tribler Core spawns worker processes (e.g. for checking metadata signatures), which is not possible
+    # for a frozen executable without this call
+    multiprocessing.freeze_support()
     init_boot_logger()
 
     parsed_args = RunTriblerArgsParser().parse_args()
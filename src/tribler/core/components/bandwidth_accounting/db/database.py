@@ -5,6 +5,7 @@ from pony.orm import Database, count, db_session, desc, select
 
 from tribler.core.components.bandwidth_accounting.db import history, misc, transaction as db_transaction
 from tribler.core.components.bandwidth_accounting.db.transaction import BandwidthTransactionData
+from tribler.core.utilities.pony_utils import DatabaseExecutor
 from tribler.core.utilities.utilities import MEMORY_DB
 
 
@@ -54,6 +55,7 @@ class BandwidthDatabase:
 
         self.database.bind(provider='sqlite', filename=db_path_string, create_db=create_db, timeout=120.0)
         self.database.generate_mapping(create_tables=create_db)
+        self.executor = DatabaseExecutor(self.database, name='BandwidthDB')
 
         if create_db:
             with db_session:
@@ -184,4 +186,5 @@ class BandwidthDatabase:
         """
         Shutdown the database.
         """
+        self.executor.shutdown()
         self.database.disconnect()
@@ -9,7 +9,8 @@ from marshmallow.fields import Integer, String
 from tribler.core.components.bandwidth_accounting.community.bandwidth_accounting_community import (
     BandwidthAccountingCommunity,
 )
-from tribler.core.components.restapi.rest.rest_endpoint import RESTEndpoint, RESTResponse
+from tribler.core.components.restapi.rest.rest_endpoint import HTTP_SERVICE_UNAVAILABLE, RESTEndpoint, RESTResponse
+from tribler.core.utilities.pony_utils import DatabaseExecutorOverloaded
 from tribler.core.utilities.utilities import froze_it
 
 
@@ -45,7 +46,11 @@ class BandwidthEndpoint(RESTEndpoint):
         }
     )
     async def get_statistics(self, request) -> RESTResponse:
-        return RESTResponse({'statistics': self.bandwidth_community.get_statistics()})
+        try:
+            statistics = await self.bandwidth_community.database.executor.run(self.bandwidth_community.get_statistics)
+        except DatabaseExecutorOverloaded as e:
+            return RESTResponse({"error": str(e)}, status=HTTP_SERVICE_UNAVAILABLE)
+        return RESTResponse({'statistics': statistics})
 
     @docs(
         tags=["Bandwidth"],
@@ -63,4 +68,9 @@ class BandwidthEndpoint(RESTEndpoint):
         }
     )
     async def get_history(self, request) -> RESTResponse:
-        return RESTResponse({'history': self.bandwidth_community.database.get_history()})
+        database = self.bandwidth_community.database
+        try:
+            history = await database.executor.run(database.get_history)
+        except DatabaseExecutorOverloaded as e:
+            return RESTResponse({"error": str(e)}, status=HTTP_SERVICE_UNAVAILABLE)
+        return RESTResponse({'history': history})
@@ -1,8 +1,10 @@
+import time
 import uuid
 from binascii import unhexlify
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 from dataclasses import dataclass
 from random import sample
+from typing import Optional
 
 from anyio import Event, create_task_group, move_on_after
 
@@ -11,6 +13,7 @@ from ipv8.types import Peer
 from pony.orm import db_session
 
 from tribler.core import notifications
+from tribler.core.components.gigachannel.community.peer_score import PeerScore
 from tribler.core.components.ipv8.discovery_booster import DiscoveryBooster
 from tribler.core.components.metadata_store.db.serialization import CHANNEL_TORRENT
 from tribler.core.components.metadata_store.remote_query_community.payload_checker import ObjState
@@ -24,8 +27,7 @@ minimal_blob_size = 200
 maximum_payload_size = 1024
 max_entries = maximum_payload_size // minimal_blob_size
 max_search_peers = 5
-
-happy_eyeballs_delay = 0.3  # Send request to another peer if the answer did not arrive in 0.3s
+max_scored_peers = 1000  # The scores of the least recently observed peers are dropped when there are more peers
 
 
 @dataclass
@@ -40,6 +42,28 @@ class ChannelsPeersMapping:
         self._channels_dict = defaultdict(set)
         # Reverse mapping from peers to channels
         self._peers_channels = defaultdict(set)
+        # The scores of the peers by their mids. The scores outlive the removal of the peers from the mapping,
+        # so a peer that timed out and then came back keeps its history
+        self._scores = OrderedDict()
+
+    def get_score(self, peer: Peer) -> PeerScore:
+        return self._scores.get(peer.mid) or PeerScore()
+
+    def _get_score_to_update(self, peer: Peer) -> PeerScore:
+        score = self._scores.pop(peer.mid, None) or PeerScore()
+        self._scores[peer.mid] = score
+        if len(self._scores) > max_scored_peers:
+            self._scores.popitem(last=False)
+        return score
+
+    def add_response(self, peer: Peer, latency: Optional[float], new_entries: int, total_entries: int):
+        self._get_score_to_update(peer).add_response(latency, new_entries, total_entries)
+
+    def add_timeout(self, peer: Peer):
+        self._get_score_to_update(peer).add_timeout()
+
+    def _get_rank(self, peer: Peer):
+        return self.get_score(peer).score, peer.last_response
 
     def add(self, peer: Peer, channel_pk: bytes, channel_id: int):
         id_tuple = (channel_pk, channel_id)
@@ -49,7 +73,7 @@ class ChannelsPeersMapping:
         self._peers_channels[peer].add(id_tuple)
 
         if len(channel_peers) > self.max_peers_per_channel:
-            removed_peer = min(channel_peers, key=lambda x: x.last_response)
+            removed_peer = min(channel_peers, key=self._get_rank)
             channel_peers.remove(removed_peer)
             # Maintain the reverse mapping
             self._peers_channels[removed_peer].remove(id_tuple)
@@ -68,6 +92,11 @@ class ChannelsPeersMapping:
         channel_peers = self._channels_dict.get(id_tuple, [])
         return sorted(channel_peers, key=lambda x: x.last_response, reverse=True)[0:limit]
 
+    def get_best_peers_for_channel(self, channel_pk: bytes, channel_id: int, limit=None):
+        id_tuple = (channel_pk, channel_id)
+        channel_peers = self._channels_dict.get(id_tuple, [])
+        return sorted(channel_peers, key=self._get_rank, reverse=True)[0:limit]
+
 
 class GigaChannelCommunity(RemoteQueryCommunity):
     community_id = unhexlify('d3512d0ff816d8ac672eab29a9c1a3a32e17cb13')
@@ -89,6 +118,7 @@ class GigaChannelCommunity(RemoteQueryCommunity):
             socket_address,
             identifier,
             introduction=introduction,
+            extra_bytes=extra_bytes,
             prefix=prefix,
             new_style=new_style,
         )
@@ -120,6 +150,7 @@ class GigaChannelCommunity(RemoteQueryCommunity):
         return all_peers
 
     def introduction_response_callback(self, peer, dist, payload):
+        super().introduction_response_callback(peer, dist, payload)
         # ACHTUNG! Due to Dispersy legacy, it is possible for other peer to send us an introduction
         # to ourselves (peer's public_key is not sent along with the introduction). To prevent querying
         # ourselves, we add the check for blacklist_mids here, which by default contains our own peer.
@@ -173,6 +204,8 @@ class GigaChannelCommunity(RemoteQueryCommunity):
             got_at_least_one_response = Event()
 
             async def _send_remote_select(peer):
+                # The known filter is not sent, as the results are shown instead of the local entries, and a page
+                # of the filtered results would not start at the requested offset
                 request = self.send_remote_select(peer, force_eva_response=True, **kwargs)
                 await request.processing_results
 
@@ -190,7 +223,7 @@ class GigaChannelCommunity(RemoteQueryCommunity):
 
                 # Issue a request to another peer
                 tg.start_soon(_send_remote_select, peer)
-                with move_on_after(happy_eyeballs_delay):
+                with move_on_after(self.channels_peers.get_score(peer).happy_eyeballs_delay):
                     await got_at_least_one_response.wait()
             await got_at_least_one_response.wait()
 
@@ -222,11 +255,21 @@ class GigaChannelCommunity(RemoteQueryCommunity):
         else:
             peers_to_query = self.get_random_peers(self.rqc_settings.max_query_peers)
 
-        for p in peers_to_query:
-            self.send_remote_select(p, **kwargs, processing_callback=notify_gui)
+        if any(self.supports_known_filter(p) for p in peers_to_query):
+            # The filter of the local results is created in the background, and sent along with the requests
+            self.register_anonymous_task('send_search_request', self._send_filtered_search_request, peers_to_query,
+                                         notify_gui, kwargs)
+        else:
+            for p in peers_to_query:
+                self.send_remote_select(p, **kwargs, processing_callback=notify_gui)
 
         return request_uuid, peers_to_query
 
+    async def _send_filtered_search_request(self, peers_to_query, processing_callback, kwargs):
+        known_filter = await self.create_known_filter(peers_to_query, **kwargs)
+        for p in peers_to_query:
+            self.send_remote_select(p, **kwargs, processing_callback=processing_callback, known_filter=known_filter)
+
     def get_known_subscribed_peers_for_node(self, node_pk, node_id, limit=None):
         # Determine the toplevel parent channel
         root_id = node_id
@@ -235,10 +278,18 @@ class GigaChannelCommunity(RemoteQueryCommunity):
             if node:
                 root_id = next((node.id_ for node in node.get_parent_nodes() if node.origin_id == 0), node.origin_id)
 
-        return self.channels_peers.get_last_seen_peers_for_channel(node_pk, root_id, limit)
+        return self.channels_peers.get_best_peers_for_channel(node_pk, root_id, limit)
+
+    def _on_query_response(self, request, processing_results):
+        # Only the first packet of a response tells the latency of the peer
+        latency = None if request.peer_responded else time.monotonic() - request.sent_at
+        new_entries = sum(r.obj_state in (ObjState.NEW_OBJECT, ObjState.UPDATED_LOCAL_VERSION)
+                          for r in processing_results)
+        self.channels_peers.add_response(request.peer, latency, new_entries, len(processing_results))
 
     def _on_query_timeout(self, request_cache):
         if not request_cache.peer_responded:
+            self.channels_peers.add_timeout(request_cache.peer)
             self.channels_peers.remove_peer(request_cache.peer)
         super()._on_query_timeout(request_cache)
 
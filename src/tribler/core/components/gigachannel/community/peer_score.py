@@ -0,0 +1,84 @@
+"""
+Quality scores of the peers that serve the channels contents.
+
+A score is made of the decaying averages of the peer response latency, its timeout rate and the share of the new
+entries among the entries it returned. Each new observation moves an average towards the observed value by `DECAY`.
+The averages of a peer that was not observed yet are the prior values, so the new peers get a fair chance to be
+queried.
+"""
+from typing import Any, Dict, Optional
+
+DECAY = 0.25  # The weight of the latest observation in the decaying averages
+
+DEFAULT_HAPPY_EYEBALLS_DELAY = 0.3  # The delay before querying the next peer, for a peer without history
+LATENCY_MARGIN = 2.0  # The next peer is queried if the response takes twice as long as usual
+MIN_HAPPY_EYEBALLS_DELAY = 0.1
+MAX_HAPPY_EYEBALLS_DELAY = 1.0
+
+PRIOR_LATENCY = DEFAULT_HAPPY_EYEBALLS_DELAY / LATENCY_MARGIN
+PRIOR_NEW_SHARE = 0.5
+
+# These keep the score finite for the very fast peers, and positive for the peers that return no new entries
+LATENCY_OFFSET = 0.05
+NEW_SHARE_OFFSET = 0.1
+TIMEOUT_COST = 5.0  # A timeout costs as much as waiting 5 seconds for a response, so the silent peers go last
+
+
+def decay(average: float, value: float) -> float:
+    return average + DECAY * (value - average)
+
+
+class PeerScore:
+    def __init__(self):
+        self.latency = PRIOR_LATENCY  # seconds
+        self.timeout_rate = 0.0
+        self.new_share = PRIOR_NEW_SHARE
+
+        self.responses = 0
+        self.timeouts = 0
+
+    def add_response(self, latency: Optional[float], new_entries: int, total_entries: int):
+        """
+        Account for a response packet of the peer.
+        :param latency: the time between sending the request and receiving the first response packet, in seconds,
+                        or None for the next packets of the same response
+        :param new_entries: the number of entries in the packet that were new or updated locally
+        :param total_entries: the number of entries in the packet
+        """
+        if latency is not None:
+            self.responses += 1
+            self.latency = decay(self.latency, latency)
+            self.timeout_rate = decay(self.timeout_rate, 0.0)
+        if total_entries:
+            self.new_share = decay(self.new_share, new_entries / total_entries)
+
+    def add_timeout(self):
+        self.timeouts += 1
+        self.timeout_rate = decay(self.timeout_rate, 1.0)
+
+    @property
+    def score(self) -> float:
+        """
+        The share of the new entries per second of the expected wait for a response: the higher, the better.
+        """
+        expected_wait = LATENCY_OFFSET + self.latency + TIMEOUT_COST * self.timeout_rate
+        return (NEW_SHARE_OFFSET + self.new_share) / expected_wait
+
+    @property
+    def happy_eyeballs_delay(self) -> float:
+        """
+        The time to wait for the response of the peer before querying the next peer. The peers that often time out
+        get less time.
+        """
+        delay = LATENCY_MARGIN * self.latency * (1.0 - self.timeout_rate)
+        return min(max(delay, MIN_HAPPY_EYEBALLS_DELAY), MAX_HAPPY_EYEBALLS_DELAY)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'score': self.score,
+            'latency': self.latency,
+            'timeout_rate': self.timeout_rate,
+            'new_share': self.new_share,
+            'responses': self.responses,
+            'timeouts': self.timeouts,
+        }
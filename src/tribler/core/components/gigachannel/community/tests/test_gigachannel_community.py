@@ -147,7 +147,7 @@ class TestGigaChannelUnits(TestBase):
 
         self.nodes[1].overlay.send_remote_select_subscribed_channels = mock_send
         peer = self.nodes[0].my_peer
-        payload = Mock()
+        payload = Mock(extra_bytes=b'')
         self.nodes[1].overlay.introduction_response_callback(peer, None, payload)
         self.assertIn(peer.mid, self.nodes[1].overlay.queried_peers)
         self.assertTrue(send_ok)
@@ -267,6 +267,27 @@ class TestGigaChannelUnits(TestBase):
         assert len(mapping._peers_channels) == 0
         assert len(mapping._channels_dict) == 0
 
+    def test_channels_peers_mapping_scores(self):
+        """
+        Test ranking the channel peers by their scores, and keeping the scores of the removed peers
+        """
+        mapping = ChannelsPeersMapping(max_peers_per_channel=2)
+        chan_pk = Mock()
+        chan_id = 123
+        slow, fast, silent = [Peer(default_eccrypto.generate_key("very-low"), ("1.2.3.4", 5)) for _ in range(3)]
+
+        mapping.add_response(slow, 1.0, 10, 10)
+        mapping.add_response(fast, 0.01, 10, 10)
+        mapping.add_timeout(silent)
+        for peer in (silent, slow, fast):
+            mapping.add(peer, chan_pk, chan_id)
+
+        # The peer with the lowest score is dropped as excess
+        assert mapping.get_best_peers_for_channel(chan_pk, chan_id) == [fast, slow]
+
+        mapping.remove_peer(fast)
+        assert mapping.get_score(fast).responses == 1
+
     def test_get_known_subscribed_peers_for_node(self):
         key = default_eccrypto.generate_key("curve25519")
         with db_session:
@@ -304,6 +325,7 @@ class TestGigaChannelUnits(TestBase):
 
         self.nodes[2].overlay.send_remote_select = Mock()
         self.nodes[2].overlay.send_search_request(**kwargs)
+        await self.deliver_messages()
 
         # The peer must have queried at least one peer
         self.nodes[2].overlay.send_remote_select.assert_called()
@@ -319,6 +341,7 @@ class TestGigaChannelUnits(TestBase):
 
         # the `remove_peer` function must have been called because of the timeout
         assert mocked_remove_peer.called
+        assert self.overlay(1).channels_peers.get_score(self.peer(0)).timeouts == 1
 
     @patch.object(ChannelsPeersMapping, 'remove_peer')
     async def test_drop_silent_peer_empty_response_packet(self, mocked_remove_peer: Mock):
@@ -342,6 +365,20 @@ class TestGigaChannelUnits(TestBase):
         assert results == await client.remote_select_channel_contents(**kwargs)
         assert len(results) == 50
 
+        score = client.channels_peers.get_score(server.my_peer)
+        assert score.responses == 1
+        assert score.new_share > 0.5
+
+    async def test_remote_select_channel_contents_known_entries(self):
+        """
+        Test that the entries already known to the client are not skipped by the remote peer
+        """
+        client, server, kwargs = self.client_server_request_setup()
+        await self.introduce_nodes()
+        results = await client.remote_select_channel_contents(**kwargs)
+        assert len(results) == 50
+        assert results == await client.remote_select_channel_contents(**kwargs)
+
     async def test_remote_select_channel_contents_empty(self):
         """
         Test awaiting for response from remote peer and getting empty results
@@ -353,7 +390,7 @@ class TestGigaChannelUnits(TestBase):
     @patch.object(EvaSelectRequest, 'timeout_delay', new=PropertyMock(return_value=0.1))
     async def test_remote_select_channel_timeout(self):
         client, server, kwargs = self.client_server_request_setup()
-        server.send_db_results = Mock()
+        server.send_db_results_chunks = AsyncMock()
         with pytest.raises(RequestTimeoutException):
             await client.remote_select_channel_contents(**kwargs)
 
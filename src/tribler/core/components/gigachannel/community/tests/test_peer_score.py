@@ -0,0 +1,70 @@
+import pytest
+
+from tribler.core.components.gigachannel.community.peer_score import (
+    DEFAULT_HAPPY_EYEBALLS_DELAY,
+    MAX_HAPPY_EYEBALLS_DELAY,
+    MIN_HAPPY_EYEBALLS_DELAY,
+    PeerScore,
+)
+
+
+def test_prior():
+    score = PeerScore()
+    assert score.happy_eyeballs_delay == pytest.approx(DEFAULT_HAPPY_EYEBALLS_DELAY)
+    assert score.to_dict()['responses'] == 0
+
+
+def test_faster_peer_is_better():
+    fast, slow = PeerScore(), PeerScore()
+    for _ in range(5):
+        fast.add_response(0.05, 10, 10)
+        slow.add_response(0.5, 10, 10)
+    assert fast.score > slow.score
+    assert fast.happy_eyeballs_delay < slow.happy_eyeballs_delay
+
+
+def test_peer_with_new_entries_is_better():
+    useful, useless = PeerScore(), PeerScore()
+    for _ in range(5):
+        useful.add_response(0.1, 10, 10)
+        useless.add_response(0.1, 0, 10)
+    assert useful.score > useless.score
+
+
+def test_next_packets_do_not_count_as_responses():
+    score = PeerScore()
+    score.add_response(0.1, 0, 10)
+    score.add_response(None, 10, 10)
+    assert score.responses == 1
+    assert score.latency < PeerScore().latency
+    assert score.new_share > 0
+
+
+def test_empty_response_does_not_change_new_share():
+    score = PeerScore()
+    score.add_response(0.1, 0, 0)
+    assert score.new_share == PeerScore().new_share
+
+
+def test_timeouts():
+    score = PeerScore()
+    score.add_timeout()
+    assert score.score < PeerScore().score
+    assert score.happy_eyeballs_delay < PeerScore().happy_eyeballs_delay
+
+    for _ in range(20):
+        score.add_timeout()
+    assert score.happy_eyeballs_delay == MIN_HAPPY_EYEBALLS_DELAY
+    assert score.timeouts == 21
+
+    # The timeout rate decays when the peer responds again
+    timeout_rate = score.timeout_rate
+    score.add_response(0.1, 1, 1)
+    assert score.timeout_rate < timeout_rate
+
+
+def test_happy_eyeballs_delay_limit():
+    score = PeerScore()
+    for _ in range(20):
+        score.add_response(10, 1, 1)
+    assert score.happy_eyeballs_delay == MAX_HAPPY_EYEBALLS_DELAY
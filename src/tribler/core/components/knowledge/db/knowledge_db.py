@@ -10,7 +10,7 @@ from pony.orm.core import Entity, Query, select
 from pony.utils import between
 
 from tribler.core.components.knowledge.community.knowledge_payload import StatementOperation
-from tribler.core.utilities.pony_utils import get_or_create
+from tribler.core.utilities.pony_utils import DatabaseExecutor, get_or_create
 
 CLOCK_START_VALUE = 0
 
@@ -68,6 +68,7 @@ class KnowledgeDatabase:
         self.instance.bind('sqlite', filename or ':memory:', create_db=True)
         generate_mapping_kwargs['create_tables'] = create_tables
         self.instance.generate_mapping(**generate_mapping_kwargs)
+        self.executor = DatabaseExecutor(self.instance, name='KnowledgeDB')
         self.logger = logging.getLogger(self.__class__.__name__)
 
     @staticmethod
@@ -413,6 +414,7 @@ class KnowledgeDatabase:
         )
 
     def shutdown(self) -> None:
+        self.executor.shutdown()
         self.instance.disconnect()
 
     def _get_random_operations_by_condition(self, condition: Callable[[Entity], bool], count: int = 5,
@@ -0,0 +1,190 @@
+"""
+The delivery of the libtorrent alerts to the asyncio loop.
+
+Libtorrent writes a byte to the alert socket of a session from its own thread when the alert queue of the session
+becomes non-empty. The read end of the socket is watched by the loop, so the alerts are popped as soon as they
+arrive instead of on the next tick of a polling task. A Python notify callback is not used, as libtorrent calls it
+while holding the lock of its alert queue, and it would wait for the GIL held by a loop thread that waits for
+the same lock. The sessions of the bindings without `set_alert_fd`, and the sessions of the loops that can not watch
+sockets, are polled every ALERT_POLL_INTERVAL seconds.
+
+The popped alerts are handled for at most ALERT_TIME_BUDGET seconds per loop iteration; the rest of them are handled
+on the next iterations, so a storm of alerts does not starve the other tasks of the loop.
+"""
+import asyncio
+import logging
+import socket
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+ALERT_TIME_BUDGET = 0.05  # The time in seconds the alerts are handled for in a single loop iteration
+ALERT_POLL_INTERVAL = 0.1  # The time in seconds between the polls of the sessions without an alert socket
+
+
+@dataclass
+class AlertStatistics:
+    count: int = 0
+    total_delay: float = 0.0  # The time between the notification and the start of the handling
+    max_delay: float = 0.0
+    total_handling_time: float = 0.0
+    max_handling_time: float = 0.0
+
+    def update(self, delay: float, handling_time: float):
+        self.count += 1
+        self.total_delay += delay
+        self.max_delay = max(self.max_delay, delay)
+        self.total_handling_time += handling_time
+        self.max_handling_time = max(self.max_handling_time, handling_time)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'avg_delay': self.total_delay / self.count if self.count else 0.0,
+            'max_delay': self.max_delay,
+            'avg_handling_time': self.total_handling_time / self.count if self.count else 0.0,
+            'max_handling_time': self.max_handling_time,
+        }
+
+
+class AlertPump:
+    def __init__(self, handler: Callable[[Any, int], None], time_budget: float = ALERT_TIME_BUDGET):
+        """
+        :param handler: the callable that handles an alert of the session with the given number of hops
+        :param time_budget: the time in seconds the alerts are handled for in a single loop iteration
+        """
+        self.handler = handler
+        self.time_budget = time_budget
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self.sessions: Dict[int, Any] = {}
+        self.statistics: Dict[str, AlertStatistics] = {}
+        # The popped alerts waiting to be handled: the hops of the session, the alert, and the time of the notification
+        self._queue: Deque[Tuple[int, Any, float]] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handle: Optional[asyncio.Handle] = None
+        # The read and write ends of the alert sockets, by the hops of the session
+        self._sockets: Dict[int, Tuple[socket.socket, socket.socket]] = {}
+        self._polled: Set[int] = set()
+        self._poll_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._queue)
+
+    def add_session(self, hops: int, session):
+        self.sessions[hops] = session
+        if self._loop is not None:
+            self._connect(hops, session)
+
+    def start(self):
+        """
+        Start the delivery of the alerts of the sessions. Must be called from the loop thread.
+        """
+        self._loop = asyncio.get_event_loop()
+        for hops, session in self.sessions.items():
+            self._connect(hops, session)
+
+    def stop(self):
+        for hops, (reader, writer) in self._sockets.items():
+            # Libtorrent must stop writing to the descriptor before it is closed and reused
+            self.sessions[hops].set_alert_fd(-1)
+            self._loop.remove_reader(reader.fileno())
+            reader.close()
+            writer.close()
+        self._sockets.clear()
+        self._polled.clear()
+        for handle in (self._handle, self._poll_handle):
+            if handle is not None:
+                handle.cancel()
+        self._handle = self._poll_handle = None
+        self._queue.clear()
+        self._loop = None
+
+    def _connect(self, hops: int, session):
+        if not self._connect_socket(hops, session):
+            self._logger.info(f'The alerts of the session with {hops} hops are polled')
+            self._polled.add(hops)
+            if self._poll_handle is None:
+                self._poll_handle = self._loop.call_later(ALERT_POLL_INTERVAL, self._poll)
+        # The alerts posted before the session was connected do not trigger a notification
+        self._on_notify(hops, time.monotonic())
+
+    def _connect_socket(self, hops: int, session) -> bool:
+        if not hasattr(session, 'set_alert_fd'):
+            return False
+        reader, writer = socket.socketpair()
+        reader.setblocking(False)
+        # Libtorrent must never block on a full socket, a single byte is enough to wake the loop up
+        writer.setblocking(False)
+        try:
+            self._loop.add_reader(reader.fileno(), self._on_readable, hops, reader)
+        except NotImplementedError:  # The loop can not watch sockets, e.g., the proactor loop on Windows
+            reader.close()
+            writer.close()
+            return False
+        self._sockets[hops] = (reader, writer)
+        session.set_alert_fd(writer.fileno())
+        return True
+
+    def _on_readable(self, hops: int, reader: socket.socket):
+        notified = time.monotonic()
+        try:
+            while reader.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        self._on_notify(hops, notified)
+
+    def _poll(self):
+        self._poll_handle = None
+        if self._loop is None:
+            return
+        now = time.monotonic()
+        for hops in self._polled:
+            self._on_notify(hops, now)
+        self._poll_handle = self._loop.call_later(ALERT_POLL_INTERVAL, self._poll)
+
+    def _on_notify(self, hops: int, notified: float):
+        session = self.sessions.get(hops)
+        if session is None or self._loop is None:
+            return
+        # The alerts are popped right away, so the libtorrent alert queue does not overflow
+        for alert in session.pop_alerts():
+            self._queue.append((hops, alert, notified))
+        self._schedule()
+
+    def _schedule(self):
+        if self._queue and self._handle is None and self._loop is not None:
+            self._handle = self._loop.call_soon(self.process_alerts)
+
+    def process_alerts(self):
+        """
+        Handle the queued alerts until the time budget is spent.
+        """
+        self._handle = None
+        deadline = time.monotonic() + self.time_budget
+        try:
+            while self._queue:
+                hops, alert, notified = self._queue.popleft()
+                started = time.monotonic()
+                try:
+                    self.handler(alert, hops)
+                finally:
+                    finished = time.monotonic()
+                    alert_type = alert.__class__.__name__
+                    if alert_type not in self.statistics:
+                        self.statistics[alert_type] = AlertStatistics()
+                    self.statistics[alert_type].update(started - notified, finished - started)
+                if finished >= deadline:
+                    break
+        finally:
+            # An error is reported by the loop exception handler, and the remaining alerts are handled later
+            self._schedule()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'queue_size': self.queue_size,
+            'alerts': {alert_type: statistics.to_dict() for alert_type, statistics in self.statistics.items()},
+        }
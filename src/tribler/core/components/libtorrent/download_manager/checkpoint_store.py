@@ -0,0 +1,159 @@
+"""
+The store of the download checkpoints.
+
+A checkpoint is the config of a download with its metainfo and its libtorrent resume data. The checkpoints are kept
+in a single SQLite database in the checkpoints directory, one row per infohash, instead of a ConfigObj file per
+download. The config is stored as JSON, so loading it does not parse the ConfigObj syntax.
+
+The checkpoints are written behind: `put` and `remove` only remember the change, and `flush` writes the changes
+in a single transaction. The download manager flushes the store every CHECKPOINT_FLUSH_INTERVAL seconds and on
+shutdown. The `.conf` checkpoint files of the older versions are moved into the store by `migrate`.
+"""
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tribler.core.components.libtorrent.download_manager.download_config import DownloadConfig
+from tribler.core.utilities.path_util import Path
+
+CHECKPOINTS_DB_FILENAME = 'checkpoints.db'
+CHECKPOINT_FLUSH_INTERVAL = 5  # seconds
+SELECT_BATCH_SIZE = 500  # The number of the checkpoints selected by a single query
+
+sql_create_checkpoint_table = """
+    CREATE TABLE IF NOT EXISTS Checkpoint (
+        infohash BLOB NOT NULL PRIMARY KEY,
+        config TEXT NOT NULL
+    ) WITHOUT ROWID;"""
+
+
+class CheckpointStore:
+    def __init__(self, path: Path):
+        self.path = path
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        # The changes that are not written yet: the JSON of the config, or None for the removed checkpoints
+        self._pending: Dict[bytes, Optional[str]] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+        # The connection is used by the event loop thread and by the worker threads that load the checkpoints
+        self._lock = threading.RLock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._connection is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._connection = sqlite3.connect(str(self.path), isolation_level=None, check_same_thread=False)
+                self._connection.execute('PRAGMA journal_mode = WAL')
+                self._connection.execute('PRAGMA synchronous = NORMAL')
+                self._connection.execute(sql_create_checkpoint_table)
+            return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def put(self, infohash: bytes, config: DownloadConfig):
+        config_json = config.to_json()
+        with self._lock:
+            self._pending[infohash] = config_json
+
+    def remove(self, infohash: bytes):
+        with self._lock:
+            self._pending[infohash] = None
+
+    def contains(self, infohash: bytes) -> bool:
+        if infohash in self._pending:
+            return self._pending[infohash] is not None
+        with self._lock:
+            row = self.connection.execute('SELECT 1 FROM Checkpoint WHERE infohash = ?', (infohash,)).fetchone()
+        return row is not None
+
+    def get(self, infohash: bytes, state_dir: Optional[Path] = None) -> Optional[DownloadConfig]:
+        configs = self.get_configs([infohash])
+        return DownloadConfig.from_json(configs[0][1], state_dir=state_dir) if configs else None
+
+    def get_infohashes(self) -> List[bytes]:
+        with self._lock:
+            infohashes = {infohash for infohash, in self.connection.execute('SELECT infohash FROM Checkpoint')}
+            pending = dict(self._pending)
+        infohashes.update(infohash for infohash, config in pending.items() if config is not None)
+        infohashes.difference_update(infohash for infohash, config in pending.items() if config is None)
+        return sorted(infohashes)
+
+    def get_configs(self, infohashes: Iterable[bytes]) -> List[Tuple[bytes, str]]:
+        """
+        Get the JSON of the configs of the given infohashes, skipping the infohashes without a checkpoint.
+        """
+        infohashes = list(infohashes)
+        configs = {}
+        with self._lock:
+            for i in range(0, len(infohashes), SELECT_BATCH_SIZE):
+                batch = infohashes[i:i + SELECT_BATCH_SIZE]
+                placeholders = ', '.join('?' * len(batch))
+                cursor = self.connection.execute(
+                    f'SELECT infohash, config FROM Checkpoint WHERE infohash IN ({placeholders})', batch)
+                configs.update(cursor)
+            pending = dict(self._pending)
+        for infohash in infohashes:
+            if infohash in pending:
+                configs[infohash] = pending[infohash]
+        return [(infohash, configs[infohash]) for infohash in infohashes if configs.get(infohash) is not None]
+
+    def flush(self) -> int:
+        """
+        Write the pending changes in a single transaction.
+        :return: the number of the changes written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            puts = [(infohash, config) for infohash, config in pending.items() if config is not None]
+            removes = [(infohash,) for infohash, config in pending.items() if config is None]
+            try:
+                with self.connection:
+                    self.connection.execute('BEGIN')
+                    self.connection.executemany('INSERT OR REPLACE INTO Checkpoint (infohash, config) VALUES (?, ?)',
+                                                puts)
+                    self.connection.executemany('DELETE FROM Checkpoint WHERE infohash = ?', removes)
+            except sqlite3.Error as e:
+                self._logger.warning(f'Unable to write the checkpoints: {type(e).__name__}: {e}')
+                # Keep the changes for the next flush, unless they are replaced by the newer ones
+                for infohash, config in pending.items():
+                    self._pending.setdefault(infohash, config)
+                return 0
+        self._logger.debug(f'{len(puts)} checkpoints are written, {len(removes)} are removed')
+        return len(pending)
+
+    def migrate(self, checkpoint_dir: Path) -> int:
+        """
+        Move the checkpoint files of the older versions into the store. The files that can not be loaded are left
+        in place.
+        :return: the number of the migrated checkpoints
+        """
+        filenames = list(checkpoint_dir.glob('*.conf'))
+        if not filenames:
+            return 0
+
+        migrated = []
+        for filename in filenames:
+            try:
+                config = DownloadConfig.load(filename)
+                infohash = bytes.fromhex(filename.stem)
+            except Exception:  # pylint: disable=broad-except
+                self._logger.exception("Could not migrate checkpoint file %s", filename)
+                continue
+            with self._lock:
+                self._pending.setdefault(infohash, config.to_json())
+            migrated.append(filename)
+
+        if not self.flush():
+            return 0
+        for filename in migrated:
+            filename.unlink(missing_ok=True)
+        self._logger.info(f'{len(migrated)} checkpoint files are migrated')
+        return len(migrated)
@@ -13,12 +13,16 @@ from tribler.core.utilities.unicode import hexlify
 class DHTHealthManager(TaskManager):
     """
     This class manages BEP33 health requests to the libtorrent DHT.
+
+    The DHT packets are only needed while there are lookups in progress, so the DHT log alerts of the session
+    are enabled when the first lookup starts and disabled when the last one is finalized.
     """
 
-    def __init__(self, lt_session):
+    def __init__(self, lt_session, alert_mask=None):
         """
         Initialize the DHT health manager.
         :param lt_session: The session used to perform health lookups.
+        :param alert_mask: The alert mask of the session without the DHT log alerts.
         """
         TaskManager.__init__(self)
         self.lookup_futures = {}  # Map from binary infohash to future
@@ -26,6 +30,27 @@ class DHTHealthManager(TaskManager):
         self.bf_peers = {}  # Map from infohash to (final) peers bloomfilter
         self.outstanding = {}  # Map from transaction_id to infohash
         self.lt_session = lt_session
+        self.alert_mask = alert_mask
+        self.inspecting_packets = False
+
+    @property
+    def is_active(self):
+        """
+        Whether the DHT packets should be inspected for the BEP33 bloom filters.
+        """
+        return bool(self.lookup_futures or self.outstanding)
+
+    def update_packet_inspection(self):
+        """
+        Enable the DHT log alerts of the session while there are lookups in progress, and disable them otherwise.
+        """
+        if self.alert_mask is None or self.inspecting_packets == self.is_active:
+            return
+        self.inspecting_packets = self.is_active
+        alert_mask = self.alert_mask
+        if self.inspecting_packets:
+            alert_mask |= lt.alert.category_t.dht_log_notification
+        self.lt_session.set_alert_mask(alert_mask)
 
     def get_health(self, infohash, timeout=15) -> Awaitable[HealthInfo]:
         """
@@ -40,6 +65,7 @@ class DHTHealthManager(TaskManager):
         self.lookup_futures[infohash] = lookup_future
         self.bf_seeders[infohash] = bytearray(256)
         self.bf_peers[infohash] = bytearray(256)
+        self.update_packet_inspection()
 
         # Perform a get_peers request. This should result in get_peers responses with the BEP33 bloom filters.
         self.lt_session.dht_get_peers(lt.sha1_hash(bytes(infohash)))
@@ -69,6 +95,7 @@ class DHTHealthManager(TaskManager):
             self.lookup_futures[infohash].set_result(health)
 
         self.lookup_futures.pop(infohash, None)
+        self.update_packet_inspection()
 
     @staticmethod
     def combine_bloomfilters(bf1, bf2):
@@ -35,6 +35,8 @@ from tribler.core.utilities.utilities import bdecode_compat
 class Download(TaskManager):
     """ Download subclass that represents a libtorrent download."""
 
+    last_version = 0  # The last version of the state of the downloads
+
     def __init__(self,
                  tdef: TorrentDef,
                  config: DownloadConfig = None,
@@ -68,6 +70,10 @@ class Download(TaskManager):
         self.tracker_status = {}  # {url: [num_peers, status_str]}
         self.checkpoint_disabled = self.dummy
 
+        # The version of the state of the download, see `update_version`
+        self.version = Download.next_version()
+        self._peer_info: Optional[List] = None
+
         self.futures = defaultdict(list)
         self.alert_handlers = defaultdict(list)
 
@@ -83,6 +89,7 @@ class Download(TaskManager):
                           'performance_alert': self.on_performance_alert,
                           'torrent_checked_alert': self.on_torrent_checked_alert,
                           'torrent_finished_alert': self.on_torrent_finished_alert,
+                          'piece_finished_alert': self.on_piece_finished_alert,
                           'save_resume_data_alert': self.on_save_resume_data_alert,
                           'state_changed_alert': self.on_state_changed_alert,
                           'torrent_error_alert': self.on_torrent_error_alert,
@@ -238,7 +245,21 @@ class Download(TaskManager):
         alert = type('anonymous_alert', (object,), alert_dict)()
         self.process_alert(alert, alert_type)
 
+    @classmethod
+    def next_version(cls) -> int:
+        Download.last_version += 1
+        return Download.last_version
+
+    def update_version(self):
+        """
+        Mark the state of the download as changed. The versions are unique across all the downloads, so the REST API
+        can return the downloads changed since a version a client has seen.
+        """
+        self.version = Download.next_version()
+        self._peer_info = None
+
     def process_alert(self, alert: lt.torrent_alert, alert_type: str):
+        self.update_version()
         try:
             if alert.category() in [lt.alert.category_t.error_notification, lt.alert.category_t.performance_warning]:
                 self._logger.debug("Got alert: %s", alert)
@@ -274,7 +295,7 @@ class Download(TaskManager):
     def on_save_resume_data_alert(self, alert: lt.save_resume_data_alert):
         """
         Callback for the alert that contains the resume data of a specific download.
-        This resume data will be written to a file on disk.
+        This resume data will be written to the checkpoint store.
         """
         self._logger.debug('On save resume data alert: %s', alert)
         if self.checkpoint_disabled:
@@ -295,16 +316,9 @@ class Download(TaskManager):
         self.config.set_metainfo(metainfo)
         self.config.set_engineresumedata(resume_data)
 
-        # Save it to file
-        basename = hexlify(resume_data[b'info-hash']) + '.conf'
-        filename = self.download_manager.get_checkpoint_dir() / basename
         self.config.config['download_defaults']['name'] = self.tdef.get_name_as_unicode()  # store name (for debugging)
-        try:
-            self.config.write(str(filename))
-        except OSError as e:
-            self._logger.warning(f'{e.__class__.__name__}: {e}')
-        else:
-            self._logger.debug(f'Resume data has been saved to: {filename}')
+        self.download_manager.checkpoint_store.put(resume_data[b'info-hash'], self.config)
+        self._logger.debug(f'Resume data has been saved: {hexlify(resume_data[b"info-hash"])}')
 
     def on_tracker_reply_alert(self, alert: lt.tracker_reply_alert):
         self._logger.info(f'On tracker reply alert: {alert}')
@@ -429,9 +443,18 @@ class Download(TaskManager):
             hidden = self.hidden or self.config.get_channel_download()
             self.notifier[notifications.torrent_finished](infohash=infohash, name=name, hidden=hidden)
 
+    def set_piece_alerts(self, enabled: bool):
+        if self.download_manager is not None:
+            self.download_manager.set_piece_alerts(self.config.get_hops(), self.tdef.get_infohash(), enabled)
+
+    def on_piece_finished_alert(self, alert: lt.piece_finished_alert):
+        if self.stream is not None:
+            self.stream.piecefinished(alert.piece_index)
+
     def update_lt_status(self, lt_status: lt.torrent_status):
         """ Update libtorrent stats and check if the download should be stopped."""
         self.lt_status = lt_status
+        self.update_version()
         self._stop_if_finished()
 
     def _stop_if_finished(self):
@@ -534,7 +557,7 @@ class Download(TaskManager):
         </pre>
         """
         peers = []
-        peer_infos = self.handle.get_peer_info() if self.handle and self.handle.is_valid() else []
+        peer_infos = self.get_peer_info() if self.handle and self.handle.is_valid() else []
         for peer_info in peer_infos:
             try:
                 extended_version = peer_info.client
@@ -566,13 +589,19 @@ class Download(TaskManager):
             peers.append(peer_dict)
         return peers
 
+    def get_peer_info(self) -> List:
+        """ Returns the peer info of the handle, cached until the state of the download changes """
+        if self._peer_info is None:
+            self._peer_info = self.handle.get_peer_info()
+        return self._peer_info
+
     def get_num_connected_seeds_peers(self) -> Tuple[int, int]:
         """ Returns number of connected seeders and leechers """
         num_seeds = num_peers = 0
         if not self.handle or not self.handle.is_valid():
             return 0, 0
 
-        for peer_info in self.handle.get_peer_info():
+        for peer_info in self.get_peer_info():
             if peer_info.flags & peer_info.seed:
                 num_seeds += 1
             else:
@@ -604,7 +633,7 @@ class Download(TaskManager):
         peer_info = []
 
         try:
-            peer_info = self.handle.get_peer_info()
+            peer_info = self.get_peer_info()
         except Exception as e:  # pylint: disable=broad-except
             self._logger.exception(e)
 
@@ -683,9 +712,7 @@ class Download(TaskManager):
         if not self.handle or not self.handle.is_valid():
             # Libtorrent hasn't received or initialized this download yet
             # 1. Check if we have data for this infohash already (don't overwrite it if we do!)
-            basename = hexlify(self.tdef.get_infohash()) + '.conf'
-            filename = Path(self.download_manager.get_checkpoint_dir() / basename)
-            if not filename.is_file():
+            if not self.download_manager.checkpoint_store.contains(self.tdef.get_infohash()):
                 # 2. If there is no saved data for this infohash, checkpoint it without data so we do not
                 #    lose it when we crash or restart before the download becomes known.
                 resume_data = self.config.get_engineresumedata() or {
@@ -695,7 +722,7 @@ class Download(TaskManager):
                 }
                 self.post_alert('save_resume_data_alert', dict(resume_data=resume_data))
             else:
-                self._logger.warning("Either file does not exist or is not file")
+                self._logger.debug("The checkpoint already exists")
             return succeed(None)
         return self.save_resume_data()
 
@@ -1,4 +1,5 @@
 import base64
+import json
 from typing import Dict, Optional
 
 from configobj import ConfigObj
@@ -55,6 +56,14 @@ class DownloadConfig:
         return DownloadConfig(ConfigObj(infile=Path.fix_win_long_file(config_path), file_error=True,
                                         configspec=str(CONFIG_SPEC_PATH), default_encoding='utf-8'))
 
+    @staticmethod
+    def from_json(text: str, state_dir=None):
+        return DownloadConfig(ConfigObj(json.loads(text), configspec=str(CONFIG_SPEC_PATH), default_encoding='utf-8'),
+                              state_dir=state_dir)
+
+    def to_json(self) -> str:
+        return json.dumps(self.config.dict())
+
     @staticmethod
     def from_defaults(settings: DownloadDefaultsSettings, state_dir=None):
         config = DownloadConfig(state_dir=state_dir)
@@ -7,15 +7,22 @@ import asyncio
 import logging
 import os
 import time as timemod
-from asyncio import CancelledError, gather, iscoroutine, shield, sleep, wait_for
+from asyncio import CancelledError, gather, get_running_loop, iscoroutine, shield, sleep, wait_for
 from binascii import unhexlify
+from collections import defaultdict
 from copy import deepcopy
 from shutil import rmtree
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from ipv8.taskmanager import TaskManager, task
 
 from tribler.core import notifications
+from tribler.core.components.libtorrent.download_manager.alert_pump import AlertPump
+from tribler.core.components.libtorrent.download_manager.checkpoint_store import (
+    CHECKPOINTS_DB_FILENAME,
+    CHECKPOINT_FLUSH_INTERVAL,
+    CheckpointStore,
+)
 from tribler.core.components.libtorrent.download_manager.dht_health_manager import DHTHealthManager
 from tribler.core.components.libtorrent.download_manager.download import Download
 from tribler.core.components.libtorrent.download_manager.download_config import DownloadConfig
@@ -45,6 +52,11 @@ SOCKS5_PROXY_DEF = 2
 
 LTSTATE_FILENAME = "lt.state"
 METAINFO_CACHE_PERIOD = 5 * 60
+# The bencoded fragments of the DHT packets of the BEP33 scrapes: a get_peers query with the scrape flag,
+# and a reply with the bloom filters of the seeders and the peers
+BEP33_QUERY_MARKERS = (b'9:get_peers', b'6:scrapei1e')
+BEP33_REPLY_MARKERS = (b'4:BFsd', b'4:BFpe')
+CHECKPOINTS_BATCH_SIZE = 200  # The number of the checkpoints decoded by a worker thread at once
 DEFAULT_DHT_ROUTERS = [
     ("dht.libtorrent.org", 25401),
     ("router.bittorrent.com", 6881),
@@ -106,6 +118,7 @@ class DownloadManager(TaskManager):
 
         self.downloads = {}
 
+        self.checkpoint_store = CheckpointStore(self.get_checkpoint_dir() / CHECKPOINTS_DB_FILENAME)
         self.checkpoints_count = None
         self.checkpoints_loaded = 0
         self.all_checkpoints_are_loaded = False
@@ -119,7 +132,22 @@ class DownloadManager(TaskManager):
         self.default_alert_mask = lt.alert.category_t.error_notification | lt.alert.category_t.status_notification | \
                                   lt.alert.category_t.storage_notification | lt.alert.category_t.performance_warning | \
                                   lt.alert.category_t.tracker_notification | lt.alert.category_t.debug_notification
+        # The infohashes of the streamed downloads, by the hops of their session. The piece finished alerts wake up
+        # the streams, and are only enabled for the sessions with streamed downloads, as they are posted for
+        # every piece of every download.
+        self.streamed_downloads: Dict[int, Set[bytes]] = defaultdict(set)
         self.session_stats_callback: Optional[Callable] = None
+        # The number of the DHT packets by the result of their inspection
+        self.dht_packet_counters = {'inspected': 0, 'skipped_idle': 0, 'skipped_prefilter': 0}
+        self.alert_pump = AlertPump(self.process_alert)
+        # The handlers of the session alerts, by the type of the alert
+        self.alert_handlers: Dict[str, Callable] = {
+            'state_update_alert': self.on_state_update_alert,
+            'listen_succeeded_alert': self.on_listen_succeeded_alert,
+            'peer_disconnected_alert': self.on_peer_disconnected_alert,
+            'session_stats_alert': self.on_session_stats_alert,
+            'dht_pkt_alert': self.on_dht_pkt_alert,
+        }
         self.state_cb_count = 0
 
         # Status of libtorrent session to indicate if it can safely close and no pending writes to disk exists.
@@ -151,19 +179,20 @@ class DownloadManager(TaskManager):
 
         if has_bep33_support() and self.download_defaults.number_hops <= len(self.socks_listen_ports or []):
             # Also listen to DHT log notifications - we need the dht_pkt_alert and extract the BEP33 bloom filters
-            dht_health_session = self.get_session(self.download_defaults.number_hops)
-            dht_health_session.set_alert_mask(self.default_alert_mask | lt.alert.category_t.dht_log_notification)
-            self.dht_health_manager = DHTHealthManager(dht_health_session)
+            # They are enabled by the DHTHealthManager only while it has lookups in progress.
+            hops = self.download_defaults.number_hops
+            self.dht_health_manager = DHTHealthManager(self.get_session(hops), alert_mask=self.get_alert_mask(hops))
 
         # Make temporary directory for metadata collecting through DHT
         self.metadata_tmpdir = self.metadata_tmpdir or Path.mkdtemp(suffix='tribler_metainfo_tmpdir')
 
         # Register tasks
-        self.register_task("process_alerts", self._task_process_alerts, interval=1)
+        self.alert_pump.start()
         if self.dht_readiness_timeout > 0 and self.config.dht:
             self._dht_ready_task = self.register_task("check_dht_ready", self._check_dht_ready)
         self.register_task("request_torrent_updates", self._request_torrent_updates, interval=1)
         self.register_task('task_cleanup_metacache', self._task_cleanup_metainfo_cache, interval=60, delay=0)
+        self.register_task('flush_checkpoints', self.checkpoint_store.flush, interval=CHECKPOINT_FLUSH_INTERVAL)
 
         self.set_download_states_callback(self.sesscb_states_callback)
 
@@ -206,6 +235,11 @@ class DownloadManager(TaskManager):
 
         self._logger.info('Awaiting shutdown task manager...')
         await self.shutdown_task_manager()
+        self.alert_pump.stop()
+
+        self._logger.info('Writing checkpoints...')
+        self.checkpoint_store.flush()
+        self.checkpoint_store.close()
 
         if self.dht_health_manager:
             await self.dht_health_manager.shutdown_task_manager()
@@ -287,7 +321,7 @@ class DownloadManager(TaskManager):
             self.update_ip_filter(ltsession, ['1.1.1.1'])
 
         self.set_session_settings(ltsession, settings)
-        ltsession.set_alert_mask(self.default_alert_mask)
+        ltsession.set_alert_mask(self.get_alert_mask(hops))
 
         if hops == 0:
             proxy_settings = DownloadManager.get_libtorrent_proxy_settings(self.config)
@@ -335,9 +369,41 @@ class DownloadManager(TaskManager):
     def has_session(self, hops=0):
         return hops in self.ltsessions
 
+    def set_piece_alerts(self, hops: int, infohash: bytes, enabled: bool):
+        """
+        Enable the piece finished alerts of the session while the download is streamed.
+        """
+        streamed = self.streamed_downloads[hops]
+        was_enabled = bool(streamed)
+        if enabled:
+            streamed.add(infohash)
+        else:
+            streamed.discard(infohash)
+        if bool(streamed) != was_enabled:
+            self.update_alert_mask(hops)
+
+    def get_alert_mask(self, hops: int) -> int:
+        alert_mask = self.default_alert_mask
+        if self.streamed_downloads.get(hops):
+            alert_mask |= lt.alert.category_t.piece_progress_notification
+        return alert_mask
+
+    def update_alert_mask(self, hops: int):
+        ltsession = self.ltsessions.get(hops)
+        if ltsession is None:
+            return
+        alert_mask = self.get_alert_mask(hops)
+        if self.dht_health_manager and self.dht_health_manager.lt_session is ltsession:
+            # The DHT health manager adds the DHT log alerts to this mask while it has lookups in progress
+            self.dht_health_manager.alert_mask = alert_mask
+            if self.dht_health_manager.inspecting_packets:
+                alert_mask |= lt.alert.category_t.dht_log_notification
+        ltsession.set_alert_mask(alert_mask)
+
     def get_session(self, hops=0):
         if hops not in self.ltsessions:
             self.ltsessions[hops] = self.create_session(hops)
+            self.alert_pump.add_session(hops, self.ltsessions[hops])
 
         return self.ltsessions[hops]
 
@@ -391,15 +457,12 @@ class DownloadManager(TaskManager):
     def process_alert(self, alert, hops=0):
         alert_type = alert.__class__.__name__
 
-        # Periodically, libtorrent will send us a state_update_alert, which contains the torrent status of
-        # all torrents changed since the last time we received this alert.
-        if alert_type == 'state_update_alert':
-            for status in alert.status:
-                infohash = unhexlify(str(status.info_hash))
-                if infohash not in self.downloads:
-                    self._logger.debug("Got state_update for unknown torrent %s", hexlify(infohash))
-                    continue
-                self.downloads[infohash].update_lt_status(status)
+        handler = self.alert_handlers.get(alert_type)
+        if handler:
+            handler(alert, hops)
+            # The session alerts without a torrent are not passed to the downloads
+            if not hasattr(alert, 'handle') and not hasattr(alert, 'info_hash'):
+                return
 
         infohash = unhexlify(str(alert.handle.info_hash() if hasattr(alert, 'handle') and alert.handle.is_valid()
                                  else getattr(alert, 'info_hash', '')))
@@ -415,44 +478,67 @@ class DownloadManager(TaskManager):
         elif infohash:
             self._logger.debug("Got alert for unknown download %s: %s", hexlify(infohash), alert)
 
-        if alert_type == 'listen_succeeded_alert':
-            # The ``port`` attribute was added in libtorrent 1.1.14.
-            # Older versions (most notably libtorrent 1.1.13 - the default  on Ubuntu 20.04) do not have this attribute.
-            # We use the now-deprecated ``endpoint`` attribute for these older versions.
-            self.listen_ports[hops] = getattr(alert, "port", alert.endpoint[1])
-
-        elif alert_type == 'peer_disconnected_alert':
-            self.notifier[notifications.peer_disconnected](alert.pid.to_bytes())
-
-        elif alert_type == 'session_stats_alert':
-            queued_disk_jobs = alert.values['disk.queued_disk_jobs']
-            queued_write_bytes = alert.values['disk.queued_write_bytes']
-            num_write_jobs = alert.values['disk.num_write_jobs']
-            if queued_disk_jobs == queued_write_bytes == num_write_jobs == 0:
-                self.lt_session_shutdown_ready[hops] = True
-
-            if self.session_stats_callback:
-                self.session_stats_callback(alert)
-
-        elif alert_type == "dht_pkt_alert":
-            # Unfortunately, the Python bindings don't have a direction attribute.
-            # So, we'll have to resort to using the string representation of the alert instead.
-            incoming = str(alert).startswith('<==')
-            decoded = bdecode_compat(alert.pkt_buf)
-            if not decoded:
-                return
+    def on_state_update_alert(self, alert, hops):
+        # Periodically, libtorrent will send us a state_update_alert, which contains the torrent status of
+        # all torrents changed since the last time we received this alert.
+        for status in alert.status:
+            infohash = unhexlify(str(status.info_hash))
+            if infohash not in self.downloads:
+                self._logger.debug("Got state_update for unknown torrent %s", hexlify(infohash))
+                continue
+            self.downloads[infohash].update_lt_status(status)
+
+    def on_listen_succeeded_alert(self, alert, hops):
+        # The ``port`` attribute was added in libtorrent 1.1.14.
+        # Older versions (most notably libtorrent 1.1.13 - the default  on Ubuntu 20.04) do not have this attribute.
+        # We use the now-deprecated ``endpoint`` attribute for these older versions.
+        self.listen_ports[hops] = getattr(alert, "port", alert.endpoint[1])
+
+    def on_peer_disconnected_alert(self, alert, hops):
+        self.notifier[notifications.peer_disconnected](alert.pid.to_bytes())
+
+    def on_session_stats_alert(self, alert, hops):
+        queued_disk_jobs = alert.values['disk.queued_disk_jobs']
+        queued_write_bytes = alert.values['disk.queued_write_bytes']
+        num_write_jobs = alert.values['disk.num_write_jobs']
+        if queued_disk_jobs == queued_write_bytes == num_write_jobs == 0:
+            self.lt_session_shutdown_ready[hops] = True
+
+        if self.session_stats_callback:
+            self.session_stats_callback(alert)
+
+    def on_dht_pkt_alert(self, alert, hops):
+        if not self.dht_health_manager or not self.dht_health_manager.is_active:
+            # The packets logged before the DHT log alerts were disabled
+            self.dht_packet_counters['skipped_idle'] += 1
+            return
+
+        # Most of the packets are not BEP33 scrapes, so the packet is only decoded if it contains their keys
+        pkt_buf = alert.pkt_buf
+        if not all(marker in pkt_buf for marker in BEP33_QUERY_MARKERS) \
+                and not all(marker in pkt_buf for marker in BEP33_REPLY_MARKERS):
+            self.dht_packet_counters['skipped_prefilter'] += 1
+            return
+        self.dht_packet_counters['inspected'] += 1
+
+        # Unfortunately, the Python bindings don't have a direction attribute.
+        # So, we'll have to resort to using the string representation of the alert instead.
+        incoming = str(alert).startswith('<==')
+        decoded = bdecode_compat(pkt_buf)
+        if not decoded:
+            return
 
-            # We are sending a raw DHT message - notify the DHTHealthManager of the outstanding request.
-            if not incoming and decoded.get(b'y') == b'q' \
-                    and decoded.get(b'q') == b'get_peers' and decoded[b'a'].get(b'scrape') == 1:
-                self.dht_health_manager.requesting_bloomfilters(decoded[b't'],
-                                                                decoded[b'a'][b'info_hash'])
+        # We are sending a raw DHT message - notify the DHTHealthManager of the outstanding request.
+        if not incoming and decoded.get(b'y') == b'q' \
+                and decoded.get(b'q') == b'get_peers' and decoded[b'a'].get(b'scrape') == 1:
+            self.dht_health_manager.requesting_bloomfilters(decoded[b't'],
+                                                            decoded[b'a'][b'info_hash'])
 
-            # We received a raw DHT message - decode it and check whether it is a BEP33 message.
-            if incoming and b'r' in decoded and b'BFsd' in decoded[b'r'] and b'BFpe' in decoded[b'r']:
-                self.dht_health_manager.received_bloomfilters(decoded[b't'],
-                                                              bytearray(decoded[b'r'][b'BFsd']),
-                                                              bytearray(decoded[b'r'][b'BFpe']))
+        # We received a raw DHT message - decode it and check whether it is a BEP33 message.
+        if incoming and b'r' in decoded and b'BFsd' in decoded[b'r'] and b'BFpe' in decoded[b'r']:
+            self.dht_health_manager.received_bloomfilters(decoded[b't'],
+                                                          bytearray(decoded[b'r'][b'BFsd']),
+                                                          bytearray(decoded[b'r'][b'BFpe']))
 
     def update_ip_filter(self, lt_session, ip_addresses):
         self._logger.debug('Updating IP filter %s', ip_addresses)
@@ -532,12 +618,6 @@ class DownloadManager(TaskManager):
             if ltsession:
                 ltsession.post_torrent_updates(0xffffffff)
 
-    def _task_process_alerts(self):
-        for hops, ltsession in list(self.ltsessions.items()):
-            if ltsession:
-                for alert in ltsession.pop_alerts():
-                    self.process_alert(alert, hops=hops)
-
     def _map_call_on_ltsessions(self, hops, funcname, *args, **kwargs):
         if hops is None:
             for session in self.ltsessions.values():
@@ -859,41 +939,63 @@ class DownloadManager(TaskManager):
         return self._last_states_list
 
     async def load_checkpoints(self):
+        """
+        Start the downloads of the checkpoints. The checkpoints are decoded by a worker thread in batches,
+        and the downloads of a batch are started together, so libtorrent adds their torrents while the next batch
+        is decoded.
+        """
         self._logger.info("Load checkpoints...")
-        checkpoint_filenames = list(self.get_checkpoint_dir().glob('*.conf'))
-        self.checkpoints_count = len(checkpoint_filenames)
-        for i, filename in enumerate(checkpoint_filenames, start=1):
-            self.load_checkpoint(filename)
-            self.checkpoints_loaded = i
-            await sleep(.01)
+        loop = get_running_loop()
+        await loop.run_in_executor(None, self.checkpoint_store.migrate, self.get_checkpoint_dir())
+
+        infohashes = await loop.run_in_executor(None, self.checkpoint_store.get_infohashes)
+        self.checkpoints_count = len(infohashes)
+        for i in range(0, len(infohashes), CHECKPOINTS_BATCH_SIZE):
+            batch = infohashes[i:i + CHECKPOINTS_BATCH_SIZE]
+            for tdef, config in await loop.run_in_executor(None, self.decode_checkpoints, batch):
+                self.load_checkpoint(tdef, config)
+            self.checkpoints_loaded += len(batch)
+            await sleep(0)
         self.all_checkpoints_are_loaded = True
         self._logger.info("Checkpoints are loaded")
 
-    def load_checkpoint(self, filename):
-        try:
-            config = DownloadConfig.load(filename)
-        except Exception:
-            self._logger.exception("Could not open checkpoint file %s", filename)
-            return
-
+    def decode_checkpoints(self, infohashes: List[bytes]) -> List[Tuple[TorrentDef, DownloadConfig]]:
+        """
+        Decode the checkpoints of the given infohashes, skipping the checkpoints that can not be decoded.
+        This method is called from a worker thread.
+        """
+        result = []
+        for infohash, config_json in self.checkpoint_store.get_configs(infohashes):
+            try:
+                config = DownloadConfig.from_json(config_json, state_dir=self.state_dir)
+            except Exception:  # pylint: disable=broad-except
+                self._logger.exception("Could not decode checkpoint %s", hexlify(infohash))
+                continue
+            tdef = self.get_checkpoint_tdef(config, hexlify(infohash))
+            if tdef is not None:
+                result.append((tdef, config))
+        return result
+
+    def get_checkpoint_tdef(self, config: DownloadConfig, name: str) -> Optional[TorrentDef]:
         metainfo = config.get_metainfo()
         if not metainfo:
-            self._logger.error("Could not resume checkpoint %s; metainfo not found", filename)
-            return
+            self._logger.error("Could not resume checkpoint %s; metainfo not found", name)
+            return None
         if not isinstance(metainfo, dict):
             self._logger.error("Could not resume checkpoint %s; metainfo is not dict %s %s",
-                               filename, type(metainfo), repr(metainfo))
-            return
+                               name, type(metainfo), repr(metainfo))
+            return None
 
         try:
             url = metainfo.get(b'url', None)
             url = url.decode('utf-8') if url else url
-            tdef = (TorrentDefNoMetainfo(metainfo[b'infohash'], metainfo[b'name'], url)
+            return (TorrentDefNoMetainfo(metainfo[b'infohash'], metainfo[b'name'], url)
                     if b'infohash' in metainfo else TorrentDef.load_from_dict(metainfo))
         except (KeyError, ValueError) as e:
             self._logger.exception("Could not restore tdef from metainfo dict: %s %s ", e, metainfo)
-            return
+            return None
 
+    def load_checkpoint(self, tdef: TorrentDef, config: DownloadConfig):
         if config.get_bootstrap_download():
             # In case the download is marked as bootstrap, remove it if its infohash does not
             # match the configured bootstrap infohash
@@ -903,8 +1005,9 @@ class DownloadManager(TaskManager):
 
         config.state_dir = self.state_dir
         if config.get_dest_dir() == '':  # removed torrent ignoring
-            self._logger.info("Removing checkpoint %s destdir is %s", filename, config.get_dest_dir())
-            os.remove(filename)
+            self._logger.info("Removing checkpoint %s destdir is %s", hexlify(tdef.get_infohash()),
+                              config.get_dest_dir())
+            self.remove_config(tdef.get_infohash())
             return
 
         try:
@@ -917,15 +1020,8 @@ class DownloadManager(TaskManager):
 
     def remove_config(self, infohash):
         if infohash not in self.downloads:
-            try:
-                basename = hexlify(infohash) + '.conf'
-                filename = self.get_checkpoint_dir() / basename
-                self._logger.debug("Removing download checkpoint %s", filename)
-                if os.access(filename, os.F_OK):
-                    os.remove(filename)
-            except:
-                # Show must go on
-                self._logger.exception("Could not remove state")
+            self._logger.debug("Removing download checkpoint %s", hexlify(infohash))
+            self.checkpoint_store.remove(infohash)
         else:
             self._logger.warning("Download is back, restarted? Cancelling removal! %s", hexlify(infohash))
 
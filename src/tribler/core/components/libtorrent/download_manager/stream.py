@@ -18,7 +18,8 @@ for a given fileindex of a torrent
 """
 
 import logging
-from asyncio import sleep
+from asyncio import TimeoutError as AsyncTimeoutError, get_event_loop, sleep, wait_for
+from collections import defaultdict
 
 from tribler.core.components.libtorrent.utils.torrent_utils import check_vod, get_info_from_handle
 from tribler.core.utilities.simpledefs import DLSTATUS_DOWNLOADING, DLSTATUS_SEEDING
@@ -48,6 +49,9 @@ STREAM_PAUSE_TIME = 1
 # never use 0 priority because when streams are paused
 # we still want lt to download the pieces not important for the stream
 MIN_PIECE_PRIO = 1
+# the chunks wait for the piece finished alert of the piece they read, but still check the pieces of the download
+# after this time, in case the alert never comes, ie: the piece failed the hash check or the chunk is closed
+PIECE_WAIT_TIME = 1
 
 
 class NotStreamingError(Exception):
@@ -85,6 +89,23 @@ class Stream:  # pylint: disable=too-many-instance-attributes
         #                                 <-------------------- dynamic buffer pieces -------------------->
         # {int:startbyte: [bool:ispaused, list:piecestobuffer 'according to the cursor of the related chunk']
         self.cursorpiecemap = {}
+        # piececursors is the reverse of cursorpiecemap, it maps each piece of the dynamic buffers to its deadline
+        # in the buffer of each chunk, and it is updated with cursorpiecemap when a chunk moves
+        # {int:piece: {int:startbyte: int:deadline}}
+        self.piececursors = {}
+        # the static buffer pieces mapped to their deadlines, {int:piece: int:deadline}
+        self.staticpieces = {}
+        # the first static buffer piece that is not downloaded yet, the pieces after it have prio 0
+        self.staticthreshold = None
+        # the piece prios as last read from or set to libtorrent, and the pieces to check on the next prio update.
+        # when fullupdate is set, the prios are read again and all the pieces of the file are checked
+        self.pieceprios = None
+        self.dirtypieces = set()
+        self.fullupdate = True
+        # the pieces finished after the last status update of the download, and the futures of the chunks
+        # waiting for the pieces, {int:piece: [future]}
+        self.finishedpieces = set()
+        self.piecefutures = defaultdict(list)
         self.fileindex = None
         # when first initiate this instance does not have related callback ready,
         # this coro will be awaited when the stream is enabled. If never enabled,
@@ -121,6 +142,7 @@ class Stream:  # pylint: disable=too-many-instance-attributes
         self.__setdeadline = download.set_piece_deadline
         self.__resetdeadline = download.reset_piece_deadline
         self.__resumedownload = download.resume
+        self.__setpiecealerts = download.set_piece_alerts
 
     async def enable(self, fileindex=0, prebufpos=None):
         """
@@ -157,6 +179,7 @@ class Stream:  # pylint: disable=too-many-instance-attributes
                 currrent_prebuf = list(self.prebuffpieces)
                 currrent_prebuf.extend(self.bytestopieces(prebufpos, self.prebuffsize))
                 self.prebuffpieces = sorted(list(set(currrent_prebuf)))
+                self.updatestaticpieces()
             return
 
         # update the file name and size with the file index
@@ -178,6 +201,20 @@ class Stream:  # pylint: disable=too-many-instance-attributes
         self.headerpieces = self.bytestopieces(0, HEADER_SIZE)
         self.footerpieces = self.bytestopieces(-FOOTER_SIZE, 0)
         self.prebuffpieces = [] if prebufpos is None else self.bytestopieces(prebufpos, self.prebuffsize)
+        self.updatestaticpieces()
+        self.fullupdate = True
+        # The chunks are woken up by the piece finished alerts, which are only enabled while streaming
+        self.__setpiecealerts(True)
+
+    def updatestaticpieces(self):
+        """
+        Maps the static buffer pieces to their deadlines: footer pieces first, then header pieces, then prebuff pieces
+        """
+        self.staticpieces = {}
+        for deadline, pieces in enumerate([self.footerpieces, self.headerpieces, self.prebuffpieces]):
+            for piece in pieces:
+                self.staticpieces.setdefault(piece, deadline)
+        self.dirtypieces.update(self.staticpieces)
 
     @property
     def enabled(self):
@@ -226,6 +263,38 @@ class Stream:  # pylint: disable=too-many-instance-attributes
         """
         return self.__lt_state().get_pieces_complete()
 
+    @check_vod(False)
+    def haspiece(self, piece):
+        """
+        Checks if the piece has been downloaded
+        """
+        if piece in self.finishedpieces:
+            return True
+        pieces_have = self.pieceshave
+        return 0 <= piece < len(pieces_have) and bool(pieces_have[piece])
+
+    def waitforpiece(self, piece):
+        """
+        Returns a future that is resolved when the piece is downloaded, or with False when the stream is disabled
+        """
+        future = get_event_loop().create_future()
+        if self.haspiece(piece):
+            future.set_result(True)
+        else:
+            self.piecefutures[piece].append(future)
+        return future
+
+    def piecefinished(self, piece):
+        """
+        Called with the piece finished alerts of the download, wakes up the chunks waiting for the piece
+        """
+        if not self.enabled:
+            return
+        self.finishedpieces.add(piece)
+        for future in self.piecefutures.pop(piece, []):
+            if not future.done():
+                future.set_result(True)
+
     @check_vod(True)
     def disable(self):
         """
@@ -236,8 +305,21 @@ class Stream:  # pylint: disable=too-many-instance-attributes
         self.footerpieces = []
         self.prebuffpieces = []
         self.cursorpiecemap = {}
+        self.piececursors = {}
+        self.staticpieces = {}
+        self.staticthreshold = None
+        self.pieceprios = None
+        self.dirtypieces = set()
+        self.fullupdate = True
+        self.finishedpieces = set()
+        for futures in self.piecefutures.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(False)
+        self.piecefutures.clear()
         self.resetprios()
         self.__setselectedfiles(self.enabledfiles)
+        self.__setpiecealerts(False)
 
     def close(self):
         """
@@ -296,9 +378,8 @@ class Stream:  # pylint: disable=too-many-instance-attributes
         """
         if have is not None:
             pieces_have = self.pieceshave
-        for piece in range(self.firstpiece, self.lastpiece + 1):
-            if startfrom is not None and piece < startfrom:
-                continue
+        startpiece = self.firstpiece if startfrom is None else max(self.firstpiece, startfrom)
+        for piece in range(startpiece, self.lastpiece + 1):
             if have is None:
                 yield piece
             elif have and pieces_have[piece]:
@@ -308,85 +389,140 @@ class Stream:  # pylint: disable=too-many-instance-attributes
             elif consec:
                 break
 
-    async def updateprios(self):  # pylint: disable=too-many-branches
+    def setcursor(self, startbyte, paused, pieces):
+        """
+        Sets the dynamic buffer pieces of the chunk identified by its startbyte. Only the pieces that entered or left
+        the buffer, or that moved within the first len(DEADLINE_PRIO_MAP) deadlines of it, are marked for the next
+        prio update, the prios of the other pieces can not change.
+        """
+        cursor = self.cursorpiecemap.get(startbyte)
+        oldpieces = {} if cursor is None else {piece: deadline for deadline, piece in enumerate(cursor[1])}
+        for deadline, piece in enumerate(pieces):
+            olddeadline = oldpieces.pop(piece, None)
+            if olddeadline == deadline:
+                continue
+            self.piececursors.setdefault(piece, {})[startbyte] = deadline
+            if olddeadline is None or min(olddeadline, deadline) < len(DEADLINE_PRIO_MAP):
+                self.dirtypieces.add(piece)
+        for piece in oldpieces:
+            self._removepiececursor(piece, startbyte)
+        self.cursorpiecemap[startbyte] = [paused, pieces]
+
+    def pausecursor(self, startbyte, paused):
+        """
+        Pauses or resumes the dynamic buffer of the chunk identified by its startbyte
+        """
+        cursor = self.cursorpiecemap[startbyte]
+        if cursor[0] != paused:
+            cursor[0] = paused
+            self.dirtypieces.update(cursor[1])
+
+    def removecursor(self, startbyte):
+        """
+        Removes the dynamic buffer of the chunk identified by its startbyte, returns the removed [paused, pieces]
+        """
+        cursor = self.cursorpiecemap.pop(startbyte)
+        for piece in cursor[1]:
+            self._removepiececursor(piece, startbyte)
+        return cursor
+
+    def _removepiececursor(self, piece, startbyte):
+        cursors = self.piececursors.get(piece, {})
+        cursors.pop(startbyte, None)
+        if not cursors:
+            self.piececursors.pop(piece, None)
+        self.dirtypieces.add(piece)
+
+    def finddeadline(self, piece):
+        """
+        Find the cursor which has this piece closest to its start
+        Returns the deadline for the piece, or None if the piece is not in the buffer of any unpaused cursor
+        """
+        deadline = None
+        for startbyte, cursordeadline in self.piececursors.get(piece, {}).items():
+            if not self.cursorpiecemap[startbyte][0] and (deadline is None or cursordeadline < deadline):
+                deadline = cursordeadline
+        return deadline
+
+    def getpieceprio(self, piece, staticthreshold):
+        """
+        Returns the prio and the deadline (or None) that a piece which is not downloaded yet should have
+        """
+        deadline = self.staticpieces.get(piece)
+        if deadline is not None:
+            return 7, deadline
+        if staticthreshold is not None and piece > staticthreshold:
+            # static buffering is in progress, do not download the rest of the pieces
+            return 0, None
+        # dynamic buffering
+        deadline = self.finddeadline(piece)
+        if deadline is None:
+            # the piece is not in buffer zone, set to min prio without deadline
+            return MIN_PIECE_PRIO, None
+        if deadline < len(DEADLINE_PRIO_MAP):
+            # get prio according to deadline
+            return DEADLINE_PRIO_MAP[deadline], deadline
+        # the deadline is outside of map, set piece prio 1 with the deadline
+        # buffer size is bigger then prio_map
+        return 1, deadline
+
+    async def updateprios(self):
         """
         This async function controls how the individual piece priority and deadline is configured.
         This method is called when a stream in enabled, and when a chunk reads the stream each time.
-        The performance of this method is crucical since it gets called quite frequently
+        The performance of this method is crucical since it gets called quite frequently, so only the pieces
+        marked by the changes of the buffers are checked, and only the changed prios are pushed to libtorrent.
         """
         if not self.enabled:
             return
 
-        def _updateprio(piece, prio, deadline=None):
-            """
-            Utility function to update piece priorities
-            """
-            if not curr_prio == prio:
-                piecepriorities[piece] = prio
-                if deadline is not None:
-                    # it is cool to step deadlines with 10ms interval but in realty there is no need.
-                    self.__setdeadline(piece, deadline * 10)
-                    diffmap[piece] = f"{piece}:{deadline * 10}:{curr_prio}->{prio}"
-                else:
-                    self.__resetdeadline(piece)
-                    diffmap[piece] = f"{piece}:-:{curr_prio}->{prio}"
-
-        def _find_deadline(piece):
-            """
-            Find the cursor which has this piece closest to its start
-            Returns the deadline for the piece and the cursor startbyte
-            """
-            # if piece is not in piecemaps, then there is no deadline
-            # if piece in piecemaps, then the deadline is the index of the related piecemap
-            deadline = None
-            cursor = None
-            for startbyte in self.cursorpiecemap:
-                paused, cursorpieces = self.cursorpiecemap[startbyte]
-                if not paused and piece in cursorpieces and \
-                        (deadline is None or cursorpieces.index(piece) < deadline):
-                    deadline = cursorpieces.index(piece)
-                    cursor = startbyte
-            return deadline, cursor
-
-        # current priorities
-        piecepriorities = self.__getpieceprios()
-        if not piecepriorities:
-            # this case might happen when hop count is changing.
-            return
+        pieces_have = self.pieceshave
+
+        def _haspiece(piece):
+            return piece in self.finishedpieces or (piece < len(pieces_have) and pieces_have[piece])
+
+        # the pieces after the first static buffer piece that is not downloaded yet are not downloaded until
+        # the static buffering is done. When that piece changes, the prios of the pieces in between change too.
+        staticthreshold = min((piece for piece in self.staticpieces if not _haspiece(piece)), default=None)
+
+        if self.fullupdate or self.pieceprios is None:
+            # current priorities
+            piecepriorities = self.__getpieceprios()
+            if not piecepriorities:
+                # this case might happen when hop count is changing.
+                return
+            self.pieceprios = piecepriorities
+            self.fullupdate = False
+            self.dirtypieces = set()
+            pieces = range(self.firstpiece, self.lastpiece + 1)
+        else:
+            pieces, self.dirtypieces = self.dirtypieces, set()
+            if staticthreshold != self.staticthreshold:
+                before = self.lastpiece if self.staticthreshold is None else self.staticthreshold
+                after = self.lastpiece if staticthreshold is None else staticthreshold
+                pieces.update(range(min(before, after) + 1, max(before, after) + 1))
+        self.staticthreshold = staticthreshold
+
         # a map holds the changes, used only for logging purposes
         diffmap = {}
-        # flag that holds if we are in static buffering phase of dynamic buffering
-        staticbuff = False
-        for piece in self.iterpieces(have=False):
-            # current piece prio
-            curr_prio = piecepriorities[piece]
-            if piece in self.footerpieces:
-                _updateprio(piece, 7, 0)
-                staticbuff = True
-            elif piece in self.headerpieces:
-                _updateprio(piece, 7, 1)
-                staticbuff = True
-            elif piece in self.prebuffpieces:
-                _updateprio(piece, 7, 2)
-                staticbuff = True
+        changes = []
+        for piece in pieces:
+            if piece >= len(self.pieceprios) or _haspiece(piece):
+                continue
+            curr_prio = self.pieceprios[piece]
+            prio, deadline = self.getpieceprio(piece, staticthreshold)
+            if curr_prio == prio:
+                continue
+            changes.append((piece, prio))
+            self.pieceprios[piece] = prio
+            if deadline is not None:
+                # it is cool to step deadlines with 10ms interval but in realty there is no need.
+                self.__setdeadline(piece, deadline * 10)
+                diffmap[piece] = f"{piece}:{deadline * 10}:{curr_prio}->{prio}"
             else:
-                if staticbuff:
-                    _updateprio(piece, 0)
-                else:
-                    # dynamic buffering
-                    deadline, cursor = _find_deadline(piece)
-                    if cursor is not None:
-                        if deadline < len(DEADLINE_PRIO_MAP):
-                            # get prio according to deadline
-                            _updateprio(piece, DEADLINE_PRIO_MAP[deadline], deadline)
-                        else:
-                            # the deadline is outside of map, set piece prio 1 with the deadline
-                            # buffer size is bigger then prio_map
-                            _updateprio(piece, 1, deadline)
-                    else:
-                        # the piece is not in buffer zone, set to min prio without deadline
-                        _updateprio(piece, MIN_PIECE_PRIO)
-        if diffmap:
+                self.__resetdeadline(piece)
+                diffmap[piece] = f"{piece}:-:{curr_prio}->{prio}"
+        if changes:
             # log stuff
             self._logger.info("Piece Piority changed: %s", repr(diffmap))
             self._logger.debug("Header Pieces: %s", repr(self.headerpieces))
@@ -394,9 +530,8 @@ class Stream:  # pylint: disable=too-many-instance-attributes
             self._logger.debug("Prebuff Pieces: %s", repr(self.prebuffpieces))
             for startbyte in self.cursorpiecemap:
                 self._logger.debug("Cursor '%s' Pieces: %s", startbyte, repr(self.cursorpiecemap[startbyte]))
-            # BELOW LINE WILL BE REMOVED, Most of the above are for debugging to be cleaned
-            self._logger.debug("Current Prios: %s", [(x, piecepriorities[x]) for x in self.iterpieces(have=False)])
-            self.__setpieceprios(piecepriorities)
+            # only the changed pieces are pushed, as (piece, prio) pairs
+            self.__setpieceprios(changes)
 
     def resetprios(self, pieces=None, prio=None):
         """
@@ -404,12 +539,16 @@ class Stream:  # pylint: disable=too-many-instance-attributes
         If no pieces are provided, resets every piece for the fileindex
         """
         prio = prio if prio is not None else 4
-        piecepriorities = self.__getpieceprios()
         if pieces is None:
-            pieces = list(range(len(piecepriorities)))
+            pieces = list(range(len(self.__getpieceprios())))
         for piece in pieces:
             self.__resetdeadline(piece)
-        self.__setpieceprios([prio] * len(pieces))
+        self.__setpieceprios([(piece, prio) for piece in pieces])
+        if self.pieceprios is not None:
+            for piece in pieces:
+                if piece < len(self.pieceprios):
+                    self.pieceprios[piece] = prio
+            self.dirtypieces.update(pieces)
 
 
 class StreamChunk:
@@ -494,7 +633,7 @@ class StreamChunk:
         Sets the chunk pieces to pause, if not forced, chunk is only paused if other chunks are not paused
         """
         if not self.ispaused and (self.shouldpause or force):
-            self.stream.cursorpiecemap[self.startpos][0] = True
+            self.stream.pausecursor(self.startpos, True)
             return True
         return False
 
@@ -503,7 +642,7 @@ class StreamChunk:
         Sets the chunk pieces to resume, if not forced, chunk is only resume if other chunks are paused
         """
         if self.ispaused and (not self.shouldpause or force):
-            self.stream.cursorpiecemap[self.startpos][0] = False
+            self.stream.pausecursor(self.startpos, False)
             return True
         return False
 
@@ -523,7 +662,7 @@ class StreamChunk:
             else:
                 break
         # update cursor piece that represents this chunk
-        self.stream.cursorpiecemap[self.startpos] = [self.ispaused, pieces]
+        self.stream.setcursor(self.startpos, self.ispaused, pieces)
         # update the torrent prios
         await self.stream.updateprios()
         # update the file cursor also
@@ -540,7 +679,7 @@ class StreamChunk:
             self.file.close()
             self.file = None
         if self.isstarted:
-            pieces = self.stream.cursorpiecemap.pop(self.startpos)
+            pieces = self.stream.removecursor(self.startpos)
             self.stream.resetprios(pieces[1], MIN_PIECE_PRIO)
 
     async def read(self):
@@ -563,14 +702,16 @@ class StreamChunk:
         # experiment a garbage write mechanism here if the torrent read is too slow
         piece = self.stream.bytetopiece(self.seekpos)
         while True:
-            pieces_have = self.stream.pieceshave
             if piece == -1:
                 self.close()
                 return b''
-            if (0 <= piece < len(pieces_have) and pieces_have[piece]) or not self.isstarted:
+            if not self.isstarted or self.stream.haspiece(piece):
                 break
             self._logger.debug('Chunk %s, Waiting piece %s', self.startpos, piece)
-            await sleep(1)
+            try:
+                await wait_for(self.stream.waitforpiece(piece), PIECE_WAIT_TIME)
+            except AsyncTimeoutError:
+                pass
 
         result = self.file.read(self.stream.piecelen)
         self._logger.debug('Chunk %s: Got bytes %s-%s, %s bytes, piecelen: %s',
@@ -1,7 +1,11 @@
+import time
 from asyncio import CancelledError, TimeoutError as AsyncTimeoutError, wait_for
 from binascii import unhexlify
+from collections import OrderedDict
 from contextlib import suppress
+from dataclasses import dataclass, field
 from pathlib import PurePosixPath
+from typing import Any, Dict, Optional, Set, Tuple
 
 from aiohttp import web
 
@@ -12,6 +16,7 @@ from ipv8.messaging.anonymization.tunnel import CIRCUIT_ID_PORT, PEER_FLAG_EXIT_
 
 from marshmallow.fields import Boolean, Float, Integer, List, String
 
+from tribler.core.components.libtorrent.download_manager.download import Download
 from tribler.core.components.libtorrent.download_manager.download_config import DownloadConfig
 from tribler.core.components.libtorrent.download_manager.download_manager import DownloadManager
 from tribler.core.components.libtorrent.download_manager.stream import STREAM_PAUSE_TIME, StreamChunk
@@ -26,6 +31,7 @@ from tribler.core.components.restapi.rest.rest_endpoint import (
 )
 from tribler.core.components.restapi.rest.util import return_handled_exception
 from tribler.core.utilities.path_util import Path
+from tribler.core.utilities.pony_utils import DatabaseExecutorOverloaded
 from tribler.core.utilities.simpledefs import (
     DLSTATUS_CIRCUITS,
     DLSTATUS_EXIT_NODES,
@@ -41,6 +47,8 @@ from tribler.core.utilities.utilities import froze_it
 TOTAL = 'total'
 LOADED = 'loaded'
 ALL_LOADED = 'all_loaded'
+MAX_REMOVED_DOWNLOADS = 1000  # The number of the removed downloads remembered for the clients asking for changes
+MISSING_TITLE_TTL = 30  # The time in seconds after which a title that is not in the database is looked up again
 
 
 def _safe_extended_peer_info(ext_peer_info):
@@ -82,6 +90,34 @@ def get_extended_status(tunnel_community, download):
     return dlstatus
 
 
+@dataclass
+class DownloadSnapshot:
+    """
+    The last JSON fields of a download, with the version of the download each field has changed in.
+    """
+    download: Download
+    version: Optional[int] = None  # The version of the download the state fields were created for
+    fields: Dict[str, Any] = field(default_factory=dict)
+    field_versions: Dict[str, int] = field(default_factory=dict)
+    stale: Set[str] = field(default_factory=set)  # The optional fields to be created again when requested
+
+    def update(self, fields: Dict[str, Any], version: Optional[int] = None):
+        """
+        Update the fields. The changed fields get the given version, or a new one if the version is not given.
+        """
+        changed = [name for name, value in fields.items() if name not in self.fields or self.fields[name] != value]
+        if not changed:
+            return
+        version = version or Download.next_version()
+        for name in changed:
+            self.fields[name] = fields[name]
+            self.field_versions[name] = version
+
+    def get_fields(self, since: int = 0, excluded: Set[str] = frozenset()) -> Dict[str, Any]:
+        return {name: value for name, value in self.fields.items()
+                if name not in excluded and self.field_versions[name] > since}
+
+
 @froze_it
 class DownloadsEndpoint(RESTEndpoint):
     """
@@ -95,6 +131,16 @@ class DownloadsEndpoint(RESTEndpoint):
         self.mds = metadata_store
         self.tunnel_community = tunnel_community
 
+        # The last JSON of the downloads, by infohash
+        self.download_snapshots: Dict[bytes, DownloadSnapshot] = {}
+        # The versions of the removals of the downloads, by hex infohash
+        self.removed_downloads: Dict[str, int] = OrderedDict()
+        # The version of the last removal that is not kept in removed_downloads anymore
+        self.removed_version = 0
+        # The cached titles of the torrents: the name of the torrent the title was looked up for, the title,
+        # and the time of the lookup
+        self.torrent_titles: Dict[bytes, Tuple[str, Optional[str], float]] = {}
+
         self.app.on_shutdown.append(self.on_shutdown)
 
     async def on_shutdown(self, _):
@@ -190,10 +236,20 @@ class DownloadsEndpoint(RESTEndpoint):
             'description': 'Flag indicating whether or not to include files',
             'type': 'boolean',
             'required': False
+        },
+            {
+            'in': 'query',
+            'name': 'since',
+            'description': 'The version of the last response. Only the changes since this version are returned',
+            'type': 'integer',
+            'required': False
         }],
         responses={
             200: {
                 "schema": schema(DownloadsResponse={
+                    'version': Integer,
+                    'delta': Boolean,
+                    'removed': [String],
                     'downloads': schema(Download={
                         'name': String,
                         'progress': Float,
@@ -239,13 +295,23 @@ class DownloadsEndpoint(RESTEndpoint):
                     "in bytes. The estimated time assumed is given in seconds.\n\n"
                     "Detailed information about peers and pieces is only requested when the get_peers and/or "
                     "get_pieces flag is set. Note that setting this flag has a negative impact on performance "
-                    "and should only be used in situations where this data is required. "
+                    "and should only be used in situations where this data is required.\n\n"
+                    "If the since parameter is set to the version of a previous response, the response has the delta "
+                    "flag set and contains only the downloads and the fields changed since that version, with "
+                    "the infohash of each changed download, and the infohashes of the removed downloads. "
+                    "If the changes since that version are not known, all the downloads are returned without "
+                    "the delta flag. The get_peers, get_pieces and get_files flags should be the same as in "
+                    "the previous request. "
     )
     async def get_downloads(self, request):
         params = request.query
         get_peers = params.get('get_peers', '0') == '1'
         get_pieces = params.get('get_pieces', '0') == '1'
         get_files = params.get('get_files', '0') == '1'
+        try:
+            since = int(params['since']) if 'since' in params else None
+        except ValueError:
+            return RESTResponse({"error": "since must be an integer"}, status=HTTP_BAD_REQUEST)
 
         checkpoints = {
             TOTAL: self.download_manager.checkpoints_count,
@@ -256,102 +322,178 @@ class DownloadsEndpoint(RESTEndpoint):
         if not self.download_manager.all_checkpoints_are_loaded:
             return RESTResponse({"downloads": [], "checkpoints": checkpoints})
 
+        # We still want to send channel downloads since they are displayed in the GUI
+        downloads = [download for download in self.download_manager.get_downloads()
+                     if not download.hidden or download.config.get_channel_download()]
+        await self.update_torrent_titles(downloads)
+
+        optional_fields = {"peers": get_peers, "pieces": get_pieces, "files": get_files}
+        snapshots = {}
+        for download in downloads:
+            infohash = download.get_def().get_infohash()
+            snapshot = self.download_snapshots.get(infohash)
+            if snapshot is None or snapshot.download is not download:
+                snapshot = DownloadSnapshot(download)
+            self.update_snapshot(snapshot, optional_fields)
+            snapshots[infohash] = snapshot
+
+        # The downloads that are gone since the last request
+        for infohash in self.download_snapshots.keys() - snapshots.keys():
+            self.removed_downloads[hexlify(infohash)] = Download.next_version()
+            self.torrent_titles.pop(infohash, None)
+        while len(self.removed_downloads) > MAX_REMOVED_DOWNLOADS:
+            _, self.removed_version = self.removed_downloads.popitem(last=False)
+        self.download_snapshots = snapshots
+
+        excluded = {name for name, requested in optional_fields.items() if not requested}
+        version = Download.last_version
+        if since is None or since < self.removed_version or since > version:
+            downloads_json = [snapshot.get_fields(excluded=excluded) for snapshot in snapshots.values()]
+            return RESTResponse({"downloads": downloads_json, "checkpoints": checkpoints, "version": version})
+
         downloads_json = []
-        downloads = self.download_manager.get_downloads()
+        for snapshot in snapshots.values():
+            fields = snapshot.get_fields(since=since, excluded=excluded)
+            if fields:
+                downloads_json.append({"infohash": snapshot.fields["infohash"], **fields})
+        removed = [infohash for infohash, removed_version in self.removed_downloads.items() if removed_version > since]
+        return RESTResponse({"downloads": downloads_json, "removed": removed, "checkpoints": checkpoints,
+                             "version": version, "delta": True})
+
+    async def update_torrent_titles(self, downloads):
+        """
+        Look up the titles of the torrents of the downloads in the database. The titles are cached, and looked up
+        again when the name of the torrent changes, e.g., when its metainfo is received. The torrents without
+        a title are looked up again after MISSING_TITLE_TTL seconds, as the title can be added to the database later.
+        """
+        if self.mds is None:
+            return
+        now = time.monotonic()
+        missing = {}
         for download in downloads:
-            if download.hidden and not download.config.get_channel_download():
-                # We still want to send channel downloads since they are displayed in the GUI
+            if download.config.get_channel_download():
                 continue
-            state = download.get_state()
             tdef = download.get_def()
+            cached = self.torrent_titles.get(tdef.get_infohash())
+            if cached is not None:
+                name, title, looked_up_at = cached
+                if name == tdef.get_name_utf8() and (title is not None or now - looked_up_at < MISSING_TITLE_TTL):
+                    continue
+            missing[tdef.get_infohash()] = tdef.get_name_utf8()
+        if not missing:
+            return
+        try:
+            titles = await self.mds.executor.run(self.mds.TorrentMetadata.get_torrent_titles, list(missing))
+        except DatabaseExecutorOverloaded as e:
+            # The titles are looked up on the next request
+            self._logger.warning(f"Can't look up the torrent titles: {e}")
+            return
+        for infohash, name in missing.items():
+            self.torrent_titles[infohash] = (name, titles.get(infohash), now)
+
+    def get_download_name(self, download):
+        tdef = download.get_def()
+        if download.config.get_channel_download():
+            return self.mds.ChannelMetadata.get_channel_name_cached(tdef.get_name_utf8(), tdef.get_infohash())
+        if self.mds is None:
+            return tdef.get_name_utf8()
+        _, title, _ = self.torrent_titles.get(tdef.get_infohash(), (None, None, None))
+        return title or tdef.get_name_utf8()
+
+    def update_snapshot(self, snapshot: DownloadSnapshot, optional_fields: Dict[str, bool]):
+        download = snapshot.download
+        if snapshot.version != download.version:
+            # The fields that change with the alerts and the state updates of the download
+            snapshot.version = download.version
+            snapshot.update(self.get_download_state_fields(download), version=download.version)
+            snapshot.stale.update(optional_fields)
+
+        # The fields that change without an alert are checked on every request
+        snapshot.update(self.get_download_settings_fields(download))
+
+        for name, requested in optional_fields.items():
+            if requested and name in snapshot.stale:
+                snapshot.stale.discard(name)
+                snapshot.update({name: self.get_download_optional_field(download, name)})
+
+    def get_download_state_fields(self, download) -> Dict[str, Any]:
+        state = download.get_state()
+        tdef = download.get_def()
+
+        # Create tracker information of the download
+        tracker_info = []
+        for url, url_info in download.get_tracker_status().items():
+            tracker_info.append({"url": url, "peers": url_info[0], "status": url_info[1]})
+
+        num_seeds, num_peers = state.get_num_seeds_peers()
+        num_connected_seeds, num_connected_peers = download.get_num_connected_seeds_peers()
+
+        fields = {
+            "progress": state.get_progress(),
+            "infohash": hexlify(tdef.get_infohash()),
+            "speed_down": state.get_current_payload_speed(DOWNLOAD),
+            "speed_up": state.get_current_payload_speed(UPLOAD),
+            "size": tdef.get_length(),
+            "eta": state.get_eta(),
+            "num_peers": num_peers,
+            "num_seeds": num_seeds,
+            "num_connected_peers": num_connected_peers,
+            "num_connected_seeds": num_connected_seeds,
+            "total_up": state.get_total_transferred(UPLOAD),
+            "total_down": state.get_total_transferred(DOWNLOAD),
+            "ratio": state.get_seeding_ratio(),
+            "trackers": tracker_info,
+            "availability": state.get_availability(),
+            "total_pieces": tdef.get_nr_pieces(),
+            "error": repr(state.get_error()) if state.get_error() else "",
+        }
+        if download.stream:
+            fields.update({
+                "vod_prebuffering_progress": download.stream.prebuffprogress,
+                "vod_prebuffering_progress_consec": download.stream.prebuffprogress_consec,
+                "vod_header_progress": download.stream.headerprogress,
+                "vod_footer_progress": download.stream.footerprogress,
+            })
+        return fields
+
+    def get_download_settings_fields(self, download) -> Dict[str, Any]:
+        download_status = get_extended_status(
+            self.tunnel_community, download) if self.tunnel_community else download.get_state().get_status()
+        return {
+            # The title of the torrent can be found in the database without an alert
+            "name": self.get_download_name(download),
+            "status": dlstatus_strings[download_status],
+            "hops": download.config.get_hops(),
+            "anon_download": download.get_anon_mode(),
+            "safe_seeding": download.config.get_safe_seeding(),
+            # Maximum upload/download rates are set for entire sessions
+            "max_upload_speed": DownloadManager.get_libtorrent_max_upload_rate(self.download_manager.config),
+            "max_download_speed": DownloadManager.get_libtorrent_max_download_rate(self.download_manager.config),
+            "destination": str(download.config.get_dest_dir()),
+            "vod_mode": download.stream and download.stream.enabled,
+            "time_added": download.config.get_time_added(),
+            "channel_download": download.config.get_channel_download()
+        }
 
-            # Create tracker information of the download
-            tracker_info = []
-            for url, url_info in download.get_tracker_status().items():
-                tracker_info.append({"url": url, "peers": url_info[0], "status": url_info[1]})
-
-            num_seeds, num_peers = state.get_num_seeds_peers()
-            num_connected_seeds, num_connected_peers = download.get_num_connected_seeds_peers()
-
-            if download.config.get_channel_download():
-                download_name = self.mds.ChannelMetadata.get_channel_name_cached(
-                    tdef.get_name_utf8(), tdef.get_infohash())
-            elif self.mds is None:
-                download_name = tdef.get_name_utf8()
-            else:
-                download_name = self.mds.TorrentMetadata.get_torrent_title(tdef.get_infohash()) or \
-                    tdef.get_name_utf8()
-
-            download_status = get_extended_status(
-                self.tunnel_community, download) if self.tunnel_community else download.get_state().get_status()
-
-            download_json = {
-                "name": download_name,
-                "progress": state.get_progress(),
-                "infohash": hexlify(tdef.get_infohash()),
-                "speed_down": state.get_current_payload_speed(DOWNLOAD),
-                "speed_up": state.get_current_payload_speed(UPLOAD),
-                "status": dlstatus_strings[download_status],
-                "size": tdef.get_length(),
-                "eta": state.get_eta(),
-                "num_peers": num_peers,
-                "num_seeds": num_seeds,
-                "num_connected_peers": num_connected_peers,
-                "num_connected_seeds": num_connected_seeds,
-                "total_up": state.get_total_transferred(UPLOAD),
-                "total_down": state.get_total_transferred(DOWNLOAD),
-                "ratio": state.get_seeding_ratio(),
-                "trackers": tracker_info,
-                "hops": download.config.get_hops(),
-                "anon_download": download.get_anon_mode(),
-                "safe_seeding": download.config.get_safe_seeding(),
-                # Maximum upload/download rates are set for entire sessions
-                "max_upload_speed": DownloadManager.get_libtorrent_max_upload_rate(self.download_manager.config),
-                "max_download_speed": DownloadManager.get_libtorrent_max_download_rate(self.download_manager.config),
-                "destination": str(download.config.get_dest_dir()),
-                "availability": state.get_availability(),
-                "total_pieces": tdef.get_nr_pieces(),
-                "vod_mode": download.stream and download.stream.enabled,
-                "error": repr(state.get_error()) if state.get_error() else "",
-                "time_added": download.config.get_time_added(),
-                "channel_download": download.config.get_channel_download()
-            }
-            if download.stream:
-                download_json.update({
-                    "vod_prebuffering_progress": download.stream.prebuffprogress,
-                    "vod_prebuffering_progress_consec": download.stream.prebuffprogress_consec,
-                    "vod_header_progress": download.stream.headerprogress,
-                    "vod_footer_progress": download.stream.footerprogress,
-
-                })
-
-            # Add peers information if requested
-            if get_peers:
-                peer_list = state.get_peerlist()
-                for peer_info in peer_list:  # Remove have field since it is very large to transmit.
-                    del peer_info['have']
-                    if 'extended_version' in peer_info:
-                        peer_info['extended_version'] = _safe_extended_peer_info(peer_info['extended_version'])
-                    # Does this peer represent a hidden services circuit?
-                    if peer_info.get('port') == CIRCUIT_ID_PORT and self.tunnel_community:
-                        tc = self.tunnel_community
-                        circuit_id = tc.ip_to_circuit_id(peer_info['ip'])
-                        circuit = tc.circuits.get(circuit_id, None)
-                        if circuit:
-                            peer_info['circuit'] = circuit_id
-
-                download_json["peers"] = peer_list
-
-            # Add piece information if requested
-            if get_pieces:
-                download_json["pieces"] = download.get_pieces_base64().decode('utf-8')
-
-            # Add files if requested
-            if get_files:
-                download_json["files"] = self.get_files_info_json(download)
-
-            downloads_json.append(download_json)
-        return RESTResponse({"downloads": downloads_json, "checkpoints": checkpoints})
+    def get_download_optional_field(self, download, name):
+        if name == "pieces":
+            return download.get_pieces_base64().decode('utf-8')
+        if name == "files":
+            return self.get_files_info_json(download)
+
+        peer_list = download.get_state().get_peerlist()
+        for peer_info in peer_list:  # Remove have field since it is very large to transmit.
+            del peer_info['have']
+            if 'extended_version' in peer_info:
+                peer_info['extended_version'] = _safe_extended_peer_info(peer_info['extended_version'])
+            # Does this peer represent a hidden services circuit?
+            if peer_info.get('port') == CIRCUIT_ID_PORT and self.tunnel_community:
+                tc = self.tunnel_community
+                circuit_id = tc.ip_to_circuit_id(peer_info['ip'])
+                circuit = tc.circuits.get(circuit_id, None)
+                if circuit:
+                    peer_info['circuit'] = circuit_id
+        return peer_list
 
     @docs(
         tags=["Libtorrent"],
@@ -26,7 +26,8 @@ class LibTorrentEndpoint(RESTEndpoint):
 
     def setup_routes(self):
         self.app.add_routes([web.get('/settings', self.get_libtorrent_settings),
-                             web.get('/session', self.get_libtorrent_session_info)])
+                             web.get('/session', self.get_libtorrent_session_info),
+                             web.get('/alerts', self.get_alert_statistics)])
 
     @docs(
         tags=["Libtorrent"],
@@ -102,3 +103,22 @@ class LibTorrentEndpoint(RESTEndpoint):
         self.download_manager.ltsessions[hop].post_session_stats()
         stats = await session_stats
         return RESTResponse({'hop': hop, 'session': stats})
+
+    @docs(
+        tags=["Libtorrent"],
+        summary="Return the statistics of the handled Libtorrent alerts.",
+        responses={
+            200: {
+                'description': 'Return the number of the queued alerts, and the number of the handled alerts, '
+                               'the delay before their handling and the handling time by the type of the alert. '
+                               'The DHT packets are counted by the result of their inspection for BEP33 scrapes',
+                "schema": schema(LibtorrentAlertsResponse={'queue_size': Integer,
+                                                           'alerts': schema(LibtorrentAlertStatistics={}),
+                                                           'dht_packets': schema(LibtorrentDHTPackets={})})
+            }
+        }
+    )
+    async def get_alert_statistics(self, request):
+        statistics = self.download_manager.alert_pump.get_statistics()
+        statistics['dht_packets'] = dict(self.download_manager.dht_packet_counters)
+        return RESTResponse(statistics)
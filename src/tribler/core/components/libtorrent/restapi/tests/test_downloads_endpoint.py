@@ -1,10 +1,11 @@
 import collections
 import os
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 import pytest
 from aiohttp.web_app import Application
 from ipv8.util import fail, succeed
+from pony.orm import db_session
 
 from tribler.core.components.libtorrent.download_manager.download_state import DownloadState
 from tribler.core.components.libtorrent.restapi.downloads_endpoint import DownloadsEndpoint, get_extended_status
@@ -167,8 +168,9 @@ async def test_get_downloads_no_downloads(mock_dlmgr, rest_api):
     mock_dlmgr.checkpoints_loaded = 0
     mock_dlmgr.all_checkpoints_are_loaded = True
 
-    expected_json = {"downloads": [], "checkpoints": {"total": 0, "loaded": 0, "all_loaded": True}}
-    await do_request(rest_api, "downloads?get_peers=1&get_pieces=1", expected_code=200, expected_json=expected_json)
+    response = await do_request(rest_api, "downloads?get_peers=1&get_pieces=1", expected_code=200)
+    assert response["downloads"] == []
+    assert response["checkpoints"] == {"total": 0, "loaded": 0, "all_loaded": True}
 
 
 async def test_get_downloads(mock_dlmgr, test_download, rest_api):
@@ -520,6 +522,9 @@ async def test_stream_download(mock_dlmgr, mock_handle, test_download, rest_api,
     stream.pieceshave = [1, 2]
     stream.updateprios = lambda: succeed(None)
     stream.cursorpiecemap = {}
+    stream.setcursor = lambda startbyte, paused, pieces: stream.cursorpiecemap.update({startbyte: [paused, pieces]})
+    stream.removecursor = stream.cursorpiecemap.pop
+    stream.haspiece = lambda _: True
     stream.get_byte_progress = lambda _: 1
     stream.read = lambda _: succeed('a' * 500)
     test_download.stream = stream
@@ -550,3 +555,92 @@ async def test_change_hops_fail(mock_dlmgr, test_download, rest_api):
     await do_request(rest_api, f'downloads/{test_download.infohash}', post_data={'anon_hops': 1},
                      expected_code=500, request_type='PATCH',
                      expected_json={'error': {'message': '', 'code': 'RuntimeError', 'handled': True}})
+
+
+async def test_get_downloads_delta(mock_dlmgr, test_download, mock_lt_status, rest_api):
+    """
+    Testing whether only the changed downloads and fields are returned since the version of a previous response
+    """
+    mock_dlmgr.get_downloads = lambda: [test_download]
+    test_download.get_state = lambda: DownloadState(test_download, mock_lt_status, None)
+
+    response = await do_request(rest_api, 'downloads', expected_code=200)
+    assert len(response["downloads"]) == 1
+    assert "delta" not in response
+    version = response["version"]
+
+    # Nothing has changed
+    response = await do_request(rest_api, f'downloads?since={version}', expected_code=200)
+    assert response["delta"]
+    assert response["downloads"] == []
+    assert response["removed"] == []
+    assert response["version"] == version
+
+    # The state of the download is updated
+    mock_lt_status.progress = 0.8
+    test_download.update_lt_status(mock_lt_status)
+    response = await do_request(rest_api, f'downloads?since={version}', expected_code=200)
+    delta = response["downloads"][0]
+    assert delta["infohash"] == test_download.infohash
+    assert delta["progress"] == 0.8
+    assert "name" not in delta
+    version = response["version"]
+
+    # The settings of the download are checked on every request
+    test_download.config.set_safe_seeding(not test_download.config.get_safe_seeding())
+    response = await do_request(rest_api, f'downloads?since={version}', expected_code=200)
+    assert response["downloads"] == [{"infohash": test_download.infohash,
+                                      "safe_seeding": test_download.config.get_safe_seeding()}]
+    version = response["version"]
+
+    mock_dlmgr.get_downloads = lambda: []
+    response = await do_request(rest_api, f'downloads?since={version}', expected_code=200)
+    assert response["downloads"] == []
+    assert response["removed"] == [test_download.infohash]
+
+
+async def test_get_downloads_unknown_version(mock_dlmgr, test_download, rest_api):
+    """
+    Testing whether all the downloads are returned if the changes since the given version are not known
+    """
+    mock_dlmgr.get_downloads = lambda: [test_download]
+    response = await do_request(rest_api, 'downloads', expected_code=200)
+    assert response["downloads"][0]["infohash"] == test_download.infohash
+
+    response = await do_request(rest_api, f'downloads?since={response["version"] + 1}', expected_code=200)
+    assert len(response["downloads"]) == 1
+    assert "delta" not in response
+
+    await do_request(rest_api, 'downloads?since=abc', expected_code=400)
+
+
+async def test_get_downloads_title(mock_dlmgr, test_download, metadata_store, rest_api):
+    """
+    Testing whether the title of the torrent in the database is returned as the name of the download
+    """
+    mock_dlmgr.get_downloads = lambda: [test_download]
+    with db_session:
+        metadata_store.TorrentMetadata(title='Torrent title', infohash=test_download.get_def().get_infohash())
+
+    response = await do_request(rest_api, 'downloads', expected_code=200)
+    assert response["downloads"][0]["name"] == 'Torrent title'
+
+
+async def test_get_downloads_title_added_later(mock_dlmgr, test_download, metadata_store, rest_api):
+    """
+    Testing whether the title added to the database after the first request is returned as the name of the download
+    """
+    mock_dlmgr.get_downloads = lambda: [test_download]
+    response = await do_request(rest_api, 'downloads', expected_code=200)
+    name = response["downloads"][0]["name"]
+    assert name != 'Torrent title'
+
+    with db_session:
+        metadata_store.TorrentMetadata(title='Torrent title', infohash=test_download.get_def().get_infohash())
+    response = await do_request(rest_api, 'downloads', expected_code=200)
+    assert response["downloads"][0]["name"] == name
+
+    # The missing title is looked up again when its cache entry expires
+    with patch('tribler.core.components.libtorrent.restapi.downloads_endpoint.MISSING_TITLE_TTL', 0):
+        response = await do_request(rest_api, 'downloads', expected_code=200)
+    assert response["downloads"][0]["name"] == 'Torrent title'
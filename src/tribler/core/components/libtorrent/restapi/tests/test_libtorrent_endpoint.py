@@ -99,3 +99,14 @@ async def test_get_stats_for_uninitialized_session(rest_api):
     response_dict = await do_request(rest_api, 'libtorrent/session?hop=%d' % hop, expected_code=200)
     assert response_dict['hop'] == hop
     assert response_dict['session'] == {}
+
+
+async def test_get_alert_statistics(rest_api, mock_dlmgr):
+    """
+    Tests getting the statistics of the handled alerts
+    """
+    statistics = {'queue_size': 0, 'alerts': {'state_update_alert': {'count': 1}}}
+    mock_dlmgr.alert_pump.get_statistics = lambda: dict(statistics)
+    mock_dlmgr.dht_packet_counters = {'inspected': 1, 'skipped_idle': 2, 'skipped_prefilter': 3}
+    response_dict = await do_request(rest_api, 'libtorrent/alerts', expected_code=200)
+    assert response_dict == {**statistics, 'dht_packets': mock_dlmgr.dht_packet_counters}
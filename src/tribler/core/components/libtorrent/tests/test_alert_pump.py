@@ -0,0 +1,164 @@
+import asyncio
+import socket
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tribler.core.components.libtorrent.download_manager.alert_pump import AlertPump
+
+
+class PolledSession:
+    """A session of the libtorrent bindings without `set_alert_fd`"""
+
+    def __init__(self):
+        self.alerts = []
+
+    def pop_alerts(self):
+        alerts, self.alerts = self.alerts, []
+        return alerts
+
+    def post(self, *alerts):
+        self.alerts.extend(alerts)
+
+
+class FakeSession(PolledSession):
+    def __init__(self):
+        super().__init__()
+        self.alert_fd = -1
+
+    def set_alert_fd(self, fd):
+        self.alert_fd = fd
+
+    def post(self, *alerts):
+        # Libtorrent writes to the alert socket from its own thread when the queue becomes non-empty
+        notify = not self.alerts
+        super().post(*alerts)
+        if notify and self.alert_fd != -1:
+            sock = socket.socket(fileno=self.alert_fd)
+            try:
+                sock.send(b'\0')
+            finally:
+                sock.detach()
+
+
+def create_alert(alert_type='state_update_alert'):
+    return type(alert_type, (object,), {})()
+
+
+@pytest.fixture
+def handler():
+    return MagicMock()
+
+
+@pytest.fixture
+def alert_pump(handler):
+    pump = AlertPump(handler)
+    yield pump
+    pump.stop()
+
+
+async def wait_for_alerts(handler, count):
+    for _ in range(100):
+        if handler.call_count >= count:
+            return
+        await asyncio.sleep(0.01)
+
+
+async def test_alerts_posted_before_start(alert_pump, handler):
+    session = FakeSession()
+    alert = create_alert()
+    session.alerts = [alert]
+    alert_pump.add_session(1, session)
+
+    alert_pump.start()
+    await asyncio.sleep(0)
+    handler.assert_called_once_with(alert, 1)
+
+
+async def test_alerts_on_notify(alert_pump, handler):
+    alert_pump.start()
+    session = FakeSession()
+    alert_pump.add_session(0, session)
+
+    alerts = [create_alert(), create_alert('add_torrent_alert')]
+    session.post(*alerts)
+    await wait_for_alerts(handler, 2)
+    assert [call.args for call in handler.call_args_list] == [(alerts[0], 0), (alerts[1], 0)]
+
+    statistics = alert_pump.get_statistics()
+    assert statistics['queue_size'] == 0
+    assert statistics['alerts']['state_update_alert']['count'] == 1
+    assert statistics['alerts']['add_torrent_alert']['count'] == 1
+
+
+async def test_time_budget(handler):
+    alert_pump = AlertPump(handler, time_budget=0)
+    session = FakeSession()
+    session.alerts = [create_alert() for _ in range(3)]
+    alert_pump.add_session(0, session)
+    alert_pump.start()
+
+    # A single alert is handled in a loop iteration
+    await asyncio.sleep(0)
+    assert handler.call_count == 1
+    assert alert_pump.queue_size == 2
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert handler.call_count == 3
+    alert_pump.stop()
+
+
+async def test_handler_error(alert_pump, handler):
+    loop = asyncio.get_running_loop()
+    loop.set_exception_handler(exception_handler := MagicMock())
+    handler.side_effect = [ValueError, None]
+    session = FakeSession()
+    session.alerts = [create_alert(), create_alert()]
+    alert_pump.add_session(0, session)
+    alert_pump.start()
+
+    # The error is reported by the loop, and the remaining alert is handled later
+    await asyncio.sleep(0)
+    loop.set_exception_handler(None)
+    assert isinstance(exception_handler.call_args[0][1]['exception'], ValueError)
+    await asyncio.sleep(0)
+    assert handler.call_count == 2
+    assert alert_pump.get_statistics()['alerts']['state_update_alert']['count'] == 2
+
+
+async def test_polled_session(alert_pump, handler):
+    alert_pump.start()
+    session = PolledSession()
+    with patch('tribler.core.components.libtorrent.download_manager.alert_pump.ALERT_POLL_INTERVAL', 0.01):
+        alert_pump.add_session(0, session)
+
+    alert = create_alert()
+    session.post(alert)
+    await wait_for_alerts(handler, 1)
+    handler.assert_called_once_with(alert, 0)
+
+
+async def test_loop_without_readers(alert_pump, handler):
+    alert_pump.start()
+    session = FakeSession()
+    with patch.object(asyncio.get_running_loop(), 'add_reader', side_effect=NotImplementedError), \
+            patch('tribler.core.components.libtorrent.download_manager.alert_pump.ALERT_POLL_INTERVAL', 0.01):
+        alert_pump.add_session(0, session)
+    assert session.alert_fd == -1
+
+    alert = create_alert()
+    session.post(alert)
+    await wait_for_alerts(handler, 1)
+    handler.assert_called_once_with(alert, 0)
+
+
+async def test_stop(alert_pump, handler):
+    alert_pump.start()
+    session = FakeSession()
+    alert_pump.add_session(0, session)
+    alert_pump.stop()
+    assert session.alert_fd == -1
+
+    session.post(create_alert())
+    await asyncio.sleep(0.01)
+    handler.assert_not_called()
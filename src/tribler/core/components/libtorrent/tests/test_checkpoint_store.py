@@ -0,0 +1,93 @@
+import shutil
+import sqlite3
+from unittest.mock import MagicMock
+
+import pytest
+
+from tribler.core.components.libtorrent.download_manager.checkpoint_store import CHECKPOINTS_DB_FILENAME, \
+    CheckpointStore
+from tribler.core.components.libtorrent.download_manager.download_config import DownloadConfig
+from tribler.core.tests.tools.common import TESTS_DATA_DIR
+
+INFOHASH = b'a' * 20
+
+
+@pytest.fixture
+def checkpoint_store(tmp_path):
+    store = CheckpointStore(tmp_path / CHECKPOINTS_DB_FILENAME)
+    yield store
+    store.close()
+
+
+def create_config(hops=0):
+    config = DownloadConfig()
+    config.set_hops(hops)
+    config.set_metainfo({b'infohash': INFOHASH, b'name': b'torrent'})
+    return config
+
+
+def test_put_and_flush(checkpoint_store, tmp_path):
+    checkpoint_store.put(INFOHASH, create_config(hops=2))
+    assert checkpoint_store.contains(INFOHASH)
+    assert checkpoint_store.get(INFOHASH).get_hops() == 2
+
+    assert checkpoint_store.flush() == 1
+    assert checkpoint_store.flush() == 0
+    checkpoint_store.close()
+
+    store = CheckpointStore(tmp_path / CHECKPOINTS_DB_FILENAME)
+    config = store.get(INFOHASH, state_dir=tmp_path)
+    assert config.get_hops() == 2
+    assert config.get_metainfo() == {b'infohash': INFOHASH, b'name': b'torrent'}
+    assert config.state_dir == tmp_path
+    store.close()
+
+
+def test_pending_changes_take_precedence(checkpoint_store):
+    checkpoint_store.put(INFOHASH, create_config(hops=1))
+    checkpoint_store.flush()
+
+    checkpoint_store.put(INFOHASH, create_config(hops=3))
+    assert checkpoint_store.get(INFOHASH).get_hops() == 3
+
+    checkpoint_store.remove(INFOHASH)
+    assert not checkpoint_store.contains(INFOHASH)
+    assert checkpoint_store.get(INFOHASH) is None
+    assert checkpoint_store.get_infohashes() == []
+
+    checkpoint_store.flush()
+    assert not checkpoint_store.contains(INFOHASH)
+
+
+def test_get_infohashes(checkpoint_store):
+    infohashes = [bytes([i]) * 20 for i in range(5)]
+    for infohash in infohashes[:3]:
+        checkpoint_store.put(infohash, create_config())
+    checkpoint_store.flush()
+    for infohash in infohashes[3:]:
+        checkpoint_store.put(infohash, create_config())
+    checkpoint_store.remove(infohashes[0])
+
+    assert checkpoint_store.get_infohashes() == infohashes[1:]
+    assert [infohash for infohash, _ in checkpoint_store.get_configs(infohashes)] == infohashes[1:]
+
+
+def test_flush_error_keeps_changes(checkpoint_store):
+    checkpoint_store.put(INFOHASH, create_config(hops=1))
+    checkpoint_store._connection = MagicMock(executemany=MagicMock(side_effect=sqlite3.OperationalError('locked')))
+    assert checkpoint_store.flush() == 0
+    checkpoint_store._connection = None
+
+    assert checkpoint_store.flush() == 1
+    assert checkpoint_store.get(INFOHASH).get_hops() == 1
+
+
+def test_migrate(checkpoint_store, tmp_path):
+    shutil.copy(TESTS_DATA_DIR / 'config_files/13a25451c761b1482d3e85432f07c4be05ca8a56.conf', tmp_path)
+    shutil.copy(TESTS_DATA_DIR / 'config_files/corrupt_session_config.conf', tmp_path)
+
+    assert checkpoint_store.migrate(tmp_path) == 1
+    assert checkpoint_store.get_infohashes() == [bytes.fromhex('13a25451c761b1482d3e85432f07c4be05ca8a56')]
+    # The corrupt file is left in place
+    assert [path.name for path in tmp_path.glob('*.conf')] == ['corrupt_session_config.conf']
+    assert checkpoint_store.migrate(tmp_path) == 0
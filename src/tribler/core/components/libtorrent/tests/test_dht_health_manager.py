@@ -5,6 +5,7 @@ from unittest.mock import Mock
 import pytest
 
 from tribler.core.components.libtorrent.download_manager.dht_health_manager import DHTHealthManager
+from tribler.core.components.libtorrent.utils.libtorrent_helper import libtorrent as lt
 
 
 # pylint: disable=redefined-outer-name
@@ -82,3 +83,29 @@ def test_receive_bloomfilters(dht_health_manager):
                                              bf_peers=bytearray(b'\xff' * 256))
     assert dht_health_manager.bf_seeders[infohash] == bytearray(b'\xee' * 256)
     assert dht_health_manager.bf_peers[infohash] == bytearray(b'\xff' * 256)
+
+
+async def test_packet_inspection():
+    """
+    Test whether the DHT log alerts are enabled only while there are lookups in progress
+    """
+    lt_session = Mock()
+    manager = DHTHealthManager(lt_session=lt_session, alert_mask=1)
+    assert not manager.is_active
+
+    lookup_future = manager.get_health(b'a' * 20, timeout=0.1)
+    assert manager.is_active
+    lt_session.set_alert_mask.assert_called_once_with(1 | lt.alert.category_t.dht_log_notification)
+
+    manager.get_health(b'b' * 20, timeout=0.1)
+    lt_session.set_alert_mask.assert_called_once()
+
+    manager.finalize_lookup(b'a' * 20)
+    await lookup_future
+    assert manager.is_active
+    lt_session.set_alert_mask.assert_called_once()
+
+    manager.finalize_lookup(b'b' * 20)
+    assert not manager.is_active
+    lt_session.set_alert_mask.assert_called_with(1)
+    await manager.shutdown_task_manager()
@@ -14,7 +14,6 @@ from tribler.core.components.reporter.exception_handler import NoCrashException
 from tribler.core.exceptions import SaveResumeDataError
 from tribler.core.tests.tools.base_test import MockObject
 from tribler.core.tests.tools.common import TESTS_DATA_DIR
-from tribler.core.utilities.unicode import hexlify
 from tribler.core.utilities.utilities import bdecode_compat
 
 
@@ -48,9 +47,7 @@ async def test_save_resume(mock_handle, test_download: Download, test_tdef):
 
     alert = Mock(resume_data={b'info-hash': test_tdef.get_infohash()})
     await test_download.save_resume_data()
-    basename = hexlify(test_tdef.get_infohash()) + '.conf'
-    filename = test_download.download_manager.get_checkpoint_dir() / basename
-    dcfg = DownloadConfig.load(str(filename))
+    dcfg = test_download.download_manager.checkpoint_store.get(test_tdef.get_infohash())
     assert test_tdef.get_infohash() == dcfg.get_engineresumedata().get(b'info-hash')
 
 
@@ -77,9 +74,7 @@ def test_move_storage(mock_handle, test_download, test_tdef, test_tdef_no_metain
 
 async def test_save_checkpoint(test_download, test_tdef):
     await test_download.checkpoint()
-    basename = hexlify(test_tdef.get_infohash()) + '.conf'
-    filename = Path(test_download.download_manager.get_checkpoint_dir() / basename)
-    assert filename.is_file()
+    assert test_download.download_manager.checkpoint_store.contains(test_tdef.get_infohash())
 
 
 def test_selected_files(mock_handle, test_download):
@@ -420,18 +415,6 @@ async def test_checkpoint_timeout(test_download):
     assert task.done()
 
 
-@patch.object(DownloadConfig, 'write', new_callable=MagicMock)
-@patch('tribler.core.components.libtorrent.download_manager.download.hexlify', Mock(return_value=''))
-def test_on_save_resume_data_alert_permission_denied(mocked_write: Mock, test_download):
-    """
-    Test that the `on_save_resume_data_alert` method doesn't raises an Exception in the case `DownloadConfig.write()`
-    raises a PermissionError
-    """
-    mocked_write.side_effect = PermissionError()
-    test_download.on_save_resume_data_alert(MagicMock())
-    assert mocked_write.called
-
-
 def test_get_tracker_status_unicode_decode_error(test_download: Download):
     """
     Sometimes a tracker entry raises UnicodeDecodeError while accessing it's values.
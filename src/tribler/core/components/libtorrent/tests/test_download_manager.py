@@ -1,14 +1,18 @@
 import asyncio
+import shutil
 from asyncio import Future, gather, get_event_loop, sleep
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import pytest
 from ipv8.util import succeed
 from libtorrent import bencode
 
+from tribler.core import notifications
+from tribler.core.components.libtorrent.download_manager.download_config import DownloadConfig
 from tribler.core.components.libtorrent.download_manager.download_manager import DownloadManager
 from tribler.core.components.libtorrent.settings import LibtorrentSettings
 from tribler.core.components.libtorrent.torrentdef import TorrentDef, TorrentDefNoMetainfo
+from tribler.core.components.libtorrent.utils.libtorrent_helper import libtorrent as lt
 from tribler.core.tests.tools.common import TESTS_DATA_DIR, TORRENT_UBUNTU_FILE
 from tribler.core.utilities.path_util import Path
 from tribler.core.utilities.simpledefs import DLSTATUS_SEEDING
@@ -323,16 +327,65 @@ def test_set_proxy_settings(fake_dlmgr):
     fake_dlmgr.set_proxy_settings(mock_lt_session, 0, ('a', "1234"), ('abc', 'def'))
 
 
-def test_payout_on_disconnect(fake_dlmgr):
+async def test_payout_on_disconnect(fake_dlmgr):
     """
     Test whether a payout is initialized when a peer disconnects
     """
-    disconnect_alert = type('peer_disconnected', (object,), dict(pid=MagicMock(to_bytes=lambda: b'a' * 20)))()
-    fake_dlmgr.payout_manager = MagicMock()
+    disconnect_alert = type('peer_disconnected_alert', (object,), dict(pid=MagicMock(to_bytes=lambda: b'a' * 20)))()
     fake_dlmgr.initialize()
-    fake_dlmgr.get_session(0).pop_alerts = lambda: [disconnect_alert]
-    fake_dlmgr._task_process_alerts()
-    fake_dlmgr.payout_manager.do_payout.is_called_with(b'a' * 20)
+    fake_dlmgr.alert_pump.add_session(0, MagicMock(pop_alerts=lambda: [disconnect_alert]))
+    await asyncio.sleep(0)
+    fake_dlmgr.notifier[notifications.peer_disconnected].assert_called_with(b'a' * 20)
+
+
+def create_dht_pkt_alert(packet, incoming):
+    direction = '<==' if incoming else '==>'
+    return type('dht_pkt_alert', (object,), dict(pkt_buf=bencode(packet), __str__=lambda _: f'{direction} packet'))()
+
+
+def test_dht_pkt_alert(fake_dlmgr):
+    """
+    Test whether only the DHT packets of the BEP33 scrapes are decoded, and only while there are lookups in progress
+    """
+    fake_dlmgr.dht_health_manager = MagicMock(is_active=False)
+    query = {b't': b'1', b'y': b'q', b'q': b'get_peers', b'a': {b'info_hash': b'a' * 20, b'scrape': 1}}
+    reply = {b't': b'1', b'y': b'r', b'r': {b'BFsd': b'\x01' * 256, b'BFpe': b'\x02' * 256}}
+    fake_dlmgr.process_alert(create_dht_pkt_alert(query, incoming=False))
+    assert fake_dlmgr.dht_packet_counters['skipped_idle'] == 1
+
+    fake_dlmgr.dht_health_manager.is_active = True
+    fake_dlmgr.process_alert(create_dht_pkt_alert({b't': b'2', b'y': b'q', b'q': b'ping'}, incoming=True))
+    assert fake_dlmgr.dht_packet_counters['skipped_prefilter'] == 1
+
+    fake_dlmgr.process_alert(create_dht_pkt_alert(query, incoming=False))
+    fake_dlmgr.dht_health_manager.requesting_bloomfilters.assert_called_once_with(b'1', b'a' * 20)
+
+    fake_dlmgr.process_alert(create_dht_pkt_alert(reply, incoming=True))
+    fake_dlmgr.dht_health_manager.received_bloomfilters.assert_called_once_with(
+        b'1', bytearray(b'\x01' * 256), bytearray(b'\x02' * 256))
+    assert fake_dlmgr.dht_packet_counters['inspected'] == 2
+    fake_dlmgr.dht_health_manager = None
+
+
+def test_set_piece_alerts(fake_dlmgr):
+    """
+    Test whether the piece finished alerts of a session are enabled only while its downloads are streamed
+    """
+    session = fake_dlmgr.ltsessions[1] = MagicMock()
+    piece_alerts = lt.alert.category_t.piece_progress_notification
+    fake_dlmgr.set_piece_alerts(1, b'a' * 20, True)
+    fake_dlmgr.set_piece_alerts(1, b'b' * 20, True)
+    session.set_alert_mask.assert_called_once_with(fake_dlmgr.default_alert_mask | piece_alerts)
+
+    # The DHT log alerts of the lookups in progress are kept
+    fake_dlmgr.dht_health_manager = MagicMock(lt_session=session, inspecting_packets=True)
+    fake_dlmgr.set_piece_alerts(1, b'a' * 20, False)
+    session.set_alert_mask.assert_called_once()
+    fake_dlmgr.set_piece_alerts(1, b'b' * 20, False)
+    session.set_alert_mask.assert_called_with(fake_dlmgr.default_alert_mask | lt.alert.category_t.dht_log_notification)
+    assert fake_dlmgr.dht_health_manager.alert_mask == fake_dlmgr.default_alert_mask
+    fake_dlmgr.dht_health_manager = None
+    fake_dlmgr.ltsessions.pop(1)
 
 
 def test_post_session_stats(fake_dlmgr):
@@ -347,77 +400,80 @@ def test_post_session_stats(fake_dlmgr):
     mock_lt_session.post_session_stats.assert_called_once()
 
 
-def test_load_checkpoint(fake_dlmgr):
-    good = []
+def copy_checkpoint_file(dlmgr, source, infohash=b'a' * 20):
+    checkpoint_dir = dlmgr.get_checkpoint_dir()
+    checkpoint_dir.mkdir(exist_ok=True)
+    shutil.copy(source, checkpoint_dir / f'{hexlify(infohash)}.conf')
 
-    def mock_start_download(*_, **__):
-        good.append(1)
-    fake_dlmgr.start_download = mock_start_download
 
-    # Try opening real state file
-    state = TESTS_DATA_DIR / "config_files/13a25451c761b1482d3e85432f07c4be05ca8a56.conf"
-    fake_dlmgr.load_checkpoint(state)
-    assert good
+async def test_load_checkpoint(fake_dlmgr):
+    fake_dlmgr.start_download = MagicMock()
+
+    # The checkpoint file is migrated into the store, and the download is started
+    copy_checkpoint_file(fake_dlmgr, TESTS_DATA_DIR / "config_files/13a25451c761b1482d3e85432f07c4be05ca8a56.conf")
+    await fake_dlmgr.load_checkpoints()
+    fake_dlmgr.start_download.assert_called_once()
+    assert not list(fake_dlmgr.get_checkpoint_dir().glob('*.conf'))
+    assert fake_dlmgr.checkpoint_store.contains(b'a' * 20)
 
-    # Try opening nonexistent file
-    good = []
-    fake_dlmgr.load_checkpoint("nonexistent_file")
-    assert not good
 
-    # Try opening corrupt file
-    config_file_path = TESTS_DATA_DIR / "config_files/corrupt_session_config.conf"
-    fake_dlmgr.load_checkpoint(config_file_path)
-    assert not good
+async def test_load_corrupt_checkpoint(fake_dlmgr):
+    fake_dlmgr.start_download = MagicMock()
+
+    # The corrupt file is not migrated
+    copy_checkpoint_file(fake_dlmgr, TESTS_DATA_DIR / "config_files/corrupt_session_config.conf")
+    await fake_dlmgr.load_checkpoints()
+    fake_dlmgr.start_download.assert_not_called()
+    assert fake_dlmgr.checkpoints_count == 0
+    assert len(list(fake_dlmgr.get_checkpoint_dir().glob('*.conf'))) == 1
 
 
 @pytest.mark.asyncio
 async def test_download_manager_start(fake_dlmgr):
     fake_dlmgr.start()
-    await asyncio.sleep(0.01)
+    # The checkpoints are read by a worker thread
+    await fake_dlmgr.wait_for_tasks()
     assert fake_dlmgr.all_checkpoints_are_loaded
 
 
-def test_load_empty_checkpoint(fake_dlmgr, tmpdir):
+async def test_load_empty_checkpoint(fake_dlmgr):
     """
-    Test whether download resumes with faulty pstate file.
+    Test whether download resumes with a checkpoint without metainfo.
     """
-    fake_dlmgr.get_downloads_pstate_dir = lambda: tmpdir
     fake_dlmgr.start_download = MagicMock()
+    fake_dlmgr.checkpoint_store.put(b'a' * 20, DownloadConfig())
 
-    # Empty pstate file
-    pstate_filename = fake_dlmgr.get_downloads_pstate_dir() / 'abcd.state'
-    with open(pstate_filename, 'wb') as state_file:
-        state_file.write(b"")
-
-    fake_dlmgr.load_checkpoint(pstate_filename)
+    await fake_dlmgr.load_checkpoints()
     fake_dlmgr.start_download.assert_not_called()
 
 
-async def test_load_checkpoints(fake_dlmgr, tmpdir):
+async def test_load_checkpoints(fake_dlmgr):
     """
     Test whether we are resuming downloads after loading checkpoints
     """
-    def mocked_load_checkpoint(filename):
-        assert str(filename).endswith('abcd.conf')
-        mocked_load_checkpoint.called = True
-
-    mocked_load_checkpoint.called = False
-    fake_dlmgr.get_checkpoint_dir = lambda: Path(tmpdir)
-
-    with open(fake_dlmgr.get_checkpoint_dir() / 'abcd.conf', 'wb') as state_file:
-        state_file.write(b"hi")
+    fake_dlmgr.start_download = MagicMock()
+    tdef = TorrentDef.load(TORRENT_UBUNTU_FILE)
+    for i in range(3):
+        config = DownloadConfig(state_dir=fake_dlmgr.state_dir)
+        config.set_metainfo({'infohash': bytes([i]) * 20, 'name': f'torrent {i}', 'url': None})
+        fake_dlmgr.checkpoint_store.put(bytes([i]) * 20, config)
+    config = DownloadConfig(state_dir=fake_dlmgr.state_dir)
+    config.set_metainfo(tdef.get_metainfo())
+    fake_dlmgr.checkpoint_store.put(tdef.get_infohash(), config)
 
-    fake_dlmgr.load_checkpoint = mocked_load_checkpoint
     assert fake_dlmgr.all_checkpoints_are_loaded is False
     assert fake_dlmgr.checkpoints_count is None
     assert fake_dlmgr.checkpoints_loaded == 0
 
-    await fake_dlmgr.load_checkpoints()
+    with patch('tribler.core.components.libtorrent.download_manager.download_manager.CHECKPOINTS_BATCH_SIZE', 2):
+        await fake_dlmgr.load_checkpoints()
 
-    assert mocked_load_checkpoint.called
+    assert fake_dlmgr.start_download.call_count == 4
+    started = {call.kwargs['tdef'].get_infohash() for call in fake_dlmgr.start_download.call_args_list}
+    assert started == {bytes([i]) * 20 for i in range(3)} | {tdef.get_infohash()}
     assert fake_dlmgr.all_checkpoints_are_loaded is True
-    assert fake_dlmgr.checkpoints_count == 1
-    assert fake_dlmgr.checkpoints_loaded == 1
+    assert fake_dlmgr.checkpoints_count == 4
+    assert fake_dlmgr.checkpoints_loaded == 4
 
 
 async def test_readd_download_safe_seeding(fake_dlmgr):
@@ -0,0 +1,212 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from tribler.core.components.libtorrent.download_manager.stream import DEADLINE_PRIO_MAP, MIN_PIECE_PRIO, \
+    PIECE_WAIT_TIME, Stream, StreamChunk
+from tribler.core.components.libtorrent.utils.libtorrent_helper import libtorrent as lt
+from tribler.core.utilities.simpledefs import DLSTATUS_DOWNLOADING
+
+PIECE_LENGTH = 2 ** 20
+PIECES = 200
+
+
+class FakeDownload:
+    """
+    A download of a single file torrent with the piece prios and deadlines kept in memory
+    """
+
+    def __init__(self, destination):
+        self.info = lt.torrent_info({b'info': {b'name': b'video.mkv', b'piece length': PIECE_LENGTH,
+                                               b'length': PIECE_LENGTH * PIECES, b'pieces': b'\x00' * 20 * PIECES}})
+        self.handle = Mock(torrent_file=lambda: self.info)
+        self.destination = destination
+        self.pieces_have = [False] * PIECES
+        self.piece_prios = [4] * PIECES
+        self.piece_deadlines = {}
+        self.pushed_prios = []
+        self.piece_alerts = False
+
+        tdef = Mock()
+        tdef.get_metainfo = lambda: {b'info': {}}
+        tdef.get_piece_length = lambda: PIECE_LENGTH
+        tdef.get_files_with_length = lambda: [('video.mkv', PIECE_LENGTH * PIECES)]
+        tdef.get_infohash = lambda: b'\x01' * 20
+        self.get_def = lambda: tdef
+
+        state = Mock()
+        state.get_status = lambda: DLSTATUS_DOWNLOADING
+        state.get_pieces_complete = lambda: self.pieces_have
+        self.get_state = lambda: state
+
+    async def get_handle(self):
+        return self.handle
+
+    def get_content_dest(self):
+        return self.destination
+
+    def get_piece_priorities(self):
+        return list(self.piece_prios)
+
+    def set_piece_priorities(self, piece_priorities):
+        self.pushed_prios.append(piece_priorities)
+        if piece_priorities and isinstance(piece_priorities[0], tuple):
+            for piece, prio in piece_priorities:
+                self.piece_prios[piece] = prio
+        else:
+            self.piece_prios[:len(piece_priorities)] = piece_priorities
+
+    def get_file_priorities(self):
+        return [4]
+
+    def set_selected_files(self, *_, **__):
+        pass
+
+    def set_piece_deadline(self, piece, deadline, _flags=0):
+        self.piece_deadlines[piece] = deadline
+
+    def reset_piece_deadline(self, piece):
+        self.piece_deadlines.pop(piece, None)
+
+    def resume(self):
+        pass
+
+    def set_piece_alerts(self, enabled):
+        self.piece_alerts = enabled
+
+
+@pytest.fixture
+def download(tmp_path):
+    destination = tmp_path / 'video.mkv'
+    destination.write_bytes(b'\x00' * PIECE_LENGTH * PIECES)
+    return FakeDownload(destination)
+
+
+@pytest.fixture
+async def stream(download):
+    stream = Stream(download)
+    await stream.enable(0)
+    yield stream
+    stream.close()
+
+
+def finish_static_buffering(stream, download):
+    for piece in stream.staticpieces:
+        download.pieces_have[piece] = True
+
+
+async def test_updateprios_static_buffering(stream, download):
+    """
+    Test that only the static buffer pieces are downloaded until they are all finished
+    """
+    await stream.updateprios()
+
+    for piece in range(PIECES):
+        if piece in stream.headerpieces or piece in stream.footerpieces:
+            assert download.piece_prios[piece] == 7
+        else:
+            assert download.piece_prios[piece] == 0
+
+
+async def test_updateprios_dynamic_buffering(stream, download):
+    """
+    Test that the pieces in the buffer of a chunk get the prios of their deadlines, and the rest of the pieces
+    get the min prio once the static buffering is finished
+    """
+    finish_static_buffering(stream, download)
+    chunk = StreamChunk(stream, 0)
+    pieces = await chunk.seek(50 * PIECE_LENGTH)
+
+    assert pieces[0] == 50
+    for deadline, piece in enumerate(pieces[:len(DEADLINE_PRIO_MAP)]):
+        assert download.piece_prios[piece] == DEADLINE_PRIO_MAP[deadline]
+        assert download.piece_deadlines.get(piece, deadline * 10) == deadline * 10
+    assert download.piece_prios[49] == MIN_PIECE_PRIO
+    assert download.piece_prios[pieces[-1] + 1] == MIN_PIECE_PRIO
+
+
+async def test_updateprios_pushes_changes(stream, download):
+    """
+    Test that moving a chunk by a piece only pushes the prios of the pieces that changed
+    """
+    finish_static_buffering(stream, download)
+    chunk = StreamChunk(stream, 0)
+    await chunk.seek(50 * PIECE_LENGTH)
+    download.pushed_prios.clear()
+
+    download.pieces_have[50] = True
+    stream.piecefinished(50)
+    await chunk.seek(51 * PIECE_LENGTH)
+
+    assert len(download.pushed_prios) == 1
+    assert len(download.pushed_prios[0]) < len(DEADLINE_PRIO_MAP)
+    assert all(isinstance(change, tuple) for change in download.pushed_prios[0])
+
+
+async def test_updateprios_incremental_matches_full(stream, download):
+    """
+    Test that the prios after moving, pausing and closing chunks are the same as the prios of a full update
+    """
+    finish_static_buffering(stream, download)
+    chunk1 = StreamChunk(stream, 0)
+    chunk2 = StreamChunk(stream, 100 * PIECE_LENGTH)
+    await chunk1.seek(20 * PIECE_LENGTH)
+    await chunk2.seek(110 * PIECE_LENGTH)
+    await chunk1.seek(105 * PIECE_LENGTH)
+    chunk2.pause(force=True)
+    await stream.updateprios()
+    chunk1.close()
+    await chunk2.seek(120 * PIECE_LENGTH)
+    chunk2.resume(force=True)
+    await stream.updateprios()
+    download.pushed_prios.clear()
+
+    stream.fullupdate = True
+    await stream.updateprios()
+
+    assert not download.pushed_prios
+
+
+async def test_haspiece(stream, download):
+    """
+    Test that the finished pieces are known before the status of the download is updated
+    """
+    assert not stream.haspiece(5)
+    stream.piecefinished(5)
+    assert stream.haspiece(5)
+
+    download.pieces_have[6] = True
+    assert stream.haspiece(6)
+    assert not stream.haspiece(PIECES)
+
+
+async def test_read_waits_for_piece(stream, download):
+    """
+    Test that a chunk reads a piece as soon as the piece is finished
+    """
+    finish_static_buffering(stream, download)
+    async with StreamChunk(stream, 50 * PIECE_LENGTH) as chunk:
+        read = asyncio.ensure_future(chunk.read())
+        await asyncio.sleep(0.1)
+        assert not read.done()
+
+        stream.piecefinished(50)
+        data = await asyncio.wait_for(read, PIECE_WAIT_TIME / 2)
+    assert len(data) == PIECE_LENGTH
+
+
+async def test_disable_wakes_up_waiting_chunks(stream):
+    """
+    Test that the futures waiting for pieces are resolved when the stream is disabled
+    """
+    future = stream.waitforpiece(5)
+    stream.disable()
+    assert future.result() is False
+    assert not stream.piecefutures
+
+
+async def test_piece_alerts_while_streaming(stream, download):
+    assert download.piece_alerts
+    stream.disable()
+    assert not download.piece_alerts
@@ -0,0 +1,83 @@
+"""
+Streaming reading of the metadata blobs.
+
+A blob file is read through mmap in chunks of READ_CHUNK_SIZE bytes, the LZ4 frame is decompressed incrementally,
+and the payloads are parsed as soon as their bytes are available. So only a few chunks of a blob are kept in memory
+at any moment, instead of the whole compressed blob, the whole decompressed blob and the list of all its payloads.
+"""
+import mmap
+import os
+import struct
+from typing import Iterable, Iterator, Tuple
+
+from lz4.frame import LZ4FrameDecompressor
+
+from tribler.core.components.metadata_store.db.serialization import (
+    SIGNATURE_SIZE,
+    SignedPayload,
+    UnknownBlobTypeException,
+    read_payload_with_offset,
+)
+
+READ_CHUNK_SIZE = 1024 * 1024  # bytes of the blob file read at once
+DECOMPRESSED_CHUNK_SIZE = 1024 * 1024  # bytes of the decompressed data produced at once
+
+# A payload and the signed part of its serialized data
+SignedPayloadData = Tuple[SignedPayload, bytes]
+
+
+def read_file_chunks(path: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return  # Empty files can not be mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for start in range(0, len(mapped), chunk_size):
+                yield mapped[start:start + chunk_size]
+
+
+def decompress_chunks(chunks: Iterable[bytes], max_length: int = DECOMPRESSED_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Decompress a single LZ4 frame. The data after the end of the frame is ignored.
+    :raises RuntimeError: if the data is not a valid LZ4 frame
+    """
+    with LZ4FrameDecompressor() as decompressor:
+        for chunk in chunks:
+            data = chunk
+            while True:
+                decompressed = decompressor.decompress(data, max_length=max_length)
+                data = b''
+                if decompressed:
+                    yield decompressed
+                if decompressor.eof:
+                    return
+                if decompressor.needs_input:
+                    break
+
+
+def iter_signed_payloads(chunks: Iterable[bytes]) -> Iterator[SignedPayloadData]:
+    """
+    Parse the concatenated payloads split into chunks at arbitrary positions. The signatures are not checked.
+    """
+    buffer = b''
+    offset = 0
+    chunks = iter(chunks)
+    chunk = next(chunks, None)
+    while chunk is not None:
+        buffer = buffer[offset:] + chunk
+        offset = 0
+        chunk = next(chunks, None)
+        is_last = chunk is None
+
+        while offset < len(buffer):
+            try:
+                payload, end = read_payload_with_offset(buffer, offset, check_signature=False)
+            except UnknownBlobTypeException:
+                raise
+            except (struct.error, ValueError, IndexError):
+                if is_last:
+                    raise
+                break  # The payload continues in the next chunk
+            if end > len(buffer) and not is_last:
+                break
+            yield payload, buffer[offset:end - SIGNATURE_SIZE]
+            offset = end
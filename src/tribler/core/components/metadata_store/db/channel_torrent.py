@@ -0,0 +1,228 @@
+"""
+Incremental creation of the channel torrents.
+
+The channel directories are append-only: a commit only adds new blob files, which names follow the names of the
+existing ones. The channel torrents are hybrid (BitTorrent v1 and v2) torrents, so each file is padded to the piece
+boundary, and both the v1 piece hashes and the v2 merkle tree of a file only depend on the file itself and the piece
+length. So when the piece length stays the same, the hashes of the files of the previous channel torrent are reused,
+and only the new files are hashed, in a thread pool.
+
+The libtorrent Python bindings can not set the v2 hashes of a torrent that is being created, so the torrent
+dictionary is assembled here. The file layout (the order of the files and the padding) and the piece length are still
+determined by libtorrent, and the result is the same as the one of `lt.set_piece_hashes`. If the directory contains
+anything that is not a regular, non-empty file, `create_channel_torrent` returns None, and the torrent should be
+created by libtorrent.
+"""
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tribler.core.components.libtorrent.utils.libtorrent_helper import libtorrent as lt
+from tribler.core.utilities.path_util import Path
+
+V2_BLOCK_SIZE = 16 * 1024
+SHA1_SIZE = 20
+SHA256_SIZE = 32
+HASHING_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FileHashes:
+    length: int
+    pieces: bytes  # the v1 hashes of the pieces of the file, the last piece is padded with zeros (see hash_file)
+    pieces_root: bytes  # the v2 merkle root of the file
+    piece_layer: bytes  # the v2 hashes of the pieces of the file, empty if the file fits into a single piece
+
+
+def merkle_root(hashes: List[bytes], num_leaves: int, pad_hash: bytes = bytes(SHA256_SIZE)) -> bytes:
+    """
+    Get the root of the merkle tree of `num_leaves` leaves (a power of two). The missing leaves are `pad_hash`.
+    """
+    layer = hashes + [pad_hash] * (num_leaves - len(hashes))
+    while len(layer) > 1:
+        layer = [hashlib.sha256(layer[i] + layer[i + 1]).digest() for i in range(0, len(layer), 2)]
+    return layer[0]
+
+
+def next_power_of_two(n: int) -> int:
+    return 1 << (n - 1).bit_length()
+
+
+def read_pieces(path: Path, piece_length: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        while piece := f.read(piece_length):
+            yield piece
+
+
+def hash_file(path: Path, piece_length: int) -> FileHashes:
+    """
+    Hash a file the way libtorrent does it for a hybrid torrent (BEP 3 and BEP 52).
+    """
+    blocks_per_piece = piece_length // V2_BLOCK_SIZE
+    v1_hashes = []
+    block_hashes = []
+    length = 0
+    for piece in read_pieces(path, piece_length):
+        length += len(piece)
+        v1_hashes.append(hashlib.sha1(piece + bytes(piece_length - len(piece))).digest())
+        block_hashes.extend(hashlib.sha256(piece[offset:offset + V2_BLOCK_SIZE]).digest()
+                            for offset in range(0, len(piece), V2_BLOCK_SIZE))
+
+    if len(block_hashes) <= blocks_per_piece:
+        # A file that fits into a single piece has no piece layer
+        return FileHashes(length, b''.join(v1_hashes), merkle_root(block_hashes, next_power_of_two(len(block_hashes))),
+                          b'')
+
+    piece_hashes = [merkle_root(block_hashes[start:start + blocks_per_piece], blocks_per_piece)
+                    for start in range(0, len(block_hashes), blocks_per_piece)]
+    pad_piece_hash = merkle_root([], blocks_per_piece)
+    pieces_root = merkle_root(piece_hashes, next_power_of_two(len(piece_hashes)), pad_hash=pad_piece_hash)
+    return FileHashes(length, b''.join(v1_hashes), pieces_root, b''.join(piece_hashes))
+
+
+def hash_unpadded_last_piece(path: Path, length: int, piece_length: int) -> bytes:
+    """
+    Get the v1 hash of the last piece of a file that is not followed by a pad file, that is, of the last file
+    of a single file torrent.
+    """
+    with open(path, 'rb') as f:
+        f.seek(length - length % piece_length)
+        return hashlib.sha1(f.read()).digest()
+
+
+def get_torrent_file_hashes(torrent: dict) -> Tuple[int, Dict[bytes, FileHashes]]:
+    """
+    Get the hashes of the files of a channel torrent created by `create_channel_torrent` or by libtorrent.
+    :return: the piece length and the hashes of the files by their names
+    """
+    info = torrent[b'info']
+    piece_length = info[b'piece length']
+    pieces = info[b'pieces']
+    file_tree = info[b'file tree']
+    piece_layers = torrent.get(b'piece layers', {})
+
+    files = info[b'files']
+    result = {}
+    offset = 0
+    for index, file in enumerate(files):
+        first_piece = offset // piece_length
+        offset += file[b'length']
+        if file.get(b'attr') == b'p':
+            continue
+        if offset % piece_length and (index + 1 == len(files) or files[index + 1].get(b'attr') != b'p'):
+            # The last piece of a file that is not followed by a pad file is hashed without the padding
+            continue
+        name, = file[b'path']
+        pieces_root = file_tree[name][b''][b'pieces root']
+        last_piece = (offset + piece_length - 1) // piece_length
+        result[name] = FileHashes(file[b'length'], pieces[first_piece * SHA1_SIZE: last_piece * SHA1_SIZE],
+                                  pieces_root, piece_layers.get(pieces_root, b''))
+    return piece_length, result
+
+
+def get_previous_file_hashes(directory: Path, torrent_path: Path, piece_length: int) -> Dict[bytes, FileHashes]:
+    """
+    Get the hashes of the files of the previous channel torrent, if they can be reused with the given piece length.
+    Only the files that were not modified after the torrent was written are reused.
+    """
+    try:
+        piece_length_before, file_hashes = get_torrent_file_hashes(lt.bdecode(torrent_path.read_bytes()))
+    except FileNotFoundError:
+        return {}
+    except Exception as e:  # pylint: disable=broad-except
+        logger.warning(f'Can not reuse the hashes of {torrent_path}: {e.__class__.__name__}: {e}')
+        return {}
+    if piece_length_before != piece_length:
+        return {}
+    written_at = torrent_path.stat().st_mtime_ns
+    result = {}
+    for name, hashes in file_hashes.items():
+        path = directory / name.decode()
+        if path.exists() and path.stat().st_mtime_ns <= written_at:
+            result[name] = hashes
+    return result
+
+
+def create_channel_torrent(directory: Path, previous_torrent_path: Optional[Path] = None,
+                           max_workers: int = HASHING_WORKERS) -> Optional[dict]:
+    """
+    Create the torrent of the channel directory, reusing the hashes of the files of the previous torrent.
+    :param directory: the channel directory
+    :param previous_torrent_path: the path of the previous channel torrent
+    :param max_workers: the number of the threads that hash the new files
+    :return: the torrent dictionary, or None if the directory can not be hashed incrementally
+    """
+    fs = lt.file_storage()
+    lt.add_files(fs, str(directory))
+    creator = lt.create_torrent(fs)
+    files = creator.files()
+    piece_length = creator.piece_length()
+
+    name = directory.name
+    layout = []  # the names and the lengths of the files, and whether they are pad files
+    for index in range(files.num_files()):
+        is_pad = bool(files.file_flags(index) & lt.file_storage.flag_pad_file)
+        if files.file_flags(index) & ~lt.file_storage.flag_pad_file:
+            return None
+        path = Path(files.file_path(index)).parts
+        if is_pad:
+            layout.append((path[1:], files.file_size(index), True))
+            continue
+        if len(path) != 2 or path[0] != name or not files.file_size(index) \
+                or files.file_offset(index) % piece_length:
+            return None
+        layout.append((path[1:], files.file_size(index), False))
+
+    previous_hashes = {}
+    if previous_torrent_path is not None:
+        previous_hashes = get_previous_file_hashes(directory, previous_torrent_path, piece_length)
+    file_hashes = {}
+    for path, length, is_pad in layout:
+        hashes = previous_hashes.get(path[0].encode())
+        if not is_pad and hashes is not None and hashes.length == length:
+            file_hashes[path[0]] = hashes
+    reused = len(file_hashes)
+
+    new_files = [path[0] for path, _, is_pad in layout if not is_pad and path[0] not in file_hashes]
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ChannelTorrentHashing') as executor:
+        file_hashes.update(zip(new_files, executor.map(lambda n: hash_file(directory / n, piece_length), new_files)))
+    logger.info(f'Channel torrent {name}: {reused} files reused, {len(new_files)} files hashed')
+
+    v1_files = []
+    file_tree = {}
+    pieces = []
+    piece_layers = {}
+    for index, (path, length, is_pad) in enumerate(layout):
+        encoded_path = [part.encode() for part in path]
+        if is_pad:
+            v1_files.append({b'attr': b'p', b'length': length, b'path': encoded_path})
+            continue
+        hashes = file_hashes[path[0]]
+        if hashes.length != length:
+            raise RuntimeError(f'The file {path[0]} was modified during the hashing')
+        v1_files.append({b'length': length, b'path': encoded_path})
+        file_tree[encoded_path[0]] = {b'': {b'length': length, b'pieces root': hashes.pieces_root}}
+        pieces.append(hashes.pieces)
+        if length % piece_length and (index + 1 == len(layout) or not layout[index + 1][2]):
+            pieces[-1] = pieces[-1][:-SHA1_SIZE] + hash_unpadded_last_piece(directory / path[0], length, piece_length)
+        if hashes.piece_layer:
+            piece_layers[hashes.pieces_root] = hashes.piece_layer
+
+    torrent = {
+        b'creation date': int(time.time()),
+        b'info': {
+            b'file tree': file_tree,
+            b'files': v1_files,
+            b'meta version': 2,
+            b'name': name.encode(),
+            b'piece length': piece_length,
+            b'pieces': b''.join(pieces),
+        },
+        b'piece layers': piece_layers,
+    }
+    return torrent
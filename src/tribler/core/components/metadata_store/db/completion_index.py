@@ -0,0 +1,255 @@
+"""
+The index of the words of the titles for the search auto-completion.
+
+The index keeps the weights of the words and the word pairs (bigrams) of the titles in the `CompletionTerm` table.
+A weight is the number of the titles that contain the word or the word pair. The words of a title are its
+lowercase `\\w+` tokens, so the suggestions are not stemmed, unlike the terms of the `FtsIndex`. A word pair also
+keeps the text that separates the words in the title, and the last word of a title is paired with END, so the
+suggestions keep the punctuation of the titles.
+
+The FTS triggers of the ChannelNode table add the inserted, deleted and renamed titles to the `CompletionQueue`
+table, and `CompletionIndex.update` applies the queued titles to the index in bounded batches. The index is never
+rebuilt in full. The entries that existed before the index was created (by the upgrade of an existing database)
+are not queued: they are added once by a backfill, which scans the ChannelNode table in the rowid order up to
+the `backfill_rowid` of the `CompletionState` table, and stores the last scanned rowid there. The triggers skip
+only the entries that the backfill has not reached yet. Until the backfill is complete, the suggestions are made
+from the titles matched by the FTS index instead.
+
+The suggestions are looked up by a range scan over the primary key of the `CompletionTerm` table, so the lookup
+does not depend on the number of the titles in the database.
+"""
+import logging
+import re
+from collections import Counter
+from typing import Iterable, List, Optional, Set, Tuple
+
+from pony.orm import db_session
+
+# These tables should never be used from ORM directly.
+# They are created by raw SQL, and the queue is filled by the FTS triggers.
+sql_create_completion_queue_table = """
+    CREATE TABLE IF NOT EXISTS CompletionQueue (
+        title TEXT NOT NULL,
+        delta INTEGER NOT NULL
+    );"""
+
+sql_create_completion_term_table = """
+    CREATE TABLE IF NOT EXISTS CompletionTerm (
+        prev TEXT NOT NULL,
+        term TEXT NOT NULL,
+        sep TEXT NOT NULL,
+        weight INTEGER NOT NULL,
+        PRIMARY KEY (prev, term, sep)
+    ) WITHOUT ROWID;"""
+
+sql_create_completion_state_table = """
+    CREATE TABLE IF NOT EXISTS CompletionState (
+        indexed_rowid INTEGER NOT NULL,
+        backfill_rowid INTEGER NOT NULL
+    );"""
+
+# The entries that exist when the index is created are backfilled
+sql_init_completion_state = """
+    INSERT INTO CompletionState(indexed_rowid, backfill_rowid)
+    SELECT 0, coalesce((SELECT max(rowid) FROM ChannelNode), 0)
+    WHERE NOT EXISTS (SELECT 1 FROM CompletionState);"""
+
+# The condition of the triggers for the entries that are indexed by the triggers, and not by the backfill
+sql_completion_queued_rowid = """
+    NOT EXISTS (SELECT 1 FROM CompletionState WHERE {rowid} > indexed_rowid AND {rowid} <= backfill_rowid)"""
+
+COMPLETION_UPDATE_BATCH_SIZE = 1000  # The number of the titles applied to the index in a single transaction
+COMPLETION_SCAN_LIMIT = 2000  # The number of the matching terms considered for the suggestions
+MAX_TERM_LENGTH = 64  # Longer words (hashes, garbled titles) are not indexed
+MAX_SEPARATOR_LENGTH = 4  # Longer separators of the words are replaced with a space
+
+# The word that precedes the first word of a title
+NO_PREV = ''
+
+# The word that follows the last word of a title
+END = ''
+
+# The largest code point. It sorts after any string that starts with the same prefix.
+PREFIX_END = chr(0x10FFFF)
+
+words_re = re.compile(r'\w+', re.UNICODE)
+
+
+def get_title_terms(title: str) -> Set[Tuple[str, str, str]]:
+    """
+    Get the (prev, term, sep) triples of the title: the words with NO_PREV, the pairs of the adjacent words with
+    the text that separates them, and the last word with END and the text that follows it.
+    """
+    title = title.lower()
+    terms = set()
+    prev, prev_end = NO_PREV, 0
+    for match in words_re.finditer(title):
+        word = match.group()
+        if len(word) > MAX_TERM_LENGTH:
+            prev = NO_PREV
+            continue
+        terms.add((NO_PREV, word, ''))
+        if prev != NO_PREV:
+            sep = title[prev_end:match.start()]
+            terms.add((prev, word, sep if len(sep) <= MAX_SEPARATOR_LENGTH else ' '))
+        prev, prev_end = word, match.end()
+    if prev != NO_PREV:
+        sep = title[prev_end:]
+        terms.add((prev, END, sep if len(sep) <= MAX_SEPARATOR_LENGTH else ''))
+    return terms
+
+
+class CompletionIndex:
+    def __init__(self, mds, batch_size: int = COMPLETION_UPDATE_BATCH_SIZE, scan_limit: int = COMPLETION_SCAN_LIMIT):
+        self.mds = mds
+        self.batch_size = batch_size
+        self.scan_limit = scan_limit
+        self._backfilled = False
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def create_tables(self):
+        cursor = self.mds.db.get_connection().cursor()
+        cursor.execute(sql_create_completion_queue_table)
+        cursor.execute(sql_create_completion_term_table)
+        cursor.execute(sql_create_completion_state_table)
+        cursor.execute(sql_init_completion_state)
+
+    @db_session(immediate=True)
+    def update(self, max_titles: Optional[int] = None) -> int:
+        """
+        Apply the queued titles and then the titles of the backfilled entries to the index.
+        :param max_titles: the maximum number of the titles to apply, `batch_size` by default
+        :return: the number of the applied titles
+        """
+        max_titles = max_titles or self.batch_size
+        # pylint: disable=protected-access
+        queued = self.mds.db._exec_sql('SELECT rowid, title, delta FROM CompletionQueue ORDER BY rowid LIMIT ?',
+                                       (max_titles,)).fetchall()
+        indexed_rowid, backfill_rowid = self.get_backfill_range()
+        new = []
+        if indexed_rowid < backfill_rowid and len(queued) < max_titles:
+            new = self.mds.db._exec_sql("""
+                SELECT rowid, title FROM ChannelNode WHERE rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?
+            """, (indexed_rowid, backfill_rowid, max_titles - len(queued))).fetchall()
+            # The backfill is complete when the rest of its range is scanned
+            indexed_rowid = new[-1][0] if len(new) == max_titles - len(queued) else backfill_rowid
+            self.mds.db._exec_sql('UPDATE CompletionState SET indexed_rowid = ?', (indexed_rowid,))
+            if indexed_rowid == backfill_rowid:
+                self.logger.info('The completion index backfill is complete')
+        if not queued and not new:
+            return 0
+
+        deltas = Counter()
+        for title, delta in [(title, delta) for _, title, delta in queued] + [(title, 1) for _, title in new]:
+            for term in get_title_terms(title):
+                deltas[term] += delta
+
+        cursor = self.mds.db.get_connection().cursor()
+        cursor.executemany("""
+            INSERT INTO CompletionTerm(prev, term, sep, weight) VALUES (?, ?, ?, ?)
+            ON CONFLICT(prev, term, sep) DO UPDATE SET weight = weight + excluded.weight
+        """, [(prev, term, sep, delta) for (prev, term, sep), delta in deltas.items() if delta])
+        cursor.executemany("DELETE FROM CompletionTerm WHERE prev = ? AND term = ? AND sep = ? AND weight <= 0",
+                           [(prev, term, sep) for (prev, term, sep), delta in deltas.items() if delta < 0])
+        if queued:
+            cursor.execute('DELETE FROM CompletionQueue WHERE rowid <= ?', [queued[-1][0]])
+
+        self.logger.debug(f'Applied {len(queued)} queued and {len(new)} new titles to the completion index')
+        return len(queued) + len(new)
+
+    @db_session
+    def get_queue_size(self) -> int:
+        # The queue is consumed in the rowid order, so the range of the rowids is its size
+        # pylint: disable=protected-access
+        return self.mds.db._exec_sql('SELECT max(rowid) - min(rowid) + 1 FROM CompletionQueue').fetchone()[0] or 0
+
+    @db_session
+    def get_backfill_range(self) -> Tuple[int, int]:
+        """
+        Get the last backfilled rowid and the last rowid to backfill.
+        """
+        # pylint: disable=protected-access
+        return self.mds.db._exec_sql('SELECT indexed_rowid, backfill_rowid FROM CompletionState').fetchone()
+
+    def is_backfilled(self) -> bool:
+        if not self._backfilled:
+            indexed_rowid, backfill_rowid = self.get_backfill_range()
+            # The backfill is never started again, so its completion is cached
+            self._backfilled = indexed_rowid >= backfill_rowid
+        return self._backfilled
+
+    @db_session
+    def get_words(self, prev: str, prefix: str, limit: int) -> List[str]:
+        """
+        Get the most frequent words that start with the prefix and follow the `prev` word.
+
+        Only the first `scan_limit` matching terms in the alphabetical order are ranked, so short prefixes
+        of the common words are answered in a bounded time.
+        """
+        # pylint: disable=protected-access
+        rows = self.mds.db._exec_sql(f"""
+            SELECT term FROM (
+                SELECT term, weight FROM CompletionTerm
+                WHERE prev = ? AND term >= ? AND term < ?
+                LIMIT {self.scan_limit}
+            )
+            GROUP BY term
+            ORDER BY sum(weight) DESC, term
+            LIMIT ?
+        """, (prev, prefix, prefix + PREFIX_END, limit)).fetchall()
+        return [term for term, in rows]
+
+    @db_session
+    def get_next_words(self, word: str, limit: int) -> List[Tuple[str, str]]:
+        """
+        Get the most frequent (next word, separator) pairs that follow the word. The next word is END
+        for the titles that end with the word.
+        """
+        # pylint: disable=protected-access
+        rows = self.mds.db._exec_sql(f"""
+            SELECT term, sep FROM (
+                SELECT term, sep, weight FROM CompletionTerm
+                WHERE prev = ?
+                LIMIT {self.scan_limit}
+            )
+            ORDER BY weight DESC, term, sep
+            LIMIT ?
+        """, (word, limit)).fetchall()
+        return [(term, sep) for term, sep in rows]
+
+    @db_session
+    def has_word(self, prev: str, word: str) -> bool:
+        # pylint: disable=protected-access
+        return self.mds.db._exec_sql('SELECT 1 FROM CompletionTerm WHERE prev = ? AND term = ? LIMIT 1',
+                                     (prev, word)).fetchone() is not None
+
+    def get_suggestions(self, text: str, max_terms: int) -> List[str]:
+        """
+        Get the auto-completion suggestions for the text. The suggestions complete the last word of the text
+        with the words that follow the previous word of the text, and then add the next word after the last one,
+        with the text that separates them in the titles if the last word is not ended.
+        """
+        words = words_re.findall(text.lower())
+        if not words:
+            return []
+
+        word = words[-1]
+        prev = words[-2] if len(words) > 1 else NO_PREV
+        ending_typed = words_re.match(text[-1]) is None
+
+        result = []
+
+        def add(suggestions: Iterable[str]):
+            for suggestion in suggestions:
+                if len(result) >= max_terms:
+                    return
+                if suggestion not in result:
+                    result.append(suggestion)
+
+        if not ending_typed:
+            add(text + term[len(word):] for term in self.get_words(prev, word, max_terms + 1) if term != word)
+
+        if self.has_word(prev, word):
+            add(text + (term if ending_typed else sep + term) for term, sep in self.get_next_words(word, max_terms))
+
+        return result
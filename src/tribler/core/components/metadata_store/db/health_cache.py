@@ -0,0 +1,196 @@
+"""
+The write-behind cache of the torrents health.
+
+The health of the torrents received from the other peers (the popularity gossip and the health items of the mdblobs)
+is mostly older than the health we already have. The cache keeps the health of the recently seen infohashes
+in memory, so the decision whether a received health should replace the known one does not query the database.
+The infohashes that are not in the cache are loaded with a single query per received batch.
+
+The accepted updates are kept as dirty entries, and `HealthCache.flush` writes them to the TorrentState table
+in batches, each batch in a single transaction. The flush checks the health in the database again, so a health
+written to the database directly (e.g., by the torrent checker) is never replaced with an older one. The dirty
+entries are never evicted from the cache; the clean entries are evicted in the least recently used order.
+When there are more than `max_dirty` dirty entries, `HealthCache.process` writes the excess to the database right
+away, so the cache does not grow without bounds when the health is received faster than the maintenance flushes it.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set
+
+from pony.orm import db_session, select
+
+from tribler.core.components.torrent_checker.torrent_checker.dataclasses import HealthInfo
+
+HEALTH_CACHE_SIZE = 10000  # The number of the clean entries kept in the cache
+HEALTH_FLUSH_BATCH_SIZE = 1000  # The number of the dirty entries written to the database in a single transaction
+HEALTH_CACHE_MAX_DIRTY = 50000  # The number of the dirty entries over which they are written by `process`
+
+
+@dataclass(frozen=True)
+class CachedHealth:
+    seeders: int
+    leechers: int
+    last_check: int
+    self_checked: bool
+
+    @classmethod
+    def from_health(cls, health: HealthInfo, self_checked: bool = False):
+        return cls(seeders=health.seeders, leechers=health.leechers, last_check=health.last_check,
+                   self_checked=self_checked)
+
+
+class HealthCache:
+    def __init__(self, mds, max_size: int = HEALTH_CACHE_SIZE, max_dirty: int = HEALTH_CACHE_MAX_DIRTY):
+        self.mds = mds
+        self.max_size = max_size
+        self.max_dirty = max_dirty
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        # The entries are replaced, never modified, so a flush can tell whether an entry changed while it was written
+        self._entries: Dict[bytes, CachedHealth] = OrderedDict()
+        self._dirty: Dict[bytes, CachedHealth] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def get(self, infohash: bytes):
+        return self._entries.get(infohash)
+
+    def _set(self, infohash: bytes, entry: CachedHealth, dirty: bool):
+        self._entries[infohash] = entry
+        self._entries.move_to_end(infohash)
+        if dirty:
+            self._dirty[infohash] = entry
+        else:
+            self._dirty.pop(infohash, None)
+
+    def _evict(self):
+        excess = len(self._entries) - self.max_size
+        if excess <= 0:
+            return
+        evicted = []
+        for infohash in self._entries:
+            if len(evicted) == excess:
+                break
+            if infohash not in self._dirty:
+                evicted.append(infohash)
+        for infohash in evicted:
+            del self._entries[infohash]
+
+    def load(self, infohashes: Iterable[bytes]):
+        """
+        Load the health of the given infohashes that are not in the cache from the database.
+        """
+        with self._lock:
+            missing = [infohash for infohash in set(infohashes) if infohash not in self._entries]
+        if not missing:
+            return
+
+        with db_session:
+            rows = list(select((s.infohash, s.seeders, s.leechers, s.last_check, s.self_checked)
+                               for s in self.mds.TorrentState if s.infohash in missing))
+
+        with self._lock:
+            for infohash, seeders, leechers, last_check, self_checked in rows:
+                # The entry could be added by another thread while the rows were loaded
+                if infohash not in self._entries:
+                    self._set(infohash, CachedHealth(seeders, leechers, last_check, bool(self_checked)), dirty=False)
+
+    def process(self, health_list: List[HealthInfo]) -> Set[bytes]:
+        """
+        Apply the health received from the other peers to the cache. It is called from the database executor,
+        as it loads the unknown infohashes, and writes the oldest dirty entries if there are too many of them.
+        :param health_list: the health of the torrents
+        :return: the infohashes that were not known before
+        """
+        valid = []
+        for health in health_list:
+            if health.is_valid():
+                valid.append(health)
+            else:
+                self._logger.warning(f'Invalid health info ignored: {health}')
+
+        self.load(health.infohash for health in valid)
+
+        added = set()
+        with self._lock:
+            for health in valid:
+                entry = self._entries.get(health.infohash)
+                if entry is None:
+                    self._logger.debug(f"Add health info {health}")
+                    added.add(health.infohash)
+                    self._set(health.infohash, CachedHealth.from_health(health), dirty=True)
+                elif health.should_update(entry):
+                    self._logger.debug(f"Update health info {health}")
+                    self._set(health.infohash, CachedHealth.from_health(health), dirty=True)
+                else:
+                    self._entries.move_to_end(health.infohash)
+            self._evict()
+            excess = len(self._dirty) - self.max_dirty
+
+        if excess > 0:
+            self._logger.info(f'Too many dirty health entries, {excess} of them are written right away')
+            self.flush(max_entries=excess)
+        return added
+
+    def update_checked(self, health: HealthInfo):
+        """
+        Account for the health of a torrent checked locally and already written to the database.
+        """
+        with self._lock:
+            entry = self._entries.get(health.infohash)
+            if entry is None or health.should_update(entry, self_checked=True):
+                self._set(health.infohash, CachedHealth.from_health(health, self_checked=True), dirty=False)
+                self._evict()
+
+    def flush(self, max_entries: int = None) -> int:
+        """
+        Write the dirty entries to the database in batches of HEALTH_FLUSH_BATCH_SIZE entries.
+        :param max_entries: the maximum number of the entries to write, or None to write all of them
+        :return: the number of the entries written
+        """
+        written = 0
+        while max_entries is None or written < max_entries:
+            batch_size = HEALTH_FLUSH_BATCH_SIZE
+            if max_entries is not None:
+                batch_size = min(batch_size, max_entries - written)
+            with self._lock:
+                batch = dict(list(self._dirty.items())[:batch_size])
+            if not batch:
+                break
+
+            self._write(batch)
+            written += len(batch)
+
+            with self._lock:
+                for infohash, entry in batch.items():
+                    # The entries that were updated again during the write stay dirty
+                    if self._dirty.get(infohash) is entry:
+                        del self._dirty[infohash]
+                self._evict()
+        return written
+
+    def _write(self, batch: Dict[bytes, CachedHealth]):
+        infohashes = list(batch)
+        with db_session:
+            # Lock the database for writing first, so no other thread adds the same infohashes in the meantime
+            states = select(s for s in self.mds.TorrentState if s.infohash in infohashes).for_update()
+            existing = {state.infohash: state for state in states}
+            for infohash, entry in batch.items():
+                state = existing.get(infohash)
+                if state is None:
+                    self.mds.TorrentState(infohash=infohash, seeders=entry.seeders, leechers=entry.leechers,
+                                          last_check=entry.last_check, self_checked=entry.self_checked)
+                    continue
+                health = HealthInfo(infohash, last_check=entry.last_check, seeders=entry.seeders,
+                                    leechers=entry.leechers)
+                if health.should_update(state, self_checked=entry.self_checked):
+                    state.set(seeders=entry.seeders, leechers=entry.leechers, last_check=entry.last_check,
+                              self_checked=entry.self_checked)
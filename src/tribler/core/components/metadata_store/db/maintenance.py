@@ -0,0 +1,241 @@
+"""
+Background maintenance of the metadata database.
+
+The maintenance tasks (writing the health cache to the database, WAL checkpoints, merging the FTS segments,
+updating the query planner statistics and the incremental vacuum) are split into small steps. Every CHECK_INTERVAL
+seconds, the scheduler picks a task that is due and runs its steps in the database executor for at most TIME_BUDGET
+seconds. Each step is a separate short transaction, so the steps never hold the write lock long enough to stall
+the processing of the incoming metadata.
+
+The tasks run only when the database is idle, that is, when the executor has not run other tasks since the previous
+check. A task that is overdue by more than its interval runs anyway, so a busy node does not skip the maintenance
+forever. The time of the last complete run of each task is stored in MiscData.
+
+The completion index is updated separately, every COMPLETION_INDEX_INTERVAL seconds while the executor has
+no other tasks waiting, so the new titles get into the index, and the index of an upgraded database is built,
+without waiting for the other tasks.
+"""
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from ipv8.taskmanager import TaskManager
+from pony.orm import db_session
+from pony.orm.dbapiprovider import OperationalError
+
+from tribler.core.utilities.pony_utils import DatabaseExecutorOverloaded
+from tribler.core.utilities.utilities import MEMORY_DB
+
+CHECK_INTERVAL = 5.0  # seconds
+TIME_BUDGET = 0.1  # seconds of the maintenance work per check
+BUSY_TIMEOUT = 1.0  # seconds, how long a maintenance step waits for the database lock
+WAL_SIZE_LIMIT = 64 * 1024 * 1024  # bytes, the WAL file is truncated to this size after the checkpoints
+
+COMPLETION_INDEX_INTERVAL = 1.0  # seconds
+COMPLETION_INDEX_TIME_BUDGET = 0.2  # seconds of the completion index updates per interval
+
+HEALTH_CACHE_ENTRIES = 1000  # dirty health cache entries written per step
+COMPLETION_INDEX_TITLES = 1000  # titles applied to the completion index per step
+FTS_MERGE_PAGES = 100  # FTS index pages merged per step
+VACUUM_PAGES = 500  # free pages released per step
+ANALYSIS_LIMIT = 1000  # rows of each index examined by ANALYZE
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+
+@dataclass
+class MaintenanceTask:
+    name: str
+    interval: float  # seconds between the complete runs of the task
+    step: Callable[[], bool]  # does a small part of the work and returns True when the run is complete
+    last_run: float = 0.0
+    in_progress: bool = False
+    steps: int = 0
+
+    @property
+    def misc_key(self) -> str:
+        return f'maintenance_{self.name}_last_run'
+
+
+class DatabaseMaintenance(TaskManager):
+    def __init__(self, mds, check_interval: float = CHECK_INTERVAL, time_budget: float = TIME_BUDGET):
+        super().__init__()
+        self.mds = mds
+        self.check_interval = check_interval
+        self.time_budget = time_budget
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.tasks: List[MaintenanceTask] = [
+            MaintenanceTask('health_cache', 10, self.flush_health_cache),
+            MaintenanceTask('wal_checkpoint', 10 * 60, self.checkpoint_wal),
+            MaintenanceTask('fts_merge', HOUR, self.merge_fts_segments),
+            MaintenanceTask('analyze', DAY, self.analyze),
+            MaintenanceTask('incremental_vacuum', DAY, self.incremental_vacuum),
+        ]
+
+        self._connection: Optional[sqlite3.Connection] = None
+        self._tasks_completed = 0  # the number of the executor tasks completed before the previous check
+        self._own_tasks = 0  # the number of the maintenance tasks submitted to the executor since the previous check
+
+    def start(self):
+        if self.mds.db_path is MEMORY_DB:
+            return
+
+        now = time.time()
+        with db_session:
+            for task in self.tasks:
+                last_run = self.mds.get_value(task.misc_key)
+                # The tasks that have never run are due, but they wait for the database to become idle
+                task.last_run = float(last_run) if last_run else now - task.interval
+        self._tasks_completed = self.mds.executor.get_statistics()['tasks_completed']
+        self.register_task('Database maintenance', self.run_maintenance, interval=self.check_interval)
+        self.register_task('Completion index', self.run_completion_index, interval=COMPLETION_INDEX_INTERVAL)
+
+    def close(self):
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+
+    def is_idle(self) -> bool:
+        """
+        Check whether the database executor has run other tasks since the previous check.
+        """
+        statistics = self.mds.executor.get_statistics()
+        other_tasks = statistics['tasks_completed'] - self._tasks_completed - self._own_tasks
+        self._tasks_completed = statistics['tasks_completed']
+        self._own_tasks = 0
+        return statistics['queue_depth'] == 0 and other_tasks <= 0
+
+    def get_due_task(self, idle: bool) -> Optional[MaintenanceTask]:
+        now = time.time()
+        for task in self.tasks:
+            overdue = now - task.last_run - task.interval
+            if not task.in_progress and overdue < 0:
+                continue
+            if idle or overdue > task.interval:
+                return task
+        return None
+
+    async def run_maintenance(self):
+        task = self.get_due_task(self.is_idle())
+        if task is None:
+            return
+        self._own_tasks += 1
+        try:
+            await self.mds.executor.run(self.run_task, task)
+        except DatabaseExecutorOverloaded:
+            self._own_tasks -= 1
+            self.logger.info(f'Maintenance task {task.name} is postponed: the database executor is overloaded')
+
+    async def run_completion_index(self):
+        if self.mds.executor.get_statistics()['queue_depth']:
+            return
+        self._own_tasks += 1
+        try:
+            await self.mds.executor.run(self.update_completion_index)
+        except DatabaseExecutorOverloaded:
+            self._own_tasks -= 1
+
+    def update_completion_index(self) -> bool:
+        """
+        Apply the titles to the completion index until it is up to date or the time budget is spent.
+        :return: True if the index is up to date
+        """
+        deadline = time.monotonic() + COMPLETION_INDEX_TIME_BUDGET
+        while not self.mds._shutting_down:  # pylint: disable=protected-access
+            try:
+                if self.mds.update_completion_index(max_titles=COMPLETION_INDEX_TITLES) < COMPLETION_INDEX_TITLES:
+                    return True
+            except (sqlite3.OperationalError, OperationalError) as e:
+                self.logger.info(f'Completion index update is postponed: {e}')
+                return False
+            if time.monotonic() >= deadline:
+                return False
+        return False
+
+    def run_task(self, task: MaintenanceTask) -> bool:
+        """
+        Run the steps of the task until the run is complete or the time budget is spent.
+        :return: True if the run of the task is complete
+        """
+        deadline = time.monotonic() + self.time_budget
+        task.in_progress = True
+        while True:
+            if self.mds._shutting_down:  # pylint: disable=protected-access
+                return False
+            try:
+                complete = task.step()
+            except (sqlite3.OperationalError, OperationalError) as e:
+                # The database is locked for longer than BUSY_TIMEOUT, the step will be repeated on the next check
+                self.logger.info(f'Maintenance task {task.name} is postponed: {e}')
+                return False
+            task.steps += 1
+            if complete:
+                break
+            if time.monotonic() >= deadline:
+                return False
+
+        self.logger.info(f'Maintenance task {task.name} is complete in {task.steps} steps')
+        task.in_progress = False
+        task.steps = 0
+        task.last_run = time.time()
+        with db_session:
+            self.mds.set_value(task.misc_key, str(int(task.last_run)))
+        return True
+
+    def get_statistics(self) -> Dict:
+        return {
+            'db_size': self.mds.get_db_file_size(),
+            'wal_size': self.mds.get_wal_file_size(),
+            'tasks': {
+                task.name: {
+                    'last_run': int(task.last_run),
+                    'in_progress': task.in_progress,
+                    'steps': task.steps,
+                }
+                for task in self.tasks
+            },
+        }
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        The connection for the maintenance statements. It is not managed by PonyORM, as PonyORM starts
+        a transaction for each db_session, and the WAL checkpoints and the vacuum do not work inside a transaction.
+        """
+        if self._connection is None:
+            self._connection = sqlite3.connect(str(self.mds.db_path), timeout=BUSY_TIMEOUT, isolation_level=None,
+                                               check_same_thread=False)
+            self._connection.execute(f'PRAGMA journal_size_limit = {WAL_SIZE_LIMIT}')
+        return self._connection
+
+    def flush_health_cache(self) -> bool:
+        return self.mds.health_cache.flush(max_entries=HEALTH_CACHE_ENTRIES) < HEALTH_CACHE_ENTRIES
+
+    def checkpoint_wal(self) -> bool:
+        # The passive checkpoint does not wait for the readers and the writers. The WAL file is truncated
+        # to the journal_size_limit when the writers start over from its beginning.
+        self.connection.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        return True
+
+    def merge_fts_segments(self) -> bool:
+        # With a negative number of pages the segments are merged even if there are few of them, like the FTS5
+        # 'optimize' command does, but in small steps. The merge is complete when the step does not change anything.
+        total_changes = self.connection.total_changes
+        self.connection.execute(f"INSERT INTO FtsIndex(FtsIndex, rank) VALUES('merge', -{FTS_MERGE_PAGES})")
+        return self.connection.total_changes - total_changes < 2
+
+    def analyze(self) -> bool:
+        self.connection.execute(f'PRAGMA analysis_limit = {ANALYSIS_LIMIT}')
+        self.connection.execute('ANALYZE')
+        return True
+
+    def incremental_vacuum(self) -> bool:
+        # The incremental vacuum is only available for the databases created with auto_vacuum = INCREMENTAL
+        if self.connection.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return True
+        self.connection.execute(f'PRAGMA incremental_vacuum({VACUUM_PAGES})').fetchall()
+        return self.connection.execute('PRAGMA freelist_count').fetchone()[0] == 0
@@ -8,6 +8,7 @@ from pony import orm
 from pony.orm import db_session, raw_sql, select
 
 from tribler.core.components.libtorrent.utils.libtorrent_helper import libtorrent as lt
+from tribler.core.components.metadata_store.db.channel_torrent import create_channel_torrent
 from tribler.core.components.metadata_store.db.orm_bindings.channel_node import (
     CHANNEL_DESCRIPTION_FLAG,
     CHANNEL_THUMBNAIL_FLAG,
@@ -46,13 +47,16 @@ def chunks(l, n):
 
 
 def create_torrent_from_dir(directory, torrent_filename):
-    fs = lt.file_storage()
-    lt.add_files(fs, str(directory))
-    t = lt.create_torrent(fs)
-    # t = create_torrent(fs, flags=17) # piece alignment
-    t.set_priv(False)
-    lt.set_piece_hashes(t, str(directory.parent))
-    torrent = t.generate()
+    # Only the new files of the channel are hashed, the hashes of the other files are taken from the previous torrent
+    torrent = create_channel_torrent(Path(directory), previous_torrent_path=Path(torrent_filename))
+    if torrent is None:
+        fs = lt.file_storage()
+        lt.add_files(fs, str(directory))
+        t = lt.create_torrent(fs)
+        # t = create_torrent(fs, flags=17) # piece alignment
+        t.set_priv(False)
+        lt.set_piece_hashes(t, str(directory.parent))
+        torrent = t.generate()
     with open(torrent_filename, 'wb') as f:
         f.write(lt.bencode(torrent))
 
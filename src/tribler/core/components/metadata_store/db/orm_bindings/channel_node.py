@@ -12,6 +12,7 @@ from tribler.core.components.metadata_store.db.serialization import (
     ChannelNodePayload,
     DELETED,
     DeletedMetadataPayload,
+    SIGNATURE_SIZE,
 )
 from tribler.core.exceptions import InvalidChannelNodeException, InvalidSignatureException
 from tribler.core.utilities.path_util import Path
@@ -78,6 +79,9 @@ def define_binding(db, logger=None, key=None):  # pylint: disable=R0915
         # Local
         added_on = orm.Optional(datetime, default=datetime.utcnow)
         status = orm.Optional(int, default=COMMITTED)
+        # The signed payload bytes of the entry, as returned by `serialized()`. They are stored when the entry is
+        # signed or received, and are only used while they end with the current signature of the entry.
+        serialized_payload = orm.Optional(bytes, nullable=True, default=None)
 
         # Special class-level properties
         _payload_class = ChannelNodePayload
@@ -169,6 +173,7 @@ def define_binding(db, logger=None, key=None):  # pylint: disable=R0915
                 )
                 kwargs["public_key"] = payload.public_key
                 kwargs["signature"] = payload.signature
+                kwargs["serialized_payload"] = payload.serialized()
 
             super().__init__(*args, **kwargs)
 
@@ -188,8 +193,19 @@ def define_binding(db, logger=None, key=None):  # pylint: disable=R0915
             :param key: private key to sign object with
             :return: serialized_data+signature binary string
             """
+            if key is None and self.has_serialized_payload():
+                return self.serialized_payload
             return b''.join(self._serialized(key))
 
+        def has_serialized_payload(self) -> bool:
+            """
+            Check whether the stored payload bytes correspond to the current version of the entry. The bytes end with
+            the signature they were stored with, and a signature can not match another version of the signed data.
+            Unsigned entries have no signature to check, so their payload bytes are never stored.
+            """
+            stored = self.serialized_payload
+            return stored is not None and self.signature is not None and stored[-SIGNATURE_SIZE:] == self.signature
+
         def _serialized_delete(self):
             """
             Create a special command to delete this metadata and encode it for transfer (tuple output).
@@ -221,7 +237,8 @@ def define_binding(db, logger=None, key=None):  # pylint: disable=R0915
             if not key:
                 key = self._my_key
             self.public_key = key.pub().key_to_bin()[10:]
-            _, self.signature = self._serialized(key)
+            data, self.signature = self._serialized(key)
+            self.serialized_payload = data + self.signature
 
         def has_valid_signature(self):
             crypto = default_eccrypto
@@ -240,7 +257,7 @@ def define_binding(db, logger=None, key=None):  # pylint: disable=R0915
 
         @classmethod
         def from_payload(cls, payload):
-            return cls(**payload.to_dict())
+            return cls(serialized_payload=payload.get_signed_blob(), **payload.to_dict())
 
         @classmethod
         def from_dict(cls, dct):
@@ -27,6 +27,66 @@ from tribler.core.utilities.utilities import random_infohash
 
 # pylint: disable=too-many-statements
 
+COLLECTION_TYPES = f'({COLLECTION_NODE}, {CHANNEL_TORRENT})'  # the discriminators of CollectionNode and its subclasses
+
+# The personal nodes to commit, together with all their ancestors (the parents are the collections that have the
+# origin_id of their children as id_)
+sql_dirty_closure = f"""
+    closure(rowid, id_, origin_id, metadata_type) AS (
+        SELECT rowid, id_, origin_id, metadata_type FROM ChannelNode
+        WHERE public_key = $public_key AND status IN {DIRTY_STATUSES}
+      UNION
+        SELECT parent.rowid, parent.id_, parent.origin_id, parent.metadata_type
+        FROM closure JOIN ChannelNode AS parent
+        ON parent.public_key = $public_key AND parent.id_ = closure.origin_id
+            AND parent.metadata_type IN {COLLECTION_TYPES}
+        WHERE closure.origin_id != 0
+    )
+"""
+
+# The origin_ids of the nodes to commit that refer to non-existing parents
+sql_select_dead_parents = f"""
+    WITH RECURSIVE {sql_dirty_closure}
+    SELECT DISTINCT origin_id FROM closure
+    WHERE origin_id != 0 AND NOT EXISTS (
+        SELECT 1 FROM ChannelNode AS parent
+        WHERE parent.public_key = $public_key AND parent.id_ = closure.origin_id
+            AND parent.metadata_type IN {COLLECTION_TYPES}
+    )
+"""
+
+# The nodes to commit, in the commit order: the trees of the top-level nodes one after another, each in post-order,
+# so the contents of a collection go before the collection, and the top-level node goes last. The path is built of
+# the fixed width hex rowids, and '~' sorts after the path separator, so the descendants go before their ancestor.
+sql_select_commit_forest = f"""
+    WITH RECURSIVE {sql_dirty_closure},
+    tree(root, rowid, id_, metadata_type, path) AS (
+        SELECT rowid, rowid, id_, metadata_type, printf('%016x/', rowid) FROM closure WHERE origin_id = 0
+      UNION ALL
+        SELECT tree.root, closure.rowid, closure.id_, closure.metadata_type,
+            tree.path || printf('%016x/', closure.rowid)
+        FROM tree JOIN closure ON closure.origin_id = tree.id_
+        WHERE tree.metadata_type IN {COLLECTION_TYPES}
+    )
+    SELECT node.* FROM tree JOIN ChannelNode AS node ON node.rowid = tree.rowid
+    ORDER BY tree.root, tree.path || '~'
+"""
+
+# The personal collections marked for deletion that have no ancestors marked for deletion
+sql_select_highest_deleted_collections = f"""
+    WITH RECURSIVE ancestors(node, id_, origin_id, status, is_node) AS (
+        SELECT rowid, id_, origin_id, status, 1 FROM ChannelNode
+        WHERE public_key = $public_key AND status = {TODELETE} AND metadata_type IN {COLLECTION_TYPES}
+      UNION
+        SELECT ancestors.node, parent.id_, parent.origin_id, parent.status, 0
+        FROM ancestors JOIN ChannelNode AS parent
+        ON parent.public_key = $public_key AND parent.id_ = ancestors.origin_id
+            AND parent.metadata_type IN {COLLECTION_TYPES}
+        WHERE ancestors.origin_id != 0
+    )
+    SELECT node FROM ancestors GROUP BY node HAVING max(status = {TODELETE} AND NOT is_node) = 0
+"""
+
 
 def define_binding(db):
     class CollectionNode(db.MetadataNode):
@@ -255,85 +315,43 @@ def define_binding(db):
 
         @staticmethod
         @db_session
-        def get_children_dict_to_commit():
-            db.CollectionNode.collapse_deleted_subtrees()
-            upd_dict = {}
-            children = {}
-            # Remark: it should be possible to optimize this by rewriting in pure SQL with recursive CTEs
-
-            def update_node_info(n):
-                # Add the node to its parent's set of children
-                if n.origin_id not in children:
-                    children[n.origin_id] = {n}
-                else:
-                    children[n.origin_id].add(n)
-                upd_dict[n.id_] = n
-
-            dead_parents = set()
-            # First we traverse the tree upwards from changed leaves to find all nodes affected by changes
-            for node in db.ChannelNode.select(
-                lambda g: g.public_key == db.ChannelNode._my_key.pub().key_to_bin()[10:]  # pylint: disable=W0212
-                and g.status in DIRTY_STATUSES
-            ):
-                update_node_info(node)
-                # This process resolves the parents completely.
-                # Therefore, if a parent is already in the dict, its path has already been resolved.
-                while node and (node.origin_id not in upd_dict):
-                    # Add the node to its parent's set of children
-                    update_node_info(node)
-                    # Get parent node
-                    parent = db.CollectionNode.get(public_key=node.public_key, id_=node.origin_id)
-                    if not parent:
-                        dead_parents.add(node.origin_id)
-                    node = parent
-
-            # Normally, dead_parents should consist only of 0 node, which is root. Otherwise, we got some orphans.
-            if 0 in dead_parents:
-                dead_parents.remove(0)
-            # Delete orphans
-            db.ChannelNode.select(
-                lambda g: db.ChannelNode._my_key.pub().key_to_bin()[10:] == g.public_key  # pylint: disable=W0212
-                and g.origin_id in dead_parents
-            ).delete()
-            orm.flush()  # Just in case...
-            if not children or 0 not in children:
-                return {}
-            return children
+        def delete_orphans_to_commit():
+            """
+            Delete the personal nodes whose parents do not exist anymore, if there are such nodes among the nodes
+            to commit or their ancestors. Normally, there are none.
+            """
+            public_key = db.ChannelNode._my_key.pub().key_to_bin()[10:]  # pylint: disable=W0212
+            orm.flush()  # The raw SQL queries do not flush the changes
+            dead_parents = [origin_id for origin_id, in db.execute(sql_select_dead_parents)]
+            if dead_parents:
+                db.ChannelNode.select(
+                    lambda g: g.public_key == public_key and g.origin_id in dead_parents
+                ).delete()
+                orm.flush()
 
         @staticmethod
         @db_session
         def get_commit_forest():
-            children = db.CollectionNode.get_children_dict_to_commit()
-            if not children:
-                return {}
-            # We want a separate commit tree/queue for each toplevel channel
-            forest = {}
-            toplevel_nodes = children.pop(0)
-            for root_node in toplevel_nodes:
-                # Tree -> stack -> queue
-                commit_queue = []
-                tree_stack = [root_node]
-                while tree_stack and children.get(tree_stack[-1].id_, None):
-                    # Traverse the tree from top to bottom converting it to a stack
-                    while children.get(tree_stack[-1].id_, None):
-                        node = children[tree_stack[-1].id_].pop()
-                        tree_stack.append(node)
-
-                    while not issubclass(type(tree_stack[-1]), db.CollectionNode):
-                        commit_queue.append(tree_stack.pop())
-                    # Unwind the tree stack until either the stack is empty or we meet a non-empty node
-                    while tree_stack and not children.get(tree_stack[-1].id_, None):
-                        while not issubclass(type(tree_stack[-1]), db.CollectionNode):
-                            commit_queue.append(tree_stack.pop())
-
-                        # It was a terminal collection
-                        collection = tree_stack.pop()
-                        commit_queue.append(collection)
-
-                if not commit_queue or commit_queue[-1] != root_node:
-                    commit_queue.append(root_node)
-                forest[root_node.id_] = tuple(commit_queue)
+            """
+            Get the commit queues of the personal top-level nodes that have something to commit.
+            The tree walks are done by the database, and only the entries to commit are loaded.
+            :return: a dict of the commit queues by the id_ of the top-level nodes. The contents of a collection
+                     go before the collection in the queue, and the top-level node itself goes last.
+            """
+            db.CollectionNode.collapse_deleted_subtrees()
+            db.CollectionNode.delete_orphans_to_commit()
+            public_key = db.ChannelNode._my_key.pub().key_to_bin()[10:]  # pylint: disable=W0212,W0612
+            orm.flush()
+            nodes = db.ChannelNode.select_by_sql(sql_select_commit_forest)
 
+            # The nodes of each tree go one after another, and the top-level node is the last one
+            forest = {}
+            commit_queue = []
+            for node in nodes:
+                commit_queue.append(node)
+                if node.origin_id == 0:
+                    forest[node.id_] = tuple(commit_queue)
+                    commit_queue = []
             return forest
 
         @staticmethod
@@ -379,26 +397,9 @@ def define_binding(db):
             in the future.
             This procedure should be always run _before_ committing personal channels.
             """
-            # Remark: it should be possible to optimize this by rewriting in pure SQL with recursive CTEs
-
-            def get_highest_deleted_parent(node, highest_deleted_parent=None):
-                if node.origin_id == 0:
-                    return highest_deleted_parent
-                parent = db.CollectionNode.get(public_key=node.public_key, id_=node.origin_id)
-                if not parent:
-                    return highest_deleted_parent
-                if parent.status == TODELETE:
-                    highest_deleted_parent = parent
-                return get_highest_deleted_parent(parent, highest_deleted_parent)
-
-            deletion_set = {
-                get_highest_deleted_parent(node, highest_deleted_parent=node).rowid
-                for node in db.CollectionNode.select(
-                    lambda g: g.public_key == db.CollectionNode._my_key.pub().key_to_bin()[10:]  # pylint: disable=W0212
-                    and g.status == TODELETE
-                )
-                if node
-            }
+            public_key = db.CollectionNode._my_key.pub().key_to_bin()[10:]  # pylint: disable=W0212,W0612
+            orm.flush()
+            deletion_set = [rowid for rowid, in db.execute(sql_select_highest_deleted_collections)]
 
             for node in [db.CollectionNode[rowid] for rowid in deletion_set]:
                 for subnode in node.contents:
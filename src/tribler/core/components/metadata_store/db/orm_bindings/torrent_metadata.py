@@ -3,6 +3,7 @@ from struct import unpack
 
 from pony import orm
 from pony.orm import db_session
+from pony.orm.core import DEFAULT
 
 from tribler.core import notifications
 from tribler.core.components.metadata_store.category_filter.category import Category, default_category_filter
@@ -10,10 +11,12 @@ from tribler.core.components.metadata_store.category_filter.family_filter import
 from tribler.core.components.metadata_store.db.orm_bindings.channel_node import COMMITTED
 from tribler.core.components.metadata_store.db.serialization import EPOCH, REGULAR_TORRENT, TorrentMetadataPayload
 from tribler.core.utilities.notifier import Notifier
+from tribler.core.utilities.pony_utils import invalidate_cached_collections
 from tribler.core.utilities.tracker_utils import get_uniformed_tracker_url
 from tribler.core.utilities.unicode import ensure_unicode, hexlify
 
 NULL_KEY_SUBST = b"\00"
+TITLES_BATCH_SIZE = 500  # The number of the infohashes in a single query of the torrent titles
 
 
 # This function is used to devise id_ from infohash in deterministic way. Used in FFA channels.
@@ -129,6 +132,102 @@ def define_binding(db, notifier: Notifier, tag_processor_version: int):
             # Add the torrent as a free-for-all entry if it is unknown to GigaChannel
             return cls.from_dict(dict(metadata, public_key=b'', status=COMMITTED, id_=id_))
 
+        @classmethod
+        def add_from_payloads(cls, payloads):
+            """
+            Create TorrentMetadata entries for a list of signed payloads in bulk.
+
+            Instead of constructing a Pony object per payload, the rows are written with `executemany`. The FTS index
+            is kept up to date by the database triggers, and the health/tracker links are created the same way
+            the constructor creates them. The payloads must be unknown to the database and their signatures must
+            be already checked (e.g. by `MetadataStore.read_payloads`), as the signatures are not checked again here.
+            :return: a list of the created TorrentMetadata objects in the order of the payloads
+            """
+            if not payloads:
+                return []
+            # The raw SQL below must see the objects that are still pending in the Pony cache
+            db.flush()
+
+            dicts = [payload.to_dict() for payload in payloads]
+            health = cls._get_or_create_torrent_states({d["infohash"] for d in dicts})
+            cls._add_trackers([(health[d["infohash"]], d["tracker_info"]) for d in dicts])
+
+            attrs = [attr for attr in cls._attrs_ if not attr.is_collection and not attr.is_pk]
+            rows = []
+            for payload, d in zip(payloads, dicts):
+                kwargs = dict(d, xxx=default_xxx_filter.isXXXTorrentMetadataDict(d),
+                              serialized_payload=payload.get_signed_blob())
+                if notifier:
+                    kwargs["tag_processor_version"] = tag_processor_version
+                row = []
+                for attr in attrs:
+                    if attr is cls.health:
+                        row.append(health[d["infohash"]])
+                    else:
+                        value = attr.validate(kwargs.get(attr.name, DEFAULT), entity=cls)
+                        row.append(attr.converters[0].val2dbval(value))
+                rows.append(tuple(row))
+
+            max_rowid = db.select('SELECT max(rowid) FROM ChannelNode')[0] or 0
+            columns = ', '.join(f'"{attr.column}"' for attr in attrs)
+            placeholders = ', '.join('?' * len(attrs))
+            db._exec_sql(f'INSERT INTO "ChannelNode" ({columns}) VALUES ({placeholders})', rows)
+            invalidate_cached_collections(db, db.TorrentState.metadata, db.TorrentState.trackers,
+                                          db.TrackerState.torrents)
+
+            # The database is locked for writing, so all the new rows get rowids greater than the previous maximum
+            # Load the health too, as the callers use it after the db_session is over
+            query = cls.select(lambda g: g.rowid > max_rowid).prefetch(cls.health)
+            created = {(md.public_key, md.id_): md for md in query}
+            result = [created[(d["public_key"], d["id_"])] for d in dicts]
+            if notifier:
+                for md in result:
+                    notifier[notifications.new_torrent_metadata_created](infohash=md.infohash, title=md.title)
+            return result
+
+        @staticmethod
+        def _get_or_create_torrent_states(infohashes):
+            """
+            Return a dict that maps the given infohashes to the rowids of their TorrentState entries,
+            creating the missing entries.
+            """
+            infohashes = list(infohashes)
+            rowids = dict(orm.select((s.infohash, s.rowid) for s in db.TorrentState if s.infohash in infohashes))
+            missing = [(infohash,) for infohash in infohashes if infohash not in rowids]
+            if missing:
+                db._exec_sql('INSERT INTO "TorrentState" (infohash, seeders, leechers, last_check, self_checked, '
+                             'has_data) VALUES (?, 0, 0, 0, 0, 0)', missing)
+                new = [infohash for (infohash,) in missing]
+                rowids.update(orm.select((s.infohash, s.rowid) for s in db.TorrentState if s.infohash in new))
+            return rowids
+
+        @staticmethod
+        def _add_trackers(tracker_urls):
+            """
+            Link TorrentState entries to the trackers, creating the missing TrackerState entries.
+            :param tracker_urls: a list of (TorrentState rowid, tracker URL) pairs
+            """
+            sanitized = set()
+            for torrent_state_rowid, tracker_url in tracker_urls:
+                url = get_uniformed_tracker_url(tracker_url)
+                if url:
+                    sanitized.add((torrent_state_rowid, url))
+            if not sanitized:
+                return
+
+            urls = list({url for _, url in sanitized})
+            rowids = dict(orm.select((t.url, t.rowid) for t in db.TrackerState if t.url in urls))
+            missing = [(url,) for url in urls if url not in rowids]
+            if missing:
+                db._exec_sql('INSERT INTO "TrackerState" (url, last_check, alive, failures) VALUES (?, 0, 1, 0)',
+                             missing)
+                new = [url for (url,) in missing]
+                rowids.update(orm.select((t.url, t.rowid) for t in db.TrackerState if t.url in new))
+
+            links = [(torrent_state_rowid, rowids[url]) for torrent_state_rowid, url in sanitized]
+            db._exec_sql('INSERT OR IGNORE INTO "TorrentState_TrackerState" (torrentstate, trackerstate) VALUES (?, ?)',
+                         links)
+
         @db_session
         def to_simple_dict(self):
             """
@@ -171,6 +270,20 @@ def define_binding(db, notifier: Notifier, tag_processor_version: int):
             md = cls.get_with_infohash(infohash)
             return md.title if md else None
 
+        @classmethod
+        @db_session
+        def get_torrent_titles(cls, infohashes):
+            """
+            Get the titles of the torrents with the given infohashes in a single query.
+            :return: a dict of the infohashes to the titles, without the infohashes of the unknown torrents
+            """
+            infohashes = list(infohashes)
+            titles = {}
+            for i in range(0, len(infohashes), TITLES_BATCH_SIZE):
+                batch = infohashes[i:i + TITLES_BATCH_SIZE]
+                titles.update(orm.select((t.infohash, t.title) for t in cls if t.infohash in batch))
+            return titles
+
         def serialized_health(self) -> bytes:
             health = self.health
             if not health or (not health.seeders and not health.leechers and not health.last_check):
@@ -0,0 +1,79 @@
+"""
+Keyset (cursor) pagination of metadata entries.
+
+Instead of skipping the rows of the previous pages with OFFSET, the next page is selected by comparing the sort key
+of the rows with the sort key of the last row of the previous page. With this, the cost of a page does not depend on
+its depth. The sort key always ends with the rowid, so it is unique and the pages do not overlap.
+
+The key of the last row is passed to the REST API clients as an opaque cursor string.
+"""
+import base64
+import json
+from typing import Optional, Tuple
+
+# The sort orders that support keyset pagination, mapped to the number of elements in their sort keys
+KEYSET_SORT_KEY_SIZES = {
+    None: 1,  # (rowid,)
+    'HEALTH': 3,  # (seeders, leechers, rowid)
+    'title': 2,  # (title COLLATE NOCASE, rowid)
+}
+
+# The value used in sort keys instead of NULL seeders/leechers of the entries without health info
+NO_HEALTH = -1
+
+
+def is_keyset_pagination_supported(sort_by=None, txt_filter=None, popular=None, **_) -> bool:
+    # Text search results without explicit sorting are ranked by relevance in Python, and popular torrents
+    # are limited to a small top list, so these are still paginated by offset
+    if popular or (txt_filter and sort_by is None):
+        return False
+    return sort_by in KEYSET_SORT_KEY_SIZES
+
+
+def get_sort_key(entry, sort_by=None) -> Tuple:
+    """
+    Get the values of the sort key for a metadata entry.
+    """
+    if sort_by == 'HEALTH':
+        health = getattr(entry, 'health', None)
+        if health is None:
+            return NO_HEALTH, NO_HEALTH, entry.rowid
+        return health.seeders, health.leechers, entry.rowid
+    if sort_by == 'title':
+        return entry.title, entry.rowid
+    return (entry.rowid,)
+
+
+def encode_cursor(sort_key: Tuple, sort_by=None, sort_desc=True) -> str:
+    data = json.dumps([sort_by, bool(sort_desc), *sort_key], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_by=None, sort_desc=True) -> Tuple:
+    """
+    Decode a cursor into the sort key of the last entry of the previous page.
+    :raises ValueError: if the cursor is malformed or was created for a different sort order
+    """
+    try:
+        cursor_sort_by, cursor_sort_desc, *sort_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Malformed cursor: {cursor}') from e
+
+    if cursor_sort_by != sort_by or cursor_sort_desc != bool(sort_desc):
+        raise ValueError('The cursor does not match the sort order of the query')
+    if len(sort_key) != KEYSET_SORT_KEY_SIZES.get(sort_by, 0):
+        raise ValueError('Wrong sort key size in the cursor')
+    value_type = str if sort_by == 'title' else int
+    *values, rowid = sort_key
+    if not isinstance(rowid, int) or not all(isinstance(value, value_type) for value in values):
+        raise ValueError('Wrong sort key values in the cursor')
+    return tuple(sort_key)
+
+
+def get_next_cursor(entries, sort_by=None, sort_desc=True, **kwargs) -> Optional[str]:
+    """
+    Get the cursor for the page that follows the given entries, if the query supports keyset pagination.
+    """
+    if not entries or not is_keyset_pagination_supported(sort_by=sort_by, **kwargs):
+        return None
+    return encode_cursor(get_sort_key(entries[-1], sort_by), sort_by=sort_by, sort_desc=sort_desc)
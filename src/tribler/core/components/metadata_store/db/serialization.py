@@ -64,12 +64,12 @@ class UnknownBlobTypeException(Exception):
     pass
 
 
-def read_payload_with_offset(data, offset=0):
+def read_payload_with_offset(data, offset=0, check_signature=True):
     # First we have to determine the actual payload type
     metadata_type = struct.unpack_from('>H', data, offset=offset)[0]
     payload_class = DISCRIMINATOR_TO_PAYLOAD_CLASS.get(metadata_type)
     if payload_class is not None:
-        return payload_class.from_signed_blob_with_offset(data, offset=offset)
+        return payload_class.from_signed_blob_with_offset(data, check_signature=check_signature, offset=offset)
 
     # Unknown metadata type, raise exception
     raise UnknownBlobTypeException
@@ -82,6 +82,11 @@ class SignedPayload(Payload):
 
     format_list = ['H', 'H', '64s']
 
+    # The serialized data and the signature of a payload read from a blob, see `from_signed_blob_with_offset`
+    signed_blob = None
+    # Set when the signature check is skipped because the same bytes are stored, see `MetadataStore.verify_payloads`
+    signature_skipped = False
+
     def __init__(self, metadata_type, reserved_flags, public_key, **kwargs):
         super().__init__()
         self.metadata_type = metadata_type
@@ -104,21 +109,33 @@ class SignedPayload(Payload):
                 return
             raise InvalidSignatureException("Tried to create FFA payload with non-null signature")
 
-        serialized_data = default_serializer.pack_serializable(self)
         if "key" in kwargs and kwargs["key"]:
             key = kwargs["key"]
             if self.public_key != key.pub().key_to_bin()[10:]:
                 raise KeysMismatchException(self.public_key, key.pub().key_to_bin()[10:])
-            self.signature = default_eccrypto.create_signature(key, serialized_data)
+            self.signature = default_eccrypto.create_signature(key, default_serializer.pack_serializable(self))
         elif "signature" in kwargs:
             # This check ensures that an entry with a wrong signature will not proliferate further
-            if not default_eccrypto.is_valid_signature(
-                default_eccrypto.key_from_public_bin(b"LibNaCLPK:" + self.public_key), serialized_data, self.signature
-            ):
-                raise InvalidSignatureException("Tried to create payload with wrong signature")
+            self.check_signature()
         else:
             raise InvalidSignatureException("Tried to create payload without signature")
 
+    def check_signature(self):
+        """
+        Check the signature of the payload, raising InvalidSignatureException if it is wrong.
+        """
+        # This is integrity check for FFA payloads.
+        if self.public_key == NULL_KEY:
+            if self.signature == NULL_SIG:
+                return
+            raise InvalidSignatureException("Tried to create FFA payload with non-null signature")
+
+        serialized_data = default_serializer.pack_serializable(self)
+        if not default_eccrypto.is_valid_signature(
+            default_eccrypto.key_from_public_bin(b"LibNaCLPK:" + self.public_key), serialized_data, self.signature
+        ):
+            raise InvalidSignatureException("Tried to create payload with wrong signature")
+
     def to_pack_list(self):
         data = [('H', self.metadata_type), ('H', self.reserved_flags), ('64s', self.public_key)]
         return data
@@ -133,14 +150,19 @@ class SignedPayload(Payload):
 
     @classmethod
     def from_signed_blob_with_offset(cls, data, check_signature=True, offset=0):
+        start = offset
         unpack_list = []
         for format_str in cls.format_list:
             offset = default_serializer.get_packer_for(format_str).unpack(data, offset, unpack_list)
+        signature = data[offset: offset + SIGNATURE_SIZE]
         if check_signature:
-            signature = data[offset: offset + SIGNATURE_SIZE]
             payload = cls.from_unpack_list(*unpack_list, signature=signature)  # pylint: disable=E1120
         else:
-            payload = cls.from_unpack_list(*unpack_list, skip_key_check=True)  # pylint: disable=E1120
+            # The signature is kept, so it could be checked later by `check_signature`
+            payload = cls.from_unpack_list(*unpack_list, signature=signature,  # pylint: disable=E1120
+                                           skip_key_check=True)
+        # The received bytes are kept, so the entry created from the payload does not have to serialize it again
+        payload.signed_blob = bytes(data[start: offset + SIGNATURE_SIZE])
         return payload, offset + SIGNATURE_SIZE
 
     def to_dict(self):
@@ -158,6 +180,13 @@ class SignedPayload(Payload):
     def serialized(self):
         return b''.join(self._serialized())
 
+    def get_signed_blob(self) -> bytes:
+        """
+        Get the serialized data and the signature of the payload, without serializing it again if it was read
+        from a blob.
+        """
+        return self.signed_blob if self.signed_blob is not None else self.serialized()
+
     @classmethod
     def from_file(cls, filepath):
         with open(filepath, 'rb') as f:
@@ -0,0 +1,85 @@
+"""
+Verification of metadata payload signatures in a pool of worker processes.
+
+This module is imported by the worker processes, so it should not import anything heavy.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from ipv8.keyvault.crypto import default_eccrypto
+
+# (public key, signed data, signature)
+SignedItem = Tuple[bytes, bytes, bytes]
+
+CHUNK_SIZE = 250  # The number of signatures verified by a worker process in one go
+MIN_PARALLEL_SIZE = 500  # Fewer signatures than this are verified in the calling thread
+
+
+def verify_signatures(items: Sequence[SignedItem]) -> List[bool]:
+    """
+    Verify Ed25519 signatures of metadata payloads.
+    :param items: a sequence of (public key, signed data, signature) tuples
+    :return: a list of booleans, True for valid signatures
+    """
+    keys = {}
+    result = []
+    for public_key, data, signature in items:
+        key = keys.get(public_key)
+        if key is None:
+            key = keys[public_key] = default_eccrypto.key_from_public_bin(b"LibNaCLPK:" + public_key)
+        result.append(bool(default_eccrypto.is_valid_signature(key, data, signature)))
+    return result
+
+
+def get_default_workers_count() -> int:
+    # Leave a core for the event loop and the database thread
+    return min(4, (os.cpu_count() or 1) - 1)
+
+
+class SignatureVerifier:
+    """
+    Verifies signatures of metadata payloads in chunks, using a pool of worker processes for large batches.
+
+    The pool is started on the first large batch. If there is only one CPU core, or `max_workers` is less than two,
+    all signatures are verified in the calling thread.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, chunk_size: int = CHUNK_SIZE,
+                 min_parallel_size: int = MIN_PARALLEL_SIZE):
+        self.max_workers = get_default_workers_count() if max_workers is None else max_workers
+        self.chunk_size = chunk_size
+        self.min_parallel_size = min_parallel_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._shutdown = False
+
+    def verify(self, items: Sequence[SignedItem]) -> List[bool]:
+        """
+        Verify signatures of the given items.
+        :param items: a sequence of (public key, signed data, signature) tuples
+        :return: a list of booleans, True for valid signatures
+        """
+        if self.max_workers < 2 or len(items) < self.min_parallel_size or self._shutdown:
+            return verify_signatures(items)
+
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        result = []
+        for chunk_result in self._get_pool().map(verify_signatures, chunks):
+            result.extend(chunk_result)
+        return result
+
+    def shutdown(self):
+        self._shutdown = True
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self.logger.info(f'Start a pool of {self.max_workers} signature verification processes')
+            # Forking a process with running threads is unsafe, so the workers are spawned
+            self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
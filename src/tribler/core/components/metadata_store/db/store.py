@@ -1,15 +1,30 @@
+import asyncio
+import hashlib
+import json
 import logging
+import os
 import re
+import sqlite3
 from datetime import datetime, timedelta
+from itertools import islice
 from time import sleep, time
-from typing import Optional, Union
+from typing import FrozenSet, Iterable, List, Optional, Tuple, Union
 
+import numpy as np
 from lz4.frame import LZ4FrameDecompressor
 from pony import orm
-from pony.orm import db_session, desc, left_join, raw_sql, select
-from pony.orm.dbproviders.sqlite import keep_exception
+from pony.orm import coalesce, db_session, desc, left_join, raw_sql, select
 
 from tribler.core import notifications
+from tribler.core.components.metadata_store.db.blob_stream import (
+    SignedPayloadData,
+    decompress_chunks,
+    iter_signed_payloads,
+    read_file_chunks,
+)
+from tribler.core.components.metadata_store.db.completion_index import CompletionIndex, sql_completion_queued_rowid
+from tribler.core.components.metadata_store.db.health_cache import HealthCache
+from tribler.core.components.metadata_store.db.maintenance import WAL_SIZE_LIMIT
 from tribler.core.components.metadata_store.db.orm_bindings import (
     binary_node,
     channel_description,
@@ -30,6 +45,7 @@ from tribler.core.components.metadata_store.db.orm_bindings import (
 from tribler.core.components.metadata_store.db.orm_bindings.channel_metadata import get_mdblob_sequence_number
 from tribler.core.components.metadata_store.db.orm_bindings.channel_node import LEGACY_ENTRY, TODELETE
 from tribler.core.components.metadata_store.db.orm_bindings.torrent_metadata import NULL_KEY_SUBST
+from tribler.core.components.metadata_store.db.pagination import NO_HEALTH, is_keyset_pagination_supported
 from tribler.core.components.metadata_store.db.serialization import (
     BINARY_NODE,
     CHANNEL_DESCRIPTION,
@@ -37,28 +53,41 @@ from tribler.core.components.metadata_store.db.serialization import (
     CHANNEL_THUMBNAIL,
     CHANNEL_TORRENT,
     COLLECTION_NODE,
+    DELETED,
     HealthItemsPayload,
     JSON_NODE,
     METADATA_NODE,
+    NULL_KEY,
     REGULAR_TORRENT,
-    read_payload_with_offset,
+    SIGNATURE_SIZE,
+)
+from tribler.core.components.metadata_store.db.signature_verification import SignatureVerifier
+from tribler.core.components.metadata_store.db.total_count import TotalCountService
+from tribler.core.components.metadata_store.remote_query_community.payload_checker import (
+    process_payload,
+    process_payload_batch,
 )
-from tribler.core.components.metadata_store.remote_query_community.payload_checker import process_payload
 from tribler.core.components.torrent_checker.torrent_checker.dataclasses import HealthInfo
 from tribler.core.exceptions import InvalidSignatureException
 from tribler.core.utilities.notifier import Notifier
 from tribler.core.utilities.path_util import Path
-from tribler.core.utilities.pony_utils import get_max, get_or_create, run_threaded
-from tribler.core.utilities.search_utils import torrent_rank
+from tribler.core.utilities.pony_utils import DatabaseExecutor, get_max, get_or_create
+from tribler.core.utilities.search_utils import torrent_rank_batch
 from tribler.core.utilities.unicode import hexlify
 from tribler.core.utilities.utilities import MEMORY_DB
 
 BETA_DB_VERSIONS = [0, 1, 2, 3, 4, 5]
-CURRENT_DB_VERSION = 14
+CURRENT_DB_VERSION = 18
 
 MIN_BATCH_SIZE = 10
 MAX_BATCH_SIZE = 1000
 
+VERIFICATION_WINDOW_SIZE = 1000  # The number of streamed payloads which signatures are checked together
+
+CHANNEL_MANIFEST_PREFIX = 'channel_manifest_'
+
+MAX_SQL_VARIABLES = 500  # The number of parameters in a single SQL query, to stay below the SQLite limit
+
 POPULAR_TORRENTS_FRESHNESS_PERIOD = 60 * 60 * 24  # Last day
 POPULAR_TORRENTS_COUNT = 100
 
@@ -70,22 +99,33 @@ sql_create_fts_table = """
         (title, content='ChannelNode', prefix = '2 3 4 5',
          tokenize='porter unicode61 remove_diacritics 1');"""
 
-sql_add_fts_trigger_insert = """
+# The titles are queued for the completion index, except for the entries that are still to be backfilled
+sql_add_fts_trigger_insert = f"""
     CREATE TRIGGER IF NOT EXISTS fts_ai AFTER INSERT ON ChannelNode
     BEGIN
         INSERT INTO FtsIndex(rowid, title) VALUES (new.rowid, new.title);
+        INSERT INTO CompletionQueue(title, delta) SELECT new.title, 1
+            WHERE new.title != '' AND {sql_completion_queued_rowid.format(rowid='new.rowid')};
     END;"""
 
-sql_add_fts_trigger_delete = """
+sql_add_fts_trigger_delete = f"""
     CREATE TRIGGER IF NOT EXISTS fts_ad AFTER DELETE ON ChannelNode
     BEGIN
         DELETE FROM FtsIndex WHERE rowid = old.rowid;
+        INSERT INTO CompletionQueue(title, delta) SELECT old.title, -1
+            WHERE old.title != '' AND {sql_completion_queued_rowid.format(rowid='old.rowid')};
     END;"""
 
-sql_add_fts_trigger_update = """
+sql_add_fts_trigger_update = f"""
     CREATE TRIGGER IF NOT EXISTS fts_au AFTER UPDATE ON ChannelNode BEGIN
         DELETE FROM FtsIndex WHERE rowid = old.rowid;
         INSERT INTO FtsIndex(rowid, title) VALUES (new.rowid, new.title);
+        INSERT INTO CompletionQueue(title, delta) SELECT old.title, -1
+            WHERE old.title != new.title AND old.title != ''
+            AND {sql_completion_queued_rowid.format(rowid='old.rowid')};
+        INSERT INTO CompletionQueue(title, delta) SELECT new.title, 1
+            WHERE old.title != new.title AND new.title != ''
+            AND {sql_completion_queued_rowid.format(rowid='new.rowid')};
     END;"""
 
 sql_add_torrentstate_trigger_after_insert = """
@@ -102,6 +142,34 @@ sql_add_torrentstate_trigger_after_update = """
     END;
 """
 
+# This table should never be used from ORM directly. It is maintained by SQL triggers.
+# Its version is increased by every change of the entries and of their health, so the results of the queries
+# can be reused while it stays the same. The updates of tag_processor_version do not change the entries.
+sql_create_content_version_table = """
+    CREATE TABLE IF NOT EXISTS ContentVersion (
+        version INTEGER NOT NULL
+    );"""
+
+sql_init_content_version = """
+    INSERT INTO ContentVersion(version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM ContentVersion);"""
+
+sql_add_content_version_triggers = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS content_version_{name} AFTER {event} ON {table} {condition}
+    BEGIN
+        UPDATE ContentVersion SET version = version + 1;
+    END;"""
+    for name, event, table, condition in (
+        ('channelnode_ai', 'INSERT', 'ChannelNode', ''),
+        ('channelnode_ad', 'DELETE', 'ChannelNode', ''),
+        ('channelnode_au', 'UPDATE', 'ChannelNode',
+         'WHEN old.tag_processor_version IS new.tag_processor_version'),
+        ('torrentstate_ai', 'INSERT', 'TorrentState', ''),
+        ('torrentstate_ad', 'DELETE', 'TorrentState', ''),
+        ('torrentstate_au', 'UPDATE', 'TorrentState', ''),
+    )
+]
+
 sql_create_partial_index_channelnode_subscribed = """
     CREATE INDEX IF NOT EXISTS idx_channelnode__metadata_subscribed__partial ON "ChannelNode" (subscribed)
     WHERE subscribed = 1
@@ -133,6 +201,47 @@ sql_create_partial_index_torrentstate_last_check = """
     WHERE has_data = 1;
 """
 
+# The indexes for the sort orders of `get_entries_query`. With them, a sorted page of the channel contents or of
+# the channels list is read from an index in the sort order, instead of sorting all the matching rows. The channels
+# list is served by the partial indexes, as the free-for-all torrents share origin_id 0 with the channels.
+# The whole database is not sorted by the GUI without a text filter, so these sort orders are not indexed, as every
+# index of the ChannelNode table slows down the processing of the incoming metadata.
+# The query plans are checked by db/tests/test_query_plans.py
+sql_create_sort_indexes = [
+    f'CREATE INDEX IF NOT EXISTS idx_channelnode__{name} ON "ChannelNode" ({columns})'
+    for name, columns in (
+        ('origin_id_title', 'origin_id, title COLLATE NOCASE'),
+        ('origin_id_tags', 'origin_id, tags COLLATE NOCASE'),
+        ('origin_id_num_entries_size', 'origin_id, num_entries, size'),
+        ('origin_id_torrent_date', 'origin_id, torrent_date'),
+    )
+] + [
+    f'CREATE INDEX IF NOT EXISTS idx_channelnode__channel_{name}__partial ON "ChannelNode" (origin_id, {columns}) '
+    f'WHERE metadata_type = {CHANNEL_TORRENT}'
+    for name, columns in (
+        ('title', 'title COLLATE NOCASE'),
+        ('num_entries', 'num_entries'),
+        ('votes', 'votes'),
+        ('torrent_date', 'torrent_date'),
+        ('subscribed', 'subscribed'),
+    )
+]
+
+
+# The digest of the payloads of a window and the indexes of its payloads which signature checks were skipped
+VerifiedWindow = Tuple[bytes, FrozenSet[int]]
+
+
+def get_payloads_digest(payloads) -> bytes:
+    digest = hashlib.sha256()
+    for payload in payloads:
+        digest.update(payload.get_signed_blob())
+    return digest.digest()
+
+
+def has_deletions(payloads) -> bool:
+    return any(payload.metadata_type == DELETED for payload in payloads)
+
 
 class MetadataStore:
     def __init__(
@@ -169,7 +278,10 @@ class MetadataStore:
         @self.db.on_connect(provider='sqlite')
         def on_connect(_, connection):
             cursor = connection.cursor()
+            # Has effect only for new databases, lets the maintenance release the free pages in small steps
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
             cursor.execute("PRAGMA journal_mode = WAL")
+            cursor.execute(f"PRAGMA journal_size_limit = {WAL_SIZE_LIMIT}")
             cursor.execute("PRAGMA synchronous = NORMAL")
             cursor.execute("PRAGMA temp_store = MEMORY")
             cursor.execute("PRAGMA foreign_keys = ON")
@@ -181,9 +293,6 @@ class MetadataStore:
                 cursor.execute("PRAGMA journal_mode = 0")
                 cursor.execute("PRAGMA synchronous = 0")
 
-            sqlite_rank = keep_exception(torrent_rank)
-            connection.create_function('search_rank', 5, sqlite_rank)
-
             # pylint: enable=unused-variable
 
         self.MiscData = misc.define_binding(self.db)
@@ -221,6 +330,9 @@ class MetadataStore:
             create_db = not db_filename.is_file()
             db_path_string = str(db_filename)
 
+        self.completion_index = CompletionIndex(self)
+        self.health_cache = HealthCache(self)
+
         self.db.bind(provider='sqlite', filename=db_path_string, create_db=create_db, timeout=120.0)
         self.db.generate_mapping(
             create_tables=create_db, check_tables=check_tables
@@ -228,9 +340,12 @@ class MetadataStore:
         if create_db:
             with db_session(ddl=True):
                 self.db.execute(sql_create_fts_table)
+                self.completion_index.create_tables()
                 self.create_fts_triggers()
                 self.create_torrentstate_triggers()
+                self.create_content_version_triggers()
                 self.create_partial_indexes()
+                self.create_sort_indexes()
 
         if create_db:
             with db_session:
@@ -242,6 +357,15 @@ class MetadataStore:
                 default_vsids = self.Vsids.create_default_vsids()
             self.ChannelMetadata.votes_scaling = default_vsids.max_val
 
+        with db_session:
+            # The manifests of the channels that were being processed when Tribler was stopped
+            self.MiscData.select(lambda g: g.name.startswith(CHANNEL_MANIFEST_PREFIX)).delete(bulk=True)
+
+        self.executor = DatabaseExecutor(self.db, name='MetadataStore')
+        self.signature_verifier = SignatureVerifier()
+        self.count_service = TotalCountService(self)
+        self._content_version_connection: Optional[sqlite3.Connection] = None
+
     def set_value(self, key: str, value: str):
         key_value = get_or_create(self.MiscData, name=key)
         key_value.value = value
@@ -268,9 +392,30 @@ class MetadataStore:
                     result.append(db_object)
         return result
 
+    def get_content_version(self) -> Optional[int]:
+        """
+        Get the committed version of the entries and of their health, see `sql_create_content_version_table`.
+        It is read on a separate connection, so it does not wait for the database executor.
+        :return: the content version, or None for an in-memory database
+        """
+        if self.db_path is MEMORY_DB:
+            return None
+        if self._content_version_connection is None:
+            self._content_version_connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        return self._content_version_connection.execute('SELECT version FROM ContentVersion').fetchone()[0]
+
+    async def get_content_version_threaded(self) -> Optional[int]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.get_content_version)
+
     def get_db_file_size(self):
         return 0 if self.db_path is MEMORY_DB else Path(self.db_path).size()
 
+    def get_wal_file_size(self):
+        if self.db_path is MEMORY_DB:
+            return 0
+        wal_path = Path(f'{self.db_path}-wal')
+        return wal_path.size() if wal_path.exists() else 0
+
     def drop_fts_triggers(self):
         cursor = self.db.get_connection().cursor()
         cursor.execute("select name from sqlite_master where type='trigger' and name like 'fts_%'")
@@ -292,10 +437,23 @@ class MetadataStore:
         cursor.execute(sql_add_torrentstate_trigger_after_insert)
         cursor.execute(sql_add_torrentstate_trigger_after_update)
 
+    def create_content_version_triggers(self):
+        cursor = self.db.get_connection().cursor()
+        cursor.execute(sql_create_content_version_table)
+        cursor.execute(sql_init_content_version)
+        for sql in sql_add_content_version_triggers:
+            cursor.execute(sql)
+
     def create_partial_indexes(self):
         cursor = self.db.get_connection().cursor()
         cursor.execute(sql_create_partial_index_channelnode_subscribed)
         cursor.execute(sql_create_partial_index_channelnode_metadata_type)
+        cursor.execute(sql_create_partial_index_torrentstate_last_check)
+
+    def create_sort_indexes(self):
+        cursor = self.db.get_connection().cursor()
+        for sql in sql_create_sort_indexes:
+            cursor.execute(sql)
 
     @db_session
     def upsert_vote(self, channel, peer_pk):
@@ -320,34 +478,76 @@ class MetadataStore:
 
     def shutdown(self):
         self._shutting_down = True
+        self.executor.shutdown()
+        try:
+            self.health_cache.flush()
+        except Exception as e:  # pylint: disable=broad-except
+            self._logger.warning(f'Unable to flush the health cache: {type(e).__name__}: {e}')
+        self.signature_verifier.shutdown()
+        if self._content_version_connection:
+            self._content_version_connection.close()
         self.db.disconnect()
 
     @staticmethod
     def get_list_of_channel_blobs_to_process(dirname, start_timestamp):
         blobs_to_process = []
         total_blobs_size = 0
-        for full_filename in sorted(dirname.iterdir()):
-            blob_sequence_number = get_mdblob_sequence_number(full_filename.name)
+        with os.scandir(dirname) as entries:
+            for entry in entries:
+                blob_sequence_number = get_mdblob_sequence_number(entry.name)
 
-            if blob_sequence_number is None or blob_sequence_number <= start_timestamp:
-                continue
-            blob_size = full_filename.stat().st_size
-            total_blobs_size += blob_size
-            blobs_to_process.append((blob_sequence_number, full_filename, blob_size))
+                if blob_sequence_number is None or blob_sequence_number <= start_timestamp:
+                    continue
+                blob_size = entry.stat().st_size
+                total_blobs_size += blob_size
+                blobs_to_process.append((blob_sequence_number, Path(entry.path), blob_size))
+        blobs_to_process.sort(key=lambda blob: blob[0])
         return blobs_to_process, total_blobs_size
 
     @db_session
     def get_channel_dir_path(self, channel):
         return self.channels_dir / channel.dirname
 
+    @staticmethod
+    def get_channel_manifest_key(public_key, id_):
+        return f'{CHANNEL_MANIFEST_PREFIX}{hexlify(bytes(public_key))}_{id_}'
+
+    @db_session
+    def save_channel_manifest(self, public_key, id_, blobs_to_process):
+        """
+        Store the sequence numbers and the sizes of the blobs in the channel directory,
+        so the progress of the channel processing can be computed without listing the directory.
+        """
+        manifest = [(blob_sequence_number, blob_size) for blob_sequence_number, _, blob_size in blobs_to_process]
+        self.set_value(self.get_channel_manifest_key(public_key, id_), json.dumps(manifest))
+
+    @db_session
+    def delete_channel_manifest(self, public_key, id_):
+        manifest = self.MiscData.get(name=self.get_channel_manifest_key(public_key, id_))
+        if manifest:
+            manifest.delete()
+
+    @db_session
+    def get_channel_manifest(self, channel) -> Optional[List[Tuple[int, int]]]:
+        manifest = self.get_value(self.get_channel_manifest_key(channel.public_key, channel.id_))
+        return json.loads(manifest) if manifest else None
+
     @db_session
     def compute_channel_update_progress(self, channel):
-        blobs_to_process, total_blobs_size = self.get_list_of_channel_blobs_to_process(
-            self.get_channel_dir_path(channel), channel.start_timestamp
-        )
+        manifest = self.get_channel_manifest(channel)
+        if manifest is None:
+            blobs_to_process, _ = self.get_list_of_channel_blobs_to_process(
+                self.get_channel_dir_path(channel), channel.start_timestamp
+            )
+            manifest = [(blob_sequence_number, blob_size) for blob_sequence_number, _, blob_size in blobs_to_process]
+
+        total_blobs_size = 0
         processed_blobs_size = 0
-        for blob_sequence_number, _, blob_size in blobs_to_process:
-            if channel.local_version >= blob_sequence_number >= channel.start_timestamp:
+        for blob_sequence_number, blob_size in manifest:
+            if blob_sequence_number <= channel.start_timestamp:
+                continue
+            total_blobs_size += blob_size
+            if channel.local_version >= blob_sequence_number:
                 processed_blobs_size += blob_size
         return float(processed_blobs_size) / total_blobs_size
 
@@ -376,7 +576,14 @@ class MetadataStore:
             )
 
         blobs_to_process, total_blobs_size = self.get_list_of_channel_blobs_to_process(dirname, channel.start_timestamp)
+        self.save_channel_manifest(public_key, id_, blobs_to_process)
+        try:
+            self._process_channel_blobs(dirname, blobs_to_process, total_blobs_size, public_key, id_, **kwargs)
+        finally:
+            # The manifest is only used to compute the progress of the processing
+            self.delete_channel_manifest(public_key, id_)
 
+    def _process_channel_blobs(self, dirname, blobs_to_process, total_blobs_size, public_key, id_, **kwargs):
         # We count total size of all the processed blobs to estimate the progress of channel processing
         # Counting the blobs' sizes are the only reliable way to estimate the remaining processing time,
         # because it accounts for potential deletions, entry modifications, etc.
@@ -440,16 +647,25 @@ class MetadataStore:
         :return: a list of tuples of (<metadata or payload>, <action type>)
         """
         path = Path.fix_win_long_file(filepath)
-        with open(path, 'rb') as f:
-            serialized_data = f.read()
 
-        if path.endswith('.lz4'):
-            return self.process_compressed_mdblob(serialized_data, **kwargs)
-        return self.process_squashed_mdblob(serialized_data, **kwargs)
+        def read_signed_payloads():
+            chunks = read_file_chunks(path)
+            if path.endswith('.lz4'):
+                chunks = decompress_chunks(chunks)
+            return iter_signed_payloads(chunks)
+
+        try:
+            # The blob is read twice, so the signatures of all its payloads are checked before any of them
+            # is added to the database, without keeping the payloads in memory
+            verified_windows = self.verify_payload_stream(read_signed_payloads())
+            return self.process_payload_stream(read_signed_payloads(), verified_windows, **kwargs)
+        except RuntimeError as e:
+            self._logger.warning(f"Unable to decompress mdblob {path}: {str(e)}")
+            return []
 
     async def process_compressed_mdblob_threaded(self, compressed_data, **kwargs):
         try:
-            return await run_threaded(self.db, self.process_compressed_mdblob, compressed_data, **kwargs)
+            return await self.executor.run(self.process_compressed_mdblob, compressed_data, **kwargs)
         except Exception as e:  # pylint: disable=broad-except  # pragma: no cover
             self._logger.warning("DB transaction error when tried to process compressed mdblob: %s", str(e))
             return None
@@ -474,56 +690,93 @@ class MetadataStore:
 
     def process_torrent_health(self, health: HealthInfo) -> bool:
         """
-        Adds or updates information about a torrent health for the torrent with the specified infohash value
+        Adds or updates information about a torrent health for the torrent with the specified infohash value.
+        The health is written to the database by the next flush of the health cache.
         :param health: a health info of a torrent
-        :return: True if a new TorrentState object was added
+        :return: True if the torrent was not known before
         """
-        if not health.is_valid():
-            self._logger.warning(f'Invalid health info ignored: {health}')
-            return False
+        return health.infohash in self.health_cache.process([health])
 
-        torrent_state = self.TorrentState.get_for_update(infohash=health.infohash)
+    def process_squashed_mdblob(self, chunk_data, external_thread=False, health_info=None, **kwargs):
+        """
+        Process raw concatenated payloads blob.
 
-        if torrent_state and health.should_update(torrent_state):
-            self._logger.debug(f"Update health info {health}")
-            torrent_state.set(seeders=health.seeders, leechers=health.leechers, last_check=health.last_check,
-                              self_checked=False)
-            return False
+        :param chunk_data: the blob itself, consists of one or more GigaChannel payloads concatenated together
+        :param external_thread: see `process_payload_list`
+        :param health_info: the health of the torrents in the blob, in the same order as the payloads
+        :return: a list of tuples of (<metadata or payload>, <action type>)
+        """
+        payload_list = self.read_payloads(chunk_data)
 
-        if not torrent_state:
-            self._logger.debug(f"Add health info {health}")
-            self.TorrentState.from_health(health)
-            return True
+        if health_info and len(health_info) == len(payload_list):
+            self.health_cache.process([
+                HealthInfo(payload.infohash, last_check=last_check, seeders=seeders, leechers=leechers)
+                for payload, (seeders, leechers, last_check) in zip(payload_list, health_info)
+                if hasattr(payload, 'infohash')
+            ])
+            # The entries of the blob are shown right away, so their health should be in the database too
+            self.health_cache.flush()
 
-        return False
+        return self.process_payload_list(payload_list, external_thread=external_thread, **kwargs)
 
-    def process_squashed_mdblob(self, chunk_data, external_thread=False, health_info=None, **kwargs):
+    def verify_payload_stream(self, signed_payloads: Iterable[SignedPayloadData]) -> List[VerifiedWindow]:
+        """
+        Check the signatures of the payloads as they are parsed from a blob, in windows of VERIFICATION_WINDOW_SIZE
+        payloads. The payloads are not kept: a window is described by the digest of its bytes and the indexes
+        of its payloads which signature checks were skipped, see `verify_payloads`.
+
+        :param signed_payloads: an iterable of the payloads with the signed parts of their serialized data
+        :return: a list of the verified windows, for `process_payload_stream`
+        :raises InvalidSignatureException: if any of the payloads has a wrong signature
+        """
+        verified_windows = []
+        signed_payloads = iter(signed_payloads)
+        while window := list(islice(signed_payloads, VERIFICATION_WINDOW_SIZE)):
+            payload_list = self.verify_payloads(window)
+            skipped = frozenset(i for i, payload in enumerate(payload_list) if payload.signature_skipped)
+            verified_windows.append((get_payloads_digest(payload_list), skipped))
+        return verified_windows
+
+    def process_payload_stream(self, signed_payloads: Iterable[SignedPayloadData],
+                               verified_windows: List[VerifiedWindow], external_thread=False, **kwargs):
+        """
+        Process the payloads as they are parsed from a blob, in windows of VERIFICATION_WINDOW_SIZE payloads.
+        The signatures of the payloads must have been checked by `verify_payload_stream`, and the payloads
+        must be the same as they were then.
+
+        :param signed_payloads: an iterable of the payloads with the signed parts of their serialized data
+        :param verified_windows: the result of `verify_payload_stream` for the same payloads
+        :param external_thread: see `process_payload_list`
+        :return: a list of tuples of (<metadata or payload>, <action type>)
+        :raises InvalidSignatureException: if the payloads are not the same as the verified ones
+        """
+        result = []
+        signed_payloads = iter(signed_payloads)
+        verified_windows = iter(verified_windows)
+        while window := list(islice(signed_payloads, VERIFICATION_WINDOW_SIZE)):
+            payload_list = [payload for payload, _ in window]
+            digest, skipped = next(verified_windows, (None, None))
+            if get_payloads_digest(payload_list) != digest:
+                raise InvalidSignatureException("The payloads changed after their signatures were checked")
+            for i in skipped:
+                payload_list[i].signature_skipped = True
+            result.extend(self.process_payload_list(payload_list, external_thread=external_thread, **kwargs))
+            if self._shutting_down:
+                break
+        return result
+
+    def process_payload_list(self, payload_list, external_thread=False, **kwargs):
         """
-        Process raw concatenated payloads blob. This routine breaks the database access into smaller batches.
+        Add the payloads to the database. This routine breaks the database access into smaller batches.
         It uses a congestion-control like algorithm to determine the optimal batch size, targeting the
         batch processing time value of self.reference_timedelta.
 
-        :param chunk_data: the blob itself, consists of one or more GigaChannel payloads concatenated together
+        :param payload_list: the payloads with checked signatures
         :param external_thread: if this is set to True, we add some sleep between batches to allow other threads
             to get the database lock. This is an ugly workaround for Python and asynchronous programming (locking)
             imperfections. It only makes sense to use it when this routine runs on a non-reactor thread.
         :return: a list of tuples of (<metadata or payload>, <action type>)
         """
-
-        offset = 0
-        payload_list = []
-        while offset < len(chunk_data):
-            payload, offset = read_payload_with_offset(chunk_data, offset)
-            payload_list.append(payload)
-
-        if health_info and len(health_info) == len(payload_list):
-            with db_session:
-                for payload, (seeders, leechers, last_check) in zip(payload_list, health_info):
-                    if hasattr(payload, 'infohash'):
-                        health = HealthInfo(payload.infohash, last_check=last_check,
-                                            seeders=seeders, leechers=leechers)
-                        self.process_torrent_health(health)
-
         result = []
         total_size = len(payload_list)
         start = 0
@@ -534,8 +787,8 @@ class MetadataStore:
 
             # We separate the sessions to minimize database locking.
             with db_session(immediate=True):
-                for payload in batch:
-                    result.extend(self.process_payload(payload, **kwargs))
+                self.check_skipped_signatures(batch)
+                result.extend(self.process_payload_batch(batch, **kwargs))
 
             # Batch size adjustment
             batch_end_time = datetime.now() - batch_start_time
@@ -564,10 +817,89 @@ class MetadataStore:
 
         return result
 
+    def read_payloads(self, chunk_data):
+        """
+        Parse raw concatenated payloads blob and check the signatures of the payloads.
+
+        The blob is parsed first, and the signatures are checked afterwards: the payloads we already store are
+        skipped, and the rest are checked by the signature verifier, which uses several processes for large blobs.
+
+        :param chunk_data: the blob itself, consists of one or more GigaChannel payloads concatenated together
+        :return: a list of payloads
+        :raises InvalidSignatureException: if any of the payloads has a wrong signature
+        """
+        return self.verify_payloads(list(iter_signed_payloads([chunk_data])))
+
+    def verify_payloads(self, signed_payloads: List[SignedPayloadData]):
+        """
+        Check the signatures of the parsed payloads.
+
+        The payloads we already store byte for byte are not checked again, and are marked with `signature_skipped`.
+        Their stored copies can be gone by the time they are added to the database, so they are checked again then,
+        see `check_skipped_signatures`. Nothing is skipped if any of the payloads deletes an entry.
+
+        :param signed_payloads: a list of the payloads with the signed parts of their serialized data
+        :return: a list of payloads
+        :raises InvalidSignatureException: if any of the payloads has a wrong signature
+        """
+        payload_list = [payload for payload, _ in signed_payloads]
+        stored = set() if has_deletions(payload_list) else self.get_stored_payloads(payload_list)
+        to_verify = []
+        for payload, data in signed_payloads:
+            if payload.public_key == NULL_KEY:
+                payload.check_signature()  # There is no signature to verify for free-for-all entries
+            elif data + payload.signature in stored:
+                payload.signature_skipped = True
+            else:
+                to_verify.append((payload.public_key, data, payload.signature))
+
+        if not all(self.signature_verifier.verify(to_verify)):
+            raise InvalidSignatureException("Tried to create payload with wrong signature")
+        return payload_list
+
+    def check_skipped_signatures(self, payloads):
+        """
+        Check the signatures skipped by `verify_payloads` of the payloads which stored copies are gone.
+        Must be called in the db_session that adds the payloads, so the stored copies can not be deleted meanwhile.
+
+        :raises InvalidSignatureException: if any of the payloads has a wrong signature
+        """
+        skipped = [payload for payload in payloads if payload.signature_skipped]
+        if not skipped:
+            return
+        stored = set() if has_deletions(payloads) else self.get_stored_payloads(skipped)
+        to_verify = []
+        for payload in skipped:
+            signed_blob = payload.get_signed_blob()
+            if signed_blob not in stored:
+                to_verify.append((payload.public_key, signed_blob[:-SIGNATURE_SIZE], payload.signature))
+            payload.signature_skipped = False
+
+        if not all(self.signature_verifier.verify(to_verify)):
+            raise InvalidSignatureException("Tried to create payload with wrong signature")
+
+    @db_session
+    def get_stored_payloads(self, payloads):
+        """
+        Return the stored serialized data and signatures of the entries with the signatures of the given payloads.
+        The payloads with the same bytes can not change the database, so there is no need to check their signatures.
+        """
+        signatures = list({p.signature for p in payloads if hasattr(p, 'id_')})
+        stored = set()
+        for i in range(0, len(signatures), MAX_SQL_VARIABLES):
+            chunk = signatures[i:i + MAX_SQL_VARIABLES]
+            stored.update(select(g.serialized_payload for g in self.ChannelNode
+                                 if g.signature in chunk and g.serialized_payload is not None))
+        return stored
+
     @db_session
     def process_payload(self, payload, **kwargs):
         return process_payload(self, payload, **kwargs)
 
+    @db_session
+    def process_payload_batch(self, payloads, **kwargs):
+        return process_payload_batch(self, payloads, **kwargs)
+
     @db_session
     def get_num_channels(self):
         return orm.count(self.ChannelMetadata.select(lambda g: g.metadata_type == CHANNEL_TORRENT))
@@ -623,8 +955,8 @@ class MetadataStore:
             #   * Finally, in the main query, we apply a slow ranking function to these 1000 torrents to show the most
             #     relevant torrents at the top of the search result list.
             #
-            # This multistep sort+limit sequence allows speedup queries up to two orders of magnitude. To further
-            # speed up full-text search queries, we can rewrite the torrent_rank function to C one day.
+            # This multistep sort+limit sequence allows speedup queries up to two orders of magnitude. The final
+            # ranking is not done by SQLite: see the `rank_search_results` method for details.
             fts_ids = raw_sql("""
                 SELECT fts.rowid
                 FROM (
@@ -681,16 +1013,7 @@ class MetadataStore:
             if metadata_type != REGULAR_TORRENT:
                 raise TypeError('With `popular=True`, only `metadata_type=REGULAR_TORRENT` is allowed')
 
-            t = time() - POPULAR_TORRENTS_FRESHNESS_PERIOD
-            health_list = list(
-                select(
-                    health
-                    for health in self.TorrentState
-                    if health.last_check >= t and (health.seeders > 0 or health.leechers > 0)
-                ).order_by(
-                    lambda health: (desc(health.seeders), desc(health.leechers), desc(health.last_check))
-                )[:POPULAR_TORRENTS_COUNT]
-            )
+            health_list = list(self.get_popular_torrents_health_query()[:POPULAR_TORRENTS_COUNT])
             pony_query = pony_query.where(lambda g: g.health in health_list)
 
         if max_rowid is not None:
@@ -702,11 +1025,9 @@ class MetadataStore:
             except TypeError:
                 pony_query = pony_query.where(lambda g: g.metadata_type == metadata_type)
 
-        pony_query = (
-            pony_query.where(public_key=(b"" if channel_pk == NULL_KEY_SUBST else channel_pk))
-            if channel_pk is not None
-            else pony_query
-        )
+        if channel_pk is not None:
+            public_key = b"" if channel_pk == NULL_KEY_SUBST else channel_pk
+            pony_query = pony_query.where(lambda g: g.public_key == public_key)
 
         if attribute_ranges is not None:
             for attr, left, right in attribute_ranges:
@@ -720,9 +1041,13 @@ class MetadataStore:
                 if right is not None:
                     pony_query = pony_query.where(f"g.{attr} < right")
 
+        # Keyword arguments of `where` are not used here, because Pony fails to use the resulting queries as
+        # subqueries (see `rank_search_results`). The attribute value is validated explicitly instead.
+        if id_ is not None:
+            id_ = self.ChannelNode.id_.validate(id_, entity=self.ChannelNode)
+            pony_query = pony_query.where(lambda g: g.id_ == id_)
         # origin_id can be zero, for e.g. root channel
-        pony_query = pony_query.where(id_=id_) if id_ is not None else pony_query
-        pony_query = pony_query.where(origin_id=origin_id) if origin_id is not None else pony_query
+        pony_query = pony_query.where(lambda g: g.origin_id == origin_id) if origin_id is not None else pony_query
         pony_query = pony_query.where(lambda g: g.subscribed) if subscribed is not None else pony_query
         pony_query = pony_query.where(lambda g: g.tags == category) if category else pony_query
         pony_query = pony_query.where(lambda g: g.status != TODELETE) if exclude_deleted else pony_query
@@ -759,91 +1084,169 @@ class MetadataStore:
             sort_expression = "desc(g.num_entries), desc(g.size)" if sort_desc else "g.num_entries, g.size"
             pony_query = pony_query.sort_by(sort_expression)
         elif sort_by:
-            sort_expression = raw_sql(f"g.{sort_by} COLLATE NOCASE" + (" DESC" if sort_desc else ""))
+            # Only the text columns are sorted case-insensitively. COLLATE NOCASE does not change the order of
+            # other columns, but it prevents SQLite from using their indexes for sorting.
+            attr = (
+                    self.ChannelNode._adict_.get(sort_by)  # pylint: disable=W0212
+                    or self.ChannelNode._subclass_adict_.get(sort_by)  # pylint: disable=W0212
+            )
+            collation = " COLLATE NOCASE" if attr is None or attr.py_type is str else ""
+            sort_expression = raw_sql(f"g.{sort_by}{collation}" + (" DESC" if sort_desc else ""))
             pony_query = pony_query.sort_by(sort_expression)
 
-        if sort_by is None:
-            if txt_filter:
-                # pylint: disable=W0105
-                """
-                The following call of `sort_by` produces an ORDER BY expression that looks like this:
-
-                ORDER BY
-                    case when "g"."metadata_type" = $CHANNEL_TORRENT then 1
-                         when "g"."metadata_type" = $COLLECTION_NODE then 2
-                         else 3 end,
-
-                    search_rank(
-                        $QUERY_STRING,
-                        g.title,
-                        torrentstate.seeders,
-                        torrentstate.leechers,
-                        $CURRENT_TIME - strftime('%s', g.torrent_date)
-                    ) DESC,
-
-                    "torrentstate"."last_check" DESC,
-
-                So, the channel torrents and channel folders are always on top if they are not filtered out.
-                Then regular torrents are selected in order of their relevance according to a search_rank() result.
-                If two torrents have the same search rank, they are ordered by the last time they were checked.
-
-                The search_rank() function is called directly from the SQLite query, but is implemented in Python,
-                it is actually the torrent_rank() function from core/utilities/search_utils.py, wrapped with
-                keep_exception() to return possible exception from SQLite to Python.
-
-                The search_rank() function receives the following arguments:
-                  - the current query string (like "Big Buck Bunny");
-                  - the title of the current torrent;
-                  - the number of seeders;
-                  - the number of leechers;
-                  - the number of seconds since the torrent's creation time.
-                """
-
-                pony_query = pony_query.sort_by(
-                    f"""
-                    (1 if g.metadata_type == {CHANNEL_TORRENT} else 2 if g.metadata_type == {COLLECTION_NODE} else 3),
-                    raw_sql('''search_rank(
-                        $txt_filter, g.title, torrentstate.seeders, torrentstate.leechers,
-                        $int(time()) - strftime('%s', g.torrent_date)
-                    ) DESC'''),
-                    desc(g.health.last_check)  # just to trigger the TorrentState table inclusion into the left join
-                """
-                )
-            elif popular:
-                pony_query = pony_query.sort_by('(desc(g.health.seeders), desc(g.health.leechers))')
+        # Text search results without explicit sorting are ordered by relevance in `get_entries`. It is done
+        # by the `rank_search_results` method, as the ranking function is too expensive to call from SQLite.
+        if sort_by is None and popular and not txt_filter:
+            pony_query = pony_query.sort_by('(desc(g.health.seeders), desc(g.health.leechers))')
 
         return pony_query
 
     async def get_entries_threaded(self, **kwargs):
-        return await run_threaded(self.db, self.get_entries, **kwargs)
+        return await self.executor.run(self.get_entries, **kwargs)
+
+    def get_popular_torrents_health_query(self):
+        t = time() - POPULAR_TORRENTS_FRESHNESS_PERIOD
+        # The `has_data` condition is implied by the `last_check` one, it lets SQLite use the partial index
+        return select(
+            health
+            for health in self.TorrentState
+            if health.has_data == True  # pylint: disable=singleton-comparison
+            and health.last_check >= t and (health.seeders > 0 or health.leechers > 0)
+        ).order_by(
+            lambda health: (desc(health.seeders), desc(health.leechers), desc(health.last_check))
+        )
 
     @db_session
-    def get_entries(self, first=1, last=None, **kwargs):
+    def get_entries(self, first=1, last=None, after_key=None, **kwargs):
         """
         Get some torrents. Optionally sort the results by a specific field, or filter the channels based
         on a keyword/whether you are subscribed to it.
+
+        If `after_key` is given, the page starts right after the entry with this sort key (see
+        metadata_store/db/pagination.py), and `first` and `last` only determine the page size.
         :return: A list of class members
         """
-        pony_query = self.get_entries_query(**kwargs)
-        result = pony_query[(first or 1) - 1: last]
+        if kwargs.get('txt_filter') and kwargs.get('sort_by') is None:
+            rowids = self.rank_search_results(**kwargs)[(first or 1) - 1: last]
+            result = self.get_entries_by_rowids(rowids, cls=kwargs.get('cls'))
+        elif after_key is not None and is_keyset_pagination_supported(**kwargs):
+            pony_query = self.get_entries_query(**kwargs)
+            pony_query = self.filter_after_sort_key(pony_query, after_key, sort_by=kwargs.get('sort_by'),
+                                                    sort_desc=kwargs.get('sort_desc', True))
+            result = pony_query[:last - (first or 1) + 1] if last is not None else pony_query[:]
+        else:
+            pony_query = self.get_entries_query(**kwargs)
+            result = pony_query[(first or 1) - 1: last]
         for entry in result:
             # ACHTUNG! This is necessary in order to load entry.health inside db_session,
             # to be able to perform successfully `entry.to_simple_dict()` later
             entry.to_simple_dict()
         return result
 
+    @staticmethod
+    def filter_after_sort_key(pony_query, sort_key, sort_by=None, sort_desc=True):
+        """
+        Filter the query that is sorted by `get_entries_query` to the entries that follow the given sort key.
+        """
+        # The sort key is compared as a whole, in the same order as the ORDER BY clause of the query. Unlike with
+        # OFFSET, SQLite does not have to produce and discard the rows of the previous pages.
+        if sort_by == 'HEALTH':
+            seeders, leechers, rowid = sort_key
+            if sort_desc:
+                return pony_query.where(lambda g: (coalesce(g.health.seeders, NO_HEALTH),
+                                                   coalesce(g.health.leechers, NO_HEALTH),
+                                                   g.rowid) < (seeders, leechers, rowid))
+            return pony_query.where(lambda g: (coalesce(g.health.seeders, NO_HEALTH),
+                                               coalesce(g.health.leechers, NO_HEALTH),
+                                               g.rowid) > (seeders, leechers, rowid))
+        if sort_by == 'title':
+            title, rowid = sort_key  # pylint: disable=unused-variable
+            if sort_desc:
+                return pony_query.where(lambda g: raw_sql('(g.title COLLATE NOCASE, g.rowid) < ($title, $rowid)'))
+            return pony_query.where(lambda g: raw_sql('(g.title COLLATE NOCASE, g.rowid) > ($title, $rowid)'))
+        rowid, = sort_key
+        if sort_desc:
+            return pony_query.where(lambda g: g.rowid < rowid)
+        return pony_query.where(lambda g: g.rowid > rowid)
+
+    @db_session
+    def rank_search_results(self, txt_filter, sort_desc=True, **kwargs) -> List[int]:
+        """
+        Get rowids of the entries matching the text query, ordered by relevance.
+
+        Candidate rows are fetched with a single query, and the whole batch is ranked at once. The resulting order is:
+          - channel torrents, then channel folders, then everything else;
+          - then by the `torrent_rank()` value from core/utilities/search_utils.py in descending order;
+          - then by the last time the torrent health was checked, in descending order;
+          - then by rowid, in descending order if `sort_desc` is True.
+        """
+        pony_query = self.get_entries_query(txt_filter=txt_filter, sort_desc=sort_desc, **kwargs)
+        now = int(time())  # pylint: disable=unused-variable
+        candidates_query = left_join(
+            (
+                g.rowid, g.metadata_type, g.title, g.health.seeders, g.health.leechers, g.health.last_check,
+                raw_sql("$now - strftime('%s', g.torrent_date)")
+            )
+            for g in pony_query
+        )
+        # The rows are fetched directly from the cursor, as the per-value conversion done by Pony for query results
+        # takes more time than the ranking itself
+        # pylint: disable=protected-access
+        sql, arguments, _, _ = candidates_query._construct_sql_and_arguments()
+        candidates = self.db._exec_sql(sql, arguments).fetchall()
+        return self.order_search_candidates(txt_filter, candidates, sort_desc=sort_desc)
+
+    @staticmethod
+    def order_search_candidates(txt_filter: str, candidates: List[Tuple], sort_desc=True) -> List[int]:
+        """
+        Order search candidates by relevance.
+        :param txt_filter: the text query
+        :param candidates: a list of (rowid, metadata_type, title, seeders, leechers, last_check, freshness) tuples
+        :param sort_desc: the order of rowids for the entries with the same rank and last check time
+        :return: a list of rowids
+        """
+        if not candidates:
+            return []
+
+        rowids, metadata_types, titles, seeders, leechers, last_checks, freshness = zip(*candidates)
+        ranks = torrent_rank_batch(txt_filter, titles, seeders, leechers, freshness)
+
+        metadata_types = np.array(metadata_types)
+        type_priorities = np.where(metadata_types == CHANNEL_TORRENT, 1,
+                                   np.where(metadata_types == COLLECTION_NODE, 2, 3))
+        # Missing values go last, as SQLite does it for NULLs with descending order
+        last_check_missing = np.array([last_check is None for last_check in last_checks])
+        last_checks = np.array([last_check or 0 for last_check in last_checks], dtype=np.int64)
+        rowids = np.array(rowids, dtype=np.int64)
+
+        # The last key is the primary one
+        order = np.lexsort((-rowids if sort_desc else rowids, -last_checks, last_check_missing, -ranks,
+                            type_priorities))
+        return rowids[order].tolist()
+
+    @db_session
+    def get_entries_by_rowids(self, rowids: List[int], cls=None) -> list:
+        """
+        Get entries by their rowids, preserving the order of rowids.
+        """
+        if not rowids:
+            return []
+        cls = cls or self.ChannelNode
+        entries = {entry.rowid: entry for entry in cls.select(lambda g: g.rowid in rowids)}
+        return [entries[rowid] for rowid in rowids if rowid in entries]
+
     @db_session
     def get_total_count(self, **kwargs):
         """
         Get total count of torrents that would be returned if there would be no pagination/limits/sort
         """
-        for p in ["first", "last", "sort_by", "sort_desc"]:
+        for p in ["first", "last", "after_key", "sort_by", "sort_desc"]:
             kwargs.pop(p, None)
         return self.get_entries_query(**kwargs).count()
 
     @db_session
     def get_entries_count(self, **kwargs):
-        for p in ["first", "last"]:
+        for p in ["first", "last", "after_key"]:
             kwargs.pop(p, None)
         return self.get_entries_query(**kwargs).count()
 
@@ -853,13 +1256,26 @@ class MetadataStore:
 
     fts_keyword_search_re = re.compile(r'\w+', re.UNICODE)
 
-    def get_auto_complete_terms(self, text, max_terms, limit=200):
+    def update_completion_index(self, max_titles=None) -> int:
+        return self.completion_index.update(max_titles=max_titles)
+
+    def get_auto_complete_terms(self, text, max_terms):
+        """
+        Get the auto-completion suggestions for the text from the completion index.
+        The index is updated in the background by the DatabaseMaintenance. Until the titles of an upgraded database
+        are backfilled, the suggestions are made from the titles matched by the FTS index.
+        """
         if not text:
             return []
 
+        if not self.completion_index.is_backfilled():
+            return self.get_fts_auto_complete_terms(text, max_terms)
+        return self.completion_index.get_suggestions(text, max_terms)
+
+    def get_fts_auto_complete_terms(self, text, max_terms, limit=200):
         words = self.fts_keyword_search_re.findall(text)
         if not words:
-            return ""
+            return []
 
         fts_query = '"%s"*' % ' '.join(f'{word}' for word in words)  # pylint: disable=unused-variable
         suggestion_pattern = r'\W+'.join(word for word in words) + r'(\W*)((?:[.-]?\w)*)'
@@ -0,0 +1,52 @@
+import lz4.frame
+import pytest
+from pony.orm import db_session
+
+from tribler.core.components.metadata_store.db.blob_stream import (
+    decompress_chunks,
+    iter_signed_payloads,
+    read_file_chunks,
+)
+from tribler.core.components.metadata_store.db.serialization import SIGNATURE_SIZE
+from tribler.core.utilities.utilities import random_infohash
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.fixture
+def serialized_entries(metadata_store):
+    with db_session:
+        md_list = [metadata_store.TorrentMetadata(title=f'torrent {i}', infohash=random_infohash()) for i in range(5)]
+        return [md.serialized() for md in md_list]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 100, 10000])
+def test_iter_signed_payloads_chunk_boundaries(serialized_entries, chunk_size):
+    blob = b''.join(serialized_entries)
+    result = list(iter_signed_payloads(split(blob, chunk_size)))
+
+    assert [data for _, data in result] == [entry[:-SIGNATURE_SIZE] for entry in serialized_entries]
+    assert [payload.signature for payload, _ in result] == [entry[-SIGNATURE_SIZE:] for entry in serialized_entries]
+
+
+def test_read_compressed_file(tmp_path, serialized_entries):
+    blob = b''.join(serialized_entries)
+    path = tmp_path / 'blob.mdblob.lz4'
+    path.write_bytes(lz4.frame.compress(blob) + b'garbage after the frame')
+
+    chunks = list(decompress_chunks(read_file_chunks(str(path), chunk_size=16), max_length=32))
+    assert all(len(chunk) <= 32 for chunk in chunks)
+    assert b''.join(chunks) == blob
+
+
+def test_read_empty_file(tmp_path):
+    path = tmp_path / 'empty.mdblob'
+    path.write_bytes(b'')
+    assert not list(read_file_chunks(str(path)))
+
+
+def test_decompress_invalid_data():
+    with pytest.raises(RuntimeError):
+        list(decompress_chunks([b'abcdefg']))
@@ -0,0 +1,107 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from tribler.core.components.libtorrent.utils.libtorrent_helper import libtorrent as lt
+from tribler.core.components.metadata_store.db import channel_torrent
+from tribler.core.components.metadata_store.db.channel_torrent import create_channel_torrent, get_torrent_file_hashes
+from tribler.core.utilities.path_util import Path
+
+
+def create_libtorrent_torrent(directory):
+    fs = lt.file_storage()
+    lt.add_files(fs, str(directory))
+    t = lt.create_torrent(fs)
+    lt.set_piece_hashes(t, str(directory.parent))
+    return t.generate()
+
+
+def without_creation_date(torrent):
+    return lt.bencode({key: value for key, value in torrent.items() if key != b'creation date'})
+
+
+def add_files(directory, sizes, start=0):
+    for index, size in enumerate(sizes, start):
+        (directory / f'{index:012d}.mdblob.lz4').write_bytes(os.urandom(size))
+
+
+@pytest.fixture
+def channel_dir(tmp_path):
+    directory = Path(tmp_path) / 'channel'
+    directory.mkdir()
+    return directory
+
+
+@pytest.mark.parametrize('sizes', [[1], [16385], [1, 2, 3], [32768, 65536, 5000], [3_000_000, 10, 7_000_000]])
+def test_same_as_libtorrent(channel_dir, sizes):
+    add_files(channel_dir, sizes)
+    torrent = create_channel_torrent(channel_dir)
+    assert without_creation_date(torrent) == without_creation_date(create_libtorrent_torrent(channel_dir))
+
+
+@pytest.mark.parametrize('use_libtorrent', [False, True])
+def test_reuse_previous_hashes(channel_dir, use_libtorrent):
+    add_files(channel_dir, [100000, 5])
+    previous = create_libtorrent_torrent(channel_dir) if use_libtorrent else create_channel_torrent(channel_dir)
+    torrent_path = channel_dir.parent / 'channel.torrent'
+    torrent_path.write_bytes(lt.bencode(previous))
+    add_files(channel_dir, [7, 300000], start=2)
+
+    with patch.object(channel_torrent, 'hash_file', wraps=channel_torrent.hash_file) as hash_file:
+        torrent = create_channel_torrent(channel_dir, previous_torrent_path=torrent_path)
+
+    hashed = sorted(call.args[0].name for call in hash_file.call_args_list)
+    assert hashed == ['000000000002.mdblob.lz4', '000000000003.mdblob.lz4']
+    assert without_creation_date(torrent) == without_creation_date(create_libtorrent_torrent(channel_dir))
+
+
+def test_modified_files_are_hashed_again(channel_dir):
+    add_files(channel_dir, [100, 200])
+    torrent_path = channel_dir.parent / 'channel.torrent'
+    torrent_path.write_bytes(lt.bencode(create_channel_torrent(channel_dir)))
+    os.utime(channel_dir / '000000000000.mdblob.lz4', ns=(0, torrent_path.stat().st_mtime_ns + 1))
+
+    with patch.object(channel_torrent, 'hash_file', wraps=channel_torrent.hash_file) as hash_file:
+        create_channel_torrent(channel_dir, previous_torrent_path=torrent_path)
+    assert [call.args[0].name for call in hash_file.call_args_list] == ['000000000000.mdblob.lz4']
+
+
+def test_piece_length_change(channel_dir):
+    add_files(channel_dir, [1000, 1000])
+    previous = create_channel_torrent(channel_dir)
+    torrent_path = channel_dir.parent / 'channel.torrent'
+    torrent_path.write_bytes(lt.bencode(previous))
+    add_files(channel_dir, [40_000_000], start=2)
+
+    torrent = create_channel_torrent(channel_dir, previous_torrent_path=torrent_path)
+    assert torrent[b'info'][b'piece length'] != previous[b'info'][b'piece length']
+    assert without_creation_date(torrent) == without_creation_date(create_libtorrent_torrent(channel_dir))
+
+
+def test_single_file_hashes_are_not_reused():
+    # The last piece of the only file of a single file torrent is hashed without the padding
+    torrent = {
+        b'info': {
+            b'file tree': {b'a': {b'': {b'length': 100, b'pieces root': bytes(32)}}},
+            b'files': [{b'length': 100, b'path': [b'a']}],
+            b'piece length': 16384,
+            b'pieces': bytes(20),
+        }
+    }
+    assert get_torrent_file_hashes(torrent) == (16384, {})
+
+
+def test_broken_previous_torrent(channel_dir):
+    add_files(channel_dir, [100, 200])
+    torrent_path = channel_dir.parent / 'channel.torrent'
+    torrent_path.write_bytes(b'garbage')
+
+    torrent = create_channel_torrent(channel_dir, previous_torrent_path=torrent_path)
+    assert without_creation_date(torrent) == without_creation_date(create_libtorrent_torrent(channel_dir))
+
+
+def test_unsupported_layout(channel_dir):
+    add_files(channel_dir, [100])
+    (channel_dir / 'empty').write_bytes(b'')
+    assert create_channel_torrent(channel_dir) is None
@@ -0,0 +1,128 @@
+from pony.orm import db_session, flush
+
+from tribler.core.components.metadata_store.db.completion_index import END, NO_PREV, get_title_terms
+from tribler.core.utilities.utilities import random_infohash
+
+
+def add_torrents(metadata_store, *titles):
+    with db_session:
+        for title in titles:
+            metadata_store.TorrentMetadata(title=title, infohash=random_infohash())
+    metadata_store.update_completion_index()
+
+
+def get_weights(metadata_store):
+    with db_session:
+        return {(prev, term, sep): weight for prev, term, sep, weight in
+                metadata_store.db.select('prev, term, sep, weight FROM CompletionTerm')}
+
+
+def test_title_terms():
+    assert get_title_terms('Big.Buck bunny, big!') == {
+        (NO_PREV, 'big', ''), (NO_PREV, 'buck', ''), (NO_PREV, 'bunny', ''),
+        ('big', 'buck', '.'), ('buck', 'bunny', ' '), ('bunny', 'big', ', '), ('big', END, '!'),
+    }
+    assert get_title_terms('big ----- buck') == {
+        (NO_PREV, 'big', ''), (NO_PREV, 'buck', ''), ('big', 'buck', ' '), ('buck', END, ''),
+    }
+    assert get_title_terms('') == set()
+
+
+def test_incremental_update(metadata_store):
+    index = metadata_store.completion_index
+    with db_session:
+        metadata_store.TorrentMetadata(title='big buck bunny', infohash=random_infohash())
+        metadata_store.TorrentMetadata(title='big buck', infohash=random_infohash())
+
+    # The titles of the new entries are queued by the triggers
+    assert index.get_queue_size() == 2
+    assert index.update(max_titles=1) == 1
+    assert index.update() == 1
+    assert index.update() == 0
+    assert get_weights(metadata_store) == {
+        (NO_PREV, 'big', ''): 2, (NO_PREV, 'buck', ''): 2, (NO_PREV, 'bunny', ''): 1,
+        ('big', 'buck', ' '): 2, ('buck', 'bunny', ' '): 1, ('bunny', END, ''): 1, ('buck', END, ''): 1,
+    }
+
+    with db_session:
+        torrent = metadata_store.TorrentMetadata.get(title='big buck bunny')
+        torrent.tag_processor_version = 1  # Updates that do not change the title are not queued
+        flush()
+        assert index.get_queue_size() == 0
+        torrent.title = 'big bird'
+    with db_session:
+        metadata_store.TorrentMetadata.get(title='big buck').delete()
+    assert index.get_queue_size() == 3
+    index.update()
+
+    assert get_weights(metadata_store) == {
+        (NO_PREV, 'big', ''): 1, (NO_PREV, 'bird', ''): 1, ('big', 'bird', ' '): 1, ('bird', END, ''): 1,
+    }
+
+
+def test_backfill(metadata_store):
+    """
+    Test that the entries created before the index are backfilled once, and the others are queued
+    """
+    index = metadata_store.completion_index
+    add_torrents(metadata_store, 'big buck bunny', 'big buck', 'big bird')
+    with db_session:
+        # The index of an upgraded database: the existing entries are to be backfilled
+        metadata_store.db.execute('DELETE FROM CompletionTerm')
+        metadata_store.db.execute('UPDATE CompletionState SET indexed_rowid = 0, backfill_rowid = $max_rowid',
+                                  {'max_rowid': metadata_store.get_max_rowid()})
+    index._backfilled = False  # pylint: disable=protected-access
+    assert not index.is_backfilled()
+
+    with db_session:
+        # The changes of the entries that are not backfilled yet are not queued
+        metadata_store.TorrentMetadata.get(title='big bird').title = 'big buck 2'
+        metadata_store.TorrentMetadata(title='big buck 3', infohash=random_infohash())
+    assert index.get_queue_size() == 1
+
+    # The queue is applied first
+    assert index.update(max_titles=2) == 2
+    assert index.get_backfill_range()[0] == 1
+    while index.update(max_titles=2):
+        pass
+    assert index.is_backfilled()
+    # Every title is indexed once, with its current text
+    weights = get_weights(metadata_store)
+    assert weights[(NO_PREV, 'big', '')] == 4
+    assert ('big', 'bird', ' ') not in weights
+    assert metadata_store.get_auto_complete_terms('big buck', 10) == [
+        'big buck', 'big buck 2', 'big buck 3', 'big buck bunny'
+    ]
+
+
+def test_large_queue_is_drained(metadata_store):
+    """
+    Test that a large queue is applied in batches, without rebuilding the index
+    """
+    index = metadata_store.completion_index
+    add_torrents(metadata_store, *[f'torrent {i}' for i in range(10)])
+    with db_session:
+        for torrent in metadata_store.TorrentMetadata.select():
+            torrent.title += ' renamed'
+    assert index.get_queue_size() == 20
+
+    for _ in range(5):
+        assert index.update(max_titles=4) == 4
+    assert index.update() == 0
+    assert metadata_store.get_auto_complete_terms('torrent 1', 10) == ['torrent 1 renamed']
+
+
+def test_suggestions_are_ranked(metadata_store):
+    add_torrents(metadata_store, 'ubuntu desktop', 'ubuntu server', 'ubuntu server 22.04', 'ubuntus', 'kubuntu')
+
+    assert metadata_store.get_auto_complete_terms('ubu', 10) == ['ubuntu', 'ubuntus']
+    assert metadata_store.get_auto_complete_terms('ubuntu', 10) == ['ubuntus', 'ubuntu server', 'ubuntu desktop']
+    assert metadata_store.get_auto_complete_terms('ubuntu s', 1) == ['ubuntu server']
+
+
+def test_suggestions_scan_limit(metadata_store):
+    metadata_store.completion_index.scan_limit = 2
+    add_torrents(metadata_store, 'aa', 'ab', 'ac', 'ac')
+
+    # Only the first terms in the alphabetical order are ranked
+    assert metadata_store.get_auto_complete_terms('a', 10) == ['aa', 'ab']
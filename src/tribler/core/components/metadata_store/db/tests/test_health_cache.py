@@ -0,0 +1,123 @@
+import time
+from unittest.mock import patch
+
+from pony.orm import db_session
+
+from tribler.core.components.torrent_checker.torrent_checker.dataclasses import HealthInfo
+from tribler.core.utilities.utilities import random_infohash
+
+
+def get_state(metadata_store, infohash):
+    with db_session:
+        state = metadata_store.TorrentState.get(infohash=infohash)
+        return state.to_health() if state else None
+
+
+def test_process_new_and_stale_health(metadata_store):
+    cache = metadata_store.health_cache
+    now = int(time.time())
+    known, unknown = random_infohash(), random_infohash()
+    with db_session:
+        metadata_store.TorrentState(infohash=known, seeders=5, last_check=now)
+
+    added = cache.process([HealthInfo(known, last_check=now - 10, seeders=1),
+                           HealthInfo(unknown, last_check=now, seeders=2)])
+    assert added == {unknown}
+    assert cache.get(known).seeders == 5
+    assert cache.dirty_count == 1
+
+    # The health is not written to the database until the cache is flushed
+    assert get_state(metadata_store, unknown) is None
+    assert cache.flush() == 1
+    assert cache.dirty_count == 0
+    assert get_state(metadata_store, unknown).seeders == 2
+    assert get_state(metadata_store, known).seeders == 5
+
+    # The infohash is known now
+    assert not cache.process([HealthInfo(unknown, last_check=now + 1, seeders=3)])
+    cache.flush()
+    assert get_state(metadata_store, unknown).seeders == 3
+
+
+def test_process_invalid_health(metadata_store):
+    infohash = random_infohash()
+    assert not metadata_store.health_cache.process([HealthInfo(infohash, last_check=int(time.time()) + 3600)])
+    assert metadata_store.health_cache.get(infohash) is None
+
+
+def test_process_does_not_query_known_infohashes(metadata_store):
+    cache = metadata_store.health_cache
+    infohash = random_infohash()
+    cache.process([HealthInfo(infohash, last_check=1)])
+    with patch('tribler.core.components.metadata_store.db.health_cache.select') as select:
+        cache.process([HealthInfo(infohash, last_check=2)])
+        select.assert_not_called()
+    assert cache.get(infohash).last_check == 2
+
+
+def test_flush_keeps_fresher_database_health(metadata_store):
+    # The torrent checker writes to the database directly
+    cache = metadata_store.health_cache
+    infohash = random_infohash()
+    now = int(time.time())
+    cache.process([HealthInfo(infohash, last_check=now - 100, seeders=1)])
+    with db_session:
+        metadata_store.TorrentState(infohash=infohash, seeders=10, last_check=now, self_checked=True)
+
+    cache.flush()
+    assert get_state(metadata_store, infohash).seeders == 10
+
+
+def test_update_checked(metadata_store):
+    cache = metadata_store.health_cache
+    infohash = random_infohash()
+    now = int(time.time())
+    cache.update_checked(HealthInfo(infohash, last_check=now - 100, seeders=10))
+    assert cache.get(infohash).self_checked
+    assert cache.dirty_count == 0
+
+    # The recent local check is trusted more than the remote health
+    assert not cache.process([HealthInfo(infohash, last_check=now, seeders=1)])
+    assert cache.get(infohash).seeders == 10
+
+
+def test_flush_in_batches(metadata_store):
+    cache = metadata_store.health_cache
+    cache.process([HealthInfo(random_infohash(), last_check=1) for _ in range(5)])
+
+    with patch('tribler.core.components.metadata_store.db.health_cache.HEALTH_FLUSH_BATCH_SIZE', 2):
+        assert cache.flush(max_entries=3) == 3
+        assert cache.dirty_count == 2
+        assert cache.flush() == 2
+    with db_session:
+        assert metadata_store.TorrentState.select().count() == 5
+
+
+def test_evict_clean_entries_only(metadata_store):
+    cache = metadata_store.health_cache
+    cache.max_size = 3
+    infohashes = [random_infohash() for _ in range(5)]
+    cache.process([HealthInfo(infohash, last_check=1) for infohash in infohashes])
+    assert len(cache) == 5
+
+    cache.flush()
+    assert len(cache) == 3
+    assert cache.get(infohashes[0]) is None
+    assert cache.get(infohashes[-1])
+
+    # The evicted entries are loaded from the database again
+    assert not cache.process([HealthInfo(infohashes[0], last_check=1)])
+    assert cache.get(infohashes[0])
+
+
+def test_flush_excess_dirty_entries(metadata_store):
+    cache = metadata_store.health_cache
+    cache.max_dirty = 3
+    infohashes = [random_infohash() for _ in range(5)]
+    cache.process([HealthInfo(infohash, last_check=1) for infohash in infohashes])
+
+    # The oldest dirty entries are written to the database right away
+    assert cache.dirty_count == 3
+    assert get_state(metadata_store, infohashes[0])
+    assert get_state(metadata_store, infohashes[1])
+    assert get_state(metadata_store, infohashes[2]) is None
@@ -0,0 +1,111 @@
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from pony.orm import db_session
+
+from tribler.core.components.metadata_store.db.maintenance import DatabaseMaintenance, MaintenanceTask
+from tribler.core.utilities.utilities import random_infohash
+
+
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture
+async def maintenance(metadata_store):
+    maintenance = DatabaseMaintenance(metadata_store)
+    yield maintenance
+    await maintenance.shutdown_task_manager()
+    maintenance.close()
+
+
+def get_task(maintenance, name):
+    return next(task for task in maintenance.tasks if task.name == name)
+
+
+def add_torrents(metadata_store, count):
+    with db_session:
+        for i in range(count):
+            metadata_store.TorrentMetadata(title=f'torrent {i}', infohash=random_infohash())
+
+
+async def test_run_tasks(metadata_store, maintenance):
+    add_torrents(metadata_store, 10)
+    for task in maintenance.tasks:
+        assert maintenance.run_task(task)
+        assert not task.in_progress
+        with db_session:
+            assert int(metadata_store.get_value(task.misc_key)) == int(task.last_run)
+
+    assert maintenance.get_due_task(idle=True) is None
+
+
+async def test_run_task_time_budget(maintenance):
+    maintenance.time_budget = 0
+    task = MaintenanceTask('test', 10, Mock(side_effect=[False, True]))
+    maintenance.tasks.append(task)
+
+    assert not maintenance.run_task(task)
+    assert task.in_progress
+    assert task.steps == 1
+    assert maintenance.get_statistics()['tasks']['test']['in_progress']
+
+    assert maintenance.run_task(task)
+    assert task.steps == 0
+
+
+async def test_incremental_vacuum(metadata_store, maintenance):
+    maintenance.time_budget = 60  # The test does not depend on the speed of the machine
+    add_torrents(metadata_store, 500)
+    with db_session:
+        metadata_store.TorrentMetadata.select().delete()
+    maintenance.run_task(get_task(maintenance, 'wal_checkpoint'))
+    assert maintenance.connection.execute('PRAGMA freelist_count').fetchone()[0] > 0
+
+    assert maintenance.run_task(get_task(maintenance, 'incremental_vacuum'))
+    assert maintenance.connection.execute('PRAGMA freelist_count').fetchone()[0] == 0
+
+
+async def test_get_due_task(maintenance):
+    now = time.time()
+    for task in maintenance.tasks:
+        task.last_run = now
+    analyze = get_task(maintenance, 'analyze')
+
+    analyze.last_run = now - analyze.interval - 1
+    assert maintenance.get_due_task(idle=True) is analyze
+    assert maintenance.get_due_task(idle=False) is None
+
+    # The tasks that are overdue by more than their interval run even when the database is busy
+    analyze.last_run = now - 3 * analyze.interval
+    assert maintenance.get_due_task(idle=False) is analyze
+
+
+async def test_run_maintenance_when_idle(metadata_store, maintenance):
+    for task in maintenance.tasks:
+        task.last_run = time.time() - task.interval
+    task = maintenance.get_due_task(idle=True)
+    last_run = task.last_run
+    assert maintenance.is_idle()
+
+    await metadata_store.executor.run(metadata_store.get_max_rowid)
+    await maintenance.run_maintenance()  # The database is busy
+    assert task.last_run == last_run
+
+    await maintenance.run_maintenance()
+    assert task.last_run > last_run
+    await maintenance.run_completion_index()
+    assert maintenance.is_idle()  # The maintenance tasks do not count
+
+
+@patch('tribler.core.components.metadata_store.db.maintenance.COMPLETION_INDEX_TITLES', 10)
+async def test_run_completion_index(metadata_store, maintenance):
+    add_torrents(metadata_store, 25)
+
+    with patch('tribler.core.components.metadata_store.db.maintenance.COMPLETION_INDEX_TIME_BUDGET', 0):
+        await maintenance.run_completion_index()
+    assert metadata_store.completion_index.get_queue_size() == 15
+
+    await maintenance.run_completion_index()
+    assert metadata_store.completion_index.get_queue_size() == 0
+    assert metadata_store.get_auto_complete_terms('torrent 1', 10)
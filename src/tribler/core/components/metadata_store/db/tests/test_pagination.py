@@ -0,0 +1,38 @@
+import pytest
+
+from tribler.core.components.metadata_store.db.pagination import (
+    decode_cursor,
+    encode_cursor,
+    get_next_cursor,
+    is_keyset_pagination_supported,
+)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor((10, 5, 123), sort_by='HEALTH', sort_desc=False)
+    assert decode_cursor(cursor, sort_by='HEALTH', sort_desc=False) == (10, 5, 123)
+
+
+@pytest.mark.parametrize('cursor', ['', 'not a cursor', encode_cursor(('a', 1), sort_by='title')[:-4]])
+def test_decode_malformed_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, sort_by='title')
+
+
+def test_decode_cursor_for_another_query():
+    cursor = encode_cursor((123,))
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, sort_desc=False)
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, sort_by='title')
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(('a', 'b'), sort_by='title'), sort_by='title')
+
+
+def test_is_keyset_pagination_supported():
+    assert is_keyset_pagination_supported()
+    assert is_keyset_pagination_supported(sort_by='HEALTH', txt_filter='abc')
+    assert not is_keyset_pagination_supported(sort_by='size')
+    assert not is_keyset_pagination_supported(txt_filter='abc')
+    assert not is_keyset_pagination_supported(popular=True)
+    assert get_next_cursor([], sort_by='HEALTH') is None
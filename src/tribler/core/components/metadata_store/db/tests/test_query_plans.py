@@ -0,0 +1,174 @@
+"""
+Query plan regression tests for `MetadataStore.get_entries_query`.
+
+The parameter combinations used by the REST endpoints and the RemoteQueryCommunity are explained by SQLite on
+a generated database with collected statistics. A page of results must be read in the requested order, so that
+the LIMIT stops the query early: the plan must not sort the rows in a temporary B-tree, and must not scan a table
+other than reading the entries in the rowid order.
+"""
+import re
+import time
+
+import pytest
+from ipv8.keyvault.crypto import default_eccrypto
+from pony.orm import db_session
+
+from tribler.core.components.metadata_store.db.serialization import (
+    CHANNEL_DESCRIPTION,
+    CHANNEL_TORRENT,
+    COLLECTION_NODE,
+    REGULAR_TORRENT,
+)
+from tribler.core.components.metadata_store.db.store import MetadataStore
+
+# pylint: disable=redefined-outer-name, protected-access
+
+CHANNELS = 100
+CHANNEL_TORRENTS = 20000
+FREE_FOR_ALL_TORRENTS = 20000  # Free-for-all torrents share origin_id 0 with the channels
+COLLECTIONS = 500
+PAGE_SIZE = 50
+
+CHANNEL_PK = b'channel 5'
+CHANNEL_ID = 5
+
+SEARCH_SCOPE = frozenset((REGULAR_TORRENT, CHANNEL_TORRENT, COLLECTION_NODE))
+
+
+@pytest.fixture(scope='module')
+def large_metadata_store(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('query_plans')
+    mds = MetadataStore(tmp_path / 'test.db', tmp_path / 'channels', default_eccrypto.generate_key('curve25519'),
+                        disable_sync=True)
+    now = int(time.time())
+    torrents = CHANNEL_TORRENTS + FREE_FOR_ALL_TORRENTS
+    with db_session:
+        mds.db.execute(f"""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {torrents})
+            INSERT INTO TorrentState(infohash, seeders, leechers, last_check)
+            SELECT randomblob(20), abs(random()) % 100, abs(random()) % 100,
+                   CASE WHEN i % 5 = 0 THEN {now} - i ELSE 0 END
+            FROM n
+        """)
+        mds.db.execute(f"""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {CHANNELS})
+            INSERT INTO ChannelNode(metadata_type, origin_id, public_key, id_, timestamp, local_version, status, title,
+                                    tags, num_entries, size, torrent_date, subscribed, votes)
+            SELECT {CHANNEL_TORRENT}, 0, 'channel ' || i, i, 100, 100 - i % 2, 0, 'channel ' || i,
+                   '', {CHANNEL_TORRENTS // CHANNELS}, 1000, '2022-01-01 00:00:00', i % 10 = 0, i
+            FROM n
+        """)
+        mds.db.execute(f"""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {torrents})
+            INSERT INTO ChannelNode(metadata_type, origin_id, public_key, id_, timestamp, status, title, tags,
+                                    size, torrent_date, xxx, health, infohash)
+            SELECT {REGULAR_TORRENT},
+                   CASE WHEN i <= {CHANNEL_TORRENTS} THEN 1 + i % {CHANNELS} ELSE 0 END,
+                   CASE WHEN i <= {CHANNEL_TORRENTS} THEN 'channel ' || (1 + i % {CHANNELS}) ELSE '' END,
+                   1000 + i, i, 0, 'torrent ' || i, 'Video', i * 1000, date('2000-01-01', '+' || i || ' hours'),
+                   i % 10 = 0, i, (SELECT infohash FROM TorrentState WHERE rowid = i)
+            FROM n
+        """)
+        mds.db.execute(f"""
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {COLLECTIONS})
+            INSERT INTO ChannelNode(metadata_type, origin_id, public_key, id_, timestamp, status, title, num_entries)
+            SELECT {COLLECTION_NODE}, 1 + i % {CHANNELS}, 'channel ' || (1 + i % {CHANNELS}), 1000000 + i, i, 0,
+                   'collection ' || i, 10
+            FROM n
+        """)
+        mds.db.execute('ANALYZE')
+    yield mds
+    mds.shutdown()
+
+
+def get_query_plan(mds, pony_query):
+    sql, arguments, _, _ = pony_query._construct_sql_and_arguments(limit=PAGE_SIZE)
+    return [row[3] for row in mds.db._exec_sql(f'EXPLAIN QUERY PLAN {sql}', arguments).fetchall()]
+
+
+def get_unindexed_steps(plan):
+    """
+    Get the steps of the query plan that read more rows than a page of results requires.
+    """
+    coroutines = {line.split()[-1] for line in plan if line.startswith('CO-ROUTINE')}
+    sorts = [line for line in plan if 'TEMP B-TREE' in line]
+    # Only the entries themselves can be scanned without an index, and only in the order of the query
+    scans = [line for line in plan if re.fullmatch(r'SCAN (\w+)', line)
+             and line.split()[1] not in coroutines and (line != 'SCAN g' or sorts)]
+    return sorts + scans
+
+
+def channel_contents(**kwargs):
+    return dict(channel_pk=CHANNEL_PK, origin_id=CHANNEL_ID, **kwargs)
+
+
+def channels(**kwargs):
+    return dict(metadata_type=CHANNEL_TORRENT, origin_id=0, **kwargs)
+
+
+INDEXED_QUERIES = {
+    # GET /channels
+    'channels by title': channels(sort_by='title'),
+    'channels by votes': channels(sort_by='votes', sort_desc=False),
+    'channels by torrents': channels(sort_by='num_entries'),
+    'channels by date': channels(sort_by='torrent_date'),
+    'channels by subscribed': channels(sort_by='subscribed'),
+    'channels not xxx': channels(sort_by='votes', hide_xxx=True, exclude_deleted=True),
+    # GET /channels/{channel_pk}/{channel_id}, and the remote queries for the channel contents
+    'contents': channel_contents(),
+    'contents not xxx': channel_contents(hide_xxx=True, exclude_deleted=True),
+    'contents by title': channel_contents(sort_by='title'),
+    'contents by title asc': channel_contents(sort_by='title', sort_desc=False),
+    'contents by size': channel_contents(sort_by='size'),
+    'contents by date': channel_contents(sort_by='torrent_date'),
+    'contents by category': channel_contents(sort_by='tags'),
+    'contents of types': channel_contents(metadata_type=[COLLECTION_NODE, REGULAR_TORRENT]),
+    'contents newer than': channel_contents(metadata_type=[CHANNEL_DESCRIPTION],
+                                            attribute_ranges=(('timestamp', 100, None),)),
+    # Remote queries for the whole database
+    'torrents': dict(metadata_type=REGULAR_TORRENT),
+    'torrents in scope': dict(metadata_type=SEARCH_SCOPE, hide_xxx=True),
+    'torrents by date': dict(metadata_type=SEARCH_SCOPE, sort_by='torrent_date'),
+    'torrents checked after': dict(metadata_type=REGULAR_TORRENT, health_checked_after=int(time.time()) - 3600),
+    'torrents self checked': dict(metadata_type=REGULAR_TORRENT, self_checked_torrent=False),
+}
+
+# The queries that sort a bounded number of rows
+SORTED_QUERIES = {
+    # The popular torrents are selected by the query checked in `test_popular_torrents_health_query_plan`
+    'popular torrents': dict(metadata_type=REGULAR_TORRENT, popular=True),
+    # The candidates of a text search are limited by `search_keyword`
+    'search': dict(txt_filter='torrent', metadata_type=SEARCH_SCOPE),
+    'search by title': dict(txt_filter='torrent', metadata_type=SEARCH_SCOPE, sort_by='title'),
+    'search by health': dict(txt_filter='torrent', metadata_type=SEARCH_SCOPE, sort_by='HEALTH'),
+    # The seeders and leechers are stored in TorrentState, which is LEFT JOINed to the entries. SQLite can not use
+    # an index of the right table of a LEFT JOIN for sorting, so the contents of the channel are sorted.
+    'contents by health': channel_contents(sort_by='HEALTH'),
+    # There are only a few entries with the same infohash
+    'infohash': dict(infohash=b'\x00' * 20),
+    # The channels are read from the partial indexes that contain only the channels
+    'channels': channels(),
+    'channels subscribed': channels(subscribed=True),
+    'complete channels': dict(metadata_type=[CHANNEL_TORRENT], subscribed=True, complete_channel=True),
+}
+
+
+@pytest.mark.parametrize('name', INDEXED_QUERIES)
+def test_indexed_query_plan(large_metadata_store, name):
+    with db_session:
+        plan = get_query_plan(large_metadata_store, large_metadata_store.get_entries_query(**INDEXED_QUERIES[name]))
+    assert not get_unindexed_steps(plan), plan
+
+
+@pytest.mark.parametrize('name', SORTED_QUERIES)
+def test_sorted_query_plan(large_metadata_store, name):
+    with db_session:
+        plan = get_query_plan(large_metadata_store, large_metadata_store.get_entries_query(**SORTED_QUERIES[name]))
+    assert not [step for step in get_unindexed_steps(plan) if 'TEMP B-TREE' not in step], plan
+
+
+def test_popular_torrents_health_query_plan(large_metadata_store):
+    with db_session:
+        plan = get_query_plan(large_metadata_store, large_metadata_store.get_popular_torrents_health_query())
+    # The torrents checked during the last day are sorted
+    assert plan[0].startswith('SEARCH health USING INDEX idx_torrentstate__last_check__partial'), plan
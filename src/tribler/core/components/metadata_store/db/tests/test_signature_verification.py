@@ -0,0 +1,42 @@
+import pytest
+from ipv8.keyvault.crypto import default_eccrypto
+
+from tribler.core.components.metadata_store.db.signature_verification import SignatureVerifier, verify_signatures
+
+
+# pylint: disable=redefined-outer-name
+
+@pytest.fixture
+def signed_items():
+    keys = [default_eccrypto.generate_key("curve25519") for _ in range(2)]
+    items = []
+    for i in range(10):
+        key = keys[i % 2]
+        data = b'data %d' % i
+        items.append((key.pub().key_to_bin()[10:], data, default_eccrypto.create_signature(key, data)))
+    public_key, data, signature = items[3]
+    items[3] = (public_key, data + b'x', signature)
+    return items
+
+
+def test_verify_signatures(signed_items):
+    assert verify_signatures(signed_items) == [i != 3 for i in range(10)]
+
+
+def test_verifier_in_calling_thread(signed_items):
+    verifier = SignatureVerifier(max_workers=1)
+    assert verifier.verify(signed_items) == [i != 3 for i in range(10)]
+    assert verifier._pool is None  # pylint: disable=protected-access
+
+
+def test_verifier_in_process_pool(signed_items):
+    verifier = SignatureVerifier(max_workers=2, chunk_size=3, min_parallel_size=5)
+    try:
+        assert verifier.verify(signed_items) == [i != 3 for i in range(10)]
+        assert verifier._pool is not None  # pylint: disable=protected-access
+    finally:
+        verifier.shutdown()
+    assert verifier._pool is None  # pylint: disable=protected-access
+
+    # After the shutdown, the signatures are verified in the calling thread
+    assert verifier.verify(signed_items) == [i != 3 for i in range(10)]
@@ -3,31 +3,36 @@ import random
 import string
 import threading
 from binascii import unhexlify
-from datetime import datetime
+from datetime import datetime, timedelta
+from time import time
 from unittest.mock import patch
 
 import pytest
 from ipv8.keyvault.crypto import default_eccrypto
-from pony.orm import db_session
+from pony.orm import commit, db_session, desc, raw_sql
 
 from tribler.core.components.metadata_store.db.orm_bindings.channel_metadata import (
     CHANNEL_DIR_NAME_LENGTH,
     entries_to_chunk,
 )
 from tribler.core.components.metadata_store.db.orm_bindings.channel_node import NEW
+from tribler.core.components.metadata_store.db.pagination import get_sort_key
 from tribler.core.components.metadata_store.db.serialization import (
     CHANNEL_TORRENT,
+    COLLECTION_NODE,
     ChannelMetadataPayload,
     DeletedMetadataPayload,
+    REGULAR_TORRENT,
     SignedPayload,
     UnknownBlobTypeException,
     int2time,
 )
 from tribler.core.components.metadata_store.remote_query_community.payload_checker import ObjState, ProcessingResult
 from tribler.core.components.metadata_store.tests.test_channel_download import CHANNEL_METADATA_UPDATED
+from tribler.core.exceptions import InvalidSignatureException
 from tribler.core.tests.tools.common import TESTS_DATA_DIR
 from tribler.core.utilities.path_util import Path
-from tribler.core.utilities.pony_utils import run_threaded
+from tribler.core.utilities.search_utils import torrent_rank
 from tribler.core.utilities.utilities import random_infohash
 
 
@@ -95,6 +100,29 @@ def test_process_channel_dir_file(tmpdir, metadata_store):
         metadata_store.process_mdblob_file(invalid_metadata, skip_personal_metadata_payload=False)
 
 
+@patch('tribler.core.components.metadata_store.db.store.VERIFICATION_WINDOW_SIZE', 2)
+def test_process_mdblob_file_invalid_signature(tmpdir, metadata_store):
+    """
+    Test that none of the payloads of a blob are added if any of them has a wrong signature,
+    even if the wrong signature is in a later window of the streamed blob
+    """
+    with db_session:
+        md_list = [metadata_store.TorrentMetadata(title=f'torrent {i}', infohash=random_infohash()) for i in range(5)]
+        blob = b''.join(md.serialized() for md in md_list)
+        for md in md_list:
+            md.delete()
+    blob_path = tmpdir / 'broken.mdblob'
+    blob_path.write_binary(blob[:-1] + bytes([blob[-1] ^ 1]))
+
+    with pytest.raises(InvalidSignatureException):
+        metadata_store.process_mdblob_file(str(blob_path), skip_personal_metadata_payload=False)
+    with db_session:
+        assert not metadata_store.TorrentMetadata.select().count()
+
+    blob_path.write_binary(blob)
+    assert len(metadata_store.process_mdblob_file(str(blob_path), skip_personal_metadata_payload=False)) == 5
+
+
 @db_session
 def test_squash_mdblobs(metadata_store):
     r = random.Random(123)
@@ -147,6 +175,56 @@ def test_squash_mdblobs_multiple_chunks(metadata_store):
     ]
 
 
+@db_session
+def test_process_payload_batch(metadata_store):
+    """
+    Test that processing a batch of payloads gives the same results and entries as processing them one by one
+    """
+    key = default_eccrypto.generate_key("curve25519")
+    rng = random.Random(123)
+    torrents = [
+        metadata_store.TorrentMetadata(sign_with=key, title=f'batch torrent {i}', infohash=random_infohash(rng),
+                                       tracker_info='http://tracker.org/announce', torrent_date=int2time(i))
+        for i in range(10)
+    ]
+    payloads = [t._payload_class.from_signed_blob(t.serialized()) for t in torrents]
+    expected = [t.to_dict() for t in torrents]
+
+    # The first two entries stay in the database, the first one is updated by a newer payload
+    newer_payload = payloads[0].__class__(**dict(payloads[0].to_dict(), timestamp=payloads[0].timestamp + 1,
+                                                 title='updated', key=key))
+    for t in torrents[2:]:
+        t.delete()
+    # The health of one of the new entries is already known
+    metadata_store.TorrentState.get(infohash=payloads[2].infohash).seeders = 5
+    channel = metadata_store.ChannelMetadata.create_channel('channel')
+    channel_payload = channel._payload_class.from_signed_blob(channel.serialized())
+    channel.delete()
+
+    batch = [newer_payload] + payloads[1:6] + [payloads[5], channel_payload] + payloads[6:]
+    results = metadata_store.process_payload_batch(batch, skip_personal_metadata_payload=False)
+
+    assert [r.obj_state for r in results] == (
+            [ObjState.UPDATED_LOCAL_VERSION, ObjState.LOCAL_VERSION_SAME] + [ObjState.NEW_OBJECT] * 4
+            + [ObjState.LOCAL_VERSION_SAME] + [ObjState.NEW_OBJECT] * 5
+    )
+    assert results[0].md_obj.title == 'updated'
+    assert results[0].md_obj.serialized() == newer_payload.serialized()
+    for result, torrent_dict in zip(results[2:6] + results[8:], expected[2:6] + expected[6:]):
+        md_dict = result.md_obj.to_dict()
+        for attr in ('rowid', 'added_on', 'health'):
+            md_dict.pop(attr)
+            torrent_dict.pop(attr)
+        assert md_dict == torrent_dict
+        assert [t.url for t in result.md_obj.health.trackers] == ['http://tracker.org/announce']
+    assert results[2].md_obj.health.seeders == 5
+    assert results[6].md_obj == results[5].md_obj
+    assert results[7].md_obj.title == 'channel'
+
+    # The new entries are indexed for the full-text search
+    assert metadata_store.get_entries_count(txt_filter='batch', metadata_type=[REGULAR_TORRENT]) == 10
+
+
 @db_session
 def test_multiple_squashed_commit_and_read(metadata_store):
     """
@@ -225,6 +303,60 @@ def test_process_invalid_compressed_mdblob(metadata_store):
     assert not metadata_store.process_compressed_mdblob(b"abcdefg")
 
 
+@db_session
+def test_read_payloads_checks_signatures(metadata_store):
+    """
+    Test that reading a blob rejects it if any payload has a wrong signature,
+    and that signatures of the entries we already store are not checked again
+    """
+    md_list = [metadata_store.TorrentMetadata(title=f'torrent {i}', infohash=random_infohash()) for i in range(4)]
+    blob = b''.join(md.serialized() for md in md_list)
+    signatures = [md.signature for md in md_list]
+    md_list[0].delete()
+
+    with patch.object(metadata_store.signature_verifier, 'verify', wraps=metadata_store.signature_verifier.verify) \
+            as verify:
+        payloads = metadata_store.read_payloads(blob)
+    assert [p.signature for p in payloads] == signatures
+    verify.assert_called_once()
+    assert [signature for _, _, signature in verify.call_args[0][0]] == signatures[:1]
+
+    # A wrong signature of a new entry
+    broken_blob = blob[:-1] + bytes([blob[-1] ^ 1])
+    md_list[3].delete()
+    with pytest.raises(InvalidSignatureException):
+        metadata_store.read_payloads(broken_blob)
+
+
+def test_read_payloads_checks_changed_bodies(metadata_store):
+    """
+    Test that a payload with the signature of a stored entry but a different body is checked
+    """
+    with db_session:
+        md = metadata_store.TorrentMetadata(title='torrent', infohash=random_infohash())
+    forged_blob = md.serialized().replace(b'torrent', b'forged!')
+
+    with pytest.raises(InvalidSignatureException):
+        metadata_store.read_payloads(forged_blob)
+
+
+def test_skipped_signatures_checked_when_deleted(metadata_store):
+    """
+    Test that a payload which signature check was skipped is checked again if the stored entry is gone
+    when the payload is added to the database
+    """
+    with db_session:
+        md = metadata_store.TorrentMetadata(title='torrent', infohash=random_infohash())
+    payload = metadata_store.read_payloads(md.serialized())[0]
+    assert payload.signature_skipped
+
+    with db_session:
+        metadata_store.TorrentMetadata.get(signature=md.signature).delete()
+    with patch.object(metadata_store.signature_verifier, 'verify', return_value=[False]):
+        with pytest.raises(InvalidSignatureException):
+            metadata_store.process_payload_list([payload])
+
+
 @db_session
 def test_process_channel_dir(metadata_store):
     """
@@ -251,6 +383,17 @@ def test_compute_channel_update_progress(metadata_store, tmpdir):
         metadata_store.process_channel_dir(CHANNEL_DIR, channel.public_key, channel.id_)
         assert metadata_store.compute_channel_update_progress(channel) == 1.0
 
+    # The manifest of the channel directory is deleted once the directory is processed
+    assert metadata_store.get_channel_manifest(channel) is None
+    commit()
+
+    # While the directory is processed, the progress is computed from its manifest, without listing it
+    blobs_to_process, _ = metadata_store.get_list_of_channel_blobs_to_process(CHANNEL_DIR, channel.start_timestamp)
+    metadata_store.save_channel_manifest(channel.public_key, channel.id_, blobs_to_process)
+    with patch.object(metadata_store, 'get_list_of_channel_blobs_to_process') as list_blobs:
+        assert metadata_store.compute_channel_update_progress(channel) == 1.0
+    list_blobs.assert_not_called()
+
 
 @db_session
 def test_process_forbidden_payload(metadata_store):
@@ -456,7 +599,7 @@ class ThreadedTestException(Exception):
     pass
 
 
-async def test_run_threaded(metadata_store):
+async def test_executor_run(metadata_store):
     thread_id = threading.get_ident()
 
     def f1(a, b, *, c, d):
@@ -464,8 +607,95 @@ async def test_run_threaded(metadata_store):
             return threading.get_ident()
         raise ThreadedTestException('test exception')
 
-    result = await run_threaded(metadata_store.db, f1, 1, 2, c=3, d=4)
+    result = await metadata_store.executor.run(f1, 1, 2, c=3, d=4)
     assert result != thread_id
 
     with pytest.raises(ThreadedTestException, match='^test exception$'):
-        await run_threaded(metadata_store.db, f1, 1, 2, c=5, d=6)
+        await metadata_store.executor.run(f1, 1, 2, c=5, d=6)
+
+
+@pytest.mark.freeze_time('2021-09-24')
+@db_session
+def test_rank_search_results_same_as_sql_ranking(metadata_store):
+    """
+    Test that the ranking stage returns the same order as ordering by the `torrent_rank` function inside SQLite
+    """
+    rnd = random.Random(123)
+    words = ['big', 'buck', 'bunny', 'sintel', 'ubuntu', 'part', '1080p']
+    for i in range(300):
+        title = ' '.join(rnd.choice(words) for _ in range(rnd.randint(1, 5)))
+        torrent = metadata_store.TorrentMetadata(
+            title=title, infohash=random_infohash(),
+            torrent_date=datetime.utcnow() - timedelta(days=rnd.choice([0, 1, 30, 365]))
+        )
+        if i % 3:
+            torrent.health.set(seeders=rnd.choice([0, 10, 100]), leechers=rnd.choice([0, 5]),
+                               last_check=rnd.choice([0, 1000, 2000]))
+    metadata_store.ChannelMetadata(title='big buck channel', infohash=random_infohash())
+    metadata_store.CollectionNode(title='big buck folder')
+
+    now = int(time())
+    metadata_store.db.get_connection().create_function('search_rank', 5, torrent_rank)
+    for txt_filter in ['big buck*', 'bunny', 'sintel 1080p']:
+        expected = metadata_store.get_entries_query(txt_filter=txt_filter).sort_by(
+            f"""
+            (1 if g.metadata_type == {CHANNEL_TORRENT} else 2 if g.metadata_type == {COLLECTION_NODE} else 3),
+            raw_sql('''search_rank(
+                $txt_filter, g.title, torrentstate.seeders, torrentstate.leechers,
+                $now - strftime('%s', g.torrent_date)
+            ) DESC'''),
+            desc(g.health.last_check)
+            """
+        )[:]
+
+        assert len(expected) > 20
+        assert metadata_store.rank_search_results(txt_filter) == [entry.rowid for entry in expected]
+        assert metadata_store.get_entries(first=11, last=20, txt_filter=txt_filter) == expected[10:20]
+
+
+@db_session
+def test_get_entries_after_key(metadata_store):
+    """
+    Test that keyset pagination returns the same pages as pagination by offset, for all supported sort orders
+    """
+    rnd = random.Random(123)
+    for _ in range(60):
+        torrent = metadata_store.TorrentMetadata(title=rnd.choice(['a', 'B', 'c', 'D']), infohash=random_infohash())
+        torrent.health.set(seeders=rnd.choice([0, 10]), leechers=rnd.choice([0, 5]))
+    for _ in range(5):
+        metadata_store.CollectionNode(title=rnd.choice(['a', 'b']))
+
+    for sort_by in (None, 'HEALTH', 'title'):
+        for sort_desc in (True, False):
+            expected = metadata_store.get_entries(sort_by=sort_by, sort_desc=sort_desc)
+            pages = []
+            after_key = None
+            while True:
+                page = metadata_store.get_entries(first=1, last=7, after_key=after_key, sort_by=sort_by,
+                                                  sort_desc=sort_desc)
+                if not page:
+                    break
+                pages.extend(page)
+                after_key = get_sort_key(page[-1], sort_by)
+            assert pages == expected
+
+
+def test_get_content_version(metadata_store):
+    content_version = metadata_store.get_content_version()
+    assert metadata_store.get_content_version() == content_version
+
+    with db_session:
+        infohash = random_infohash()
+        metadata_store.TorrentMetadata(title='torrent', infohash=infohash)
+    assert metadata_store.get_content_version() > content_version
+
+    # The changes of the other tables and of the tag processing state do not change the content version
+    content_version = metadata_store.get_content_version()
+    with db_session:
+        metadata_store.set_value('key', 'value')
+        metadata_store.TorrentMetadata.get(infohash=infohash).tag_processor_version = 1
+    assert metadata_store.get_content_version() == content_version
+
+    with db_session:
+        metadata_store.TorrentMetadata.get(infohash=infohash).health.seeders = 10
+    assert metadata_store.get_content_version() > content_version
@@ -1,6 +1,6 @@
 from datetime import datetime
 from time import time
-from unittest.mock import MagicMock, Mock
+from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 from ipv8.keyvault.crypto import default_eccrypto
@@ -165,6 +165,7 @@ def test_get_autocomplete_terms(metadata_store):
     metadata_store.TorrentMetadata.from_dict(dict(rnd_torrent(), title="barbarian xyz!", tags="video"))
     metadata_store.TorrentMetadata.from_dict(dict(rnd_torrent(), title="n.a.m.e: foobar", tags="video"))
     metadata_store.TorrentMetadata.from_dict(dict(rnd_torrent(), title="xyz n.a.m.e", tags="video"))
+    metadata_store.update_completion_index()
 
     autocomplete_terms = metadata_store.get_auto_complete_terms("", 10)
     assert autocomplete_terms == []
@@ -217,6 +218,7 @@ def test_get_autocomplete_terms_max(metadata_store):
     metadata_store.TorrentMetadata.from_dict(dict(rnd_torrent(), title="mountains sheeps wolf", tags="video"))
     metadata_store.TorrentMetadata.from_dict(dict(rnd_torrent(), title="lakes sheep", tags="video"))
     metadata_store.TorrentMetadata.from_dict(dict(rnd_torrent(), title="regular sheepish guy", tags="video"))
+    metadata_store.update_completion_index()
 
     autocomplete_terms = metadata_store.get_auto_complete_terms("sheep", 2)
     assert len(autocomplete_terms) == 2
@@ -412,3 +414,18 @@ def test_tdef_to_metadata_dict_wrong_tracker(tracker):
         category_filter=MagicMock())
 
     assert metadata_dict['tracker_info'] == ''
+
+
+@patch('tribler.core.components.metadata_store.db.orm_bindings.torrent_metadata.TITLES_BATCH_SIZE', 2)
+@db_session
+def test_get_torrent_titles(metadata_store):
+    """
+    Test getting the titles of several torrents at once
+    """
+    infohashes = [random_infohash() for _ in range(3)]
+    for i, infohash in enumerate(infohashes):
+        metadata_store.TorrentMetadata(title=f'torrent {i}', infohash=infohash)
+
+    unknown = random_infohash()
+    titles = metadata_store.TorrentMetadata.get_torrent_titles(infohashes + [unknown])
+    assert titles == {infohash: f'torrent {i}' for i, infohash in enumerate(infohashes)}
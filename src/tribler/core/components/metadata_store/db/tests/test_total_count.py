@@ -0,0 +1,73 @@
+from unittest.mock import MagicMock, patch
+
+from pony.orm import db_session
+
+from tribler.core import notifications
+from tribler.core.components.metadata_store.db.serialization import REGULAR_TORRENT
+from tribler.core.components.metadata_store.db.total_count import TotalCount, get_query_id, get_query_key
+from tribler.core.utilities.utilities import random_infohash
+
+
+# pylint: disable=protected-access
+
+
+def add_torrents(metadata_store, count):
+    with db_session:
+        for i in range(count):
+            metadata_store.TorrentMetadata(title=f'torrent {i}', infohash=random_infohash())
+
+
+def test_query_key():
+    key = get_query_key(first=1, last=50, sort_by='HEALTH', metadata_type=frozenset((300, 220)), hide_xxx=True)
+    assert key == get_query_key(hide_xxx=True, metadata_type={220, 300}, first=51, last=100)
+    assert key != get_query_key(hide_xxx=False, metadata_type={220, 300})
+    assert get_query_id(hide_xxx=True, metadata_type={220, 300}) == get_query_id(metadata_type=[220, 300],
+                                                                                  hide_xxx=True, first=11)
+
+
+def test_total_count_is_cached(metadata_store):
+    service = metadata_store.count_service
+    add_torrents(metadata_store, 5)
+    assert service.get_total_count(metadata_type=REGULAR_TORRENT) == TotalCount(5)
+
+    with patch.object(metadata_store, 'get_entries_query') as get_entries_query:
+        assert service.get_total_count(metadata_type=REGULAR_TORRENT, first=6, last=10) == TotalCount(5)
+    get_entries_query.assert_not_called()
+
+    # New entries invalidate the cache
+    add_torrents(metadata_store, 1)
+    assert service.get_total_count(metadata_type=REGULAR_TORRENT) == TotalCount(6)
+
+    # So does the time
+    service.ttl = 0
+    with db_session:
+        metadata_store.TorrentMetadata.select().first().delete()
+    assert service.get_total_count(metadata_type=REGULAR_TORRENT) == TotalCount(5)
+
+
+def test_approximate_total_count(metadata_store):
+    service = metadata_store.count_service
+    service.approximate_limit = 3
+    add_torrents(metadata_store, 5)
+
+    assert service.get_total_count(approximate=True, metadata_type=REGULAR_TORRENT) == TotalCount(3, True)
+    assert service.get_total_count(metadata_type=REGULAR_TORRENT) == TotalCount(5)
+    # The exact count is reused for the approximate queries
+    assert service.get_total_count(approximate=True, metadata_type=REGULAR_TORRENT) == TotalCount(5)
+
+    service.approximate_limit = 10
+    assert service.get_total_count(approximate=True, hide_xxx=True) == TotalCount(5)
+
+
+async def test_compute_exact_count(metadata_store):
+    metadata_store.notifier = MagicMock()
+    metadata_store.count_service.approximate_limit = 3
+    add_torrents(metadata_store, 5)
+
+    await metadata_store.count_service.compute_exact_count(metadata_type=REGULAR_TORRENT, first=1, last=50)
+
+    metadata_store.notifier.__getitem__.assert_called_with(notifications.total_count_updated)
+    metadata_store.notifier[notifications.total_count_updated].assert_called_with({
+        'query_id': get_query_id(metadata_type=REGULAR_TORRENT),
+        'total': 5,
+    })
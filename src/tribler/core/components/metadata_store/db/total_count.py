@@ -0,0 +1,147 @@
+"""
+Total counts of the entries that match the REST API queries.
+
+Counting runs the whole filtered query, so the counts are cached. A cached count is valid while no entries are added
+to the database (that is, while the max rowid of ChannelNode stays the same) and for at most COUNT_CACHE_TTL seconds,
+as updates and deletions of the existing entries do not change the max rowid.
+
+In the approximate mode, counting stops at APPROXIMATE_COUNT_LIMIT entries, and the result is marked as a lower bound.
+The exact count can then be computed in the background by `compute_exact_count` and sent to the GUI by
+the `total_count_updated` notification.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Set, Tuple
+
+from pony.orm import db_session
+
+from tribler.core import notifications
+from tribler.core.utilities.pony_utils import DatabaseExecutorOverloaded
+
+COUNT_CACHE_SIZE = 256
+COUNT_CACHE_TTL = 60  # seconds
+APPROXIMATE_COUNT_LIMIT = 1000
+
+# The query parameters that do not change the number of the matching entries
+NON_FILTER_PARAMETERS = ('first', 'last', 'after_key', 'sort_by', 'sort_desc')
+
+
+@dataclass
+class TotalCount:
+    total: int
+    is_lower_bound: bool = False
+
+
+@dataclass
+class CachedCount:
+    count: TotalCount
+    watermark: int
+    created_at: float
+
+
+def get_query_key(**kwargs) -> Tuple:
+    """
+    Get a hashable representation of the query filters, that does not depend on the order of the parameters
+    and the elements of sets.
+    """
+    items = []
+    for name, value in kwargs.items():
+        if name in NON_FILTER_PARAMETERS:
+            continue
+        if isinstance(value, (set, frozenset)):
+            value = tuple(sorted(value))
+        elif isinstance(value, list):
+            value = tuple(value)
+        items.append((name, value))
+    return tuple(sorted(items))
+
+
+def get_query_id(**kwargs) -> str:
+    """
+    Get a short identifier of the query filters, to match the count notifications with the queries in the GUI.
+    """
+    return hashlib.sha1(repr(get_query_key(**kwargs)).encode()).hexdigest()[:16]
+
+
+class TotalCountService:
+    def __init__(self, mds, cache_size: int = COUNT_CACHE_SIZE, ttl: float = COUNT_CACHE_TTL,
+                 approximate_limit: int = APPROXIMATE_COUNT_LIMIT):
+        self.mds = mds
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.approximate_limit = approximate_limit
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        # The counts are requested both from the event loop thread and from the database executor threads
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[Tuple, CachedCount] = OrderedDict()
+        self._pending: Set[Tuple] = set()
+
+    @db_session
+    def get_total_count(self, approximate: bool = False, **kwargs) -> TotalCount:
+        """
+        Get the number of entries matching the `get_entries` query with the given parameters.
+        :param approximate: stop counting at `approximate_limit` entries
+        """
+        key = get_query_key(**kwargs)
+        watermark = self.mds.get_max_rowid()
+        cached = self._get_cached(key, watermark)
+        if cached and (approximate or not cached.is_lower_bound):
+            return cached
+
+        query_kwargs = {name: value for name, value in kwargs.items() if name not in NON_FILTER_PARAMETERS}
+        pony_query = self.mds.get_entries_query(**query_kwargs).order_by(None)
+        if approximate:
+            # pylint: disable=protected-access
+            sql, arguments, _, _ = pony_query._construct_sql_and_arguments()
+            limited_sql = f'SELECT count(*) FROM ({sql} LIMIT {self.approximate_limit + 1})'
+            total = self.mds.db._exec_sql(limited_sql, arguments).fetchone()[0]
+            count = TotalCount(min(total, self.approximate_limit), is_lower_bound=total > self.approximate_limit)
+        else:
+            count = TotalCount(pony_query.count())
+
+        with self._lock:
+            self._cache[key] = CachedCount(count, watermark, time.monotonic())
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return count
+
+    async def compute_exact_count(self, **kwargs):
+        """
+        Count the entries in the database executor and notify the GUI about the result.
+        """
+        key = get_query_key(**kwargs)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        try:
+            count = await self.mds.executor.run(self.get_total_count, **kwargs)
+        except DatabaseExecutorOverloaded as e:
+            self.logger.warning(f'The exact count was not computed: {e}')
+            return
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+        if self.mds.notifier:
+            self.mds.notifier[notifications.total_count_updated]({
+                'query_id': get_query_id(**kwargs),
+                'total': count.total,
+            })
+
+    def _get_cached(self, key, watermark):
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is None:
+                return None
+            if cached.watermark != watermark or time.monotonic() - cached.created_at > self.ttl:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return cached.count
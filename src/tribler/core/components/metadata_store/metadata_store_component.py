@@ -1,6 +1,7 @@
 from tribler.core import notifications
 from tribler.core.components.component import Component
 from tribler.core.components.key.key_component import KeyComponent
+from tribler.core.components.metadata_store.db.maintenance import DatabaseMaintenance
 from tribler.core.components.metadata_store.db.store import MetadataStore
 from tribler.core.components.knowledge.rules.tag_rules_processor import KnowledgeRulesProcessor
 from tribler.core.utilities.simpledefs import STATEDIR_DB_DIR
@@ -8,6 +9,7 @@ from tribler.core.utilities.simpledefs import STATEDIR_DB_DIR
 
 class MetadataStoreComponent(Component):
     mds: MetadataStore = None
+    db_maintenance: DatabaseMaintenance = None
 
     async def run(self):
         await super().run()
@@ -44,10 +46,16 @@ class MetadataStoreComponent(Component):
             tag_processor_version=KnowledgeRulesProcessor.version
         )
         self.mds = metadata_store
+        self.db_maintenance = DatabaseMaintenance(metadata_store)
+        self.db_maintenance.start()
         self.session.notifier.add_observer(notifications.torrent_metadata_added,
                                            metadata_store.TorrentMetadata.add_ffa_from_dict)
 
     async def shutdown(self):
         await super().shutdown()
+        if self.db_maintenance:
+            await self.db_maintenance.shutdown_task_manager()
         if self.mds:
             self.mds.shutdown()
+        if self.db_maintenance:
+            self.db_maintenance.close()  # After the executor threads that use its connection are stopped
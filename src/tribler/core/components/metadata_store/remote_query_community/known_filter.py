@@ -0,0 +1,102 @@
+"""
+Filter of the metadata entries that the querying peer already has.
+
+A remote select request can carry a Bloom filter over the `(public_key, id_, timestamp)` keys of the entries that the
+querying peer already has for the same query. The responding peer skips the entries that match the filter, and fills
+the response with the entries that the querying peer does not have instead. The newer and the older versions of the
+known entries have other timestamps, so they are still sent.
+
+A false positive makes the responding peer skip an entry that the querying peer does not have. With
+`BITS_PER_ENTRY` bits per entry and `NUM_HASHES` hash functions, this happens for about 1% of the entries.
+
+The serialized filter starts with a version byte, so the format can be changed later.
+"""
+import hashlib
+import struct
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, Optional
+
+KNOWN_FILTER_VERSION = 1
+
+BITS_PER_ENTRY = 10
+NUM_HASHES = 7
+MIN_FILTER_SIZE = 32  # bytes; the smaller filters have a higher false positive rate than designed
+
+HEADER = struct.Struct('>BB')  # version, number of hash functions
+MAX_NUM_HASHES = 16
+
+
+def get_entry_key(public_key: bytes, id_: int, timestamp: int) -> bytes:
+    return public_key + struct.pack('>QQ', id_, timestamp)
+
+
+def get_filter_capacity(size: int) -> int:
+    """
+    Get the number of entries a filter of the given size (in bytes) holds with the designed false positive rate.
+    """
+    return max(size - HEADER.size, 0) * 8 // BITS_PER_ENTRY
+
+
+class KnownFilter:
+    def __init__(self, bits: bytearray, num_hashes: int = NUM_HASHES):
+        self.bits = bits
+        self.num_hashes = num_hashes
+
+    @classmethod
+    def create(cls, keys: Iterable[bytes], max_size: int) -> Optional['KnownFilter']:
+        """
+        Create a filter that fits into `max_size` bytes when serialized. If there are more keys than the filter
+        can hold, only the first keys are added, so the false positive rate stays the same.
+        :return: the filter, or None if there are no keys or there is no space for the filter
+        """
+        capacity = get_filter_capacity(max_size)
+        keys = list(keys)[:capacity]
+        if not keys:
+            return None
+
+        size = max((len(keys) * BITS_PER_ENTRY + 7) // 8, MIN_FILTER_SIZE)
+        known_filter = cls(bytearray(min(size, max_size - HEADER.size)))
+        for key in keys:
+            known_filter.add(key)
+        return known_filter
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'KnownFilter':
+        """
+        :raises ValueError: if the data is not a filter of the supported version
+        """
+        if len(data) <= HEADER.size:
+            raise ValueError('The known filter is empty')
+        version, num_hashes = HEADER.unpack_from(data)
+        if version != KNOWN_FILTER_VERSION:
+            raise ValueError(f'Unsupported known filter version: {version}')
+        if not 0 < num_hashes <= MAX_NUM_HASHES:
+            raise ValueError(f'Invalid number of the known filter hash functions: {num_hashes}')
+        return cls(bytearray(data[HEADER.size:]), num_hashes)
+
+    def to_bytes(self) -> bytes:
+        return HEADER.pack(KNOWN_FILTER_VERSION, self.num_hashes) + bytes(self.bits)
+
+    def add(self, key: bytes):
+        for position in self._get_positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._get_positions(key))
+
+    def _get_positions(self, key: bytes):
+        # Double hashing: the positions are derived from two independent halves of a single digest
+        h1, h2 = struct.unpack('>QQ', hashlib.blake2b(key, digest_size=16).digest())
+        size = len(self.bits) * 8
+        return ((h1 + i * h2) % size for i in range(self.num_hashes))
+
+
+@dataclass
+class KnownFilterStatistics:
+    sent: int = 0  # the requests sent with a filter
+    received: int = 0  # the requests received with a filter
+    skipped_entries: int = 0  # the entries not sent because they matched the filter
+    skipped_bytes: int = 0  # the serialized size of the skipped entries, before compression
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
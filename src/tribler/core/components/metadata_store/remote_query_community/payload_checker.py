@@ -1,4 +1,5 @@
 import enum
+from collections import defaultdict
 from dataclasses import dataclass, field
 
 from pony.orm import db_session
@@ -164,17 +165,24 @@ class PayloadChecker:
         # "local results == remote results" contract, but that is not a problem in most important cases
         # (e.g. browsing a non-subscribed channel). One situation where it can still matter is when
         # a remote search returns deleted results for a channel that we subscribe locally.
+        local_version = self.get_parent_channel_local_version()
+        if local_version is not None and self.payload.timestamp <= local_version:
+            # The received metadata is an older entry from a channel we are subscribed to. Reject it.
+            return []
+        return CONTINUE
+
+    def get_parent_channel_local_version(self):
+        """
+        Return the local version of the toplevel channel the payload belongs to,
+        or None if the channel is unknown to us.
+        """
         parent = self.mds.CollectionNode.get(public_key=self.payload.public_key, id_=self.payload.origin_id)
         if parent is None:
             # Probably, this is a payload for an unknown object, so nothing to do here
-            return CONTINUE
+            return None
         # If the immediate parent is not a real channel, look for its toplevel parent in turn
         parent = parent.get_parent_nodes()[0] if parent.metadata_type != CHANNEL_TORRENT else parent
-
-        if parent.metadata_type == CHANNEL_TORRENT and self.payload.timestamp <= parent.local_version:
-            # The received metadata is an older entry from a channel we are subscribed to. Reject it.
-            return []
-        return CONTINUE
+        return parent.local_version if parent.metadata_type == CHANNEL_TORRENT else None
 
     def update_local_node(self):
         """
@@ -189,7 +197,13 @@ class PayloadChecker:
         node = self.mds.ChannelNode.get_for_update(public_key=self.payload.public_key, id_=self.payload.id_)
         if not node:
             return CONTINUE
+        return self.compare_with_local_node(node)
 
+    def compare_with_local_node(self, node):
+        """
+        Compare the received payload with the version of the metadata node we already have locally,
+        and update the local node if the received version is newer.
+        """
         node.to_simple_dict()  # Force loading of related objects (like TorrentMetadata.health) in db_session
 
         if node.timestamp == self.payload.timestamp:
@@ -210,7 +224,7 @@ class PayloadChecker:
     def update_channel_node(self, node):
         # Update the local metadata entry
         if node.metadata_type == self.payload.metadata_type:
-            node.set(**self.payload.to_dict())
+            node.set(serialized_payload=self.payload.get_signed_blob(), **self.payload.to_dict())
             return [ProcessingResult(md_obj=node, obj_state=ObjState.UPDATED_LOCAL_VERSION)]
 
         # Remote change of md type.
@@ -354,3 +368,141 @@ def process_payload(metadata_store, payload, skip_personal_metadata_payload=True
         skip_personal_metadata_payload=skip_personal_metadata_payload,
         channel_public_key=channel_public_key,
     ).process_payload()
+
+
+class PayloadBatchProcessor:
+    """
+    This class processes a list of payloads, producing the same results as running `process_payload`
+    for each of them in turn.
+
+    Runs of consecutive signed REGULAR_TORRENT payloads are processed together: the checks that do not depend on
+    the payload's own entry are done one by one (with the parent channel lookups cached for the run), the existing
+    entries for the whole run are fetched with a single query, and the new entries are added in bulk. All other
+    payloads are processed one by one by `PayloadChecker`.
+    """
+
+    def __init__(self, mds, payloads, skip_personal_metadata_payload=True, channel_public_key=None):
+        self.mds = mds
+        self.payloads = payloads
+        self.skip_personal_metadata_payload = skip_personal_metadata_payload
+        self.channel_public_key = channel_public_key
+        self.parent_channel_versions = {}
+
+    @staticmethod
+    def can_process_in_bulk(payload):
+        return payload.metadata_type == REGULAR_TORRENT and payload.public_key != NULL_KEY
+
+    def create_checker(self, payload):
+        return PayloadChecker(
+            self.mds,
+            payload,
+            skip_personal_metadata_payload=self.skip_personal_metadata_payload,
+            channel_public_key=self.channel_public_key,
+        )
+
+    @db_session
+    def process(self):
+        result = []
+        run, run_keys = [], set()
+        for payload in self.payloads:
+            if self.can_process_in_bulk(payload):
+                key = (payload.public_key, payload.id_)
+                if key in run_keys:
+                    # The second entry with the same key must see the first one in the database
+                    result.extend(self.process_run(run))
+                    run, run_keys = [], set()
+                run.append(payload)
+                run_keys.add(key)
+                continue
+
+            # The payload can change the entries the run depends on (e.g. its parent channel),
+            # so the run should be processed first
+            result.extend(self.process_run(run))
+            run, run_keys = [], set()
+            result.extend(self.create_checker(payload).process_payload())
+
+        result.extend(self.process_run(run))
+        return result
+
+    def process_run(self, payloads):
+        if not payloads:
+            return []
+        self.parent_channel_versions.clear()
+
+        checkers = [checker for checker in map(self.create_checker, payloads) if self.passes_checks(checker)]
+        local_nodes = self.get_local_nodes([checker.payload for checker in checkers])
+
+        results = {}
+        new_payloads = []
+        for checker in checkers:
+            node = local_nodes.get((checker.payload.public_key, checker.payload.id_))
+            if node is None:
+                new_payloads.append(checker.payload)
+            else:
+                results[checker] = checker.compare_with_local_node(node)
+
+        new_nodes = iter(self.mds.TorrentMetadata.add_from_payloads(new_payloads))
+        result = []
+        for checker in checkers:
+            if checker in results:
+                node_results = results[checker]
+            else:
+                node_results = [ProcessingResult(md_obj=next(new_nodes), obj_state=ObjState.NEW_OBJECT)]
+            if self.channel_public_key is None:
+                # The request came from the network, so check for missing dependencies
+                node_results = checker.request_missing_dependencies(node_results)
+            result.extend(node_results)
+        return result
+
+    def passes_checks(self, checker):
+        """
+        Run the checks of `PayloadChecker.perform_checks` that precede the lookup of the payload's own entry.
+        """
+        if self.channel_public_key and checker.reject_payload_with_nonmatching_public_key(self.channel_public_key) \
+                is not CONTINUE:
+            return False
+        if self.skip_personal_metadata_payload and checker.reject_personal_metadata() is not CONTINUE:
+            return False
+        if checker.reject_payload_with_offending_words() is not CONTINUE:
+            return False
+
+        payload = checker.payload
+        parent_key = (payload.public_key, payload.origin_id)
+        if parent_key not in self.parent_channel_versions:
+            self.parent_channel_versions[parent_key] = checker.get_parent_channel_local_version()
+        local_version = self.parent_channel_versions[parent_key]
+        # The received metadata is an older entry from a channel we are subscribed to. Reject it.
+        return local_version is None or payload.timestamp > local_version
+
+    def get_local_nodes(self, payloads):
+        ids_by_public_key = defaultdict(list)
+        for payload in payloads:
+            ids_by_public_key[payload.public_key].append(payload.id_)
+
+        nodes = {}
+        for public_key, ids in ids_by_public_key.items():
+            query = self.mds.ChannelNode.select(lambda g: g.public_key == public_key and g.id_ in ids).for_update()
+            nodes.update(((node.public_key, node.id_), node) for node in query)
+        return nodes
+
+
+def process_payload_batch(metadata_store, payloads, skip_personal_metadata_payload=True, channel_public_key=None):
+    """
+    This routine processes a list of payloads the same way `process_payload` processes a single payload,
+    but adds the new signed torrent entries to the database in bulk.
+    The signatures of the payloads must be already checked (e.g. by `MetadataStore.read_payloads`).
+    :param metadata_store: Metadata Store object serving the database
+    :param payloads: payloads to work on
+    :param skip_personal_metadata_payload: if this is set to True, personal torrent metadata payload received
+            through gossip will be ignored. The default value is True.
+    :param channel_public_key: rejects payloads that do not belong to this key.
+
+    :return: a list of ProcessingResult objects
+    """
+
+    return PayloadBatchProcessor(
+        metadata_store,
+        payloads,
+        skip_personal_metadata_payload=skip_personal_metadata_payload,
+        channel_public_key=channel_public_key,
+    ).process()
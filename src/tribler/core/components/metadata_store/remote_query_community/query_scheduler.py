@@ -0,0 +1,245 @@
+"""
+Admission scheduler for the incoming remote select queries.
+
+Each query is classified by its shape (a full-text search, a tag search, a lookup by infohash, etc.) and gets
+an estimated cost, which grows with the number of requested entries. A query is admitted if the token bucket of
+the peer that sent it has enough tokens to pay for its cost, so a single peer can not take all the database time.
+
+At most `max_concurrent` admitted queries run at the same time. The rest wait in a bounded priority queue, where
+the cheaper queries go first. The priority of a query ages with its enqueue time: every second of waiting makes it
+go before the queries enqueued later that cost up to `AGING_RATE` tokens less, so the expensive queries are not
+starved by a stream of the cheap ones. When the queue is full, the query with the lowest priority is rejected.
+A query that waited for longer than `max_wait` seconds is discarded before running, as the peer has likely stopped
+waiting for the response.
+"""
+import asyncio
+import heapq
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Any, Awaitable, Callable, Dict, List
+
+FTS = 'fts'
+TAGS = 'tags'
+INFOHASH = 'infohash'
+CHANNEL = 'channel'
+POPULAR = 'popular'
+OTHER = 'other'
+
+# The relative costs of the query shapes, in tokens
+SHAPE_COSTS = {
+    FTS: 10.0,
+    TAGS: 10.0,
+    INFOHASH: 1.0,
+    CHANNEL: 1.0,
+    POPULAR: 3.0,
+    OTHER: 3.0,
+}
+ENTRIES_PER_TOKEN = 50  # the extra cost of the requested range
+AGING_RATE = 10.0  # tokens per second, the priority a query gains over the queries enqueued later
+
+MAX_IDLE_BUCKETS = 1000  # the buckets of the idle peers are removed when there are more of them
+
+RATE_LIMITED = 'rate_limited'
+QUEUE_FULL = 'queue_full'
+EXPIRED = 'expired'
+
+
+class QueryRejectedException(Exception):
+    """Raised when a query is not admitted by the `QueryScheduler`, or is discarded before running"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def get_query_shape(parameters: Dict[str, Any]) -> str:
+    if parameters.get('txt_filter'):
+        return FTS
+    if parameters.get('tags'):
+        return TAGS
+    if parameters.get('infohash') or parameters.get('infohash_set'):
+        return INFOHASH
+    if parameters.get('channel_pk') or parameters.get('origin_id'):
+        return CHANNEL
+    if parameters.get('popular'):
+        return POPULAR
+    return OTHER
+
+
+def estimate_query_cost(parameters: Dict[str, Any], shape: str) -> float:
+    first = parameters.get('first') or 0
+    last = parameters.get('last') or first
+    return SHAPE_COSTS[shape] + max(last - first, 0) / ENTRIES_PER_TOKEN
+
+
+@dataclass
+class TokenBucket:
+    tokens: float
+    updated_at: float
+
+    def refill(self, capacity: float, refill_rate: float, now: float):
+        self.tokens = min(capacity, self.tokens + (now - self.updated_at) * refill_rate)
+        self.updated_at = now
+
+
+@dataclass
+class ShapeStatistics:
+    executed: int = 0
+    rejected: Dict[str, int] = field(default_factory=lambda: dict.fromkeys((RATE_LIMITED, QUEUE_FULL, EXPIRED), 0))
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+    total_execution_time: float = 0.0
+    max_execution_time: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'executed': self.executed,
+            'rejected': dict(self.rejected),
+            'avg_wait_time': self.total_wait_time / self.executed if self.executed else 0.0,
+            'max_wait_time': self.max_wait_time,
+            'avg_execution_time': self.total_execution_time / self.executed if self.executed else 0.0,
+            'max_execution_time': self.max_execution_time,
+        }
+
+
+@dataclass(order=True)
+class QueuedQuery:
+    priority: float  # the cost of the query, aged by its enqueue time
+    number: int
+    shape: str = field(compare=False)
+    deadline: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class QueryScheduler:
+    def __init__(self, max_concurrent: int, max_queue_size: int, max_wait: float,
+                 bucket_capacity: float, bucket_refill_rate: float):
+        """
+        :param max_concurrent: the maximum number of the queries that run at the same time
+        :param max_queue_size: the maximum number of the queries that wait for their turn
+        :param max_wait: the maximum time a query waits in the queue, in seconds
+        :param bucket_capacity: the maximum number of tokens a peer can spend at once
+        :param bucket_refill_rate: the number of tokens a peer gets per second
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue_size = max_queue_size
+        self.max_wait = max_wait
+        self.bucket_capacity = bucket_capacity
+        self.bucket_refill_rate = bucket_refill_rate
+
+        self.running = 0
+        self._queue: List[QueuedQuery] = []
+        self._buckets: Dict[bytes, TokenBucket] = {}
+        self._statistics: Dict[str, ShapeStatistics] = defaultdict(ShapeStatistics)
+        self._next_number = count().__next__
+
+    async def run(self, peer_id: bytes, parameters: Dict[str, Any],
+                  func: Callable[[Dict[str, Any]], Awaitable[Any]]) -> Any:
+        """
+        Run `func(parameters)` when the query is admitted and its turn comes.
+        :raises QueryRejectedException: if the query is not admitted, or is discarded before running
+        """
+        shape = get_query_shape(parameters)
+        cost = estimate_query_cost(parameters, shape)
+        statistics = self._statistics[shape]
+        if not self._take_tokens(peer_id, cost):
+            statistics.rejected[RATE_LIMITED] += 1
+            raise QueryRejectedException(RATE_LIMITED)
+
+        queued_at = time.monotonic()
+        if self.running < self.max_concurrent and not self._queue:
+            self.running += 1
+        else:
+            priority = cost + queued_at * AGING_RATE
+            await self._wait_for_turn(QueuedQuery(priority, self._next_number(), shape, queued_at + self.max_wait,
+                                                  asyncio.get_running_loop().create_future()))
+
+        started_at = time.monotonic()
+        wait_time = started_at - queued_at
+        statistics.total_wait_time += wait_time
+        statistics.max_wait_time = max(statistics.max_wait_time, wait_time)
+        try:
+            return await func(parameters)
+        finally:
+            execution_time = time.monotonic() - started_at
+            statistics.executed += 1
+            statistics.total_execution_time += execution_time
+            statistics.max_execution_time = max(statistics.max_execution_time, execution_time)
+            self.running -= 1
+            self._start_next()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'queue_size': len(self._queue),
+            'peers': len(self._buckets),
+            'shapes': {shape: statistics.to_dict() for shape, statistics in self._statistics.items()},
+        }
+
+    def shutdown(self):
+        for query in self._queue:
+            query.future.cancel()
+        self._queue.clear()
+
+    def _take_tokens(self, peer_id: bytes, cost: float) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(peer_id)
+        if bucket is None:
+            if len(self._buckets) >= MAX_IDLE_BUCKETS:
+                self._remove_full_buckets(now)
+            bucket = self._buckets[peer_id] = TokenBucket(self.bucket_capacity, now)
+        else:
+            bucket.refill(self.bucket_capacity, self.bucket_refill_rate, now)
+
+        # A query that costs more than the capacity is admitted when the bucket is full
+        cost = min(cost, self.bucket_capacity)
+        if bucket.tokens < cost:
+            return False
+        bucket.tokens -= cost
+        return True
+
+    def _remove_full_buckets(self, now: float):
+        for peer_id, bucket in list(self._buckets.items()):
+            bucket.refill(self.bucket_capacity, self.bucket_refill_rate, now)
+            if bucket.tokens >= self.bucket_capacity:
+                self._buckets.pop(peer_id)
+
+    async def _wait_for_turn(self, query: QueuedQuery):
+        if len(self._queue) >= self.max_queue_size:
+            lowest_priority = max(self._queue)
+            if lowest_priority < query:
+                self._statistics[query.shape].rejected[QUEUE_FULL] += 1
+                raise QueryRejectedException(QUEUE_FULL)
+            self._queue.remove(lowest_priority)
+            heapq.heapify(self._queue)
+            self._reject(lowest_priority, QUEUE_FULL)
+
+        heapq.heappush(self._queue, query)
+        try:
+            await query.future
+        except asyncio.CancelledError:
+            # The slot was already given to this query, so it is passed to the next one
+            if query.future.done() and not query.future.cancelled() and query.future.exception() is None:
+                self.running -= 1
+                self._start_next()
+            raise
+
+    def _start_next(self):
+        now = time.monotonic()
+        while self._queue and self.running < self.max_concurrent:
+            query = heapq.heappop(self._queue)
+            if query.future.done():
+                continue
+            if now > query.deadline:
+                self._reject(query, EXPIRED)
+                continue
+            self.running += 1
+            query.future.set_result(None)
+
+    def _reject(self, query: QueuedQuery, reason: str):
+        self._statistics[query.shape].rejected[reason] += 1
+        if not query.future.done():
+            query.future.set_exception(QueryRejectedException(reason))
+
@@ -4,7 +4,7 @@ import time
 from asyncio import Future
 from binascii import unhexlify
 from itertools import count
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from ipv8.lazy_community import lazy_wrapper
 from ipv8.messaging.lazy_payload import VariablePayload, vp_compile
@@ -20,16 +20,40 @@ from tribler.core.components.knowledge.db.knowledge_db import ResourceType
 from tribler.core.components.metadata_store.db.orm_bindings.channel_metadata import LZ4_EMPTY_ARCHIVE, entries_to_chunk
 from tribler.core.components.metadata_store.db.serialization import CHANNEL_TORRENT, COLLECTION_NODE, REGULAR_TORRENT
 from tribler.core.components.metadata_store.db.store import MetadataStore
+from tribler.core.components.metadata_store.remote_query_community.known_filter import (
+    KNOWN_FILTER_VERSION,
+    KnownFilter,
+    KnownFilterStatistics,
+    get_entry_key,
+    get_filter_capacity,
+)
 from tribler.core.components.metadata_store.remote_query_community.payload_checker import ObjState
+from tribler.core.components.metadata_store.remote_query_community.query_scheduler import (
+    QueryRejectedException,
+    QueryScheduler,
+)
+from tribler.core.components.metadata_store.remote_query_community.response_pacer import ResponsePacer
+from tribler.core.components.metadata_store.remote_query_community.response_cache import (
+    ResponseCache,
+    get_response_key,
+)
 from tribler.core.components.metadata_store.remote_query_community.settings import RemoteQueryCommunitySettings
 from tribler.core.components.metadata_store.utils import RequestTimeoutException
 from tribler.core.components.knowledge.community.knowledge_validator import is_valid_resource
 from tribler.core.components.knowledge.db.knowledge_db import ResourceType
-from tribler.core.utilities.pony_utils import run_threaded
+from tribler.core.utilities.pony_utils import DatabaseExecutorOverloaded
 from tribler.core.utilities.unicode import hexlify
 
 BINARY_FIELDS = ("infohash", "channel_pk")
 
+# The introductions of the peers carry the marker followed by the version of the known entries filter they support
+# and the flags of the other features they support. The older peers send no marker, and get the remote select requests
+# without the filter, and the peers that send no flags get no requests that use the flagged features.
+FEATURES_MARKER = b'RQC'
+FEATURE_INFOHASH_SET = 0x01  # The queries can select the entries by a set of infohashes
+SUPPORTED_FEATURES = FEATURE_INFOHASH_SET
+MAX_PEER_FEATURES = 1000
+
 
 def sanitize_query(query_dict: Dict[str, Any], cap=100) -> Dict[str, Any]:
     sanitized_dict = dict(query_dict)
@@ -47,9 +71,20 @@ def sanitize_query(query_dict: Dict[str, Any], cap=100) -> Dict[str, Any]:
         if value is not None:
             sanitized_dict[field] = unhexlify(value)
 
+    infohash_set = sanitized_dict.get("infohash_set")
+    if infohash_set is not None:
+        if not isinstance(infohash_set, list):
+            raise TypeError("infohash_set should be a list")
+        sanitized_dict["infohash_set"] = {unhexlify(infohash) for infohash in infohash_set[:cap]}
+
     return sanitized_dict
 
 
+def get_requested_count(sanitized_parameters: Dict[str, Any]) -> int:
+    # `MetadataStore.get_entries` treats `first=0` the same way as `first=1`
+    return max(sanitized_parameters['last'] - (sanitized_parameters['first'] or 1) + 1, 0)
+
+
 def convert_to_json(parameters):
     sanitized = dict(parameters)
     # Convert frozenset to string
@@ -61,6 +96,9 @@ def convert_to_json(parameters):
         if value is not None:
             sanitized[field] = hexlify(value)
 
+    if "infohash_set" in parameters:
+        sanitized["infohash_set"] = sorted(hexlify(infohash) for infohash in parameters["infohash_set"])
+
     if "origin_id" in parameters:
         sanitized["origin_id"] = int(parameters["origin_id"])
 
@@ -79,6 +117,18 @@ class RemoteSelectPayloadEva(RemoteSelectPayload):
     msg_id = 209
 
 
+@vp_compile
+class RemoteSelectFilteredPayload(VariablePayload):
+    msg_id = 210
+    format_list = ['I', 'varlenH', 'varlenH']
+    names = ['id', 'json', 'known_filter']
+
+
+@vp_compile
+class RemoteSelectFilteredPayloadEva(RemoteSelectFilteredPayload):
+    msg_id = 211
+
+
 @vp_compile
 class SelectResponsePayload(VariablePayload):
     msg_id = 202
@@ -97,6 +147,7 @@ class SelectRequest(RandomNumberCache):
         self.packets_limit = 10
 
         self.peer = peer
+        self.sent_at = time.monotonic()
         # Indicate if at least a single packet was returned by the queried peer.
         self.peer_responded = False
 
@@ -150,15 +201,96 @@ class RemoteQueryCommunity(TriblerCommunity):
         # Also, this keeps track of hosts we responded to. There is a possibility that
         # those hosts will push back updates at us, so we need to allow it.
         self.request_cache = RequestCache()
+        # The compressed responses to the remote queries, shared by the peers that send the same query
+        self.response_cache = ResponseCache(rqc_settings.response_cache_size, rqc_settings.response_cache_ttl)
 
         self.add_message_handler(RemoteSelectPayload, self.on_remote_select)
         self.add_message_handler(RemoteSelectPayloadEva, self.on_remote_select_eva)
+        self.add_message_handler(RemoteSelectFilteredPayload, self.on_remote_select_filtered)
+        self.add_message_handler(RemoteSelectFilteredPayloadEva, self.on_remote_select_filtered_eva)
         self.add_message_handler(SelectResponsePayload, self.on_remote_select_response)
 
+        # The versions of the known entries filter and the feature flags supported by the peers, by peer mid
+        self.peer_features: Dict[bytes, Tuple[int, int]] = {}
+        self.known_filter_statistics = KnownFilterStatistics()
+
         self.eva = EVAProtocol(self, self.on_receive, self.on_send_complete, self.on_error)
-        self.remote_queries_in_progress = 0
+        # The incoming remote queries wait for their turn to access the database
+        self.query_scheduler = QueryScheduler(
+            max_concurrent=rqc_settings.max_concurrent_queries,
+            max_queue_size=rqc_settings.max_queued_queries,
+            max_wait=rqc_settings.max_query_wait,
+            bucket_capacity=rqc_settings.peer_query_tokens,
+            bucket_refill_rate=rqc_settings.peer_query_tokens_per_second,
+        )
+        # The packets of the responses are paced, instead of being sent in a burst
+        self.response_pacer = ResponsePacer(
+            rate=rqc_settings.response_send_rate,
+            burst=rqc_settings.response_send_burst,
+            peer_rate=rqc_settings.peer_response_send_rate,
+            peer_burst=rqc_settings.peer_response_send_burst,
+        )
         self.next_remote_query_num = count().__next__  # generator of sequential numbers, for logging & debug purposes
 
+    def create_introduction_request(self, socket_address, extra_bytes=b'', new_style=False, prefix=None):
+        extra_bytes = self.get_features_extra_bytes(extra_bytes)
+        return super().create_introduction_request(socket_address, extra_bytes=extra_bytes, new_style=new_style,
+                                                   prefix=prefix)
+
+    def create_introduction_response(self, lan_socket_address, socket_address, identifier, introduction=None,
+                                     extra_bytes=b'', prefix=None, new_style=False):
+        extra_bytes = self.get_features_extra_bytes(extra_bytes)
+        return super().create_introduction_response(lan_socket_address, socket_address, identifier,
+                                                    introduction=introduction, extra_bytes=extra_bytes,
+                                                    prefix=prefix, new_style=new_style)
+
+    @staticmethod
+    def get_features_extra_bytes(extra_bytes: bytes) -> bytes:
+        # The features are put before the extra bytes of the subclasses, as the peers look for them at the start
+        return FEATURES_MARKER + struct.pack('>BB', KNOWN_FILTER_VERSION, SUPPORTED_FEATURES) + extra_bytes
+
+    def introduction_request_callback(self, peer, dist, payload):
+        super().introduction_request_callback(peer, dist, payload)
+        self.remember_peer_features(peer, payload.extra_bytes)
+
+    def introduction_response_callback(self, peer, dist, payload):
+        super().introduction_response_callback(peer, dist, payload)
+        self.remember_peer_features(peer, payload.extra_bytes)
+
+    def remember_peer_features(self, peer, extra_bytes: bytes):
+        if len(extra_bytes) <= len(FEATURES_MARKER) or not extra_bytes.startswith(FEATURES_MARKER):
+            return
+        self.peer_features.pop(peer.mid, None)
+        if len(self.peer_features) >= MAX_PEER_FEATURES:
+            # Forget the peer that introduced itself the longest time ago
+            self.peer_features.pop(next(iter(self.peer_features)))
+        features = extra_bytes[len(FEATURES_MARKER):]
+        self.peer_features[peer.mid] = (features[0], features[1] if len(features) > 1 else 0)
+
+    def supports_known_filter(self, peer) -> bool:
+        return self.peer_features.get(peer.mid, (0, 0))[0] >= KNOWN_FILTER_VERSION
+
+    def supports_infohash_set(self, peer) -> bool:
+        return bool(self.peer_features.get(peer.mid, (0, 0))[1] & FEATURE_INFOHASH_SET)
+
+    async def create_known_filter(self, peers, **kwargs) -> Optional[KnownFilter]:
+        """
+        Create the filter of the local entries that match the query, to be sent along with the query to the peers.
+        :return: the filter, or None if none of the peers support it or there are no matching local entries
+        """
+        max_size = min(self.rqc_settings.known_filter_size,
+                       self.rqc_settings.maximum_payload_size - len(convert_to_json(kwargs)))
+        capacity = get_filter_capacity(max_size)
+        if not capacity or not any(self.supports_known_filter(peer) for peer in peers):
+            return None
+
+        try:
+            entries = await self.process_rpc_query(dict(kwargs, first=0, last=capacity))
+        except (OperationalError, TypeError, ValueError, DatabaseExecutorOverloaded) as error:
+            self.logger.warning(f"Can't create the known entries filter: {error}")
+            return None
+        return KnownFilter.create((get_entry_key(e.public_key, e.id_, e.timestamp) for e in entries), max_size)
+
     async def on_receive(self, result: TransferResult):
         self.logger.debug(f"EVA data received: peer {hexlify(result.peer.mid)}, info {result.info}")
         packet = (result.peer.address, result.data)
@@ -170,7 +302,8 @@ class RemoteQueryCommunity(TriblerCommunity):
     async def on_error(self, peer, exception):
         self.logger.warning(f"EVA transfer error:{exception.__class__.__name__}:{exception}, Peer: {hexlify(peer.mid)}")
 
-    def send_remote_select(self, peer, processing_callback=None, force_eva_response=False, **kwargs):
+    def send_remote_select(self, peer, processing_callback=None, force_eva_response=False,
+                           known_filter: Optional[KnownFilter] = None, **kwargs):
         request_class = EvaSelectRequest if force_eva_response else SelectRequest
         request = request_class(
             self.request_cache,
@@ -184,30 +317,31 @@ class RemoteQueryCommunity(TriblerCommunity):
 
         self.logger.debug(f"Select to {hexlify(peer.mid)} with ({kwargs})")
         args = (request.number, convert_to_json(kwargs).encode('utf8'))
-        if force_eva_response:
+        if known_filter is not None and self.supports_known_filter(peer):
+            self.known_filter_statistics.sent += 1
+            payload_class = RemoteSelectFilteredPayloadEva if force_eva_response else RemoteSelectFilteredPayload
+            self.ez_send(peer, payload_class(*args, known_filter.to_bytes()))
+        elif force_eva_response:
             self.ez_send(peer, RemoteSelectPayloadEva(*args))
         else:
             self.ez_send(peer, RemoteSelectPayload(*args))
         return request
 
-    def should_limit_rate_for_query(self, sanitized_parameters: Dict[str, Any]) -> bool:
-        return 'txt_filter' in sanitized_parameters
-
-    async def process_rpc_query_rate_limited(self, sanitized_parameters: Dict[str, Any]) -> List:
+    async def process_rpc_query_rate_limited(self, peer, sanitized_parameters: Dict[str, Any]) -> Optional[List]:
+        """
+        Process the query when the query scheduler admits it and its turn comes.
+        :return: the query results, or None if the query is ignored
+        """
         query_num = self.next_remote_query_num()
-        if self.remote_queries_in_progress and self.should_limit_rate_for_query(sanitized_parameters):
-            self.logger.warning(f'Ignore remote query {query_num} as another one is already processing. '
-                                f'The ignored query: {sanitized_parameters}')
-            return []
-
-        self.logger.info(f'Process remote query {query_num}: {sanitized_parameters}')
-        self.remote_queries_in_progress += 1
         t = time.time()
         try:
-            return await self.process_rpc_query(sanitized_parameters)
-        finally:
-            self.remote_queries_in_progress -= 1
-            self.logger.info(f'Remote query {query_num} processed in {time.time() - t} seconds: {sanitized_parameters}')
+            results = await self.query_scheduler.run(peer.mid, sanitized_parameters, self.process_rpc_query)
+        except QueryRejectedException as e:
+            self.logger.warning(f'Ignore remote query {query_num}: {e.reason}. '
+                                f'The ignored query: {sanitized_parameters}')
+            return None
+        self.logger.info(f'Remote query {query_num} processed in {time.time() - t} seconds: {sanitized_parameters}')
+        return results
 
     async def process_rpc_query(self, sanitized_parameters: Dict[str, Any]) -> List:
         """
@@ -220,7 +354,7 @@ class RemoteQueryCommunity(TriblerCommunity):
             # tags should be extracted because `get_entries_threaded` doesn't expect them as a parameter
             tags = sanitized_parameters.pop('tags', None)
 
-            infohash_set = await run_threaded(self.knowledge_db.instance, self.search_for_tags, tags)
+            infohash_set = await self.knowledge_db.executor.run(self.search_for_tags, tags)
             if infohash_set:
                 sanitized_parameters['infohash_set'] = {bytes.fromhex(s) for s in infohash_set}
 
@@ -239,25 +373,58 @@ class RemoteQueryCommunity(TriblerCommunity):
         )
         return result
 
-    def send_db_results(self, peer, request_payload_id, db_results, force_eva_response=False):
-
+    def get_db_results_chunks(self, db_results, force_eva_response=False) -> List[bytes]:
         # Special case of empty results list - sending empty lz4 archive
         if len(db_results) == 0:
-            self.ez_send(peer, SelectResponsePayload(request_payload_id, LZ4_EMPTY_ARCHIVE))
-            return
+            return [LZ4_EMPTY_ARCHIVE]
 
+        transfer_size = (
+            self.eva.settings.binary_size_limit if force_eva_response else self.rqc_settings.maximum_payload_size
+        )
+        chunks = []
         index = 0
         while index < len(db_results):
-            transfer_size = (
-                self.eva.settings.binary_size_limit if force_eva_response else self.rqc_settings.maximum_payload_size
-            )
             data, index = entries_to_chunk(db_results, transfer_size, start_index=index, include_health=True)
+            chunks.append(data)
+        return chunks
+
+    async def get_db_results_chunks_threaded(self, db_results, force_eva_response=False) -> List[bytes]:
+        """
+        Serialize and compress the entries in a database worker thread, so the event loop is not blocked.
+        The entries are loaded by `MetadataStore.get_entries`, so no database access is needed.
+        """
+        if not db_results:
+            return self.get_db_results_chunks(db_results, force_eva_response)
+        return await self.mds.executor.run(self.get_db_results_chunks, db_results, force_eva_response)
+
+    async def send_db_results(self, peer, request_payload_id, db_results, force_eva_response=False):
+        chunks = await self.get_db_results_chunks_threaded(db_results, force_eva_response)
+        await self.send_db_results_chunks(peer, request_payload_id, chunks, force_eva_response)
+
+    async def push_updates_back(self, peer, request_payload_id, db_results):
+        try:
+            await self.send_db_results(peer, request_payload_id, db_results)
+        except DatabaseExecutorOverloaded as error:
+            self.logger.warning(f"Can't push the updates back: {error}")
+
+    async def send_db_results_chunks(self, peer, request_payload_id, chunks: List[bytes], force_eva_response=False):
+        """
+        Send the chunks of the response. The packets sent over UDP are paced by the response pacer, and the transfers
+        over EVA are paced by EVA itself.
+        """
+        loop_time = 0.0
+        for data in chunks:
             payload = SelectResponsePayload(request_payload_id, data)
             if force_eva_response or (len(data) > self.rqc_settings.maximum_payload_size):
+                started_at = time.perf_counter()
                 self.eva.send_binary(peer, struct.pack('>i', request_payload_id),
                                      self.ezr_pack(payload.msg_id, payload))
             else:
+                await self.response_pacer.wait(peer.mid, len(data))
+                started_at = time.perf_counter()
                 self.ez_send(peer, payload)
+            loop_time += time.perf_counter() - started_at
+        self.response_pacer.add_response(loop_time)
 
     @lazy_wrapper(RemoteSelectPayloadEva)
     async def on_remote_select_eva(self, peer, request_payload):
@@ -267,6 +434,14 @@ class RemoteQueryCommunity(TriblerCommunity):
     async def on_remote_select(self, peer, request_payload):
         await self._on_remote_select_basic(peer, request_payload)
 
+    @lazy_wrapper(RemoteSelectFilteredPayloadEva)
+    async def on_remote_select_filtered_eva(self, peer, request_payload):
+        await self._on_remote_select_basic(peer, request_payload, force_eva_response=True)
+
+    @lazy_wrapper(RemoteSelectFilteredPayload)
+    async def on_remote_select_filtered(self, peer, request_payload):
+        await self._on_remote_select_basic(peer, request_payload)
+
     def parse_parameters(self, json_bytes: bytes) -> Dict[str, Any]:
         parameters = json.loads(json_bytes)
         return sanitize_query(parameters, self.rqc_settings.max_response_size)
@@ -274,16 +449,80 @@ class RemoteQueryCommunity(TriblerCommunity):
     async def _on_remote_select_basic(self, peer, request_payload, force_eva_response=False):
         try:
             sanitized_parameters = self.parse_parameters(request_payload.json)
-            db_results = await self.process_rpc_query_rate_limited(sanitized_parameters)
+            known_filter = None
+            if isinstance(request_payload, RemoteSelectFilteredPayload):
+                known_filter = KnownFilter.from_bytes(request_payload.known_filter)
+                self.known_filter_statistics.received += 1
+            chunks, has_results = await self.get_response_chunks(peer, sanitized_parameters, force_eva_response,
+                                                                 known_filter)
 
             # When we send our response to a host, we open a window of opportunity
             # for it to push back updates
-            if db_results and not self.request_cache.has(hexlify(peer.mid), request_payload.id):
+            if has_results and not self.request_cache.has(hexlify(peer.mid), request_payload.id):
                 self.request_cache.add(PushbackWindow(self.request_cache, hexlify(peer.mid), request_payload.id))
 
-            self.send_db_results(peer, request_payload.id, db_results, force_eva_response)
+            await self.send_db_results_chunks(peer, request_payload.id, chunks, force_eva_response)
         except (OperationalError, TypeError, ValueError) as error:
             self.logger.error(f"Remote select. The error occurred: {error}")
+        except DatabaseExecutorOverloaded as error:
+            self.logger.warning(f"Remote select. Ignore the request: {error}")
+
+    async def get_response_chunks(self, peer, sanitized_parameters: Dict[str, Any], force_eva_response=False,
+                                  known_filter: Optional[KnownFilter] = None):
+        """
+        Get the compressed chunks of the response to the query, from the response cache if possible.
+        :return: a tuple of the chunks and a flag that indicates whether the response contains any entries
+        """
+        if not self.response_cache.enabled:
+            db_results = await self.get_unknown_db_results(peer, sanitized_parameters, known_filter) or []
+            return await self.get_db_results_chunks_threaded(db_results, force_eva_response), bool(db_results)
+
+        key_parameters = sanitized_parameters
+        if known_filter is not None:
+            key_parameters = dict(sanitized_parameters, known_filter=known_filter.to_bytes())
+        key = get_response_key(key_parameters, force_eva_response)
+        # The content version is read before the query, so the changes committed during the query invalidate
+        # the response
+        content_version = await self.mds.get_content_version_threaded()
+        cached = self.response_cache.get(key, content_version)
+        if cached is not None:
+            return cached.chunks, cached.has_results
+
+        started_at = time.perf_counter()
+        db_results = await self.get_unknown_db_results(peer, sanitized_parameters, known_filter)
+        if db_results is None:
+            return self.get_db_results_chunks([], force_eva_response), False
+
+        chunks = await self.get_db_results_chunks_threaded(db_results, force_eva_response)
+        self.response_cache.put(key, chunks, bool(db_results), content_version, time.perf_counter() - started_at)
+        return chunks, bool(db_results)
+
+    async def get_unknown_db_results(self, peer, sanitized_parameters: Dict[str, Any],
+                                     known_filter: Optional[KnownFilter] = None) -> Optional[List]:
+        """
+        Get the results of the query, without the entries that match the known entries filter of the peer.
+        The skipped entries are replaced by the following results of the query.
+        :return: the query results, or None if the query is ignored
+        """
+        if known_filter is None:
+            return await self.process_rpc_query_rate_limited(peer, sanitized_parameters)
+
+        requested_count = get_requested_count(sanitized_parameters)
+        extra_count = min(requested_count, self.rqc_settings.max_response_size)
+        extended_parameters = dict(sanitized_parameters, last=sanitized_parameters['last'] + extra_count)
+        db_results = await self.process_rpc_query_rate_limited(peer, extended_parameters)
+        if db_results is None:
+            return None
+
+        unknown = []
+        for index, entry in enumerate(db_results):
+            if get_entry_key(entry.public_key, entry.id_, entry.timestamp) not in known_filter:
+                unknown.append(entry)
+            elif index < requested_count:
+                # The entry would have been sent without the filter
+                self.known_filter_statistics.skipped_entries += 1
+                self.known_filter_statistics.skipped_bytes += len(entry.serialized())
+        return unknown[:requested_count]
 
     @lazy_wrapper(SelectResponsePayload)
     async def on_remote_select_response(self, peer, response_payload):
@@ -314,7 +553,8 @@ class RemoteQueryCommunity(TriblerCommunity):
         # If we know about updated versions of the received stuff, push the updates back
         if isinstance(request, SelectRequest) and self.rqc_settings.push_updates_back_enabled:
             newer_entities = [r.md_obj for r in processing_results if r.obj_state == ObjState.LOCAL_VERSION_NEWER]
-            self.send_db_results(peer, response_payload.id, newer_entities)
+            self.register_anonymous_task('push_updates_back', self.push_updates_back, peer, response_payload.id,
+                                         newer_entities)
 
         if self.rqc_settings.channel_query_back_enabled:
             for result in processing_results:
@@ -346,8 +586,14 @@ class RemoteQueryCommunity(TriblerCommunity):
 
         # Remember that at least a single packet was received was received from the queried peer.
         if isinstance(request, SelectRequest):
+            self._on_query_response(request, processing_results)
             request.peer_responded = True
 
+    def _on_query_response(self, request, processing_results):
+        """
+        Called on each response packet to a select request, before the request is marked as responded.
+        """
+
     def _on_query_timeout(self, request_cache):
         if not request_cache.peer_responded:
             self.logger.debug(
@@ -359,6 +605,7 @@ class RemoteQueryCommunity(TriblerCommunity):
             self.network.remove_peer(request_cache.peer)
 
     async def unload(self):
+        self.query_scheduler.shutdown()
         await self.eva.shutdown()
         await self.request_cache.shutdown()
         await super().unload()
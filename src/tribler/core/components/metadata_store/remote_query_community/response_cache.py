@@ -0,0 +1,110 @@
+"""
+Cache of the responses to the remote select queries.
+
+Many peers send the same queries: popular text searches, and the previews of the channels they discover
+(`channel_query_back`). For such queries, the database query, the serialization and the LZ4 compression of the
+entries are done once, and the same compressed chunks are sent to all the peers.
+
+A cached response is valid for at most `ttl` seconds, and while the entries of the metadata database and their health
+stay unchanged (that is, while its content version, see `MetadataStore.get_content_version`, stays the same).
+The least recently used responses are evicted when the total size of the cached chunks exceeds `max_size` bytes.
+"""
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class CachedResponse:
+    chunks: List[bytes]
+    has_results: bool
+    content_version: int
+    created_at: float
+    processing_time: float  # seconds spent to query the database and to serialize the response
+
+    @property
+    def size(self) -> int:
+        return sum(len(chunk) for chunk in self.chunks)
+
+
+def get_response_key(parameters: Dict[str, Any], force_eva_response: bool = False) -> str:
+    """
+    Get the cache key of the sanitized query parameters. The key does not depend on the order of the parameters
+    and of the elements of the metadata type and the tag lists. The responses sent over EVA are split into chunks
+    differently, so they are cached separately.
+    """
+    normalized = {}
+    for name, value in parameters.items():
+        if isinstance(value, (list, tuple, set, frozenset)) and all(isinstance(v, (int, str)) for v in value):
+            value = sorted(value, key=repr)
+        normalized[name] = value
+    return json.dumps([normalized, force_eva_response], sort_keys=True, default=repr)
+
+
+class ResponseCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0
+
+        self._cache: OrderedDict[str, CachedResponse] = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, key: str, content_version: Optional[int]) -> Optional[CachedResponse]:
+        cached = self._cache.get(key)
+        if cached is not None and (cached.content_version != content_version
+                                   or time.monotonic() - cached.created_at > self.ttl):
+            self._remove(key)
+            cached = None
+
+        if cached is None:
+            self.misses += 1
+            return None
+
+        self._cache.move_to_end(key)
+        self.hits += 1
+        self.saved_time += cached.processing_time
+        return cached
+
+    def put(self, key: str, chunks: List[bytes], has_results: bool, content_version: Optional[int],
+            processing_time: float):
+        if content_version is None:
+            return  # The changes of an in-memory database can not be tracked
+
+        response = CachedResponse(chunks, has_results, content_version, time.monotonic(), processing_time)
+        if key in self._cache:
+            self._remove(key)
+        if response.size > self.max_size:
+            return
+
+        self._cache[key] = response
+        self.size += response.size
+        while self.size > self.max_size:
+            self._remove(next(iter(self._cache)))
+
+    def clear(self):
+        self._cache.clear()
+        self.size = 0
+
+    def get_statistics(self) -> Dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            'entries': len(self._cache),
+            'size': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+            'saved_time': self.saved_time,
+        }
+
+    def _remove(self, key: str):
+        self.size -= self._cache.pop(key).size
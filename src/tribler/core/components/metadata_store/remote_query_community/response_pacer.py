@@ -0,0 +1,111 @@
+"""
+Pacing of the packets of the responses to the remote select queries.
+
+Instead of sending all the packets of a response in a single burst, each packet reserves a send time within the send
+rate of the peer, and then within the global send rate, shared by all the peers. Each limit allows a burst of `burst`
+bytes to be sent at once (the generic cell rate algorithm). As the send times are reserved in order, the responses that
+are queued earlier are sent earlier.
+
+The pacer also keeps the statistics of the responses, including the time the event loop is blocked to encode
+and send the packets of a response.
+"""
+import asyncio
+import time
+from typing import Any, Dict
+
+MAX_PEERS = 1000  # the send times of the idle peers are removed when there are more peers
+
+
+class ResponsePacer:
+    def __init__(self, rate: float, burst: float, peer_rate: float, peer_burst: float):
+        """
+        :param rate: the maximum rate of sending the packets to all the peers, in bytes per second. 0 means no limit
+        :param burst: the number of bytes that can be sent to all the peers at once
+        :param peer_rate: the maximum rate of sending the packets to a peer, in bytes per second. 0 means no limit
+        :param peer_burst: the number of bytes that can be sent to a single peer at once
+        """
+        self.rate = rate
+        self.burst = burst
+        self.peer_rate = peer_rate
+        self.peer_burst = peer_burst
+
+        # The theoretical arrival times: when the previously reserved bytes are sent at the maximum rate
+        self._tat = 0.0
+        self._peer_tat: Dict[bytes, float] = {}
+
+        self.responses = 0
+        self.packets = 0
+        self.bytes = 0
+        self.delayed_packets = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+        self.total_loop_time = 0.0
+        self.max_loop_time = 0.0
+
+    def reserve_peer(self, peer_id: bytes, size: int) -> float:
+        """
+        Reserve the send time of a packet within the send rate of the peer.
+        :return: the delay before the packet can be sent, in seconds
+        """
+        if not self.peer_rate:
+            return 0.0
+        now = time.monotonic()
+        if len(self._peer_tat) >= MAX_PEERS:
+            self._peer_tat = {p: tat for p, tat in self._peer_tat.items() if tat > now}
+        tat = max(self._peer_tat.get(peer_id, now), now)
+        self._peer_tat[peer_id] = tat + size / self.peer_rate
+        return max(tat - self.peer_burst / self.peer_rate - now, 0.0)
+
+    def reserve_global(self, size: int) -> float:
+        """
+        Reserve the send time of a packet within the global send rate.
+        :return: the delay before the packet can be sent, in seconds
+        """
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        tat = max(self._tat, now)
+        self._tat = tat + size / self.rate
+        return max(tat - self.burst / self.rate - now, 0.0)
+
+    async def wait(self, peer_id: bytes, size: int):
+        """
+        Wait until a packet of `size` bytes can be sent to the peer.
+        """
+        # The global send time is reserved when the packet is due for the peer, so a peer that is limited by its own
+        # send rate does not delay the packets of the other peers
+        delay = self.reserve_peer(peer_id, size)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        global_delay = self.reserve_global(size)
+        if global_delay > 0:
+            await asyncio.sleep(global_delay)
+        delay += global_delay
+
+        self.packets += 1
+        self.bytes += size
+        if delay > 0:
+            self.delayed_packets += 1
+            self.total_delay += delay
+            self.max_delay = max(self.max_delay, delay)
+
+    def add_response(self, loop_time: float):
+        """
+        Account for a sent response.
+        :param loop_time: the time the event loop was blocked to encode and send the packets of the response
+        """
+        self.responses += 1
+        self.total_loop_time += loop_time
+        self.max_loop_time = max(self.max_loop_time, loop_time)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'responses': self.responses,
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'delayed_packets': self.delayed_packets,
+            'avg_delay': self.total_delay / self.delayed_packets if self.delayed_packets else 0.0,
+            'max_delay': self.max_delay,
+            'avg_loop_time': self.total_loop_time / self.responses if self.responses else 0.0,
+            'max_loop_time': self.max_loop_time,
+        }
@@ -19,6 +19,26 @@ class RemoteQueryCommunitySettings(TriblerConfigSection):
     max_channel_query_back: int = 4  # Max number of entries to query back on receiving an unknown channel
     push_updates_back_enabled = True
 
+    # The admission of the incoming remote queries, see query_scheduler.py
+    max_concurrent_queries: int = 2  # Max number of remote queries processed at the same time
+    max_queued_queries: int = 50  # Max number of remote queries waiting to be processed
+    max_query_wait: float = 5.0  # Max time a remote query waits to be processed, in seconds
+    peer_query_tokens: float = 100.0  # Max cost of the remote queries a peer can send at once
+    peer_query_tokens_per_second: float = 10.0  # Cost of the remote queries a peer can send per second
+
+    # The responses to the repeated remote queries are served from the cache while the database stays unchanged
+    response_cache_size: int = 4 * 1024 * 1024  # Max size of the cached responses, in bytes. 0 disables the cache
+    response_cache_ttl: int = 60  # Max age of a cached response, in seconds
+
+    # The remote queries carry a filter of the entries we already have, so the peers send only the new ones
+    known_filter_size: int = 800  # Max size of the known entries filter, in bytes. 0 disables the filter
+
+    # The packets of the responses are paced, see response_pacer.py. The rates are in bytes per second, 0 is no limit
+    response_send_rate: int = 1024 * 1024  # Max rate of sending the responses to all the peers
+    response_send_burst: int = 64 * 1024  # Max number of bytes sent to all the peers at once
+    peer_response_send_rate: int = 128 * 1024  # Max rate of sending the responses to a single peer
+    peer_response_send_burst: int = 16 * 1024  # Max number of bytes sent to a single peer at once
+
     @property
     def channel_query_back_enabled(self):
         return self.max_channel_query_back > 0
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from tribler.core.components.metadata_store.remote_query_community.known_filter import (
+    BITS_PER_ENTRY,
+    HEADER,
+    KNOWN_FILTER_VERSION,
+    KnownFilter,
+    MIN_FILTER_SIZE,
+    get_entry_key,
+    get_filter_capacity,
+)
+
+
+def random_keys(count):
+    return [get_entry_key(os.urandom(64), i, i * 1000) for i in range(count)]
+
+
+def test_create():
+    keys = random_keys(100)
+    known_filter = KnownFilter.create(keys, max_size=1000)
+
+    assert all(key in known_filter for key in keys)
+    assert len(known_filter.to_bytes()) == HEADER.size + 100 * BITS_PER_ENTRY // 8
+
+
+def test_create_empty():
+    assert KnownFilter.create([], max_size=1000) is None
+    assert KnownFilter.create(random_keys(1), max_size=HEADER.size) is None
+
+
+def test_create_over_capacity():
+    keys = random_keys(200)
+    known_filter = KnownFilter.create(keys, max_size=102)
+
+    assert get_filter_capacity(102) == 80
+    assert len(known_filter.to_bytes()) == 102
+    assert all(key in known_filter for key in keys[:80])
+
+
+def test_false_positives():
+    known_filter = KnownFilter.create(random_keys(500), max_size=1000)
+    false_positives = sum(key in known_filter for key in random_keys(10000))
+    assert false_positives < 300
+
+
+def test_small_filter():
+    known_filter = KnownFilter.create(random_keys(5), max_size=1000)
+    assert len(known_filter.to_bytes()) == HEADER.size + MIN_FILTER_SIZE
+    false_positives = sum(key in known_filter for key in random_keys(10000))
+    assert false_positives < 100
+
+    # The minimum size does not exceed the maximum size
+    assert len(KnownFilter.create(random_keys(5), max_size=10).to_bytes()) == 10
+
+
+def test_entry_key():
+    public_key = os.urandom(64)
+    known_filter = KnownFilter.create([get_entry_key(public_key, 1, 100)], max_size=1000)
+
+    # Another version of the entry does not match the filter
+    assert get_entry_key(public_key, 1, 100) in known_filter
+    assert get_entry_key(public_key, 1, 101) not in known_filter
+
+
+def test_from_bytes():
+    keys = random_keys(10)
+    known_filter = KnownFilter.from_bytes(KnownFilter.create(keys, max_size=1000).to_bytes())
+    assert all(key in known_filter for key in keys)
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    HEADER.pack(KNOWN_FILTER_VERSION, 7),
+    HEADER.pack(KNOWN_FILTER_VERSION + 1, 7) + b'\xff',
+    HEADER.pack(KNOWN_FILTER_VERSION, 0) + b'\xff',
+])
+def test_from_bytes_invalid(data):
+    with pytest.raises(ValueError):
+        KnownFilter.from_bytes(data)
@@ -0,0 +1,173 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from tribler.core.components.metadata_store.remote_query_community.query_scheduler import (
+    AGING_RATE,
+    CHANNEL,
+    EXPIRED,
+    FTS,
+    INFOHASH,
+    OTHER,
+    QUEUE_FULL,
+    QueryRejectedException,
+    QueryScheduler,
+    RATE_LIMITED,
+    TAGS,
+    estimate_query_cost,
+    get_query_shape,
+)
+
+# pylint: disable=redefined-outer-name, protected-access
+
+
+@pytest.fixture
+def scheduler():
+    return QueryScheduler(max_concurrent=1, max_queue_size=2, max_wait=10, bucket_capacity=100,
+                          bucket_refill_rate=10)
+
+
+class Query:
+    """A query that runs until it is released by the test"""
+
+    def __init__(self, scheduler, parameters, peer_id=b'peer'):
+        self.started = False
+        self.released = asyncio.Event()
+        self.task = asyncio.create_task(scheduler.run(peer_id, parameters, self.process))
+
+    async def process(self, parameters):
+        self.started = True
+        await self.released.wait()
+        return parameters
+
+    async def release(self):
+        self.released.set()
+        return await self.task
+
+
+@pytest.mark.parametrize('parameters, shape', [
+    ({'txt_filter': 'ubuntu', 'tags': ['linux']}, FTS),
+    ({'tags': ['linux']}, TAGS),
+    ({'infohash': b'1' * 20}, INFOHASH),
+    ({'channel_pk': b'1' * 64, 'origin_id': 123}, CHANNEL),
+    ({'metadata_type': [300]}, OTHER),
+])
+def test_get_query_shape(parameters, shape):
+    assert get_query_shape(parameters) == shape
+
+
+def test_estimate_query_cost():
+    assert estimate_query_cost({'first': 0, 'last': 100}, FTS) > estimate_query_cost({'first': 0, 'last': 4}, FTS)
+    assert estimate_query_cost({}, FTS) > estimate_query_cost({}, INFOHASH)
+
+
+async def test_run(scheduler):
+    query = Query(scheduler, {'txt_filter': 'ubuntu'})
+    await asyncio.sleep(0)
+    assert query.started
+    assert scheduler.running == 1
+
+    assert await query.release() == {'txt_filter': 'ubuntu'}
+    assert scheduler.running == 0
+    statistics = scheduler.get_statistics()['shapes'][FTS]
+    assert statistics['executed'] == 1
+    assert statistics['rejected'] == {RATE_LIMITED: 0, QUEUE_FULL: 0, EXPIRED: 0}
+
+
+async def test_rate_limit(scheduler):
+    scheduler.bucket_capacity = 25
+    for _ in range(2):
+        await Query(scheduler, {'txt_filter': 'ubuntu'}).release()
+
+    with pytest.raises(QueryRejectedException, match=RATE_LIMITED):
+        await Query(scheduler, {'txt_filter': 'ubuntu'}).release()
+
+    # Another peer has its own tokens
+    await Query(scheduler, {'txt_filter': 'ubuntu'}, peer_id=b'another peer').release()
+
+    # The tokens are refilled over time
+    with patch('time.monotonic', return_value=scheduler._buckets[b'peer'].updated_at + 1):
+        await Query(scheduler, {'txt_filter': 'ubuntu'}).release()
+
+    assert scheduler.get_statistics()['shapes'][FTS]['rejected'][RATE_LIMITED] == 1
+
+
+async def test_cheaper_queries_first(scheduler):
+    running = Query(scheduler, {'txt_filter': 'ubuntu'})
+    expensive = Query(scheduler, {'txt_filter': 'debian'})
+    cheap = Query(scheduler, {'infohash': b'1' * 20})
+    await asyncio.sleep(0)
+    assert running.started and not expensive.started and not cheap.started
+
+    await running.release()
+    await asyncio.sleep(0)
+    assert cheap.started and not expensive.started
+
+    await cheap.release()
+    await expensive.release()
+    assert scheduler.get_statistics()['shapes'][INFOHASH]['max_wait_time'] > 0
+
+
+async def test_aged_queries_first(scheduler):
+    running = Query(scheduler, {'txt_filter': 'ubuntu'})
+    expensive = Query(scheduler, {'txt_filter': 'debian'})
+    await asyncio.sleep(0)
+
+    # The expensive query has waited long enough to go before a cheap query enqueued later
+    queued_at = scheduler._queue[0].deadline - scheduler.max_wait
+    with patch('time.monotonic', return_value=queued_at + 10 / AGING_RATE):
+        cheap = Query(scheduler, {'infohash': b'1' * 20})
+        await asyncio.sleep(0)
+        await running.release()
+    await asyncio.sleep(0)
+    assert expensive.started and not cheap.started
+
+    await expensive.release()
+    await cheap.release()
+
+
+async def test_queue_full(scheduler):
+    running = Query(scheduler, {'txt_filter': 'ubuntu'})
+    expensive = Query(scheduler, {'txt_filter': 'debian'})
+    cheap = Query(scheduler, {'infohash': b'1' * 20})
+    await asyncio.sleep(0)
+
+    # The most expensive query is rejected to make place for a cheaper one
+    another_cheap = Query(scheduler, {'channel_pk': b'1' * 64})
+    await asyncio.sleep(0)
+    with pytest.raises(QueryRejectedException, match=QUEUE_FULL):
+        await expensive.task
+
+    # A query that is more expensive than all the queued ones is rejected
+    with pytest.raises(QueryRejectedException, match=QUEUE_FULL):
+        await Query(scheduler, {'txt_filter': 'linux'}).task
+
+    await running.release()
+    await cheap.release()
+    await another_cheap.release()
+    assert scheduler.get_statistics()['shapes'][FTS]['rejected'][QUEUE_FULL] == 2
+
+
+async def test_expired(scheduler):
+    running = Query(scheduler, {'txt_filter': 'ubuntu'})
+    queued = Query(scheduler, {'infohash': b'1' * 20})
+    await asyncio.sleep(0)
+
+    with patch('time.monotonic', return_value=scheduler._queue[0].deadline + 1):
+        await running.release()
+    with pytest.raises(QueryRejectedException, match=EXPIRED):
+        await queued.task
+    assert not queued.started
+    assert scheduler.running == 0
+
+
+async def test_shutdown(scheduler):
+    running = Query(scheduler, {'txt_filter': 'ubuntu'})
+    queued = Query(scheduler, {'infohash': b'1' * 20})
+    await asyncio.sleep(0)
+
+    scheduler.shutdown()
+    with pytest.raises(asyncio.CancelledError):
+        await queued.task
+    await running.release()
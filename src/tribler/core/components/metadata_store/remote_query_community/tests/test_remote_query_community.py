@@ -1,4 +1,5 @@
 import asyncio
+import json
 import random
 import string
 import time
@@ -18,11 +19,14 @@ from tribler.core.components.metadata_store.db.orm_bindings.channel_node import
 from tribler.core.components.metadata_store.db.serialization import CHANNEL_THUMBNAIL, CHANNEL_TORRENT, REGULAR_TORRENT
 from tribler.core.components.metadata_store.db.store import MetadataStore
 from tribler.core.components.metadata_store.remote_query_community.remote_query_community import (
+    FEATURES_MARKER,
     RemoteQueryCommunity,
+    convert_to_json,
     sanitize_query,
 )
 from tribler.core.components.metadata_store.remote_query_community.settings import RemoteQueryCommunitySettings
 from tribler.core.utilities.path_util import Path
+from tribler.core.utilities.pony_utils import DatabaseExecutorOverloaded
 from tribler.core.utilities.unicode import hexlify
 from tribler.core.utilities.utilities import random_infohash
 
@@ -69,9 +73,10 @@ class TestRemoteQueryCommunity(TestBase):
         self.initialize(BasicRemoteQueryCommunity, 2)
 
     async def tearDown(self):
+        # The communities are unloaded first, so their requests in progress do not use the closed databases
+        await super().tearDown()
         for metadata_store in self.metadata_store_set:
             metadata_store.shutdown()
-        await super().tearDown()
 
     def create_node(self, *args, **kwargs):
         metadata_store = MetadataStore(
@@ -333,6 +338,54 @@ class TestRemoteQueryCommunity(TestBase):
             field_in_hex = hexlify(field_in_b)
             assert sanitize_query({field: field_in_hex})[field] == field_in_b
 
+    def test_sanitize_query_infohash_set(self):
+        infohashes = {random_infohash() for _ in range(3)}
+        parameters = json.loads(convert_to_json({"infohash_set": infohashes}))
+        assert sanitize_query(parameters)["infohash_set"] == infohashes
+        assert len(sanitize_query(parameters, cap=2)["infohash_set"]) == 2
+
+        with pytest.raises(TypeError):
+            sanitize_query({"infohash_set": hexlify(random_infohash())})
+
+    def test_remember_peer_features(self):
+        overlay = self.overlay(0)
+        peer = self.nodes[1].my_peer
+
+        # The peers without the feature flags only support the known entries filter
+        overlay.remember_peer_features(peer, FEATURES_MARKER + b'\x01')
+        assert overlay.supports_known_filter(peer)
+        assert not overlay.supports_infohash_set(peer)
+
+        overlay.remember_peer_features(peer, FEATURES_MARKER + b'\x01\x01')
+        assert overlay.supports_infohash_set(peer)
+
+    def test_features_extra_bytes(self):
+        overlay = self.overlay(0)
+        peer = self.nodes[1].my_peer
+
+        # The extra bytes of the subclasses are kept after the features
+        extra_bytes = overlay.get_features_extra_bytes(b'extra')
+        assert extra_bytes.endswith(b'extra')
+        overlay.remember_peer_features(peer, extra_bytes)
+        assert overlay.supports_known_filter(peer)
+        assert overlay.supports_infohash_set(peer)
+
+    async def test_remote_select_infohash_set(self):
+        a = self.nodes[0].overlay
+        b = self.nodes[1].overlay
+        await self.introduce_nodes()
+        assert b.supports_infohash_set(self.nodes[0].my_peer)
+
+        with db_session:
+            for i in range(5):
+                add_random_torrent(a.mds.TorrentMetadata, name=f"ubuntu {i}")
+            infohashes = {t.infohash for t in a.mds.TorrentMetadata.select()[:3]}
+
+        b.send_remote_select(self.nodes[0].my_peer, infohash_set=infohashes, last=len(infohashes))
+        await self.deliver_messages(timeout=0.5)
+        with db_session:
+            assert {t.infohash for t in b.mds.TorrentMetadata.select()} == infohashes
+
     async def test_unknown_query_attribute(self):
         rqc_node1 = self.nodes[0].overlay
         rqc_node2 = self.nodes[1].overlay
@@ -586,7 +639,7 @@ class TestRemoteQueryCommunity(TestBase):
 
         self.nodes[1].overlay.eva.send_binary.assert_called_once()
 
-    async def test_multiple_parallel_request(self):
+    async def send_parallel_requests(self):
         peer_a = self.nodes[0].my_peer
         a = self.nodes[0].overlay
         b = self.nodes[1].overlay
@@ -596,7 +649,7 @@ class TestRemoteQueryCommunity(TestBase):
             add_random_torrent(a.mds.TorrentMetadata, name="foo")
             add_random_torrent(a.mds.TorrentMetadata, name="bar")
 
-        # Peer B sends two parallel full-text search queries, only one of them should be processed
+        # Peer B sends two parallel full-text search queries
         callback1 = Mock()
         kwargs1 = {"txt_filter": "foo", "metadata_type": [REGULAR_TORRENT]}
         b.send_remote_select(peer_a, **kwargs1, processing_callback=callback1)
@@ -617,14 +670,159 @@ class TestRemoteQueryCommunity(TestBase):
         with patch.object(a, 'logger') as logger, patch.object(MetadataStore, 'get_entries', slow_get_entries):
             await self.deliver_messages(timeout=0.5)
 
+        # Both remote queries should return results to the peer B
+        assert callback1.called and callback2.called
+
         torrents1 = list(b.mds.get_entries(**kwargs1))
         torrents2 = list(b.mds.get_entries(**kwargs2))
+        warnings = [call.args[0] for call in logger.warning.call_args_list]
+        ignored = [msg for msg in warnings if msg.startswith('Ignore remote query')]
+        return torrents1, torrents2, ignored
 
-        # Both remote queries should return results to the peer B...
-        assert callback1.called and callback2.called
-        # ...but one of them should return an empty list, as the database query was not actually executed
+    async def test_multiple_parallel_request(self):
+        # The second query waits until the first one is processed
+        scheduler = self.overlay(0).query_scheduler
+        scheduler.max_concurrent = 1
+
+        torrents1, torrents2, ignored = await self.send_parallel_requests()
+
+        assert torrents1 and torrents2
+        assert not ignored
+        statistics = scheduler.get_statistics()['shapes']['fts']
+        assert statistics['executed'] == 2
+        assert statistics['max_wait_time'] > 0
+
+    async def test_multiple_parallel_request_rate_limited(self):
+        # The peer can only pay for a single full-text search
+        scheduler = self.overlay(0).query_scheduler
+        scheduler.bucket_capacity = 15
+        scheduler.bucket_refill_rate = 0
+
+        torrents1, torrents2, ignored = await self.send_parallel_requests()
+
+        # One of the queries should return an empty list, as the database query was not actually executed
         assert bool(torrents1) != bool(torrents2)
+        assert len(ignored) == 1
+        assert scheduler.get_statistics()['shapes']['fts']['rejected']['rate_limited'] == 1
 
-        # Check that on peer A there is exactly one warning about an ignored remote query
-        warnings = [call.args[0] for call in logger.warning.call_args_list]
-        assert len([msg for msg in warnings if msg.startswith('Ignore remote query')]) == 1
+    async def test_remote_select_response_cache(self):
+        a = self.nodes[0].overlay
+        b = self.nodes[1].overlay
+        b.rqc_settings.max_channel_query_back = 0
+
+        with db_session:
+            add_random_torrent(a.mds.TorrentMetadata, name="ubuntu")
+        # The setup of the connection of the executor thread changes the data version of the database
+        await a.mds.get_entries_threaded()
+
+        kwargs_dict = {"txt_filter": "ubuntu*", "metadata_type": [REGULAR_TORRENT]}
+        with patch.object(a.mds, 'get_entries_threaded', wraps=a.mds.get_entries_threaded) as get_entries_threaded:
+            for _ in range(2):
+                callback = Mock()
+                b.send_remote_select(self.nodes[0].my_peer, **kwargs_dict, processing_callback=callback)
+                await self.deliver_messages(timeout=0.5)
+                callback.assert_called()
+
+            # The second query is answered from the response cache
+            get_entries_threaded.assert_called_once()
+            assert a.response_cache.get_statistics()['hits'] == 1
+
+            # The changes of the database invalidate the cached response
+            with db_session:
+                add_random_torrent(a.mds.TorrentMetadata, name="ubuntu 2")
+            b.send_remote_select(self.nodes[0].my_peer, **kwargs_dict)
+            await self.deliver_messages(timeout=0.5)
+            assert get_entries_threaded.call_count == 2
+
+        with db_session:
+            assert b.mds.TorrentMetadata.select().count() == 2
+
+    async def test_remote_select_known_filter(self):
+        peer_a = self.nodes[0].my_peer
+        a = self.nodes[0].overlay
+        b = self.nodes[1].overlay
+        await self.introduce_nodes()
+        assert b.supports_known_filter(peer_a)
+
+        with db_session:
+            for i in range(10):
+                add_random_torrent(a.mds.TorrentMetadata, name=f"ubuntu {i}")
+
+        # Peer B gets the first half of the entries
+        kwargs_dict = {"metadata_type": [REGULAR_TORRENT], "first": 0, "last": 5}
+        b.send_remote_select(peer_a, **kwargs_dict)
+        await self.deliver_messages(timeout=0.5)
+        with db_session:
+            assert b.mds.TorrentMetadata.select().count() == 5
+
+        # Peer A skips the entries that peer B has, and sends the other entries instead
+        known_filter = await b.create_known_filter([peer_a], **kwargs_dict)
+        b.send_remote_select(peer_a, **kwargs_dict, known_filter=known_filter)
+        await self.deliver_messages(timeout=0.5)
+        with db_session:
+            assert b.mds.TorrentMetadata.select().count() == 10
+
+        assert b.known_filter_statistics.sent == 1
+        assert a.known_filter_statistics.received == 1
+        assert a.known_filter_statistics.skipped_entries == 5
+        assert a.known_filter_statistics.skipped_bytes > 0
+
+    async def test_remote_select_known_filter_not_supported(self):
+        peer_a = self.nodes[0].my_peer
+        a = self.nodes[0].overlay
+        b = self.nodes[1].overlay
+
+        with db_session:
+            add_random_torrent(a.mds.TorrentMetadata, name="ubuntu")
+            add_random_torrent(b.mds.TorrentMetadata, name="debian")
+        kwargs_dict = {"metadata_type": [REGULAR_TORRENT]}
+
+        # Peer B did not receive the introduction of peer A, so the filter is neither created nor sent
+        assert not b.supports_known_filter(peer_a)
+        assert await b.create_known_filter([peer_a], **kwargs_dict) is None
+
+        b.send_remote_select(peer_a, **kwargs_dict, known_filter=Mock())
+        await self.deliver_messages(timeout=0.5)
+        with db_session:
+            assert b.mds.TorrentMetadata.select().count() == 2
+        assert b.known_filter_statistics.sent == 0
+        assert a.known_filter_statistics.received == 0
+
+    async def test_remote_select_paced(self):
+        a = self.nodes[0].overlay
+        b = self.nodes[1].overlay
+        b.rqc_settings.max_channel_query_back = 0
+
+        # The response does not fit into a single packet, and the packets are paced
+        with db_session:
+            for i in range(20):
+                add_random_torrent(a.mds.TorrentMetadata, name=f"ubuntu {i} " + "0123456789" * 10)
+        a.response_pacer.peer_rate = 50_000
+        a.response_pacer.peer_burst = 0
+
+        kwargs_dict = {"metadata_type": [REGULAR_TORRENT]}
+        b.send_remote_select(self.nodes[0].my_peer, **kwargs_dict)
+        await self.deliver_messages(timeout=1)
+
+        with db_session:
+            assert b.mds.TorrentMetadata.select().count() == 20
+        statistics = a.response_pacer.get_statistics()
+        assert statistics['responses'] == 1
+        assert statistics['packets'] > 1
+        assert statistics['delayed_packets'] == statistics['packets'] - 1
+
+    async def test_remote_select_executor_overloaded(self):
+        """
+        Test that a request is ignored when the database executor of the queried peer is overloaded
+        """
+        a = self.nodes[0].overlay
+        b = self.nodes[1].overlay
+        with db_session:
+            add_random_torrent(a.mds.TorrentMetadata, name="ubuntu")
+        a.mds.executor.run = Mock(side_effect=DatabaseExecutorOverloaded('DB executor queue is full'))
+
+        b.send_remote_select(self.nodes[0].my_peer, metadata_type=[REGULAR_TORRENT])
+        await self.deliver_messages(timeout=0.5)
+
+        with db_session:
+            assert not b.mds.TorrentMetadata.select().count()
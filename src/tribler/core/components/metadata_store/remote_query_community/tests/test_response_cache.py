@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+import pytest
+
+from tribler.core.components.metadata_store.remote_query_community.response_cache import (
+    ResponseCache,
+    get_response_key,
+)
+
+# pylint: disable=redefined-outer-name
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(max_size=100, ttl=60)
+
+
+def test_get_put(cache):
+    assert cache.get('key', 1) is None
+    cache.put('key', [b'a' * 10, b'b' * 20], True, 1, processing_time=0.5)
+
+    cached = cache.get('key', 1)
+    assert cached.chunks == [b'a' * 10, b'b' * 20]
+    assert cached.has_results
+    assert cache.size == 30
+    assert cache.get_statistics() == {
+        'entries': 1,
+        'size': 30,
+        'hits': 1,
+        'misses': 1,
+        'hit_ratio': 0.5,
+        'saved_time': 0.5,
+    }
+
+
+def test_content_version_changed(cache):
+    cache.put('key', [b'a'], True, 1, processing_time=0)
+    assert cache.get('key', 2) is None
+    assert cache.size == 0
+    assert cache.get_statistics()['entries'] == 0
+
+
+def test_expired(cache):
+    cache.put('key', [b'a'], True, 1, processing_time=0)
+    with patch('time.monotonic', return_value=cache.get('key', 1).created_at + cache.ttl + 1):
+        assert cache.get('key', 1) is None
+
+
+def test_in_memory_database(cache):
+    cache.put('key', [b'a'], True, None, processing_time=0)
+    assert cache.get('key', None) is None
+
+
+def test_evict_least_recently_used(cache):
+    cache.put('first', [b'a' * 40], True, 1, processing_time=0)
+    cache.put('second', [b'b' * 40], True, 1, processing_time=0)
+    cache.get('first', 1)
+
+    cache.put('third', [b'c' * 40], True, 1, processing_time=0)
+    assert cache.get('second', 1) is None
+    assert cache.get('first', 1)
+    assert cache.get('third', 1)
+    assert cache.size == 80
+
+
+def test_put_too_large(cache):
+    cache.put('key', [b'a' * 10], True, 1, processing_time=0)
+    cache.put('key', [b'a' * 101], True, 1, processing_time=0)
+    assert cache.get('key', 1) is None
+    assert cache.size == 0
+
+
+def test_enabled():
+    assert ResponseCache(max_size=100, ttl=60).enabled
+    assert not ResponseCache(max_size=0, ttl=60).enabled
+
+
+def test_get_response_key():
+    key = get_response_key({'metadata_type': [300, 400], 'txt_filter': 'ubuntu', 'channel_pk': b'\x01'})
+    assert key == get_response_key({'channel_pk': b'\x01', 'txt_filter': 'ubuntu', 'metadata_type': [400, 300]})
+    assert key != get_response_key({'metadata_type': [300, 400], 'txt_filter': 'ubuntu', 'channel_pk': b'\x02'})
+    assert key != get_response_key({'metadata_type': [300, 400], 'txt_filter': 'ubuntu', 'channel_pk': b'\x01'},
+                                   force_eva_response=True)
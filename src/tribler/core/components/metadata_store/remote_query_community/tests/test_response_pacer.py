@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import pytest
+
+from tribler.core.components.metadata_store.remote_query_community.response_pacer import MAX_PEERS, ResponsePacer
+
+# pylint: disable=redefined-outer-name, protected-access
+
+
+@pytest.fixture
+def pacer():
+    return ResponsePacer(rate=10_000, burst=3_000, peer_rate=1_000, peer_burst=1_000)
+
+
+@pytest.fixture
+def now():
+    with patch('time.monotonic', return_value=100.0) as monotonic:
+        yield monotonic
+
+
+def test_peer_rate(pacer, now):  # pylint: disable=unused-argument
+    # The burst is sent at once, the next packets are sent at the rate of the peer
+    assert pacer.reserve_peer(b'peer', 1000) == 0
+    assert pacer.reserve_peer(b'peer', 1000) == 0
+    assert pacer.reserve_peer(b'peer', 1000) == pytest.approx(1.0)
+    assert pacer.reserve_peer(b'peer', 500) == pytest.approx(2.0)
+
+    # Another peer has its own send rate
+    assert pacer.reserve_peer(b'another peer', 1000) == 0
+
+
+def test_global_rate(pacer, now):  # pylint: disable=unused-argument
+    for _ in range(4):
+        assert pacer.reserve_global(1000) == 0
+    assert pacer.reserve_global(1000) == pytest.approx(0.1)
+
+
+def test_refill(pacer, now):
+    pacer.reserve_peer(b'peer', 2000)
+    assert pacer.reserve_peer(b'peer', 1000) == pytest.approx(1.0)
+
+    now.return_value += 10
+    assert pacer.reserve_peer(b'peer', 1000) == 0
+
+
+def test_no_limit(now):  # pylint: disable=unused-argument
+    pacer = ResponsePacer(rate=0, burst=0, peer_rate=0, peer_burst=0)
+    for _ in range(100):
+        assert pacer.reserve_peer(b'peer', 10_000) == 0
+        assert pacer.reserve_global(10_000) == 0
+
+
+def test_remove_idle_peers(pacer, now):
+    for i in range(MAX_PEERS):
+        pacer.reserve_peer(b'peer %d' % i, 100)
+
+    now.return_value += 10
+    pacer.reserve_peer(b'new peer', 100)
+    assert list(pacer._peer_tat) == [b'new peer']
+
+
+async def test_wait(pacer):
+    pacer.peer_rate = 100_000
+    pacer.peer_burst = 0
+    await pacer.wait(b'peer', 1000)
+    await pacer.wait(b'peer', 1000)
+
+    statistics = pacer.get_statistics()
+    assert statistics['packets'] == 2
+    assert statistics['bytes'] == 2000
+    assert statistics['delayed_packets'] == 1
+    assert 0 < statistics['avg_delay'] == statistics['max_delay'] <= 0.01
+
+
+def test_add_response(pacer):
+    pacer.add_response(0.25)
+    pacer.add_response(0.75)
+    statistics = pacer.get_statistics()
+    assert statistics['responses'] == 2
+    assert statistics['avg_loop_time'] == pytest.approx(0.5)
+    assert statistics['max_loop_time'] == pytest.approx(0.75)
@@ -20,6 +20,7 @@ from tribler.core.components.gigachannel_manager.gigachannel_manager import Giga
 from tribler.core.components.libtorrent.download_manager.download_manager import DownloadManager
 from tribler.core.components.libtorrent.torrentdef import TorrentDef
 from tribler.core.components.metadata_store.db.orm_bindings.channel_node import DIRTY_STATUSES, NEW
+from tribler.core.components.metadata_store.db.pagination import get_next_cursor
 from tribler.core.components.metadata_store.db.serialization import CHANNEL_TORRENT, REGULAR_TORRENT
 from tribler.core.components.metadata_store.restapi.metadata_endpoint_base import MetadataEndpointBase
 from tribler.core.components.metadata_store.restapi.metadata_schema import ChannelSchema, MetadataSchema, TorrentSchema
@@ -100,21 +101,32 @@ class ChannelsEndpoint(MetadataEndpointBase):
                         'sort_by': String(),
                         'sort_desc': Integer(),
                         'total': Integer(),
+                        'total_is_lower_bound': Boolean(),
+                        'total_id': String(),
+                        'cursor': String(),
                     }
                 )
             }
         },
     )
     async def get_channels(self, request):
-        sanitized = self.sanitize_parameters(request.query)
+        try:
+            sanitized = self.sanitize_parameters(request.query)
+        except (ValueError, KeyError):
+            return RESTResponse({"error": "Error processing request parameters"}, status=HTTP_BAD_REQUEST)
         sanitized['subscribed'] = None if 'subscribed' not in request.query else bool(int(request.query['subscribed']))
         include_total = request.query.get('include_total', '')
+        approximate_total = request.query.get('approximate_total', '')
         sanitized.update({"origin_id": 0})
         sanitized['metadata_type'] = CHANNEL_TORRENT
 
         with db_session:
             channels = self.mds.get_entries(**sanitized)
-            total = self.mds.get_total_count(**sanitized) if include_total else None
+            total = (
+                self.mds.count_service.get_total_count(approximate=bool(approximate_total), **sanitized)
+                if include_total else None
+            )
+            cursor = get_next_cursor(channels, **sanitized)
             channels_list = []
             for channel in channels:
                 channel_dict = channel.to_simple_dict()
@@ -148,7 +160,9 @@ class ChannelsEndpoint(MetadataEndpointBase):
             "sort_desc": int(sanitized["sort_desc"]),
         }
         if total is not None:
-            response_dict.update({"total": total})
+            self.add_total_to_response(response_dict, total, sanitized)
+        if cursor is not None:
+            response_dict.update({"cursor": cursor})
         return RESTResponse(response_dict)
 
     @docs(
@@ -164,6 +178,9 @@ class ChannelsEndpoint(MetadataEndpointBase):
                         'sort_by': String(),
                         'sort_desc': Integer(),
                         'total': Integer(),
+                        'total_is_lower_bound': Boolean(),
+                        'total_id': String(),
+                        'cursor': String(),
                     }
                 )
             }
@@ -171,13 +188,19 @@ class ChannelsEndpoint(MetadataEndpointBase):
     )
     async def get_channel_contents(self, request):
         self._logger.info('Get channel content')
-        sanitized = self.sanitize_parameters(request.query)
+        try:
+            sanitized = self.sanitize_parameters(request.query)
+        except (ValueError, KeyError):
+            return RESTResponse({"error": "Error processing request parameters"}, status=HTTP_BAD_REQUEST)
         include_total = request.query.get('include_total', '')
+        approximate_total = request.query.get('approximate_total', '')
         channel_pk, channel_id = self.get_channel_from_request(request)
         sanitized.update({"channel_pk": channel_pk, "origin_id": channel_id})
         remote = sanitized.pop("remote", None)
+        # Remote peers do not know about cursors, so the remote queries are still paginated by offset
+        after_key = sanitized.pop("after_key", None)
 
-        total = None
+        total = cursor = None
 
         remote_failed = False
         if remote:
@@ -191,12 +214,16 @@ class ChannelsEndpoint(MetadataEndpointBase):
         if not remote or remote_failed:
             self._logger.info('Receive local content')
             with db_session:
-                contents = self.mds.get_entries(**sanitized)
+                contents = self.mds.get_entries(after_key=after_key, **sanitized)
                 contents_list = []
                 for entry in contents:
                     self.extract_tags(entry)
                     contents_list.append(entry.to_simple_dict())
-                total = self.mds.get_total_count(**sanitized) if include_total else None
+                total = (
+                    self.mds.count_service.get_total_count(approximate=bool(approximate_total), **sanitized)
+                    if include_total else None
+                )
+                cursor = get_next_cursor(contents, **sanitized)
         self.add_download_progress_to_metadata_list(contents_list)
         self.add_statements_to_metadata_list(contents_list, hide_xxx=sanitized["hide_xxx"])
         response_dict = {
@@ -207,7 +234,9 @@ class ChannelsEndpoint(MetadataEndpointBase):
             "sort_desc": int(sanitized['sort_desc']),
         }
         if total is not None:
-            response_dict.update({"total": total})
+            self.add_total_to_response(response_dict, total, sanitized)
+        if cursor is not None:
+            response_dict.update({"cursor": cursor})
 
         return RESTResponse(response_dict)
 
@@ -6,8 +6,10 @@ from pony.orm import db_session
 from tribler.core.components.knowledge.db.knowledge_db import KnowledgeDatabase, ResourceType
 from tribler.core.components.knowledge.rules.tag_rules_processor import KnowledgeRulesProcessor
 from tribler.core.components.metadata_store.category_filter.family_filter import default_xxx_filter
+from tribler.core.components.metadata_store.db.pagination import decode_cursor
 from tribler.core.components.metadata_store.db.serialization import CHANNEL_TORRENT, COLLECTION_NODE, REGULAR_TORRENT
 from tribler.core.components.metadata_store.db.store import MetadataStore
+from tribler.core.components.metadata_store.db.total_count import TotalCount, get_query_id
 from tribler.core.components.restapi.rest.rest_endpoint import RESTEndpoint
 # This dict is used to translate JSON fields into the columns used in Pony for _sorting_.
 # id_ is not in the list because there is not index on it, so we never really want to sort on it.
@@ -61,6 +63,8 @@ class MetadataEndpointBase(RESTEndpoint):
             "category": parameters.get('category'),
             "exclude_deleted": bool(int(parameters.get('exclude_deleted', 0)) > 0),
         }
+        if 'cursor' in parameters:
+            sanitized['after_key'] = decode_cursor(parameters['cursor'], sanitized['sort_by'], sanitized['sort_desc'])
         if 'tags' in parameters:
             sanitized['tags'] = parameters.getall('tags')
         if "remote" in parameters:
@@ -72,6 +76,16 @@ class MetadataEndpointBase(RESTEndpoint):
             sanitized['metadata_type'] = frozenset(mtypes)
         return sanitized
 
+    def add_total_to_response(self, response_dict, count: TotalCount, sanitized):
+        """
+        Add the total number of the matching entries to the response. If the number is approximate, the exact
+        number is computed in the background and sent with the `total_count_updated` event.
+        """
+        response_dict["total"] = count.total
+        if count.is_lower_bound:
+            response_dict.update({"total_is_lower_bound": True, "total_id": get_query_id(**sanitized)})
+            self.async_group.add(self.mds.count_service.compute_exact_count(**sanitized))
+
     def extract_tags(self, entry):
         is_torrent = entry.get_type() == REGULAR_TORRENT
         if not is_torrent or not self.tag_rules_processor:
@@ -7,12 +7,16 @@ class MetadataParameters(Schema):
     last = Integer(default=50, description='Limit the range of the query')
     sort_by = String(description='Sorts results in forward or backward, based on column name (e.g. "id" vs "-id")')
     sort_desc = Boolean(default=True)
+    cursor = String(description='Continue after the last entry of the previous page. Replaces the range offset')
     txt_filter = String(description='FTS search on the chosen word* terms')
     hide_xxx = Boolean(default=False, description='Toggles xxx filter')
     category = String()
     exclude_deleted = Boolean(default=False)
     remote_query = Boolean(default=False)
     metadata_type = List(String(description='Limits query to certain metadata types (e.g. "torrent" or "channel")'))
+    include_total = Boolean(default=False, description='Include the total number of the matching entries')
+    approximate_total = Boolean(default=False, description='Stop counting the total number of entries at 1000 '
+                                                           'and send the exact number later as an event')
 
 
 class RemoteQueryParameters(MetadataParameters):
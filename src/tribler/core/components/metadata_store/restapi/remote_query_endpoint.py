@@ -35,6 +35,8 @@ class RemoteQueryEndpoint(MetadataEndpointBase):
 
     def sanitize_parameters(self, parameters):
         sanitized = super().sanitize_parameters(parameters)
+        # Cursors are local to our database, so they are not sent to other peers
+        sanitized.pop("after_key", None)
 
         if "channel_pk" in parameters:
             sanitized["channel_pk"] = unhexlify(parameters["channel_pk"])
@@ -70,13 +72,14 @@ class RemoteQueryEndpoint(MetadataEndpointBase):
         result = []
         mapping = self.gigachannel_community.channels_peers
         with db_session:
-            for id_tuple, peers in mapping._channels_dict.items():  # pylint:disable=W0212
+            for id_tuple in mapping._channels_dict:  # pylint:disable=W0212
                 channel_pk, channel_id = id_tuple
                 chan = self.mds.ChannelMetadata.get(public_key=channel_pk, id_=channel_id)
 
                 peers_list = []
-                for p in peers:
-                    peers_list.append((hexlify(p.mid), int(current_time - p.last_response)))
+                for p in mapping.get_best_peers_for_channel(channel_pk, channel_id):
+                    peers_list.append((hexlify(p.mid), int(current_time - p.last_response),
+                                       mapping.get_score(p).to_dict()))
 
                 chan_dict = {
                     "channel_name": chan.title if chan else None,
@@ -5,17 +5,18 @@ from typing import Dict, List
 from aiohttp import web
 from aiohttp_apispec import docs, querystring_schema
 from ipv8.REST.schema import schema
-from marshmallow.fields import Integer, String
+from marshmallow.fields import Boolean, Integer, String
 from pony.orm import db_session
 
 from tribler.core.components.knowledge.db.knowledge_db import ResourceType
+from tribler.core.components.metadata_store.db.pagination import get_next_cursor
 from tribler.core.components.metadata_store.db.serialization import SNIPPET
 from tribler.core.components.metadata_store.db.store import MetadataStore
 from tribler.core.components.metadata_store.restapi.metadata_endpoint import MetadataEndpointBase
 from tribler.core.components.metadata_store.restapi.metadata_schema import MetadataParameters, MetadataSchema
 from tribler.core.components.restapi.rest.rest_endpoint import HTTP_BAD_REQUEST, RESTResponse
 from tribler.core.components.knowledge.db.knowledge_db import ResourceType
-from tribler.core.utilities.pony_utils import run_threaded
+from tribler.core.utilities.pony_utils import DatabaseExecutorOverloaded
 from tribler.core.utilities.utilities import froze_it
 
 SNIPPETS_TO_SHOW = 3  # The number of snippets we return from the search results
@@ -105,6 +106,9 @@ class SearchEndpoint(MetadataEndpointBase):
                         'sort_by': String(),
                         'sort_desc': Integer(),
                         'total': Integer(),
+                        'total_is_lower_bound': Boolean(),
+                        'total_id': String(),
+                        'cursor': String(),
                     }
                 )
             }
@@ -119,6 +123,7 @@ class SearchEndpoint(MetadataEndpointBase):
             return RESTResponse({"error": "Error processing request parameters"}, status=HTTP_BAD_REQUEST)
 
         include_total = request.query.get('include_total', '')
+        approximate_total = request.query.get('approximate_total', '')
 
         mds: MetadataStore = self.mds
 
@@ -128,9 +133,10 @@ class SearchEndpoint(MetadataEndpointBase):
                 pony_query = mds.get_entries(**sanitized)
                 t2 = time.time()
                 search_results = [r.to_simple_dict() for r in pony_query]
+                cursor = get_next_cursor(pony_query, **sanitized)
                 t3 = time.time()
                 if include_total:
-                    total = mds.get_total_count(**sanitized)
+                    total = mds.count_service.get_total_count(approximate=bool(approximate_total), **sanitized)
                     t4 = time.time()
                     max_rowid = mds.get_max_rowid()
                     t5 = time.time()
@@ -145,7 +151,7 @@ class SearchEndpoint(MetadataEndpointBase):
                                       f'Main query executed in {t2 - t1:.6} seconds;\n'
                                       f'Result constructed in {t3 - t2:.6} seconds.')
 
-            return search_results, total, max_rowid
+            return search_results, total, max_rowid, cursor
 
         try:
             with db_session:
@@ -157,7 +163,7 @@ class SearchEndpoint(MetadataEndpointBase):
                     if infohash_set:
                         sanitized['infohash_set'] = {bytes.fromhex(s) for s in infohash_set}
 
-            search_results, total, max_rowid = await run_threaded(mds.db, search_db)
+            search_results, total, max_rowid, cursor = await mds.executor.run(search_db)
         except Exception as e:  # pylint: disable=broad-except;  # pragma: no cover
             self._logger.exception("Error while performing DB search: %s: %s", type(e).__name__, e)
             return RESTResponse(status=HTTP_BAD_REQUEST)
@@ -174,8 +180,11 @@ class SearchEndpoint(MetadataEndpointBase):
             "sort_by": sanitized["sort_by"],
             "sort_desc": sanitized["sort_desc"],
         }
+        if cursor is not None:
+            response_dict.update(cursor=cursor)
         if include_total:
-            response_dict.update(total=total, max_rowid=max_rowid)
+            response_dict.update(max_rowid=max_rowid)
+            self.add_total_to_response(response_dict, total, sanitized)
 
         return RESTResponse(response_dict)
 
@@ -201,5 +210,8 @@ class SearchEndpoint(MetadataEndpointBase):
 
         keywords = args['q'].strip().lower()
         # TODO: add XXX filtering for completion terms
-        results = self.mds.get_auto_complete_terms(keywords, max_terms=5)
+        try:
+            results = await self.mds.executor.run(self.mds.get_auto_complete_terms, keywords, max_terms=5)
+        except DatabaseExecutorOverloaded:
+            return RESTResponse({"completions": []})
         return RESTResponse({"completions": results})
@@ -106,6 +106,23 @@ async def test_get_channels_invalid_sort(add_fake_torrents_channels, mock_dlmgr,
     assert len(json_dict['results']) == 10
 
 
+async def test_get_channels_with_cursor(add_fake_torrents_channels, mock_dlmgr, rest_api):
+    """
+    Test paging through the channels with the cursors returned by the REST API
+    """
+    all_channels = (await do_request(rest_api, 'channels?sort_by=name&first=1&last=20'))['results']
+
+    channels = []
+    json_dict = await do_request(rest_api, 'channels?sort_by=name&first=1&last=3')
+    while json_dict['results']:
+        channels.extend(json_dict['results'])
+        json_dict = await do_request(rest_api, f'channels?sort_by=name&first=1&last=3&cursor={json_dict["cursor"]}')
+    assert [c['name'] for c in channels] == [c['name'] for c in all_channels]
+
+    # A cursor that was returned for another sort order is rejected
+    await do_request(rest_api, f'channels?sort_by=health&cursor={json_dict.get("cursor", "")}', expected_code=400)
+
+
 async def test_get_subscribed_channels(add_fake_torrents_channels, mock_dlmgr, rest_api):
     """
     Test whether we can successfully query channels we are subscribed to with the REST API
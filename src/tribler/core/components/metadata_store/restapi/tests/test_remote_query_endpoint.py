@@ -97,3 +97,4 @@ async def test_get_channels_peers(rest_api, endpoint, metadata_store, mock_gigac
     assert first_result["channel_pk"] == hexlify(chan.public_key)
     assert first_result["channel_id"] == chan.id_
     assert first_result["peers"][0][0] == hexlify(peer.mid)
+    assert first_result["peers"][0][2]["responses"] == 0
@@ -476,6 +476,36 @@ def test_recursive_commit_channel_torrent(metadata_store):
     assert chan.num_entries == 366
 
 
+@db_session
+def test_get_commit_forest(metadata_store):
+    """
+    Test that the commit queues contain the dirty entries and their ancestors, with the contents of the collections
+    before the collections, and the top-level node last
+    """
+    chan = metadata_store.ChannelMetadata.create_channel('root', 'test')
+    chan.status = UPDATED
+    committed_coll = metadata_store.CollectionNode(origin_id=chan.id_, status=COMMITTED)
+    new_coll = metadata_store.CollectionNode(origin_id=committed_coll.id_, status=NEW)
+    torrents = [
+        metadata_store.TorrentMetadata(infohash=random_infohash(), origin_id=parent.id_, status=NEW)
+        for parent in (chan, committed_coll, new_coll)
+    ]
+    metadata_store.TorrentMetadata(infohash=random_infohash(), origin_id=committed_coll.id_, status=COMMITTED)
+    other_chan = metadata_store.ChannelMetadata.create_channel('other', 'test')
+    other_chan.status = COMMITTED
+    orphan = metadata_store.TorrentMetadata(infohash=random_infohash(), origin_id=123456789, status=NEW)
+
+    forest = metadata_store.CollectionNode.get_commit_forest()
+
+    assert list(forest) == [chan.id_]
+    queue = forest[chan.id_]
+    assert set(queue) == {chan, committed_coll, new_coll, *torrents}
+    assert queue[-1] == chan
+    for node in queue[:-1]:
+        assert queue.index(node) < queue.index(node.get_parent_nodes()[-2])
+    assert not metadata_store.ChannelNode.exists(lambda g: g.rowid == orphan.rowid)
+
+
 @db_session
 def test_consolidate_channel_torrent(torrent_template, metadata_store):
     """
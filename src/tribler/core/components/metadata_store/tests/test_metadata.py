@@ -147,3 +147,49 @@ def test_from_payload(metadata_store):
     orm.flush()
     metadata_payload = ChannelNodePayload(**metadata_dict)
     assert metadata_store.ChannelNode.from_payload(metadata_payload)
+
+
+@db_session
+def test_serialized_payload(metadata_store):
+    """
+    Test that the signed payload bytes are stored when the entry is signed, and are used instead of serializing it
+    """
+    metadata = metadata_store.TorrentMetadata(title='torrent', infohash=b'1' * 20)
+    assert metadata.has_serialized_payload()
+    assert metadata.serialized() == metadata.serialized_payload == b''.join(metadata._serialized())
+
+    # Re-signing the updated entry replaces the stored bytes
+    metadata.update_properties({'size': 1234})
+    assert metadata.has_serialized_payload()
+    assert metadata.serialized() == b''.join(metadata._serialized())
+
+    # The bytes stored with another signature are not used
+    metadata.serialized_payload = b'\x00' * 200
+    assert not metadata.has_serialized_payload()
+    assert metadata.serialized() == b''.join(metadata._serialized())
+
+
+@db_session
+def test_serialized_payload_from_blob(metadata_store):
+    """
+    Test that the entries created from the received payloads store the received bytes
+    """
+    metadata = metadata_store.ChannelNode.from_dict({})
+    serialized = metadata.serialized()
+    metadata.delete()
+    orm.flush()
+
+    payload = ChannelNodePayload.from_signed_blob(serialized + b'garbage')
+    assert payload.signed_blob == serialized
+    metadata = metadata_store.ChannelNode.from_payload(payload)
+    assert metadata.serialized_payload == serialized
+
+
+@db_session
+def test_ffa_serialized_payload(metadata_store):
+    """
+    Test that the payload bytes of the unsigned entries are never used, as there is no signature to check them
+    """
+    metadata = metadata_store.ChannelNode.from_dict({"public_key": b"", "id_": "123", "serialized_payload": b"123"})
+    assert not metadata.has_serialized_payload()
+    assert hexlify(metadata.serialized()).endswith(hexlify(NULL_SIG))
@@ -2,16 +2,20 @@ from __future__ import annotations
 
 import random
 from binascii import unhexlify
-from typing import List, TYPE_CHECKING
+from collections import defaultdict
+from typing import Dict, List, Set, TYPE_CHECKING
 
 from ipv8.lazy_community import lazy_wrapper
-from pony.orm import db_session
+from ipv8.types import Peer
 
-from tribler.core.components.metadata_store.remote_query_community.remote_query_community import RemoteQueryCommunity
+from tribler.core.components.metadata_store.remote_query_community.remote_query_community import (
+    RemoteQueryCommunity,
+    SelectRequest,
+)
 from tribler.core.components.popularity.community.payload import PopularTorrentsRequest, TorrentsHealthPayload
 from tribler.core.components.popularity.community.version_community_mixin import VersionCommunityMixin
 from tribler.core.components.torrent_checker.torrent_checker.dataclasses import HealthInfo
-from tribler.core.utilities.pony_utils import run_threaded
+from tribler.core.utilities.pony_utils import DatabaseExecutorOverloaded
 from tribler.core.utilities.unicode import hexlify
 from tribler.core.utilities.utilities import get_normally_distributed_positive_integers
 
@@ -31,11 +35,19 @@ class PopularityCommunity(RemoteQueryCommunity, VersionCommunityMixin):
         to return their popular torrents.
 
     Gossiping is for checked torrents only.
+
+    The metadata of the unknown torrents is requested from the peers that gossiped them. The unknown infohashes
+    received from a peer during LOOKUP_COALESCING_WINDOW are requested in a single remote select. An infohash is
+    requested from one peer at a time; if the request times out, it is requested from the next peer that gossiped it.
     """
     GOSSIP_INTERVAL_FOR_RANDOM_TORRENTS = 5  # seconds
     GOSSIP_POPULAR_TORRENT_COUNT = 10
     GOSSIP_RANDOM_TORRENT_COUNT = 10
 
+    LOOKUP_COALESCING_WINDOW = 0.5  # seconds
+    MAX_LOOKUP_BATCH_SIZE = 50  # The maximum number of the infohashes in a single remote select
+    MAX_LOOKUP_PEERS = 3  # The number of the peers an unknown infohash is requested from before giving up
+
     community_id = unhexlify('9aca62f878969c437da9844cba29a134917e1648')
 
     def __init__(self, *args, torrent_checker=None, **kwargs):
@@ -43,6 +55,13 @@ class PopularityCommunity(RemoteQueryCommunity, VersionCommunityMixin):
         super().__init__(*args, **kwargs)
         self.torrent_checker: TorrentChecker = torrent_checker
 
+        # The unknown infohashes waiting to be requested, by the peer they are requested from
+        self.lookup_queues: Dict[Peer, Set[bytes]] = defaultdict(set)
+        # The peers that gossiped the infohashes being looked up. The infohash is requested from the first peer
+        self.lookup_peers: Dict[bytes, List[Peer]] = {}
+        # The infohashes of the sent requests that are not received yet
+        self.lookup_requests: Dict[SelectRequest, Set[bytes]] = {}
+
         self.add_message_handler(TorrentsHealthPayload, self.on_torrents_health)
         self.add_message_handler(PopularTorrentsRequest, self.on_popular_torrents_request)
 
@@ -87,18 +106,81 @@ class PopularityCommunity(RemoteQueryCommunity, VersionCommunityMixin):
         health_list = [HealthInfo(infohash, last_check=last_check, seeders=seeders, leechers=leechers)
                        for infohash, seeders, leechers, last_check in health_tuples]
 
-        for infohash in await run_threaded(self.mds.db, self.process_torrents_health, health_list):
-            # Get a single result per infohash to avoid duplicates
-            self.send_remote_select(peer=peer, infohash=infohash, last=1)
+        try:
+            added = await self.mds.executor.run(self.process_torrents_health, health_list)
+        except DatabaseExecutorOverloaded as e:
+            self.logger.warning(f"Ignore torrents health: {e}")
+            return
+        for health in health_list:
+            if health.infohash in added or health.infohash in self.lookup_peers:
+                self.lookup_infohash(peer, health.infohash)
 
-    @db_session
     def process_torrents_health(self, health_list: List[HealthInfo]):
-        infohashes_to_resolve = set()
-        for health in health_list:
-            added = self.mds.process_torrent_health(health)
-            if added:
-                infohashes_to_resolve.add(health.infohash)
-        return infohashes_to_resolve
+        return self.mds.health_cache.process(health_list)
+
+    def lookup_infohash(self, peer: Peer, infohash: bytes):
+        peers = self.lookup_peers.get(infohash)
+        if peers is None:
+            self.lookup_peers[infohash] = [peer]
+            self.queue_lookup(peer, infohash)
+        elif peer not in peers and len(peers) < self.MAX_LOOKUP_PEERS:
+            # The peer is asked if the peers gossiped the infohash before do not respond
+            peers.append(peer)
+
+    def queue_lookup(self, peer: Peer, infohash: bytes):
+        self.lookup_queues[peer].add(infohash)
+        task_name = f'send_lookups_{hexlify(peer.mid)}'
+        if not self.is_pending_task_active(task_name):
+            self.register_task(task_name, self.send_lookups, peer, delay=self.LOOKUP_COALESCING_WINDOW)
+
+    def send_lookups(self, peer: Peer):
+        infohashes = list(self.lookup_queues.pop(peer, ()))
+        if self.supports_infohash_set(peer):
+            for i in range(0, len(infohashes), self.MAX_LOOKUP_BATCH_SIZE):
+                batch = set(infohashes[i:i + self.MAX_LOOKUP_BATCH_SIZE])
+                request = self.send_remote_select(peer=peer, infohash_set=batch, last=len(batch),
+                                                  processing_callback=self.on_lookup_response)
+                self.lookup_requests[request] = set(batch)  # A copy, as it is emptied when the entries arrive
+        else:
+            for infohash in infohashes:
+                # Get a single result per infohash to avoid duplicates
+                request = self.send_remote_select(peer=peer, infohash=infohash, last=1,
+                                                  processing_callback=self.on_lookup_response)
+                self.lookup_requests[request] = {infohash}
+
+    def on_lookup_response(self, request, processing_results):
+        infohashes = self.lookup_requests.get(request)
+        if infohashes is None:
+            return
+        for result in processing_results:
+            infohash = getattr(result.md_obj, 'infohash', None)
+            if infohash in infohashes:
+                infohashes.discard(infohash)
+                self.lookup_peers.pop(infohash, None)
+        if not infohashes:
+            self.lookup_requests.pop(request)
+        elif not self.request_cache.has(hexlify(request.peer.mid), request.number):
+            # The request is removed from the cache after the last allowed packet, so it never times out
+            self.retry_lookups(request)
+
+    def _on_query_timeout(self, request_cache):
+        super()._on_query_timeout(request_cache)
+        self.retry_lookups(request_cache)
+
+    def retry_lookups(self, request: SelectRequest):
+        """
+        Request the infohashes that the finished request did not return from the next peers that gossiped them.
+        """
+        for infohash in self.lookup_requests.pop(request, ()):
+            peers = self.lookup_peers.get(infohash)
+            if peers is None:
+                continue
+            if request.peer in peers:
+                peers.remove(request.peer)
+            if peers:
+                self.queue_lookup(peers[0], infohash)
+            else:
+                self.lookup_peers.pop(infohash)
 
     @lazy_wrapper(PopularTorrentsRequest)
     async def on_popular_torrents_request(self, peer, payload):
@@ -1,7 +1,7 @@
 import time
 from random import randint
 from typing import List
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 from ipv8.keyvault.crypto import default_eccrypto
 from ipv8.test.base import TestBase
@@ -65,10 +65,12 @@ class TestPopularityCommunity(TestBase):
         self.count += 1
 
         rqc_settings = RemoteQueryCommunitySettings()
-        return MockIPv8("curve25519", PopularityCommunity, metadata_store=mds,
+        ipv8 = MockIPv8("curve25519", PopularityCommunity, metadata_store=mds,
                         torrent_checker=torrent_checker,
                         rqc_settings=rqc_settings
                         )
+        ipv8.overlay.LOOKUP_COALESCING_WINDOW = 0.05
+        return ipv8
 
     @db_session
     def fill_database(self, metadata_store, last_check_now=False):
@@ -84,6 +86,11 @@ class TestPopularityCommunity(TestBase):
         self.nodes[0].overlay.gossip_random_torrents_health()
 
         await self.deliver_messages(timeout=deliver_timeout)
+        self.flush_health_caches()
+
+    def flush_health_caches(self):
+        for node in self.nodes:
+            node.overlay.mds.health_cache.flush()
 
     async def test_torrents_health_gossip(self):
         """
@@ -148,6 +155,7 @@ class TestPopularityCommunity(TestBase):
 
         # Since on introduction request callback, node asks for popular torrents, we expect that
         # popular torrents are shared by node 0 to node 1.
+        self.flush_health_caches()
         with db_session:
             node0_count = node0_db.select().count()
             node1_count = node1_db.select().count()
@@ -161,6 +169,7 @@ class TestPopularityCommunity(TestBase):
         for _ in range(10):
             self.nodes[0].overlay.gossip_random_torrents_health()
             await self.deliver_messages(timeout=0.1)
+            self.flush_health_caches()
 
             # After gossip, Node 1 should have received some random torrents from Node 0.
             # Note that random torrents can also include popular torrents sent during introduction
@@ -211,3 +220,81 @@ class TestPopularityCommunity(TestBase):
         await self.init_first_node_and_gossip(
             HealthInfo(infohash, seeders=200, leechers=0, last_check=int(time.time())))
         self.nodes[1].overlay.send_remote_select.assert_not_called()
+
+    async def test_unknown_torrents_lookup_batched(self):
+        # The unknown infohashes gossiped by a peer are requested from it in a single remote select
+        with db_session:
+            for _ in range(3):
+                self.nodes[0].overlay.mds.TorrentMetadata(infohash=random_infohash())
+            infohashes = [t.infohash for t in self.nodes[0].overlay.mds.TorrentMetadata.select()]
+        health_list = [HealthInfo(infohash, seeders=200, leechers=0, last_check=int(time.time()))
+                       for infohash in infohashes]
+        self.nodes[0].overlay.torrent_checker.torrents_checked.update({h.infohash: h for h in health_list})
+
+        overlay = self.nodes[1].overlay
+        with patch.object(overlay, 'send_remote_select', wraps=overlay.send_remote_select) as send_remote_select:
+            # Node 1 gets the popular torrents of node 0 on the introduction, and then the same torrents are gossiped
+            await self.introduce_nodes()
+            self.nodes[0].overlay.gossip_random_torrents_health()
+            await self.deliver_messages(timeout=0.5)
+
+            send_remote_select.assert_called_once()
+            assert send_remote_select.call_args.kwargs['infohash_set'] == set(infohashes)
+
+        with db_session:
+            assert overlay.mds.TorrentMetadata.select().count() == 3
+        assert not overlay.lookup_peers
+        assert not overlay.lookup_requests
+
+    def test_lookup_deduplicated_and_retried(self):
+        overlay = self.nodes[1].overlay
+        peer_a, peer_b = Mock(mid=b'a' * 20), Mock(mid=b'b' * 20)
+        infohash = random_infohash()
+        overlay.send_remote_select = Mock()
+        overlay.supports_infohash_set = Mock(return_value=True)
+
+        # The infohash is requested from the first peer that gossiped it
+        overlay.lookup_infohash(peer_a, infohash)
+        overlay.lookup_infohash(peer_b, infohash)
+        assert overlay.lookup_queues == {peer_a: {infohash}}
+        overlay.send_lookups(peer_a)
+        overlay.send_remote_select.assert_called_once()
+        assert overlay.send_remote_select.call_args.kwargs['peer'] is peer_a
+
+        # On timeout, the infohash is requested from the next peer
+        request = overlay.send_remote_select.return_value
+        request.peer = peer_a
+        request.peer_responded = True
+        overlay._on_query_timeout(request)  # pylint: disable=protected-access
+        assert overlay.lookup_queues == {peer_b: {infohash}}
+        assert overlay.lookup_peers[infohash] == [peer_b]
+
+        # The lookup is over when all the peers time out
+        overlay.send_lookups(peer_b)
+        request.peer = peer_b
+        overlay._on_query_timeout(request)  # pylint: disable=protected-access
+        assert not overlay.lookup_peers
+        assert not overlay.lookup_requests
+
+    def test_lookup_retried_after_packets_limit(self):
+        overlay = self.nodes[1].overlay
+        peer_a, peer_b = Mock(mid=b'a' * 20), Mock(mid=b'b' * 20)
+        infohash = random_infohash()
+        overlay.send_remote_select = Mock()
+        overlay.supports_infohash_set = Mock(return_value=True)
+        overlay.lookup_infohash(peer_a, infohash)
+        overlay.lookup_infohash(peer_b, infohash)
+        overlay.send_lookups(peer_a)
+
+        # The request waits for more packets while it is in the request cache
+        request = overlay.send_remote_select.return_value
+        request.peer = peer_a
+        with patch.object(overlay.request_cache, 'has', Mock(return_value=True)):
+            overlay.on_lookup_response(request, [])
+        assert overlay.lookup_requests == {request: {infohash}}
+
+        # The last allowed packet of the response does not contain the infohash
+        with patch.object(overlay.request_cache, 'has', Mock(return_value=False)):
+            overlay.on_lookup_response(request, [])
+        assert not overlay.lookup_requests
+        assert overlay.lookup_queues == {peer_b: {infohash}}
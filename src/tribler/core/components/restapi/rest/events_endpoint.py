@@ -33,6 +33,7 @@ topics_to_send_to_gui = [
     notifications.channel_entity_updated,
     notifications.tribler_shutdown_state,
     notifications.remote_query_results,
+    notifications.total_count_updated,
     notifications.low_space,
     notifications.report_config_error,
 ]
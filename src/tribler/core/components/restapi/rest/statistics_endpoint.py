@@ -4,7 +4,9 @@ from ipv8.REST.schema import schema
 from ipv8.types import IPv8
 from marshmallow.fields import Integer, String
 
+from tribler.core.components.metadata_store.db.maintenance import DatabaseMaintenance
 from tribler.core.components.metadata_store.db.store import MetadataStore
+from tribler.core.components.metadata_store.remote_query_community.remote_query_community import RemoteQueryCommunity
 from tribler.core.components.restapi.rest.rest_endpoint import RESTEndpoint, RESTResponse
 from tribler.core.utilities.utilities import froze_it
 
@@ -15,9 +17,12 @@ class StatisticsEndpoint(RESTEndpoint):
     This endpoint is responsible for handing requests regarding statistics in Tribler.
     """
 
-    def __init__(self, ipv8: IPv8 = None, metadata_store: MetadataStore = None):
+    def __init__(self, ipv8: IPv8 = None, metadata_store: MetadataStore = None,
+                 db_maintenance: DatabaseMaintenance = None, remote_query_community: RemoteQueryCommunity = None):
         super().__init__()
         self.mds = metadata_store
+        self.db_maintenance = db_maintenance
+        self.remote_query_community = remote_query_community
         self.ipv8 = ipv8
 
     def setup_routes(self):
@@ -33,6 +38,7 @@ class StatisticsEndpoint(RESTEndpoint):
                     'statistics': schema(TriblerStatistics={
                         'num_channels': Integer,
                         'database_size': Integer,
+                        'wal_size': Integer,
                         'torrent_queue_stats': [
                             schema(TorrentQueueStats={
                                 'failed': Integer,
@@ -52,8 +58,18 @@ class StatisticsEndpoint(RESTEndpoint):
         if self.mds:
             db_size = self.mds.get_db_file_size()
             stats_dict = {"db_size": db_size,
+                          "wal_size": self.mds.get_wal_file_size(),
                           "num_channels": self.mds.get_num_channels(),
-                          "num_torrents": self.mds.get_num_torrents()}
+                          "num_torrents": self.mds.get_num_torrents(),
+                          "db_executor": self.mds.executor.get_statistics()}
+            if self.db_maintenance:
+                stats_dict["db_maintenance"] = self.db_maintenance.get_statistics()
+            if self.remote_query_community:
+                stats_dict["remote_query_cache"] = self.remote_query_community.response_cache.get_statistics()
+                stats_dict["remote_query_scheduler"] = self.remote_query_community.query_scheduler.get_statistics()
+                known_filter_statistics = self.remote_query_community.known_filter_statistics
+                stats_dict["remote_query_known_filter"] = known_filter_statistics.to_dict()
+                stats_dict["remote_query_responses"] = self.remote_query_community.response_pacer.get_statistics()
 
         return RESTResponse({'tribler_statistics': stats_dict})
 
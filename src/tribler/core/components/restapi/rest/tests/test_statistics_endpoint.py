@@ -46,6 +46,7 @@ async def test_get_tribler_statistics(rest_api, endpoint, metadata_store):
     assert 'db_size' in stats
     assert 'num_channels' in stats
     assert 'num_channels' in stats
+    assert 'wal_size' in stats
 
 
 async def test_get_ipv8_statistics(mock_ipv8, rest_api, endpoint):
@@ -106,7 +106,10 @@ class RESTComponent(Component):
                        metadata_store=metadata_store_component.mds, tunnel_community=tunnel_community)
         self.maybe_add('/createtorrent', CreateTorrentEndpoint, libtorrent_component.download_manager)
         self.maybe_add('/statistics', StatisticsEndpoint, ipv8=ipv8_component.ipv8,
-                       metadata_store=metadata_store_component.mds)
+                       metadata_store=metadata_store_component.mds,
+                       db_maintenance=metadata_store_component.db_maintenance,
+                       remote_query_community=gigachannel_component.community
+                       if not isinstance(gigachannel_component, NoneComponent) else None)
         self.maybe_add('/libtorrent', LibTorrentEndpoint, libtorrent_component.download_manager)
         self.maybe_add('/torrentinfo', TorrentInfoEndpoint, libtorrent_component.download_manager)
         self.maybe_add('/metadata', MetadataEndpoint, torrent_checker, metadata_store_component.mds,
@@ -380,6 +380,7 @@ class TorrentChecker(TaskManager):
 
             torrent_state.set(seeders=health.seeders, leechers=health.leechers, last_check=health.last_check,
                               self_checked=True)
+        self.mds.health_cache.update_checked(health)
 
         if health.seeders > 0:
             self.torrents_checked[health.infohash] = health
@@ -12,6 +12,10 @@ from ipv8.keyvault.private.libnaclkey import LibNaCLSK
 from ipv8.util import succeed
 
 from tribler.core.components.knowledge.db.knowledge_db import KnowledgeDatabase
+from tribler.core.components.libtorrent.download_manager.checkpoint_store import (
+    CHECKPOINTS_DB_FILENAME,
+    CheckpointStore,
+)
 from tribler.core.components.libtorrent.download_manager.download import Download
 from tribler.core.components.libtorrent.download_manager.download_config import DownloadConfig
 from tribler.core.components.libtorrent.download_manager.download_manager import DownloadManager
@@ -92,6 +96,7 @@ def mock_dlmgr(state_dir):
     checkpoints_dir = state_dir / 'dlcheckpoints'
     checkpoints_dir.mkdir()
     dlmgr.get_checkpoint_dir = lambda: checkpoints_dir
+    dlmgr.checkpoint_store = CheckpointStore(checkpoints_dir / CHECKPOINTS_DB_FILENAME)
     dlmgr.state_dir = state_dir
     dlmgr.get_downloads = lambda: []
     dlmgr.checkpoints_count = 1
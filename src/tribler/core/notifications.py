@@ -31,6 +31,11 @@ def remote_query_results(data: dict):
     ...
 
 
+def total_count_updated(data: dict):
+    # The exact number of entries matching a REST API query was computed. Contains the query id and the number
+    ...
+
+
 def circuit_removed(circuit: Circuit, additional_info: str):
     # Tribler tunnel circuit has been removed (notification to Core)
     ...
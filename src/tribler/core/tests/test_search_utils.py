@@ -2,8 +2,8 @@ from collections import deque
 
 import pytest
 
-from tribler.core.utilities.search_utils import filter_keywords, find_word_and_rotate_title, freshness_rank, item_rank,\
-    seeders_rank, split_into_keywords, torrent_rank, title_rank
+from tribler.core.utilities.search_utils import TitleRanker, filter_keywords, find_word_and_rotate_title, \
+    freshness_rank, item_rank, seeders_rank, split_into_keywords, torrent_rank, torrent_rank_batch, title_rank
 
 
 DAY = 60 * 60 * 24
@@ -53,6 +53,33 @@ def test_torrent_rank_range():
     assert torrent_rank(long_query, long_title, freshness=1000000 * 365 * DAY) == pytest.approx(+0.02879524)
 
 
+def test_title_ranker():
+    titles = ['Big Buck Bunny', 'Big Bunny Buck', 'Sintel', 'Buck', '', '...', 'A B C Big Buck Bunny 1080p']
+    for query in ['Big Buck Bunny', 'buck', 'Sintel part', '', '!!!']:
+        ranker = TitleRanker(query)
+        for title in titles:
+            assert ranker.rank(title) == title_rank(query, title)
+
+
+def test_torrent_rank_batch():
+    query = 'Big Buck Bunny'
+    rows = [
+        ('Big Buck Bunny', 0, 0, 0),
+        ('Big Buck Bunny', 1000, 10, DAY),
+        ('Big Buck Bunny II', 10, None, 100 * DAY),
+        ('Buck Bunny', None, None, None),
+        (None, 5, 5, -10),
+        ('Sintel', 1000000, 1000000, 0.01),
+    ]
+    titles, seeders, leechers, freshness = zip(*rows)
+    ranks = torrent_rank_batch(query, titles, seeders, leechers, freshness)
+    assert ranks.tolist() == [torrent_rank(query, *row) for row in rows]
+
+
+def test_torrent_rank_batch_empty():
+    assert torrent_rank_batch('Big Buck Bunny', [], [], [], []).tolist() == []
+
+
 def test_torrent_rank():
     query = 'Big Buck Bunny'
     # The exact match ranked as pretty high
@@ -6,7 +6,7 @@ from unittest.mock import patch
 
 import pytest
 from ipv8.keyvault.private.libnaclkey import LibNaCLSK
-from pony.orm import db_session, select
+from pony.orm import db_session, flush, select
 
 from tribler.core.components.bandwidth_accounting.db.database import BandwidthDatabase
 from tribler.core.components.metadata_store.db.orm_bindings.channel_metadata import CHANNEL_DIR_NAME_LENGTH
@@ -16,6 +16,7 @@ from tribler.core.upgrade.db8_to_db10 import calc_progress
 from tribler.core.upgrade.tags_to_knowledge.tags_db import TagDatabase
 from tribler.core.upgrade.upgrade import TriblerUpgrader, cleanup_noncompliant_channel_torrents
 from tribler.core.utilities.configparser import CallbackConfigParser
+from tribler.core.utilities.utilities import random_infohash
 
 
 # pylint: disable=redefined-outer-name, protected-access
@@ -194,6 +195,88 @@ def test_upgrade_pony13to14_no_tags(upgrader: TriblerUpgrader, state_dir, channe
         assert mds.get_value('db_version') == '14'
 
 
+def test_upgrade_pony14to15(upgrader: TriblerUpgrader, channels_dir, trustchain_keypair, mds_path):
+    _copy(source_name='pony_v13.db', target=mds_path)
+    upgrader.upgrade_pony_db_13to14()
+
+    upgrader.upgrade_pony_db_14to15()
+    mds = MetadataStore(mds_path, channels_dir, trustchain_keypair, check_tables=False)
+
+    with db_session:
+        assert mds.get_value('db_version') == '15'
+        # The existing titles are backfilled after the upgrade, in the rowid order
+        assert mds.completion_index.get_queue_size() == 0
+        assert mds.completion_index.get_backfill_range() == (0, mds.get_max_rowid())
+
+        # The entries are created with the column added by version 17
+        mds.db.execute('ALTER TABLE "ChannelNode" ADD "serialized_payload" BLOB')
+
+        # The triggers queue the titles of the new entries
+        mds.TorrentMetadata(title='new torrent', infohash=random_infohash())
+        flush()
+        assert mds.completion_index.get_queue_size() == 1
+
+    while mds.update_completion_index():
+        pass
+    assert mds.completion_index.is_backfilled()
+    assert mds.get_auto_complete_terms('new t', 5) == ['new torrent']
+    mds.shutdown()
+
+
+def test_upgrade_pony15to16(upgrader: TriblerUpgrader, channels_dir, trustchain_keypair, mds_path):
+    _copy(source_name='pony_v13.db', target=mds_path)
+    upgrader.upgrade_pony_db_13to14()
+    upgrader.upgrade_pony_db_14to15()
+
+    upgrader.upgrade_pony_db_15to16()
+    mds = MetadataStore(mds_path, channels_dir, trustchain_keypair, check_tables=False)
+
+    with db_session:
+        assert mds.get_value('db_version') == '16'
+        indexes = set(mds.db.select("name FROM sqlite_master WHERE type = 'index'"))
+        assert 'idx_torrentstate__last_check__partial' in indexes
+        assert 'idx_channelnode__origin_id_title' in indexes
+        assert 'idx_channelnode__channel_votes__partial' in indexes
+    mds.shutdown()
+
+
+def test_upgrade_pony16to17(upgrader: TriblerUpgrader, channels_dir, trustchain_keypair, mds_path):
+    _copy(source_name='pony_v13.db', target=mds_path)
+    upgrader.upgrade_pony_db_13to14()
+    upgrader.upgrade_pony_db_14to15()
+    upgrader.upgrade_pony_db_15to16()
+
+    upgrader.upgrade_pony_db_16to17()
+    mds = MetadataStore(mds_path, channels_dir, trustchain_keypair, check_tables=False)
+
+    with db_session:
+        assert mds.get_value('db_version') == '17'
+        assert upgrader.column_exists_in_table(mds.db, 'ChannelNode', 'serialized_payload')
+        torrent = mds.TorrentMetadata(title='new torrent', infohash=random_infohash())
+        flush()
+        assert torrent.has_serialized_payload()
+    mds.shutdown()
+
+
+def test_upgrade_pony17to18(upgrader: TriblerUpgrader, channels_dir, trustchain_keypair, mds_path):
+    _copy(source_name='pony_v13.db', target=mds_path)
+    upgrader.upgrade_pony_db_13to14()
+    upgrader.upgrade_pony_db_14to15()
+    upgrader.upgrade_pony_db_15to16()
+    upgrader.upgrade_pony_db_16to17()
+
+    upgrader.upgrade_pony_db_17to18()
+    mds = MetadataStore(mds_path, channels_dir, trustchain_keypair, check_tables=False)
+
+    with db_session:
+        assert mds.get_value('db_version') == '18'
+    content_version = mds.get_content_version()
+    with db_session:
+        mds.TorrentMetadata(title='new torrent', infohash=random_infohash())
+    assert mds.get_content_version() > content_version
+    mds.shutdown()
+
+
 def test_upgrade_pony12to13(upgrader, channels_dir, mds_path, trustchain_keypair):  # pylint: disable=W0621
     _copy('pony_v12.db', mds_path)
 
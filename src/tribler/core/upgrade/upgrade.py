@@ -100,6 +100,10 @@ class TriblerUpgrader:
         self.upgrade_pony_db_11to12()
         self.upgrade_pony_db_12to13()
         self.upgrade_pony_db_13to14()
+        self.upgrade_pony_db_14to15()
+        self.upgrade_pony_db_15to16()
+        self.upgrade_pony_db_16to17()
+        self.upgrade_pony_db_17to18()
         self.upgrade_tags_to_knowledge()
         self.remove_old_logs()
 
@@ -128,6 +132,58 @@ class TriblerUpgrader:
         migration = MigrationTagsToKnowledge(self.state_dir, self.secondary_key)
         migration.run()
 
+    def upgrade_pony_db_17to18(self):
+        """
+        Upgrade GigaChannel DB from version 17 to version 18.
+        Version 18 adds the content version, which tracks the changes of the entries and of their health.
+        """
+        mds_path = self.state_dir / STATEDIR_DB_DIR / 'metadata.db'
+        if not mds_path.exists():
+            return
+        mds = MetadataStore(mds_path, self.channels_dir, self.primary_key, disable_sync=True,
+                            check_tables=False, db_version=17)
+        self.do_upgrade_pony_db_17to18(mds)
+        mds.shutdown()
+
+    def upgrade_pony_db_16to17(self):
+        """
+        Upgrade GigaChannel DB from version 16 to version 17.
+        Version 17 stores the signed payload bytes of the entries, so they are not serialized again on every send.
+        """
+        mds_path = self.state_dir / STATEDIR_DB_DIR / 'metadata.db'
+        if not mds_path.exists():
+            return
+        mds = MetadataStore(mds_path, self.channels_dir, self.primary_key, disable_sync=True,
+                            check_tables=False, db_version=16)
+        self.do_upgrade_pony_db_16to17(mds)
+        mds.shutdown()
+
+    def upgrade_pony_db_15to16(self):
+        """
+        Upgrade GigaChannel DB from version 15 to version 16.
+        Version 16 adds the indexes for the sort orders of the metadata listings.
+        """
+        mds_path = self.state_dir / STATEDIR_DB_DIR / 'metadata.db'
+        if not mds_path.exists():
+            return
+        mds = MetadataStore(mds_path, self.channels_dir, self.primary_key, disable_sync=True,
+                            check_tables=False, db_version=15)
+        self.do_upgrade_pony_db_15to16(mds)
+        mds.shutdown()
+
+    def upgrade_pony_db_14to15(self):
+        """
+        Upgrade GigaChannel DB from version 14 to version 15.
+        Version 15 adds the search completion index, which is updated by the FTS triggers.
+        """
+        mds_path = self.state_dir / STATEDIR_DB_DIR / 'metadata.db'
+        if not mds_path.exists():
+            return
+        mds = MetadataStore(mds_path, self.channels_dir, self.primary_key, disable_sync=True,
+                            check_tables=False, db_version=14)
+        self.do_upgrade_pony_db_14to15(mds)
+        mds.shutdown()
+
     def upgrade_pony_db_13to14(self):
         mds_path = self.state_dir / STATEDIR_DB_DIR / 'metadata.db'
         tagdb_path = self.state_dir / STATEDIR_DB_DIR / 'tags.db'
@@ -280,6 +336,61 @@ class TriblerUpgrader:
             mds.db.commit()
             mds.set_value(key='db_version', value=version.next)
 
+    def do_upgrade_pony_db_14to15(self, mds: MetadataStore):
+        version = SimpleNamespace(current='14', next='15')
+        with db_session(ddl=True):
+            db_version = mds.get_value(key='db_version')
+            if db_version != version.current:
+                return
+
+            self._logger.info(f'{version.current}->{version.next}')
+
+            # The existing titles are not queued, they are backfilled in batches after the upgrade
+            mds.completion_index.create_tables()
+            mds.drop_fts_triggers()
+            mds.create_fts_triggers()
+            mds.set_value(key='db_version', value=version.next)
+
+    def do_upgrade_pony_db_15to16(self, mds: MetadataStore):
+        version = SimpleNamespace(current='15', next='16')
+        with db_session(ddl=True):
+            db_version = mds.get_value(key='db_version')
+            if db_version != version.current:
+                return
+
+            self._logger.info(f'{version.current}->{version.next}')
+
+            # The databases created after the version 13 lack the partial index of TorrentState
+            mds.db.execute(sql_create_partial_index_torrentstate_last_check)
+            mds.create_sort_indexes()
+            mds.set_value(key='db_version', value=version.next)
+
+    def do_upgrade_pony_db_16to17(self, mds: MetadataStore):
+        version = SimpleNamespace(current='16', next='17')
+        with db_session(ddl=True):
+            db_version = mds.get_value(key='db_version')
+            if db_version != version.current:
+                return
+
+            self._logger.info(f'{version.current}->{version.next}')
+
+            # The payload bytes of the existing entries are serialized on demand, as before
+            if not self.column_exists_in_table(mds.db, 'ChannelNode', 'serialized_payload'):
+                mds.db.execute('ALTER TABLE "ChannelNode" ADD "serialized_payload" BLOB')
+            mds.set_value(key='db_version', value=version.next)
+
+    def do_upgrade_pony_db_17to18(self, mds: MetadataStore):
+        version = SimpleNamespace(current='17', next='18')
+        with db_session(ddl=True):
+            db_version = mds.get_value(key='db_version')
+            if db_version != version.current:
+                return
+
+            self._logger.info(f'{version.current}->{version.next}')
+
+            mds.create_content_version_triggers()
+            mds.set_value(key='db_version', value=version.next)
+
     def do_upgrade_pony_db_11to12(self, mds):
         from_version = 11
         to_version = 12
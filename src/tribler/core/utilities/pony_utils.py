@@ -1,8 +1,12 @@
+import asyncio
+import logging
+import queue
 import threading
-from asyncio import get_event_loop
-from typing import Callable, Type
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Type, Union
 
-from pony.orm.core import Database, Entity, select
+from pony.orm.core import Database, Entity, Set, select
 
 
 # pylint: disable=bad-staticmethod-argument
@@ -33,35 +37,177 @@ def get_max(cls: Type[Entity], column_name='rowid') -> int:
     return select(max(getattr(obj, column_name)) for obj in cls).get() or 0
 
 
-async def run_threaded(db: Database, func: Callable, *args, **kwargs):
-    """Run `func` threaded and close DB connection at the end of the execution.
+def invalidate_cached_collections(db: Database, *attrs: Set):
+    """Make PonyORM reload the given collections and the query results cached in the current db_session.
 
-    Args:
-        db: the DB to be closed
-        func: the function to be executed threaded
-        *args: args for the function call
-        **kwargs: kwargs for the function call
+    PonyORM does not know about rows written by raw SQL queries, so the collections it considers fully loaded
+    could miss these rows (or raise UnrepeatableReadError when a new row referencing them is loaded).
+    """
+    cache = db._get_cache()  # pylint: disable=protected-access
+    cache.query_results.clear()
+    for obj in cache.objects:
+        for attr in attrs:
+            setdata = obj._vals_.get(attr) if isinstance(obj, attr.entity) else None  # pylint: disable=protected-access
+            if setdata is not None:
+                setdata.is_fully_loaded = False
+                setdata.count = None
+
+
+class DatabaseExecutorOverloaded(Exception):
+    """Raised when a task is submitted to a `DatabaseExecutor` with a full queue"""
+
+
+class DatabaseExecutor:
+    """A bounded pool of worker threads dedicated to a single database.
 
-    Returns: a result of the func call.
+    You should use `DatabaseExecutor.run` to execute all functions that work with the database from a separate thread.
 
-    You should use `run_threaded` to wrap all functions that should be executed from a separate thread and work with
-    the database. The `run_threaded` function ensures that all database connections opened in worker threads are
-    properly closed before the Tribler shutdown.
+    Unlike the default asyncio executor, the worker threads keep their PonyORM connections open between calls, so
+    the per-connection setup (PRAGMAs, custom functions, etc.) is done once per thread instead of once per call.
+    After the db_session is over, PonyORM caches the connection to the database to re-use it again later in the
+    same thread. It was previously reported that some obscure problems could be observed during the Tribler shutdown
+    if connections in the Tribler worker threads are not closed properly, so each worker thread closes its
+    connection when the executor is shut down.
 
-    The Asyncio `run_in_executor` method executes its argument in a separate worker thread. After the db_session is
-    over, PonyORM caches the connection to the database to re-use it again later in the same thread. It was previously
-    reported that some obscure problems could be observed during the Tribler shutdown if connections in the Tribler
-    worker threads are not closed properly.
+    The executor also keeps statistics about the queue depth, the time tasks spend waiting in the queue and
+    the time of their execution.
     """
 
-    def wrapper():
+    def __init__(self, db: Database, name: str = 'DB', max_workers: int = 2, max_queue_size: int = 1000):
+        """
+        Args:
+            db: the DB which connections are opened by the worker threads
+            name: the name of the executor, used as a prefix for the names of worker threads
+            max_workers: the maximum number of worker threads
+            max_queue_size: the maximum number of tasks waiting for execution
+        """
+        self.db = db
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._threads: List[threading.Thread] = []
+        self._idle_workers = 0
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+        self.tasks_completed = 0
+        self.tasks_rejected = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_execution_time = 0.0
+        self.max_execution_time = 0.0
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Schedule `func` for execution in one of the worker threads.
+
+        Returns: a `concurrent.futures.Future` with the result of the func call.
+
+        Raises: DatabaseExecutorOverloaded if the queue of the executor is full.
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError(f'{self.name} executor is shut down')
+            try:
+                self._queue.put_nowait((future, time.monotonic(), func, args, kwargs))
+            except queue.Full as e:
+                self.tasks_rejected += 1
+                raise DatabaseExecutorOverloaded(f'{self.name} executor queue is full') from e
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+            if self._idle_workers < self._queue.qsize() and len(self._threads) < self.max_workers:
+                self._start_worker()
+        return future
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run `func` in one of the worker threads and wait for the result.
+
+        Args:
+            func: the function to be executed threaded
+            *args: args for the function call
+            **kwargs: kwargs for the function call
+
+        Returns: a result of the func call.
+        """
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        """Cancel the tasks that are not started yet and stop the worker threads.
+
+        Each worker thread closes its database connection before stopping.
+        """
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            threads = list(self._threads)
+
+        while True:
+            try:
+                future, *_ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
+
+        for _ in threads:
+            self._queue.put(None)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def get_statistics(self) -> Dict[str, Union[int, float]]:
+        completed = self.tasks_completed
+        return {
+            'workers': len(self._threads),
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'tasks_completed': completed,
+            'tasks_rejected': self.tasks_rejected,
+            'avg_wait_time': self.total_wait_time / completed if completed else 0.0,
+            'max_wait_time': self.max_wait_time,
+            'avg_execution_time': self.total_execution_time / completed if completed else 0.0,
+            'max_execution_time': self.max_execution_time,
+        }
+
+    def _start_worker(self):
+        thread = threading.Thread(target=self._worker, name=f'{self.name}_{len(self._threads)}', daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _worker(self):
         try:
-            return func(*args, **kwargs)
+            while True:
+                with self._lock:
+                    self._idle_workers += 1
+                item = self._queue.get()
+                with self._lock:
+                    self._idle_workers -= 1
+                if item is None:
+                    break
+
+                future, submitted, func, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+
+                started = time.monotonic()
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException as e:  # pylint: disable=broad-except
+                    self._update_statistics(wait_time=started - submitted, execution_time=time.monotonic() - started)
+                    future.set_exception(e)
+                else:
+                    self._update_statistics(wait_time=started - submitted, execution_time=time.monotonic() - started)
+                    future.set_result(result)
         finally:
-            # @ichorid: this is a workaround for closing threadpool connections
-            # Remark: maybe subclass ThreadPoolExecutor to handle this automatically?
-            is_main_thread = isinstance(threading.current_thread(), threading._MainThread)  # pylint: disable=W0212
-            if not is_main_thread:
-                db.disconnect()
+            self.db.disconnect()
 
-    return await get_event_loop().run_in_executor(None, wrapper)
+    def _update_statistics(self, wait_time: float, execution_time: float):
+        with self._lock:
+            self.tasks_completed += 1
+            self.total_wait_time += wait_time
+            self.max_wait_time = max(self.max_wait_time, wait_time)
+            self.total_execution_time += execution_time
+            self.max_execution_time = max(self.max_execution_time, execution_time)
@@ -6,7 +6,9 @@ Author(s): Jelle Roozenburg, Arno Bakker, Alexander Kozlovsky
 import re
 import time
 from collections import deque
-from typing import Deque, List, Optional, Tuple
+from typing import Deque, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 RE_KEYWORD_SPLIT = re.compile(r"[\W_]", re.UNICODE)
 DIALOG_STOPWORDS = {'an', 'and', 'by', 'for', 'from', 'of', 'the', 'to', 'with'}
@@ -213,6 +215,69 @@ def calculate_rank(query: List[str], title: List[str]) -> float:
     return RANK_NORMALIZATION_COEFF / (RANK_NORMALIZATION_COEFF + total_error)
 
 
+class TitleRanker:
+    """
+    Calculates `title_rank` values of many titles for the same query string.
+
+    The query is split into words only once, and the error value for a title that does not contain any of the query
+    words is precomputed, so only the titles that share some words with the query go through `calculate_rank`.
+    The results are exactly the same as the results of `title_rank(query, title)`.
+    """
+
+    def __init__(self, query: str):
+        self.query = word_re.findall(query.lower())
+        self.query_words = frozenset(self.query)
+
+        # The same sequence of floating point operations as in `calculate_rank` for a title without query words
+        missed_words_error = 0
+        for i in range(len(self.query)):
+            missed_words_error += MISSED_WORD_PENALTY * (POSITION_COEFF / (POSITION_COEFF + i))
+        self.missed_words_error = missed_words_error
+        self.remainder_weight = 1 / (REMAINDER_COEFF + len(self.query))
+
+    def rank(self, title: str) -> float:
+        if not self.query:
+            return 1.0
+
+        title = word_re.findall(title.lower())
+        if not title:
+            return 0.0
+
+        if self.query_words.isdisjoint(title):
+            total_error = self.missed_words_error + len(title) * self.remainder_weight
+            return RANK_NORMALIZATION_COEFF / (RANK_NORMALIZATION_COEFF + total_error)
+
+        return calculate_rank(self.query, title)
+
+
+def torrent_rank_batch(query: str, titles: Sequence[Optional[str]], seeders: Sequence[Optional[int]],
+                       leechers: Sequence[Optional[int]], freshness: Sequence[Optional[float]]) -> np.ndarray:
+    """
+    Calculates search ranks for a batch of torrents at once. This is a vectorized version of `torrent_rank` that
+    returns exactly the same values, but is much cheaper than calling `torrent_rank` for each torrent separately.
+
+    :param query: a user-defined query string
+    :param titles: torrent names
+    :param seeders: the numbers of seeders, `None` values are treated as zero
+    :param leechers: the numbers of leechers, `None` values are treated as zero
+    :param freshness: the numbers of seconds since the torrent creation, `None` values are treated as zero
+    :return: an array of torrent rank values in range [0, 1]
+    """
+    ranker = TitleRanker(query or '')
+    tr = np.fromiter((ranker.rank(title or '') for title in titles), dtype=np.float64, count=len(titles))
+
+    seeders = np.array([s or 0 for s in seeders], dtype=np.float64)
+    leechers = np.array([lc or 0 for lc in leechers], dtype=np.float64)
+    sl = seeders + leechers * LEECHERS_COEFF
+    sr = (sl / (100 + sl) + 9) / 10  # range [0.9, 1], the same as in `seeders_rank`
+
+    freshness = np.maximum(np.array([f or 0 for f in freshness], dtype=np.float64), 0)
+    days = freshness / SECONDS_IN_DAY
+    fr = (np.where(freshness > 0, 1 / (1 + days / 30), 0) + 9) / 10  # range [0.9, 1], the same as in `freshness_rank`
+
+    return tr * sr * fr
+
+
 def find_word_and_rotate_title(word: str, title: Deque[str]) -> Tuple[bool, int]:
     """
     Finds the query word in the title. Returns whether it was found or not and the number of skipped words in the title.
@@ -0,0 +1,84 @@
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from tribler.core.utilities.pony_utils import DatabaseExecutor, DatabaseExecutorOverloaded
+
+
+# pylint: disable=redefined-outer-name
+
+@pytest.fixture
+def executor():
+    executor = DatabaseExecutor(MagicMock(), name='test', max_workers=2, max_queue_size=2)
+    yield executor
+    executor.shutdown()
+
+
+async def test_run(executor):
+    thread_ids = {await executor.run(threading.get_ident) for _ in range(10)}
+
+    assert threading.get_ident() not in thread_ids
+    assert len(thread_ids) <= executor.max_workers
+
+
+async def test_run_exception(executor):
+    def f():
+        raise ValueError('test exception')
+
+    with pytest.raises(ValueError, match='^test exception$'):
+        await executor.run(f)
+
+
+def test_connections_are_kept_open(executor):
+    executor.submit(lambda: None).result()
+    executor.submit(lambda: None).result()
+    executor.db.disconnect.assert_not_called()
+
+
+def test_shutdown_closes_connections(executor):
+    executor.submit(lambda: None).result()
+    workers = executor.get_statistics()['workers']
+
+    executor.shutdown()
+
+    assert executor.db.disconnect.call_count == workers
+    with pytest.raises(RuntimeError):
+        executor.submit(lambda: None)
+
+
+def test_overload(executor):
+    event = threading.Event()
+    futures = [executor.submit(event.wait) for _ in range(2)]  # occupy all workers
+    while executor.get_statistics()['queue_depth']:
+        threading.Event().wait(0.01)
+    futures += [executor.submit(event.wait) for _ in range(2)]  # fill the queue
+
+    with pytest.raises(DatabaseExecutorOverloaded):
+        executor.submit(event.wait)
+
+    event.set()
+    for future in futures:
+        future.result()
+
+    stats = executor.get_statistics()
+    assert stats['tasks_rejected'] == 1
+    assert stats['tasks_completed'] == 4
+    assert stats['max_queue_depth'] == 2
+    assert stats['max_wait_time'] >= 0
+
+
+def test_shutdown_cancels_pending_tasks():
+    executor = DatabaseExecutor(MagicMock(), max_workers=1)
+    event = threading.Event()
+    running = executor.submit(event.wait)
+    while executor.get_statistics()['queue_depth']:
+        threading.Event().wait(0.01)
+    pending = executor.submit(event.wait)
+
+    # The worker is still blocked, so the pending task can not be picked up before it is cancelled
+    executor.shutdown(wait=False)
+    assert pending.cancelled()
+
+    event.set()
+    assert running.result()
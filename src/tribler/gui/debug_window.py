@@ -270,6 +270,9 @@ class DebugWindow(QMainWindow):
         self.create_and_add_widget_item(
             "Database size", format_size(data["db_size"]), self.window().general_tree_widget
         )
+        self.create_and_add_widget_item(
+            "Database WAL size", format_size(data.get("wal_size", 0)), self.window().general_tree_widget
+        )
         self.create_and_add_widget_item(
             "Number of known torrents", data["num_torrents"], self.window().general_tree_widget
         )
@@ -26,6 +26,7 @@ class EventRequestManager(QNetworkAccessManager):
 
     node_info_updated = pyqtSignal(object)
     received_remote_query_results = pyqtSignal(object)
+    total_count_updated = pyqtSignal(object)
     core_connected = pyqtSignal(object)
     new_version_available = pyqtSignal(str)
     discovered_channel = pyqtSignal(object)
@@ -62,6 +63,7 @@ class EventRequestManager(QNetworkAccessManager):
         notifier.add_observer(notifications.torrent_finished, self.on_torrent_finished)
         notifier.add_observer(notifications.low_space, self.on_low_space)
         notifier.add_observer(notifications.remote_query_results, self.on_remote_query_results)
+        notifier.add_observer(notifications.total_count_updated, self.on_total_count_updated)
         notifier.add_observer(notifications.tribler_shutdown_state, self.on_tribler_shutdown_state)
         notifier.add_observer(notifications.report_config_error, self.on_report_config_error)
 
@@ -102,6 +104,9 @@ class EventRequestManager(QNetworkAccessManager):
     def on_remote_query_results(self, data: dict):
         self.received_remote_query_results.emit(data)
 
+    def on_total_count_updated(self, data: dict):
+        self.total_count_updated.emit(data)
+
     def on_tribler_shutdown_state(self,state: str):
         self.tribler_shutdown_signal.emit(state)
 
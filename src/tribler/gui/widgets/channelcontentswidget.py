@@ -300,6 +300,7 @@ class ChannelContentsWidget(AddBreadcrumbOnShowMixin, widget_form, widget_class)
 
     def disconnect_current_model(self):
         disconnect(self.window().core_manager.events_manager.node_info_updated, self.model.update_node_info)
+        disconnect(self.window().core_manager.events_manager.total_count_updated, self.model.on_total_count_updated)
         disconnect(self.model.info_changed, self.on_model_info_changed)
         disconnect(self.model.query_complete, self.on_model_query_completed)
 
@@ -309,6 +310,7 @@ class ChannelContentsWidget(AddBreadcrumbOnShowMixin, widget_form, widget_class)
         connect(self.model.info_changed, self.on_model_info_changed)
         connect(self.model.query_complete, self.on_model_query_completed)
         connect(self.window().core_manager.events_manager.node_info_updated, self.model.update_node_info)
+        connect(self.window().core_manager.events_manager.total_count_updated, self.model.on_total_count_updated)
 
     @property
     def current_level(self):
@@ -469,7 +471,9 @@ class ChannelContentsWidget(AddBreadcrumbOnShowMixin, widget_form, widget_class)
 
         if "total" in self.model.channel_info:
             self.channel_num_torrents_label.setHidden(False)
-            if "torrents" in self.model.channel_info:
+            if self.model.channel_info.get("total_is_lower_bound"):
+                self.channel_num_torrents_label.setText(tr("%(total)i+ items") % self.model.channel_info)
+            elif "torrents" in self.model.channel_info:
                 self.channel_num_torrents_label.setText(tr("%(total)i/%(torrents)i items") % self.model.channel_info)
             else:
                 self.channel_num_torrents_label.setText(tr("%(total)i items") % self.model.channel_info)
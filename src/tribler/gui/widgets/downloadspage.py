@@ -60,6 +60,10 @@ class DownloadsPage(AddBreadcrumbOnShowMixin, QWidget):
         self.filter = DOWNLOADS_FILTER_ALL
         self.download_widgets = {}  # key: infohash, value: QTreeWidgetItem
         self.downloads = None
+        # The core returns the changes since the version of the last response for the same query
+        self.downloads_version = None
+        self.downloads_query = None
+        self.download_states = {}  # key: infohash, value: the fields of the download received so far
         self.downloads_timer = QTimer()
         self.downloads_timeout_timer = QTimer()
         self.downloads_last_update = 0
@@ -132,11 +136,14 @@ class DownloadsPage(AddBreadcrumbOnShowMixin, QWidget):
         self.downloads_timeout_timer.stop()
 
     def load_downloads(self):
-        url = "downloads?get_pieces=1"
+        query = "downloads?get_pieces=1"
         if self.window().download_details_widget.currentIndex() == 3:
-            url += "&get_peers=1"
+            query += "&get_peers=1"
         elif self.window().download_details_widget.currentIndex() == 1:
-            url += "&get_files=1"
+            query += "&get_files=1"
+        url = query
+        if self.downloads_version is not None and query == self.downloads_query:
+            url += f"&since={self.downloads_version}"
 
         isactive = not self.isHidden()
 
@@ -146,9 +153,25 @@ class DownloadsPage(AddBreadcrumbOnShowMixin, QWidget):
             priority = QNetworkRequest.LowPriority if not isactive else QNetworkRequest.HighPriority
             if self.rest_request:
                 self.rest_request.cancel()
-            request_manager.get(url, self.on_received_downloads, priority=priority)
+            request_manager.get(url, lambda downloads: self.on_received_downloads(downloads, query=query),
+                                priority=priority)
 
-    def on_received_downloads(self, downloads):
+    def merge_downloads(self, downloads, query=None):
+        """
+        Apply the received downloads to the downloads received before, and return the downloads with all the fields.
+        """
+        if downloads.get("delta"):
+            for infohash in downloads["removed"]:
+                self.download_states.pop(infohash, None)
+            for download in downloads["downloads"]:
+                self.download_states.setdefault(download["infohash"], {}).update(download)
+        else:
+            self.download_states = {download["infohash"]: download for download in downloads["downloads"]}
+        self.downloads_version = downloads.get("version")
+        self.downloads_query = query
+        return dict(downloads, downloads=list(self.download_states.values()))
+
+    def on_received_downloads(self, downloads, query=None):
         if not downloads or "downloads" not in downloads:
             return  # This might happen when closing Tribler
 
@@ -170,6 +193,7 @@ class DownloadsPage(AddBreadcrumbOnShowMixin, QWidget):
             self.window().downloads_list.takeTopLevelItem(loading_widget_index)
             self.window().downloads_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
 
+        downloads = self.merge_downloads(downloads, query=query)
         self.downloads = downloads
 
         self.total_download = 0
@@ -109,6 +109,10 @@ class RemoteTableModel(QAbstractTableModel):
         self.data_items = []
         self.max_rowid = None
         self.local_total = None
+        # The opaque position of the next page of local results, as returned by the Core
+        self.next_cursor = None
+        # The id of the query, for which the Core computes the exact total number of results in the background
+        self.total_id = None
         self.item_load_batch = 50
         self.sort_by = self.columns[self.default_sort_column].dict_key if self.default_sort_column >= 0 else None
         self.sort_desc = True
@@ -156,6 +160,7 @@ class RemoteTableModel(QAbstractTableModel):
         self.data_items = []
         self.max_rowid = None
         self.local_total = None
+        self.next_cursor = None
         self.item_uid_map = {}
         self.endResetModel()
         self.perform_query()
@@ -342,6 +347,10 @@ class RemoteTableModel(QAbstractTableModel):
         self.query_started.emit()
         if 'first' not in kwargs or 'last' not in kwargs:
             kwargs["first"], kwargs['last'] = self.rowCount() + 1, self.rowCount() + self.item_load_batch
+            # With the cursor, the Core continues right after the last loaded entry instead of skipping
+            # the first rows, so deep pages load as fast as the first one
+            if self.next_cursor is not None:
+                kwargs["cursor"] = self.next_cursor
 
         if self.sort_by is not None:
             kwargs.update({"sort_by": self.sort_by, "sort_desc": self.sort_desc})
@@ -357,6 +366,7 @@ class RemoteTableModel(QAbstractTableModel):
             # * The result list also integrates the results from remote peers that are not from the local database.
             if 'origin_id' not in kwargs:
                 kwargs.pop("include_total", None)
+                kwargs.pop("approximate_total", None)
 
         if self.max_rowid is not None:
             kwargs["max_rowid"] = self.max_rowid
@@ -367,6 +377,14 @@ class RemoteTableModel(QAbstractTableModel):
         self._logger.info(f'Request to "{rest_endpoint_url}":{kwargs}')
         request_manager.get(rest_endpoint_url, self.on_query_results, url_params=kwargs)
 
+    def on_total_count_updated(self, data):
+        if self.qt_object_destroyed or self.total_id is None or data["query_id"] != self.total_id:
+            return
+        self.total_id = None
+        self.local_total = self.channel_info["total"] = data["total"]
+        self.channel_info.pop("total_is_lower_bound", None)
+        self.info_changed.emit([])
+
     def on_query_results(self, response, remote=False, on_top=False):
         """
         Updates the table with the response.
@@ -387,7 +405,14 @@ class RemoteTableModel(QAbstractTableModel):
         if not remote or (uuid.UUID(response.get('uuid')) in self.remote_queries):
             prev_total = self.channel_info.get("total")
             if not remote:
-                if "total" in response:
+                self.next_cursor = response.get("cursor")
+                if response.get("total_is_lower_bound"):
+                    # The exact number will come later with the total_count_updated event
+                    self.local_total = None
+                    self.total_id = response["total_id"]
+                    self.channel_info["total"] = response["total"]
+                    self.channel_info["total_is_lower_bound"] = True
+                elif "total" in response:
                     self.local_total = response["total"]
                     self.channel_info["total"] = self.local_total
             elif self.channel_info.get("total"):
@@ -599,8 +624,9 @@ class ChannelContentModel(RemoteTableModel):
                 kwargs.update({"category": self.category_filter})
 
         if "total" not in self.channel_info:
-            # Only include total for the first query to the endpoint
-            kwargs.update({"include_total": 1})
+            # Only include total for the first query to the endpoint. Counting stops early on big channels,
+            # and the exact number is sent later as an event, so the first page is not delayed by the count.
+            kwargs.update({"include_total": 1, "approximate_total": 1})
 
         if self.tags:
             kwargs['tags'] = self.tags